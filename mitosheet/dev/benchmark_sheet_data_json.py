@@ -0,0 +1,77 @@
+"""
+Benchmarks convert_df_to_parsed_json, and convert_df_to_parsed_json_columns (which 
+the sheet data uses), on a 1,500 x 1,500 dataframe, against
+serializing the dataframe with df.to_json and reading it back with json.loads,
+which is how the sheet data was serialized before.
+
+Run from the mitosheet folder with:
+python dev/benchmark_sheet_data_json.py
+"""
+import json
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from mitosheet.utils import convert_df_to_parsed_json, convert_df_to_parsed_json_columns
+
+NUM_ROWS = 1_500
+NUM_COLUMNS = 1_500
+NUM_RUNS = 3
+
+
+def convert_df_to_parsed_json_with_to_json(original_df: pd.DataFrame) -> dict:
+    df = original_df.copy(deep=True)
+    for column_index in range(len(df.columns)):
+        dtype = str(df.dtypes.iloc[column_index])
+        if 'datetime' in dtype:
+            df.isetitem(column_index, df.iloc[:, column_index].dt.strftime('%Y-%m-%d %X'))
+        elif 'timedelta' in dtype:
+            df.isetitem(column_index, df.iloc[:, column_index].apply(lambda x: str(x)))
+
+    json_obj = json.loads(df.to_json(orient="split"))
+    for d in json_obj['data']:
+        for idx, e in enumerate(d):
+            if e is None:
+                d[idx] = 'NaN'
+    return json_obj
+
+
+def get_benchmark_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    columns = {}
+    for column_index in range(NUM_COLUMNS):
+        kind = column_index % 5
+        if kind == 0 or kind == 1:
+            values = rng.standard_normal(NUM_ROWS) * 1000
+            values[rng.random(NUM_ROWS) < 0.05] = np.nan
+        elif kind == 2:
+            values = rng.integers(0, 1_000_000, NUM_ROWS)
+        elif kind == 3:
+            values = np.array([f'value {i}' for i in rng.integers(0, 1000, NUM_ROWS)], dtype=object)
+        else:
+            values = pd.to_datetime(rng.integers(0, 2 * 10 ** 18, NUM_ROWS))
+        columns[f'column_{column_index}'] = values
+    return pd.DataFrame(columns)
+
+
+def time_function(function, df: pd.DataFrame) -> float:
+    times = []
+    for _ in range(NUM_RUNS):
+        start = perf_counter()
+        function(df)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    df = get_benchmark_df()
+    assert convert_df_to_parsed_json(df) == convert_df_to_parsed_json_with_to_json(df)
+
+    to_json_time = time_function(convert_df_to_parsed_json_with_to_json, df)
+    rows_time = time_function(convert_df_to_parsed_json, df)
+    columns_time = time_function(convert_df_to_parsed_json_columns, df)
+    print(f'{NUM_ROWS} x {NUM_COLUMNS} cells, best of {NUM_RUNS} runs')
+    print(f'to_json and json.loads: {to_json_time:.3f}s')
+    print(f'convert_df_to_parsed_json: {rows_time:.3f}s ({to_json_time / rows_time:.1f}x faster)')
+    print(f'convert_df_to_parsed_json_columns: {columns_time:.3f}s ({to_json_time / columns_time:.1f}x faster)')
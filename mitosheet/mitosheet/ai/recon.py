@@ -159,7 +159,7 @@ def is_possibly_null_column_header_in_column_headers_with_no_nans(column_header:
 
 def get_added_column_headers(old_column_headers: List[ColumnHeader], new_column_headers: Iterable[ColumnHeader]) -> List[ColumnHeader]:
 
-    old_non_null = list(filter(lambda ch: not pd.isna(ch), old_column_headers))
+    old_non_null = set(filter(lambda ch: not pd.isna(ch), old_column_headers))
     new_non_null = list(filter(lambda ch: not pd.isna(ch), new_column_headers))
     added_non_null = list(filter(lambda ch: ch not in old_non_null, new_non_null))
 
@@ -171,7 +171,7 @@ def get_added_column_headers(old_column_headers: List[ColumnHeader], new_column_
 
 def get_shared_column_headers(old_column_headers: List[ColumnHeader], new_column_headers: Iterable[ColumnHeader]) -> List[ColumnHeader]:
 
-    old_non_null = list(filter(lambda ch: not pd.isna(ch), old_column_headers))
+    old_non_null = set(filter(lambda ch: not pd.isna(ch), old_column_headers))
     new_non_null = list(filter(lambda ch: not pd.isna(ch), new_column_headers))
     shared_non_null = list(filter(lambda ch: ch in old_non_null, new_non_null))
 
@@ -182,11 +182,49 @@ def get_shared_column_headers(old_column_headers: List[ColumnHeader], new_column
     return shared_non_null + shared_null
 
 
-def get_modified_dataframe_recon_data(old_df: pd.DataFrame, new_df: pd.DataFrame) -> ModifiedDataframeReconData:
+def is_same_column_data(old_column: pd.Series, new_column: pd.Series) -> bool:
+    """
+    Returns True if the columns are views of the same memory, in which case they
+    must have the same values. This is constant time, and so is much cheaper than
+    comparing the values of the columns.
+    """
+    if old_column is new_column:
+        return True
+    if not isinstance(old_column.dtype, np.dtype) or old_column.dtype != new_column.dtype:
+        return False
+    old_values = old_column.to_numpy(copy=False)
+    new_values = new_column.to_numpy(copy=False)
+    return old_values.__array_interface__ == new_values.__array_interface__
+
+
+def is_column_modified(old_column: pd.Series, new_column: pd.Series, same_index: bool) -> bool:
+    """
+    Returns True if the values of the column changed, doing cheap checks before 
+    comparing the values of the columns.
+    """
+    # Columns with a different dtype are never equal
+    if old_column.dtype != new_column.dtype:
+        return True
+    # Columns that share their data with the old column (e.g. because the step did not
+    # write to them) are unchanged, as long as the index is unchanged
+    if same_index and is_same_column_data(old_column, new_column):
+        return False
+    return not old_column.equals(new_column)
+
+
+def get_modified_dataframe_recon_data(
+        old_df: pd.DataFrame, 
+        new_df: pd.DataFrame,
+        modified_column_headers: Optional[List[ColumnHeader]]=None,
+        renamed_column_headers: Optional[Dict[ColumnHeader, ColumnHeader]]=None
+    ) -> ModifiedDataframeReconData:
     """
     Given a dataframe and a modified dataframe, this function tries to figure out what has happened
     to column headers dataframe. Specifically, because our state maps column headers to do others based on column
     id, we need to track which columns are added, which are removed, and which are renamed.
+
+    If the modified_column_headers are passed, then the caller knows which columns it changed, and so
+    we trust these (and the renamed_column_headers) rather than comparing the data in the dataframes. 
     """
 
     old_columns = old_df.columns.to_list()
@@ -202,9 +240,6 @@ def get_modified_dataframe_recon_data(old_df: pd.DataFrame, new_df: pd.DataFrame
             error_modal=False
         )
 
-    old_df_head = old_df.head(5)
-    new_df_head = new_df.head(5)
-
     rows_added_or_removed = len(old_df) != len(new_df)
 
     # First, preserving the order, we remove any columns that are in both the old
@@ -212,24 +247,35 @@ def get_modified_dataframe_recon_data(old_df: pd.DataFrame, new_df: pd.DataFrame
     old_columns_without_shared = get_added_column_headers(new_columns, old_columns)
     new_columns_without_shared = get_added_column_headers(old_columns, new_columns)
     
-    # Then, we look through to find any columns that have been simply renamed - simply
-    # by comparing to see of column are identical between the two values. We do this 
-    # just by checking the first 5 values of the dataframe, before doing a direct comparison
     renamed_columns: Dict[ColumnHeader, ColumnHeader] = {}
-    for old_ch in old_columns_without_shared:
-        old_column = old_df_head[old_ch]
-        for new_ch in new_columns_without_shared:
-            new_column = new_df_head[new_ch]
-            if old_column.equals(new_column) and new_ch not in renamed_columns.values():
-                renamed_columns[old_ch] = new_ch
+    if modified_column_headers is not None:
+        renamed_columns = {
+            old_ch: new_ch for old_ch, new_ch in (renamed_column_headers or {}).items()
+            if old_ch != new_ch
+        }
+    else:
+        # Then, we look through to find any columns that have been simply renamed - simply
+        # by comparing to see of column are identical between the two values. We do this 
+        # just by checking the first 5 values of the dataframe, before doing a direct comparison
+        old_df_head = old_df.head(5)
+        new_df_head = new_df.head(5)
+        for old_ch in old_columns_without_shared:
+            old_column = old_df_head[old_ch]
+            for new_ch in new_columns_without_shared:
+                new_column = new_df_head[new_ch]
+                if old_column.equals(new_column) and new_ch not in renamed_columns.values():
+                    renamed_columns[old_ch] = new_ch
 
     added_columns = [ch for ch in new_columns_without_shared if not is_possibly_null_column_header_in_column_headers_with_no_nans(ch, renamed_columns.values())]
     removed_columns = [ch for ch in old_columns_without_shared if not is_possibly_null_column_header_in_column_headers_with_no_nans(ch, renamed_columns)]
 
     shared_columns = get_shared_column_headers(old_columns, new_columns)
 
-    if not rows_added_or_removed:
-        modified_columns = [ch for ch in shared_columns if not old_df[ch].equals(new_df[ch])]
+    if modified_column_headers is not None:
+        modified_columns = [ch for ch in shared_columns if is_possibly_null_column_header_in_column_headers_with_no_nans(ch, modified_column_headers)]
+    elif not rows_added_or_removed:
+        same_index = old_df.index is new_df.index or old_df.index.equals(new_df.index)
+        modified_columns = [ch for ch in shared_columns if is_column_modified(old_df[ch], new_df[ch], same_index)]
     else:
         # If rows were added or removed, then we don't want to detect every column as having changed
         # and instead we'd just like to report the row changes. As such, we only compare the rows not added or removed
@@ -279,13 +325,18 @@ def update_state_by_reconing_dataframes(
         sheet_index: int, 
         old_df: pd.DataFrame,
         new_df: pd.DataFrame,
-        column_headers_to_column_ids: Optional[Dict[ColumnHeader, ColumnID]]=None
+        column_headers_to_column_ids: Optional[Dict[ColumnHeader, ColumnID]]=None,
+        modified_column_headers: Optional[List[ColumnHeader]]=None,
+        renamed_column_headers: Optional[Dict[ColumnHeader, ColumnHeader]]=None
     ) -> Tuple[State, ModifiedDataframeReconData]:
     """
     This function is the work-horse for modified dataframes. It compares the old dataframe at the index 
     to the new dataframe, and then updates the state accordingly -- making sure all the metadata is correct.
 
     This includes: handling deleted columns, added columns, renamed columns, and modified columns.
+
+    Steps that know which columns they modify and rename can pass the modified_column_headers and the
+    renamed_column_headers, so that we do not need to compare the data in the dataframes.
     """
     # Check there aren't any duplicated columns in the new dataframe
     c = Counter(new_df.columns)
@@ -294,7 +345,12 @@ def update_state_by_reconing_dataframes(
         if count > 1:
             raise make_column_exists_error(ch)
 
-    modified_dataframe_recon = get_modified_dataframe_recon_data(old_df, new_df)
+    modified_dataframe_recon = get_modified_dataframe_recon_data(
+        old_df, 
+        new_df, 
+        modified_column_headers=modified_column_headers, 
+        renamed_column_headers=renamed_column_headers
+    )
 
     # Add new columns to the state
     if len(modified_dataframe_recon['column_recon']['created_columns']) > 0:
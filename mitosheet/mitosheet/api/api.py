@@ -27,15 +27,18 @@ from mitosheet.api.get_imported_files_and_dataframes_from_analysis_name import \
     get_imported_files_and_dataframes_from_analysis_name
 from mitosheet.api.get_imported_files_and_dataframes_from_current_steps import \
     get_imported_files_and_dataframes_from_current_steps
+from mitosheet.api.get_memory_usage import get_memory_usage
 from mitosheet.api.get_parameterizable_params import get_parameterizable_params
 from mitosheet.api.get_params import get_params
 from mitosheet.api.get_path_contents import get_path_contents
 from mitosheet.api.get_path_join import get_path_join
 from mitosheet.api.get_pr_url_of_new_pr import get_pr_url_of_new_pr
 from mitosheet.api.get_render_count import get_render_count
+from mitosheet.api.get_rows import get_rows
 from mitosheet.api.get_search_matches import get_search_matches
 from mitosheet.api.get_split_text_to_columns_preview import \
     get_split_text_to_columns_preview
+from mitosheet.api.get_step_profiles import get_step_profiles
 from mitosheet.api.get_test_imports import get_test_imports
 from mitosheet.api.get_unique_value_counts import get_unique_value_counts
 from mitosheet.api.get_validate_snowflake_credentials import \
@@ -145,7 +148,8 @@ class API:
 
             self.api_queue.put(event)
         else:
-            handle_api_event(self.mito_backend.mito_send, event, self.steps_manager)
+            with self.steps_manager.execution_lock:
+                handle_api_event(self.mito_backend.mito_send, event, self.steps_manager)
 
 
 def handle_api_event_thread(
@@ -167,7 +171,9 @@ def handle_api_event_thread(
         # because otherwise if an error is thrown, then the entire thread crashes,
         # and then the API never works again
         try:
-            handle_api_event(mito_backend.mito_send, event, steps_manager)
+            # We hold the execution lock so the steps manager is not replaced while we read it
+            with steps_manager.execution_lock:
+                handle_api_event(mito_backend.mito_send, event, steps_manager)
         except:
             # Log in error if it occurs
             log_event_processed(event, steps_manager, failed=True)
@@ -235,6 +241,12 @@ def handle_api_event(
             result = get_parameterizable_params(params, steps_manager)
         elif event["type"] == "get_pr_url_of_new_pr":
             result = get_pr_url_of_new_pr(params, steps_manager)
+        elif event["type"] == "get_step_profiles":
+            result = get_step_profiles(params, steps_manager)
+        elif event["type"] == "get_memory_usage":
+            result = get_memory_usage(params, steps_manager)
+        elif event["type"] == "get_rows":
+            result = get_rows(params, steps_manager)
         # AUTOGENERATED LINE: API.PY CALL (DO NOT DELETE)
         else:
             raise Exception(f"Event: {event} is not a valid API call")
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+from typing import Any, Dict
+from mitosheet.types import StepsManagerType
+
+
+def get_memory_usage(params: Dict[str, Any], steps_manager: StepsManagerType) -> Dict[str, Any]:
+    return steps_manager.get_memory_usage()
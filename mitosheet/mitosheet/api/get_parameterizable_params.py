@@ -21,7 +21,11 @@ def get_parameterizable_params(params: Dict[str, Any], steps_manager: StepsManag
                         all_parameterizable_params.append((arg, 'import', "import_dataframe")) # type: ignore
     
         # Get optimized code chunk, and get their parameterizable params
-        code_chunks = get_code_chunks(steps_manager.steps_including_skipped[:steps_manager.curr_step_idx + 1], optimize=True)
+        code_chunks = get_code_chunks(
+                steps_manager.steps_including_skipped[:steps_manager.curr_step_idx + 1], 
+                optimize=True, 
+                step_indexes_to_skip=steps_manager.get_step_indexes_to_skip(steps_manager.curr_step_idx + 1)
+        )
 
         for code_chunk in code_chunks:
                 parameterizable_params = code_chunk.get_parameterizable_params()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+from typing import Any, Dict
+
+from mitosheet.pro.conditional_formatting_utils import get_conditonal_formatting_result
+from mitosheet.types import StepsManagerType
+from mitosheet.utils import MAX_COLUMNS, MAX_ROWS, convert_df_to_parsed_json_columns
+
+# The number of rows before and after the requested rows that we also send, so
+# that scrolling a little does not need another request
+ROW_PREFETCH_WINDOW = 100
+# Similarly, the number of columns before and after the requested columns that we also send
+COLUMN_PREFETCH_WINDOW = 10
+
+
+def get_rows(params: Dict[str, Any], steps_manager: StepsManagerType) -> Dict[str, Any]:
+    """
+    Returns the rows from start up to (but not including) end of the dataframe
+    at sheet_index, plus the prefetch window on either side. If column_ids are
+    passed, only returns the data for these columns, and otherwise returns the 
+    columns from start_column up to end_column, plus the prefetch window on either
+    side. Also returns the cells in these rows and columns that the conditional 
+    formats apply to.
+
+    The sheet data only has the first MAX_ROWS rows, so the frontend uses this
+    to get the cells in the viewport as the user scrolls through the rest. At most
+    MAX_ROWS rows and MAX_COLUMNS columns are requested at once.
+    """
+    sheet_index = params['sheet_index']
+    column_ids = params.get('column_ids')
+    df = steps_manager.dfs[sheet_index]
+    num_rows = len(df.index)
+    num_columns = len(df.columns)
+
+    start = min(max(params['start'], 0), num_rows)
+    end = min(max(params['end'], start), start + MAX_ROWS, num_rows)
+    start = max(start - ROW_PREFETCH_WINDOW, 0)
+    end = min(end + ROW_PREFETCH_WINDOW, num_rows)
+
+    if column_ids is None:
+        start_column = min(max(params.get('start_column', 0), 0), num_columns)
+        end_column = min(max(params.get('end_column', MAX_COLUMNS), start_column), start_column + MAX_COLUMNS, num_columns)
+        start_column = max(start_column - COLUMN_PREFETCH_WINDOW, 0)
+        end_column = min(end_column + COLUMN_PREFETCH_WINDOW, num_columns)
+
+        column_headers = list(df.columns[start_column:end_column])
+        column_ids = [steps_manager.curr_step.column_ids.get_column_id_by_header(sheet_index, column_header) for column_header in column_headers]
+    else:
+        column_headers = steps_manager.curr_step.column_ids.get_column_headers_by_ids(sheet_index, column_ids)
+
+    columns_data, index = convert_df_to_parsed_json_columns(df.iloc[start:end][column_headers], max_rows=None, max_columns=len(column_headers))
+
+    # The conditional formatting in the sheet data is only for the first MAX_ROWS rows, so we also send 
+    # it for these rows, only evaluating it for the columns we send
+    column_ids_set = set(column_ids)
+    conditional_formats = [
+        {**conditional_format, 'columnIDs': [column_id for column_id in conditional_format['columnIDs'] if column_id in column_ids_set]}
+        for conditional_format in steps_manager.curr_step.df_formats[sheet_index]['conditional_formats']
+    ]
+    conditional_formatting_result = get_conditonal_formatting_result(
+        steps_manager.curr_step.final_defined_state,
+        sheet_index,
+        df,
+        conditional_formats,
+        max_rows=end - start,
+        start_row=start
+    )
+
+    return {
+        'sheetIndex': sheet_index,
+        'startingRowIndex': start,
+        'endingRowIndex': end,
+        'numRows': num_rows,
+        'index': index,
+        'columnData': {
+            column_id: column_data
+            for column_id, column_data in zip(column_ids, columns_data)
+        },
+        'conditionalFormattingResults': conditional_formatting_result['results']
+    }
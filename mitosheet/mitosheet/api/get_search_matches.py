@@ -4,47 +4,55 @@
 # Copyright (c) Saga Inc.
 # Distributed under the terms of the GPL License.
 import re
-import pandas as pd
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from mitosheet.search_column_cache import get_column_search_matches
 from mitosheet.types import StepsManagerType
 
 
 def get_search_matches(params: Dict[str, Any], steps_manager: StepsManagerType) -> Any:
     """
     Finds the number of matches to a given search value in the dataframe.
+
+    If count_all_matches is False, only the displayed rows are searched, so the matches
+    are found quickly, and the total number of matches is None if it is not yet known.
     """
     sheet_index = params['sheet_index']
     search_value = params['search_value']
+    count_all_matches = params.get('count_all_matches', True)
     df = steps_manager.dfs[sheet_index]
 
-    # First, generate a count for each value in the dataframe:
-    unique_value_counts = df.stack().value_counts()
-
     escaped_search_value = re.escape(search_value)
 
     # Use the same regex for all searching
     search_regex = re.compile(escaped_search_value, re.IGNORECASE)
 
-    # Then, filter for the search value:
-    matches = unique_value_counts.filter(regex=search_regex, axis=0)
-
-    # Then, sum the matches:
-    total_number_matches = int(matches.sum())
-
-    # Then, add the column names to the matches:
-    total_number_matches += len([col for col in df.columns if re.search(search_regex,str(col)) is not None])
-
-    # Get the number of rows and columns so that we don't have to calculate the length in each iteration
-    num_rows = len(df.index)
-    num_cols = len(df.columns)
-
-    # Find the indices of cells containing the search value
-    # Only search the first 1500 rows because the editor only shows the first 1500 rows. 
-    cell_matches = [{'rowIndex': i, 'colIndex': j} for i in range(min(1500, num_rows)) for j in range(num_cols) if (re.search(search_regex,str(df.iat[i, j])) is not None)]
-
     # Find the indices of columns containing the search value
     column_matches = [{'rowIndex': -1, 'colIndex': j} for j, column in enumerate(df.columns) if (re.search(search_regex,str(column)) is not None)]
-    
+
+    # Then, count the matches in each column. We only find the indices of the cells containing the search 
+    # value in the first 1500 rows, because the editor only shows the first 1500 rows. 
+    total_number_matches: Optional[int] = len(column_matches)
+    cell_match_row_indexes = []
+    cell_match_column_indexes = []
+    for column_index in range(len(df.columns)):
+        number_matches, row_indexes = get_column_search_matches(
+            df.iloc[:, column_index], search_value, sheet_index, steps_manager.search_column_cache, count_all_matches=count_all_matches
+        )
+        total_number_matches = total_number_matches + number_matches if total_number_matches is not None and number_matches is not None else None
+        cell_match_row_indexes.append(row_indexes)
+        cell_match_column_indexes.append(np.full(len(row_indexes), column_index))
+
+    steps_manager.search_column_cache.remove_unused_entries(sheet_index, set(df.columns))
+
+    # Order the cells by row, and then by column
+    row_indexes = np.concatenate(cell_match_row_indexes) if len(cell_match_row_indexes) > 0 else np.array([], dtype=int)
+    column_indexes = np.concatenate(cell_match_column_indexes) if len(cell_match_column_indexes) > 0 else np.array([], dtype=int)
+    order = np.lexsort((column_indexes, row_indexes))
+    cell_matches = [{'rowIndex': int(row_index), 'colIndex': int(column_index)} for row_index, column_index in zip(row_indexes[order], column_indexes[order])]
+
     # We want the columns to come first
     all_matches = column_matches + cell_matches
     return {'total_number_matches': total_number_matches, 'matches': all_matches }
\ No newline at end of file
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+from typing import Any, Dict, List
+from mitosheet.types import StepProfile, StepsManagerType
+
+
+def get_step_profiles(params: Dict[str, Any], steps_manager: StepsManagerType) -> List[StepProfile]:
+    return steps_manager.get_step_profiles()
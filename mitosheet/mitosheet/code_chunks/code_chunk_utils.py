@@ -6,7 +6,7 @@
 
 
 from copy import copy
-from typing import TYPE_CHECKING, List, Optional, Any, Type
+from typing import TYPE_CHECKING, List, Optional, Any, Set, Type
 from mitosheet.code_chunks.code_chunk import CodeChunk
 from mitosheet.code_chunks.step_performers.column_steps.delete_column_code_chunk import DeleteColumnsCodeChunk
 from mitosheet.code_chunks.step_performers.filter_code_chunk import FilterCodeChunk
@@ -19,29 +19,77 @@ else:
     Step = Any
     
 
-def get_code_chunks(all_steps: List[Step], optimize: bool=True) -> List[CodeChunk]:
+class OptimizedCodeChunksCache():
+    """
+    Caches the optimized code chunks for the steps that were last transpiled.
+
+    Usually, the only change to the steps is that a step was added to the end, so
+    rather than optimizing the code chunks of all the steps again, we optimize the 
+    already optimized code chunks with just the code chunks of the new steps.
+    """
+
+    def __init__(self) -> None:
+        # The code chunks of each step that was transpiled, and the optimized code chunks for them
+        self.code_chunks_for_steps: List[List[CodeChunk]] = []
+        self.optimized_code_chunks: List[CodeChunk] = []
+
+    def copy(self) -> "OptimizedCodeChunksCache":
+        optimized_code_chunks_cache_copy = OptimizedCodeChunksCache()
+        optimized_code_chunks_cache_copy.code_chunks_for_steps = copy(self.code_chunks_for_steps)
+        optimized_code_chunks_cache_copy.optimized_code_chunks = copy(self.optimized_code_chunks)
+        return optimized_code_chunks_cache_copy
+
+    def get_optimized_code_chunks(self, code_chunks_for_steps: List[List[CodeChunk]]) -> List[CodeChunk]:
+        num_cached_steps = len(self.code_chunks_for_steps)
+
+        # The code chunks of a step are the same list until it is executed again (see Step.get_code_chunks)
+        if num_cached_steps <= len(code_chunks_for_steps) and all(
+            cached_code_chunks is code_chunks for cached_code_chunks, code_chunks in zip(self.code_chunks_for_steps, code_chunks_for_steps)
+        ):
+            new_code_chunks = [code_chunk for code_chunks in code_chunks_for_steps[num_cached_steps:] for code_chunk in code_chunks]
+            if len(new_code_chunks) > 0:
+                self.optimized_code_chunks = optimize_code_chunks(self.optimized_code_chunks + new_code_chunks)
+        else:
+            self.optimized_code_chunks = optimize_code_chunks([code_chunk for code_chunks in code_chunks_for_steps for code_chunk in code_chunks])
+
+        self.code_chunks_for_steps = list(code_chunks_for_steps)
+        return copy(self.optimized_code_chunks)
+    
+
+def get_code_chunks(
+        all_steps: List[Step], 
+        optimize: bool=True, 
+        step_indexes_to_skip: Optional[Set[int]]=None,
+        optimized_code_chunks_cache: Optional[OptimizedCodeChunksCache]=None
+    ) -> List[CodeChunk]:
     """
     A utility for taking all the steps in the steps manager, and returning a list
     of CodeChunks that correspond to these steps. 
 
     optimize is by default True, which results in these CodeChunks being optimized
     down to the smallest possible list of CodeChunks that implements the same ops.
+
+    If step_indexes_to_skip is not given, the steps to skip are found from all_steps.
+
+    If an optimized_code_chunks_cache is passed, only the code chunks of the steps 
+    added since the last call are optimized with the cached optimized code chunks.
     """
-    from mitosheet.steps_manager import get_step_indexes_to_skip
-    step_indexes_to_skip = get_step_indexes_to_skip(all_steps)
+    if step_indexes_to_skip is None:
+        from mitosheet.steps_manager import get_step_indexes_to_skip
+        step_indexes_to_skip = get_step_indexes_to_skip(all_steps)
 
-    all_code_chunks: List[CodeChunk] = []
+    code_chunks_for_steps: List[List[CodeChunk]] = []
     for step_index, step in enumerate(all_steps):
         # Skip the initalize step, or any step we should skip
         if step.step_type == 'initialize' or step_index in step_indexes_to_skip:
             continue
 
-        all_code_chunks.extend(step.step_performer.transpile(
-            step.prev_state, # type: ignore
-            step.params,
-            step.execution_data,
-        ))
+        code_chunks_for_steps.append(step.get_code_chunks())
+
+    if optimize and optimized_code_chunks_cache is not None:
+        return optimized_code_chunks_cache.get_optimized_code_chunks(code_chunks_for_steps)
 
+    all_code_chunks = [code_chunk for code_chunks in code_chunks_for_steps for code_chunk in code_chunks]
     if optimize:
         code_chunks_list = optimize_code_chunks(all_code_chunks)
     else:
@@ -19,7 +19,7 @@ class FillNaCodeChunk(CodeChunk):
         self.sheet_index = sheet_index
         self.column_ids = column_ids
         self.fill_method = fill_method
-        self.full_dataframe = len(self.prev_state.dfs[self.sheet_index]) == len(self.column_ids)
+        self.full_dataframe = len(self.prev_state.dfs[self.sheet_index].columns) == len(set(self.column_ids))
 
         self.df_name = self.prev_state.df_names[self.sheet_index]
         self.column_headers = self.prev_state.column_ids.get_column_headers_by_ids(self.sheet_index, self.column_ids)
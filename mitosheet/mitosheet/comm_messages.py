@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Some messages we send over the comm are very large, like the sheet data, graph html,
+or an Excel export. Sending these as one json message can take a long time and blocks
+the kernel's IOPub channel while it does, so heartbeats and other output stall.
+
+If the frontend tells us it can read them when it opens the comm, we instead send
+large messages as encoded messages: the message json is compressed with zlib, and
+then split into chunks, each sent as its own message with the chunk in its buffers.
+The last chunk also has the binary buffers of the original message (e.g. the Arrow
+sheet data). The frontend joins the chunks, decompresses them, and reads the message.
+As decompressing is async, the frontend handles every message in the order it arrives,
+so that a large message is never read after a smaller message that was sent after it.
+
+Frontends that do not send the message encodings they support (e.g. an older version
+of the frontend) get every message as is.
+"""
+
+import json
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mitosheet.utils import NpEncoder, get_new_id
+
+# The key in the data the frontend opens the comm with, that has the message encodings it supports
+MESSAGE_ENCODINGS_KEY = 'message_encodings'
+# The frontend can join a message split into chunks
+CHUNKS_ENCODING = 'chunks'
+# The frontend can decompress a message compressed with zlib
+ZLIB_ENCODING = 'zlib'
+
+# We only compress messages larger than this, as small messages are quick to send
+COMPRESSION_THRESHOLD_BYTES = 100_000
+# The largest chunk we send at once. Messages that are not compressed are only
+# split into chunks if they are larger than this
+CHUNK_SIZE_BYTES = 1_000_000
+# We compress with the fastest level, as the json compresses well at any level
+COMPRESSION_LEVEL = 1
+
+
+def get_frontend_message_encodings(open_data: Any) -> List[str]:
+    """
+    Returns the message encodings the frontend supports, from the data it opened the comm with.
+    """
+    if not isinstance(open_data, dict):
+        return []
+    message_encodings = open_data.get(MESSAGE_ENCODINGS_KEY)
+    if not isinstance(message_encodings, list):
+        return []
+    return [encoding for encoding in message_encodings if encoding in (CHUNKS_ENCODING, ZLIB_ENCODING)]
+
+
+def get_encoded_messages(
+        message: Dict[str, Any],
+        buffers: Optional[List[bytes]],
+        message_encodings: List[str]
+    ) -> List[Tuple[Dict[str, Any], Optional[List[bytes]]]]:
+    """
+    Returns the messages, and their buffers, to send over the comm to send the message
+    and its buffers, encoded with the message encodings the frontend supports.
+    """
+    if CHUNKS_ENCODING not in message_encodings:
+        return [(message, buffers)]
+
+    try:
+        message_bytes = json.dumps(message, cls=NpEncoder).encode('utf8')
+    except (TypeError, ValueError):
+        # If we cannot write the message as json, we let the comm send it as it is
+        return [(message, buffers)]
+
+    encoding: Optional[str] = None
+    if ZLIB_ENCODING in message_encodings:
+        if len(message_bytes) <= COMPRESSION_THRESHOLD_BYTES:
+            return [(message, buffers)]
+        message_bytes = zlib.compress(message_bytes, COMPRESSION_LEVEL)
+        encoding = ZLIB_ENCODING
+    elif len(message_bytes) <= CHUNK_SIZE_BYTES:
+        return [(message, buffers)]
+
+    encoded_message_id = get_new_id()
+    num_chunks = max(1, -(-len(message_bytes) // CHUNK_SIZE_BYTES))
+    encoded_messages: List[Tuple[Dict[str, Any], Optional[List[bytes]]]] = []
+    for chunk_index in range(num_chunks):
+        chunk = message_bytes[chunk_index * CHUNK_SIZE_BYTES:(chunk_index + 1) * CHUNK_SIZE_BYTES]
+        is_last_chunk = chunk_index == num_chunks - 1
+        encoded_messages.append((
+            {
+                'event': 'encoded_message',
+                'encoded_message_id': encoded_message_id,
+                'encoding': encoding,
+                'chunk_index': chunk_index,
+                'num_chunks': num_chunks,
+            },
+            [chunk] + (buffers if is_last_chunk and buffers is not None else [])
+        ))
+
+    return encoded_messages
+
+
+def get_encoded_comm_send(comm_send: Callable, message_encodings: List[str]) -> Callable:
+    """
+    Returns a function that sends messages with comm_send, encoding them with
+    the message encodings the frontend supports.
+    """
+    if CHUNKS_ENCODING not in message_encodings:
+        return comm_send
+
+    def encoded_comm_send(message: Dict[str, Any], buffers: Optional[List[bytes]]=None) -> None:
+        for encoded_message, encoded_buffers in get_encoded_messages(message, buffers, message_encodings):
+            if encoded_buffers is not None and len(encoded_buffers) > 0:
+                comm_send(encoded_message, buffers=encoded_buffers)
+            else:
+                comm_send(encoded_message)
+
+    return encoded_comm_send
@@ -37,6 +37,16 @@ MITO_CONFIG_CUSTOM_SHEET_FUNCTIONS_PATH = 'MITO_CONFIG_CUSTOM_SHEET_FUNCTIONS_PA
 MITO_CONFIG_CUSTOM_IMPORTERS_PATH = 'MITO_CONFIG_CUSTOM_IMPORTERS_PATH'
 MITO_CONFIG_LOG_SERVER_URL = 'MITO_CONFIG_LOG_SERVER_URL'
 MITO_CONFIG_LOG_SERVER_BATCH_INTERVAL = 'MITO_CONFIG_LOG_SERVER_BATCH_INTERVAL'
+MITO_CONFIG_STEP_HISTORY_MEMORY_BUDGET_MB = 'MITO_CONFIG_STEP_HISTORY_MEMORY_BUDGET_MB'
+MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL = 'MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL'
+MITO_CONFIG_STEP_HISTORY_SPILL_DIRECTORY = 'MITO_CONFIG_STEP_HISTORY_SPILL_DIRECTORY'
+MITO_CONFIG_STEP_HISTORY_SPILL_QUOTA_MB = 'MITO_CONFIG_STEP_HISTORY_SPILL_QUOTA_MB'
+MITO_CONFIG_STEP_EXECUTION_MAX_WORKERS = 'MITO_CONFIG_STEP_EXECUTION_MAX_WORKERS'
+MITO_CONFIG_STEP_CACHE_SIZE = 'MITO_CONFIG_STEP_CACHE_SIZE'
+MITO_CONFIG_CANCELLABLE_STEP_EXECUTION = 'MITO_CONFIG_CANCELLABLE_STEP_EXECUTION'
+MITO_CONFIG_STEP_EXECUTION_TIMEOUT = 'MITO_CONFIG_STEP_EXECUTION_TIMEOUT'
+MITO_CONFIG_ASYNC_EDIT_PIPELINE = 'MITO_CONFIG_ASYNC_EDIT_PIPELINE'
+MITO_CONFIG_ARROW_SHEET_DATA = 'MITO_CONFIG_ARROW_SHEET_DATA'
 
 
 # Note: The below keys can change since they are not set by the user.
@@ -45,6 +55,8 @@ MITO_CONFIG_CODE_SNIPPETS = 'MITO_CONFIG_CODE_SNIPPETS'
 # The default values to use if the mec does not define them
 DEFAULT_MITO_CONFIG_SUPPORT_EMAIL = 'founders@sagacollab.com'
 DEFAULT_MITO_CONFIG_CODE_SNIPPETS_SUPPORT_EMAIL = 'founders@sagacollab.com'
+DEFAULT_MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL = 10
+DEFAULT_MITO_CONFIG_STEP_CACHE_SIZE = 32
 
 # Since Mito needs to look up individual environment variables, we need to 
 # know the names of the variables associated with each mito config version. 
@@ -73,6 +85,16 @@ MEC_VERSION_KEYS = {
         MITO_CONFIG_ENTERPRISE_TEMP_LICENSE,
         MITO_CONFIG_CUSTOM_SHEET_FUNCTIONS_PATH,
         MITO_CONFIG_CUSTOM_IMPORTERS_PATH,
+        MITO_CONFIG_STEP_HISTORY_MEMORY_BUDGET_MB,
+        MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL,
+        MITO_CONFIG_STEP_HISTORY_SPILL_DIRECTORY,
+        MITO_CONFIG_STEP_HISTORY_SPILL_QUOTA_MB,
+        MITO_CONFIG_STEP_EXECUTION_MAX_WORKERS,
+        MITO_CONFIG_STEP_CACHE_SIZE,
+        MITO_CONFIG_CANCELLABLE_STEP_EXECUTION,
+        MITO_CONFIG_STEP_EXECUTION_TIMEOUT,
+        MITO_CONFIG_ASYNC_EDIT_PIPELINE,
+        MITO_CONFIG_ARROW_SHEET_DATA,
     ]
 }
 
@@ -397,6 +419,133 @@ class MitoConfig:
             self.mec[MITO_CONFIG_ENTERPRISE_TEMP_LICENSE]
         )
 
+    @property
+    def step_history_memory_budget(self) -> Optional[int]:
+        """
+        The number of bytes that the dataframes in the step history can take up
+        before we start dropping non-checkpoint states from memory. If not set, 
+        we keep every state in memory.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_HISTORY_MEMORY_BUDGET_MB] is None:
+            return None
+        return int(float(self.mec[MITO_CONFIG_STEP_HISTORY_MEMORY_BUDGET_MB]) * 1_000_000)
+
+    @property
+    def step_history_checkpoint_interval(self) -> int:
+        """
+        When over the memory budget, we keep the state of every Nth step in memory,
+        so that dropped states can be rebuilt by rerunning a few steps.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL] is None:
+            return DEFAULT_MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL
+        return max(int(self.mec[MITO_CONFIG_STEP_HISTORY_CHECKPOINT_INTERVAL]), 1)
+
+    @property
+    def step_history_spill_directory(self) -> Optional[str]:
+        """
+        If set, states that are dropped from memory because the step history is over
+        its memory budget are written to this directory, and read back from disk
+        when they are needed, rather than rebuilt by rerunning steps.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_HISTORY_SPILL_DIRECTORY] is None:
+            return None
+        return self.mec[MITO_CONFIG_STEP_HISTORY_SPILL_DIRECTORY]
+
+    @property
+    def step_history_spill_quota(self) -> Optional[int]:
+        """
+        The number of bytes that spilled states can take up on disk. If not set, 
+        there is no limit.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_HISTORY_SPILL_QUOTA_MB] is None:
+            return None
+        return int(float(self.mec[MITO_CONFIG_STEP_HISTORY_SPILL_QUOTA_MB]) * 1_000_000)
+
+    @property
+    def step_execution_max_workers(self) -> int:
+        """
+        The number of threads used to execute steps on different sheets in parallel
+        when rerunning the step list. By default, steps are executed one at a time.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_EXECUTION_MAX_WORKERS] is None:
+            return 1
+        return max(int(self.mec[MITO_CONFIG_STEP_EXECUTION_MAX_WORKERS]), 1)
+
+    @property
+    def step_cache_size(self) -> int:
+        """
+        The number of step executions to keep in the step execution cache, so
+        that executing a step with the same inputs again does not rerun it. 
+        Set to 0 to turn off the cache. The states the cache keeps count towards
+        the step history memory budget, and are removed from it if over the budget.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_CACHE_SIZE] is None:
+            return DEFAULT_MITO_CONFIG_STEP_CACHE_SIZE
+        return max(int(self.mec[MITO_CONFIG_STEP_CACHE_SIZE]), 0)
+
+    @property
+    def step_execution_timeout(self) -> Optional[float]:
+        """
+        The number of seconds an edit can run for before it is cancelled. If set,
+        edits are executed on a cancellable worker. If not set, there is no limit.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_STEP_EXECUTION_TIMEOUT] is None:
+            return None
+        return float(self.mec[MITO_CONFIG_STEP_EXECUTION_TIMEOUT])
+
+    @property
+    def cancellable_step_execution(self) -> bool:
+        """
+        If True, edits are executed on a worker thread, so that the user can cancel 
+        them while they run. This is always True if there is a step execution timeout.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.step_execution_timeout is not None:
+            return True
+        if self.mec is None or self.mec[MITO_CONFIG_CANCELLABLE_STEP_EXECUTION] is None:
+            return False
+        return is_env_variable_set_to_true(self.mec[MITO_CONFIG_CANCELLABLE_STEP_EXECUTION])
+
+    @property
+    def async_edit_pipeline(self) -> bool:
+        """
+        If True, the response to an edit is sent as soon as the edit is executed, and 
+        the sheet data and analysis data follow in their own messages, so the frontend
+        can stop loading before the analysis data is built and the analysis is saved.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_ASYNC_EDIT_PIPELINE] is None:
+            return False
+        return is_env_variable_set_to_true(self.mec[MITO_CONFIG_ASYNC_EDIT_PIPELINE])
+
+    @property
+    def arrow_sheet_data(self) -> bool:
+        """
+        If True, the data of the numeric and boolean columns in the sheet data is sent 
+        to the frontend in Arrow IPC buffers, rather than in the sheet data json.
+
+        NOTE: this is only used by the backend, and so is not in the mito_config_dict.
+        """
+        if self.mec is None or self.mec[MITO_CONFIG_ARROW_SHEET_DATA] is None:
+            return False
+        return is_env_variable_set_to_true(self.mec[MITO_CONFIG_ARROW_SHEET_DATA])
+
     # Add new mito configuration options here ...
 
     @property
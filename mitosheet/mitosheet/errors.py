@@ -666,6 +666,27 @@ def make_range_not_found_error(value: Union[str, int, float, bool], error_modal:
         error_modal=error_modal
     )
 
+def make_step_execution_cancelled_error(timed_out: bool) -> MitoError:
+    """
+    Helper function for creating a step_execution_cancelled_error.
+
+    Occurs when:
+    -  the user cancels an edit while it is executing, or the edit runs for longer than the step execution timeout.
+    """
+    if timed_out:
+        return MitoError(
+            'step_execution_cancelled_error',
+            'Edit Timed Out',
+            'This edit took too long to run, and so it was cancelled. Your sheet is the same as it was before the edit.',
+            error_modal=False
+        )
+    return MitoError(
+        'step_execution_cancelled_error',
+        'Edit Cancelled',
+        'This edit was cancelled. Your sheet is the same as it was before the edit.',
+        error_modal=False
+    )
+
 def get_recent_traceback() -> str:
     """
     Helper function that returns the most recent traceback, with the file paths
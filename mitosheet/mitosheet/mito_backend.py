@@ -7,14 +7,15 @@
 """
 Main file containing the mito widget.
 """
+import base64
 import json
 import os
 import re
 import time
+import zlib
 from sysconfig import get_python_version
-from typing import Any, Dict, List, Optional, Union, Callable
+from typing import Any, Dict, List, Optional, Tuple, Union, Callable
 
-import numpy as np
 import pandas as pd
 from IPython import get_ipython
 from IPython.display import HTML, display
@@ -22,22 +23,27 @@ from mitosheet.enterprise.telemetry.mito_log_uploader import MitoLogUploader
 
 from mitosheet.kernel_utils import get_current_kernel_id, Comm
 from mitosheet.api import API
+from mitosheet.comm_messages import COMPRESSION_LEVEL, COMPRESSION_THRESHOLD_BYTES, ZLIB_ENCODING, get_encoded_comm_send, get_frontend_message_encodings
 from mitosheet.enterprise.mito_config import MitoConfig
 from mitosheet.errors import (MitoError, get_recent_traceback,
                               make_execution_error)
 from mitosheet.saved_analyses import write_analysis
+from mitosheet.shared_state_patches import ANALYSIS_DATA, SHEET_DATA, SharedStatePatcher, get_acknowledged_version
+from mitosheet.step_execution_worker import (CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE, StepExecutionWorker,
+                                              execute_on_steps_manager_copy, finish_step_execution)
 from mitosheet.steps_manager import StepsManager
 from mitosheet.telemetry.telemetry_utils import (log, log_event_processed,
                                                  telemetry_turned_on)
 from mitosheet.types import CodeOptions, MitoTheme, ParamMetadata
 from mitosheet.updates.replay_analysis import REPLAY_ANALYSIS_UPDATE
+from mitosheet.updates.undo import UNDO_UPDATE
 from mitosheet.user.create import try_create_user_json_file
 from mitosheet.user.db import USER_JSON_PATH, get_user_field
 from mitosheet.user.location import is_dash, is_in_google_colab, is_in_vs_code, is_streamlit
 from mitosheet.user.schemas import (UJ_MITOSHEET_LAST_FIFTY_USAGES, UJ_RECEIVED_TOURS,
                                     UJ_USER_EMAIL, UJ_AI_PRIVACY_POLICY)
 from mitosheet.user.utils import get_pandas_version, is_enterprise, is_pro, is_running_test
-from mitosheet.utils import get_new_id
+from mitosheet.utils import get_new_id, is_pyarrow_installed
 from mitosheet.step_performers.utils.user_defined_function_utils import get_functions_from_path, get_non_validated_custom_sheet_functions
 from mitosheet.api.get_validate_snowflake_credentials import get_cached_snowflake_credentials
 
@@ -121,6 +127,25 @@ class MitoBackend():
 
         self.theme = theme
 
+        # If True, the shared state variables follow the response to edit and update events
+        # in their own messages. See send_shared_state_variables_response
+        self.async_edit_pipeline = self.mito_config.async_edit_pipeline
+
+        # If True, the data of numeric and boolean columns is sent in Arrow buffers, rather than
+        # in the sheet data json. See get_sheet_data_shared_state_variables
+        self.arrow_sheet_data = self.mito_config.arrow_sheet_data and is_pyarrow_installed()
+        # If True, mito_send can send binary buffers alongside a message, which the comm can
+        self.mito_send_supports_buffers = False
+
+        # Keeps the last shared state sent to each frontend, so we can send patches from it
+        self.shared_state_patcher = SharedStatePatcher()
+
+        # If edits can be cancelled, they are executed on a worker, so the kernel can 
+        # still handle messages (like a cancel) while an edit executes
+        self.step_execution_worker: Optional[StepExecutionWorker] = None
+        if self.mito_config.cancellable_step_execution:
+            self.step_execution_worker = StepExecutionWorker(self, self.mito_config.step_execution_timeout)
+
     @property
     def fully_parameterized_function(self) -> str:
         return self.steps_manager.fully_parameterized_function
@@ -138,12 +163,112 @@ class MitoBackend():
         Helper function for updating all the variables that are shared
         between the backend and the frontend through trailets.
         """
+        sheet_data_shared_state_variables, _ = self.get_sheet_data_shared_state_variables()
         return {
-            'sheet_data_json': self.steps_manager.sheet_data_json,
+            **sheet_data_shared_state_variables,
             'analysis_data_json': self.steps_manager.analysis_data_json,
             'user_profile_json': self.get_user_profile_json()
         }
 
+    def get_sheet_data_shared_state_variables(self, binary_buffers: bool=False) -> Tuple[Dict[str, Any], List[bytes]]:
+        """
+        Returns the shared state variables for the sheet data, and the binary buffers to
+        send alongside them.
+
+        If arrow sheet data is turned on, the data of the numeric and boolean columns is in
+        Arrow IPC buffers. If binary_buffers is True, these are returned as binary buffers, 
+        and otherwise they are base64 encoded in sheet_data_buffers, so that they can be sent 
+        over channels that only send json (like Streamlit and Dash).
+        """
+        if not self.arrow_sheet_data:
+            return {'sheet_data_json': self.steps_manager.sheet_data_json}, []
+
+        sheet_data_json, buffers = self.steps_manager.get_sheet_data_json_and_buffers()
+        if binary_buffers:
+            return {'sheet_data_json': sheet_data_json}, buffers
+        return {
+            'sheet_data_json': sheet_data_json, 
+            'sheet_data_buffers': [base64.b64encode(buffer).decode('ascii') for buffer in buffers]
+        }, []
+
+    def get_sheet_data_response_variables(self, event: Dict[str, Any]) -> Tuple[Dict[str, Any], List[bytes]]:
+        """
+        Returns the shared state variables for the sheet data to send in the response 
+        to the event, and the binary buffers to send alongside them. This is a patch 
+        from the last sheet data sent to the frontend, if it can apply one.
+
+        NOTE: if arrow sheet data is turned on, we always send the full sheet data.
+        """
+        if self.arrow_sheet_data:
+            return self.get_sheet_data_shared_state_variables(self.mito_send_supports_buffers)
+        return self.shared_state_patcher.get_sheet_data_shared_state_variables(
+            event.get('frontend_id'), get_acknowledged_version(event, SHEET_DATA), self.steps_manager.get_sheet_data()
+        ), []
+
+    def get_analysis_data_response_variables(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the shared state variables for the analysis data to send in the response
+        to the event, which is a patch from the last analysis data sent to the frontend, 
+        if it can apply one.
+        """
+        return self.shared_state_patcher.get_analysis_data_shared_state_variables(
+            event.get('frontend_id'), get_acknowledged_version(event, ANALYSIS_DATA), self.steps_manager.get_analysis_data()
+        )
+
+    def send_response(self, response: Dict[str, Any], buffers: List[bytes]) -> None:
+        if len(buffers) > 0:
+            self.mito_send(response, buffers=buffers)
+        else:
+            self.mito_send(response)
+
+    def send_shared_state_variables_response(self, event: Dict[str, Any]) -> None:
+        """
+        Saves the analysis, and sends the response to the event along with the new 
+        shared state variables, so that the frontend renders the new sheet and code.
+
+        If the async edit pipeline is turned on, the response is sent first, so that the
+        frontend stops loading right away. The sheet data and then the analysis data and 
+        user profile follow as responses to the ids in deferred_shared_variables, and the 
+        analysis is saved last, so that building the code and writing the file do not delay 
+        showing the new sheet.
+        """
+        if not self.async_edit_pipeline:
+            write_analysis(self.steps_manager)
+            sheet_data_shared_state_variables, buffers = self.get_sheet_data_response_variables(event)
+            self.send_response({
+                'event': 'response',
+                'id': event['id'],
+                'shared_variables': {
+                    **sheet_data_shared_state_variables,
+                    **self.get_analysis_data_response_variables(event),
+                    'user_profile_json': self.get_user_profile_json()
+                }
+            }, buffers)
+            return
+
+        sheet_data_id = f'{event["id"]}_sheet_data'
+        analysis_data_id = f'{event["id"]}_analysis_data'
+        self.mito_send({
+            'event': 'response',
+            'id': event['id'],
+            'deferred_shared_variables': [sheet_data_id, analysis_data_id]
+        })
+        sheet_data_shared_state_variables, buffers = self.get_sheet_data_response_variables(event)
+        self.send_response({
+            'event': 'response',
+            'id': sheet_data_id,
+            'shared_variables': sheet_data_shared_state_variables
+        }, buffers)
+        self.mito_send({
+            'event': 'response',
+            'id': analysis_data_id,
+            'shared_variables': {
+                **self.get_analysis_data_response_variables(event),
+                'user_profile_json': self.get_user_profile_json()
+            }
+        })
+        write_analysis(self.steps_manager)
+
     def get_user_profile_json(self) -> str:
         return json.dumps({
             # Dynamic, update each time
@@ -175,19 +300,13 @@ class MitoBackend():
         """
 
         # First, we send this new edit to the evaluator
-        self.steps_manager.handle_edit_event(event)
-
-        # Also, write the analysis to a file!
-        write_analysis(self.steps_manager)
+        with execute_on_steps_manager_copy(self.steps_manager) as steps_manager:
+            steps_manager.handle_edit_event(event)
 
-        # Tell the front-end to render the new sheet and new code with an empty
-        # response. NOTE: in the future, we can actually send back some data
-        # with the response (like an error), to get this response in-place!        
-        self.mito_send({
-            'event': 'response',
-            'id': event['id'],
-            'shared_variables': self.get_shared_state_variables()
-        })
+        # Then, write the analysis to a file, and tell the front-end to render the new 
+        # sheet and new code. NOTE: in the future, we can actually send back some data
+        # with the response (like an error), to get this response in-place!
+        self.send_shared_state_variables_response(event)
 
 
     def handle_update_event(self, event: Dict[str, Any]) -> None:
@@ -202,7 +321,8 @@ class MitoBackend():
         """
 
         try:
-            self.steps_manager.handle_update_event(event)
+            with execute_on_steps_manager_copy(self.steps_manager) as steps_manager:
+                steps_manager.handle_update_event(event)
         except Exception as e:
             # We handle the case of replaying the analysis specially, because we don't
             # want to display the error modal - we want to display something specific
@@ -216,16 +336,9 @@ class MitoBackend():
                     raise e
                 raise make_execution_error(error_modal=False)
             raise
-        # Also, write the analysis to a file!
-        write_analysis(self.steps_manager)
-
-        # Tell the front-end to render the new sheet and new code with an empty
-        # response. 
-        self.mito_send({
-            'event': 'response',
-            'id': event['id'],
-            'shared_variables': self.get_shared_state_variables()
-        })
+        # Also, write the analysis to a file, and tell the front-end to render the 
+        # new sheet and new code
+        self.send_shared_state_variables_response(event)
 
     def receive_message(self, content: Dict[str, Any]) -> bool:
         """
@@ -243,10 +356,39 @@ class MitoBackend():
         updating the backend state.
 
         4. A log_event is just an event that should get logged on the backend.
+
+        If edits can be cancelled, then edit and update events are handed to the 
+        step execution worker, which processes them on its own thread.
+        """
+        event = content
+
+        if event['event'] == 'update_event' and event.get('type') == CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE:
+            # Cancelling an edit does not wait for the edit, so we handle it right away
+            cancelled = self.step_execution_worker.cancel() if self.step_execution_worker is not None else False
+            self.mito_send({
+                'event': 'response',
+                'id': event['id'],
+                'data': cancelled
+            })
+            return True
+
+        if self.step_execution_worker is not None and event['event'] in ['edit_event', 'update_event']:
+            # Undoing while an edit executes undoes the edit, by cancelling it before it is applied
+            if event['event'] == 'update_event' and event.get('type') == UNDO_UPDATE['event_type'] and self.step_execution_worker.cancel_for_undo():
+                self.step_execution_worker.submit(event, execute=False)
+            else:
+                self.step_execution_worker.submit(event)
+            return True
+
+        return self.process_message(event)
+
+    def process_message(self, event: Dict[str, Any]) -> bool:
+        """
+        Processes a message from the JS widget on the current thread. See 
+        receive_message for the types of messages.
         """
 
         start_time: Optional[float] = time.perf_counter()
-        event = content
 
         try:
             if event['event'] == 'edit_event':
@@ -268,6 +410,10 @@ class MitoBackend():
 
             return True
         except MitoError as e:
+            # If the event was cancelled, the step execution worker already told the frontend
+            if not finish_step_execution():
+                return False
+
             if is_running_test():
                 print(get_recent_traceback())
                 print(e)
@@ -285,6 +431,9 @@ class MitoBackend():
                 'showErrorModal': e.error_modal
             })
         except:
+            if not finish_step_execution():
+                return False
+
             if is_running_test():
                 print(get_recent_traceback())
             
@@ -343,8 +492,11 @@ def register_comm_target_on_mito_backend(
             # Register handler for any incoming messages
             mito_backend.receive_message(msg['content']['data'])
         
-        # Save the comm in the mito widget, so we can use this .send function
-        mito_backend.mito_send = comm.send
+        # Save the comm in the mito widget, so we can use this .send function, encoding
+        # large messages if the frontend tells us how it can read them
+        message_encodings = get_frontend_message_encodings(open_msg['content']['data'])
+        mito_backend.mito_send = get_encoded_comm_send(comm.send, message_encodings)
+        mito_backend.mito_send_supports_buffers = True
 
         # Send data to the frontend on creation, so the frontend knows that we have
         # actually registered the comm on the backend
@@ -364,14 +516,25 @@ def get_mito_frontend_code(kernel_id: str, comm_target_id: str, div_id: str, mit
     # with ` quotes, which properly contain the CSS string
     js_code = js_code.replace('"REPLACE_THIS_WITH_CSS"', "`" + css_code_from_file + "`")
     js_code = js_code.replace('`REPLACE_THIS_WITH_CSS`', "`" + css_code_from_file + "`")
-    # NOTE: we encode these as utf8 encoded byte arrays, so that we can avoid having to do complicated things with 
-    # replacing \t, etc, which is required because JSON.parse limits what characters are valid in strings (bah humbug)
-    def to_uint8_arr(string: str) -> List[int]:
-        return np.frombuffer(string.encode("utf8"), dtype=np.uint8).tolist()
-
-    js_code = js_code.replace('["REPLACE_THIS_WITH_SHEET_DATA_BYTES"]', f'{to_uint8_arr(mito_backend.steps_manager.sheet_data_json)}')
-    js_code = js_code.replace('["REPLACE_THIS_WITH_ANALYSIS_DATA_BYTES"]', f'{to_uint8_arr(mito_backend.steps_manager.analysis_data_json)}')
-    js_code = js_code.replace('["REPLACE_THIS_WITH_USER_PROFILE_BYTES"]', f'{to_uint8_arr(mito_backend.get_user_profile_json())}')
+    # NOTE: we encode these as base64 encoded utf8 bytes, so that we can avoid having to do complicated things with 
+    # replacing \t, etc, which is required because JSON.parse limits what characters are valid in strings (bah humbug).
+    # If they are large, we also compress them, which keeps the rendered code (and so the saved notebook) small
+    payloads = [
+        mito_backend.steps_manager.sheet_data_json.encode('utf8'), 
+        mito_backend.steps_manager.analysis_data_json.encode('utf8'),
+        mito_backend.get_user_profile_json().encode('utf8')
+    ]
+    bootstrap_encoding = ZLIB_ENCODING if sum(len(payload) for payload in payloads) > COMPRESSION_THRESHOLD_BYTES else 'utf8'
+    def to_base64(payload: bytes) -> str:
+        if bootstrap_encoding == ZLIB_ENCODING:
+            payload = zlib.compress(payload, COMPRESSION_LEVEL)
+        return base64.b64encode(payload).decode('ascii')
+
+    sheet_data_payload, analysis_data_payload, user_profile_payload = payloads
+    js_code = js_code.replace('REPLACE_THIS_WITH_BOOTSTRAP_ENCODING', bootstrap_encoding)
+    js_code = js_code.replace('REPLACE_THIS_WITH_SHEET_DATA_BASE64', to_base64(sheet_data_payload))
+    js_code = js_code.replace('REPLACE_THIS_WITH_ANALYSIS_DATA_BASE64', to_base64(analysis_data_payload))
+    js_code = js_code.replace('REPLACE_THIS_WITH_USER_PROFILE_BASE64', to_base64(user_profile_payload))
 
     return js_code
 
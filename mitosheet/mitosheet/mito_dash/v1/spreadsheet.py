@@ -242,6 +242,8 @@ try:
             def send(response):
                 self.responses.append(response)
             self.mito_backend.mito_send = send
+            # The frontend renders the shared state variables it is passed, so they cannot follow the responses
+            self.mito_backend.async_edit_pipeline = False
 
             # If there are any df_names, then we send them to the backend as well. 
             # TODO: we should be able to pass this directly to the backend
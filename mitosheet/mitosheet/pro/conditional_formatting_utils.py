@@ -1,63 +1,177 @@
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
-from mitosheet.types import ConditionalFormattingCellResults, ConditionalFormattingInvalidResults, ConditionalFormattingResult, StateType
+from mitosheet.sheet_data_cache import get_column_version
+from mitosheet.types import ColumnID, ConditionalFormattingCellResults, ConditionalFormattingInvalidResults, ConditionalFormattingResult, StateType
 from mitosheet.utils import MAX_ROWS, NpEncoder
 
 
+def get_json_index_labels(index: pd.Index) -> List[str]:
+    """
+    Returns each label in the index as json, in the same way as json.dumps(label, cls=NpEncoder),
+    which is how the conditional formatting results are keyed.
+    """
+    if isinstance(index, pd.RangeIndex) or (isinstance(index.dtype, np.dtype) and index.dtype.kind in 'iu'):
+        return index.to_numpy().astype(str).tolist()
+    if isinstance(index.dtype, np.dtype) and index.dtype.kind == 'b':
+        return np.where(index.to_numpy(), 'true', 'false').tolist()
+    if isinstance(index, pd.DatetimeIndex) and not index.hasnans:
+        return ('"' + index.strftime('%Y-%m-%d %X') + '"').tolist()
+
+    encoder = NpEncoder()
+    return [encoder.encode(label) for label in index]
+
+
+def get_conditional_format_column_result(
+        df: pd.DataFrame,
+        column_header: Any,
+        conditional_format: Dict[str, Any],
+        start_row: int,
+        max_rows: Optional[int],
+    ) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Returns the cells in the column from start_row up to max_rows rows after it that match
+    the filters of the conditional format, keyed by their index label as json.
+    """
+    from mitosheet.step_performers.filter import check_filters_contain_condition_that_needs_full_df, get_full_applied_filter
+
+    filters = conditional_format["filters"]
+    end_row = start_row + max_rows if max_rows is not None else None
+
+    # Certain filter conditions require the entire dataframe to be present, as they calculate based
+    # on the full dataframe. In other cases, we only operate on the rows that are displayed, for speed
+    if check_filters_contain_condition_that_needs_full_df(filters):
+        full_applied_filter, _ = get_full_applied_filter(df, column_header, 'And', filters)
+        applied_filter = full_applied_filter.iloc[start_row:end_row]
+    else:
+        applied_filter, _ = get_full_applied_filter(df.iloc[start_row:end_row], column_header, 'And', filters)
+
+    # Missing values in nullable columns never match
+    applied_index = applied_filter.index[applied_filter.to_numpy(dtype=bool, na_value=False)]
+
+    # We need to make these indexes valid json, and do so in a way that is consistent with how indexes
+    # are sent to the frontend. Each cell shares the same format, which is never modified
+    cell_format = {'backgroundColor': conditional_format.get("backgroundColor", None), 'color': conditional_format.get("color", None)}
+    return {json_index: cell_format for json_index in get_json_index_labels(applied_index)}
+
+
+class ConditionalFormattingResultCache():
+    """
+    Caches the result of each conditional format for each column it applies to, along with the
+    version of the column and the index it is for (see get_column_version), so that we only evaluate
+    conditional formats again when the column they format, or the conditional format itself, changes.
+    """
+
+    def __init__(self) -> None:
+        # (sheet_index, format_uuid, column_id) -> (key, data kept so the key stays valid, result or None if invalid)
+        self.entries: Dict[Tuple[int, str, ColumnID], Tuple[Hashable, Any, Optional[Dict[str, Dict[str, Optional[str]]]]]] = {}
+        self.num_results_evaluated = 0
+
+    def get_column_result(
+            self,
+            sheet_index: int,
+            df: pd.DataFrame,
+            column_id: ColumnID,
+            column_header: Any,
+            conditional_format: Dict[str, Any],
+            start_row: int,
+            max_rows: Optional[int],
+        ) -> Optional[Dict[str, Dict[str, Optional[str]]]]:
+        """
+        Returns the result of the conditional format for the column, or None if the
+        conditional format cannot be applied to it.
+        """
+        column_version, column_values = get_column_version(df[column_header])
+        key = (
+            json.dumps([conditional_format["filters"], conditional_format.get("backgroundColor", None), conditional_format.get("color", None)], cls=NpEncoder),
+            column_version,
+            id(df.index),
+            start_row,
+            max_rows
+        )
+
+        entry_key = (sheet_index, conditional_format["format_uuid"], column_id)
+        entry = self.entries.get(entry_key)
+        if entry is None or entry[0] != key:
+            self.num_results_evaluated += 1
+            try:
+                result: Optional[Dict[str, Dict[str, Optional[str]]]] = get_conditional_format_column_result(df, column_header, conditional_format, start_row, max_rows)
+            except Exception:
+                result = None
+            entry = (key, (column_values, df.index), result)
+            self.entries[entry_key] = entry
+
+        return entry[2]
+
+    def remove_unused_entries(self, sheet_index: int, used_entries: Set[Tuple[int, str, ColumnID]]) -> None:
+        """
+        Removes the results for the sheet that are not for a current conditional format and column.
+        """
+        for entry_key in list(self.entries.keys()):
+            if entry_key[0] == sheet_index and entry_key not in used_entries:
+                del self.entries[entry_key]
+
+    def remove_sheets_after(self, num_sheets: int) -> None:
+        """
+        Removes the results of the sheets that no longer exist.
+        """
+        for entry_key in list(self.entries.keys()):
+            if entry_key[0] >= num_sheets:
+                del self.entries[entry_key]
+
+
 def get_conditonal_formatting_result(
         state: StateType,
         sheet_index: int,
         df: pd.DataFrame,
         conditional_formatting_rules: List[Dict[str, Any]],
         max_rows: Optional[int]=MAX_ROWS,
-    ) -> ConditionalFormattingResult: 
-    from mitosheet.step_performers.filter import check_filters_contain_condition_that_needs_full_df
+        start_row: int=0,
+        conditional_formatting_cache: Optional[ConditionalFormattingResultCache]=None,
+    ) -> ConditionalFormattingResult:
+    """
+    Returns the cells that each conditional format applies to, for the rows from start_row
+    up to max_rows rows after it, as well as the columns that each conditional format
+    cannot be applied to.
 
+    If a conditional_formatting_cache is passed, only the conditional formats and columns
+    that have changed since they were last evaluated are evaluated again.
+    """
     invalid_conditional_formats: ConditionalFormattingInvalidResults = dict()
     formatted_result: ConditionalFormattingCellResults = dict()
+    used_entries: Set[Tuple[int, str, ColumnID]] = set()
 
     for conditional_format in conditional_formatting_rules:
-        try:
-
-            format_uuid = conditional_format["format_uuid"]
-            column_ids = conditional_format["columnIDs"]
+        format_uuid = conditional_format["format_uuid"]
+        column_ids = conditional_format["columnIDs"]
 
-            for column_id in column_ids:
-                if column_id not in formatted_result:
-                    formatted_result[column_id] = dict()
-
-                filters  = conditional_format["filters"]
-                backgroundColor = conditional_format.get("backgroundColor", None)
-                color = conditional_format.get("color", None)
-                
-                # Certain filter conditions require the entire dataframe to be present, as they calculate based
-                # on the full dataframe. In other cases, we only operate on the first 1500 rows, for speed
-                _df = df
-                if not check_filters_contain_condition_that_needs_full_df(filters):
-                    df = df.head(max_rows)
+        for column_id in column_ids:
+            if column_id not in formatted_result:
+                formatted_result[column_id] = dict()
 
+            result: Optional[Dict[str, Dict[str, Optional[str]]]]
+            try:
                 column_header = state.column_ids.get_column_header_by_id(sheet_index, column_id)
+                if conditional_formatting_cache is not None:
+                    used_entries.add((sheet_index, format_uuid, column_id))
+                    result = conditional_formatting_cache.get_column_result(sheet_index, df, column_id, column_header, conditional_format, start_row, max_rows)
+                else:
+                    result = get_conditional_format_column_result(df, column_header, conditional_format, start_row, max_rows)
+            except Exception:
+                result = None
 
-                # Use the get_applied_filter function from our filtering infrastructure
-                from mitosheet.step_performers.filter import \
-                    get_full_applied_filter
-                full_applied_filter, _ = get_full_applied_filter(_df, column_header, 'And', filters)
-
-                # We can only take the first max_rows here, as this is all we need
-                applied_indexes = _df[full_applied_filter].head(max_rows).index.tolist()
+            if result is None:
+                if format_uuid not in invalid_conditional_formats:
+                    invalid_conditional_formats[format_uuid] = []
+                invalid_conditional_formats[format_uuid].append(column_id)
+            else:
+                formatted_result[column_id].update(result)
 
-                for index in applied_indexes:
-                    # We need to make this index valid json, and do so in a way that is consistent with how indexes
-                    # are sent to the frontend
-                    json_index = json.dumps(index, cls=NpEncoder)
-                    formatted_result[column_id][json_index] = {'backgroundColor': backgroundColor, 'color': color}
-        except Exception as e:
-            if format_uuid not in invalid_conditional_formats:
-                invalid_conditional_formats[format_uuid] = []
-            invalid_conditional_formats[format_uuid].append(column_id)
+    if conditional_formatting_cache is not None:
+        conditional_formatting_cache.remove_unused_entries(sheet_index, used_entries)
 
     return {
         'invalid_conditional_formats': invalid_conditional_formats,
         'results': formatted_result
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Searching a sheet checks whether each cell contains the search value, which is slow to
+do one cell at a time on a large sheet, and the frontend searches again on each keystroke.
+
+So we search column by column. We skip the columns that cannot contain the search value
+given their dtype (e.g. a search for a word in a column of numbers). For every other column,
+we stringify each unique value in it just once, and keep these strings along with how many
+times each value is in the column and which value is in each of the displayed rows. We then
+only check whether each unique string contains the search value.
+
+Stringifying all of a large column is slow, so we first only stringify the displayed rows,
+which is all that is needed to find the displayed matches, and only stringify the rest of
+the column when the total number of matches is needed.
+
+These are cached by the version of the column (see get_column_version), so repeated
+searches of the same sheet only stringify the columns that changed since the last search.
+We only keep a weak reference to the data of each column, so the cache does not keep the
+data of columns that are no longer in any step alive.
+"""
+
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mitosheet.sheet_data_cache import get_column_version, get_data_owner
+from mitosheet.utils import MAX_ROWS, is_pyarrow_installed
+
+# The most memory the strings of the searched columns can use
+DEFAULT_SEARCH_COLUMN_CACHE_MAX_BYTES = 500_000_000
+
+# The characters that the string of a value of each dtype kind can contain,
+# for dtypes whose values can only contain some characters
+SEARCHABLE_CHARACTERS_BY_DTYPE_KIND = {
+    'i': set('0123456789-'),
+    'u': set('0123456789'),
+    'f': set('0123456789-+.einf'),
+    'M': set('0123456789-: .'),
+    'm': set('0123456789-+: .days'),
+}
+
+
+def can_column_contain_search_value(dtype: Any, search_value: str) -> bool:
+    """
+    Returns False if no value in a column with this dtype can contain the
+    lowercase search value when stringified.
+    """
+    if not isinstance(dtype, np.dtype):
+        return True
+    if dtype.kind == 'b':
+        return search_value in 'true' or search_value in 'false'
+    searchable_characters = SEARCHABLE_CHARACTERS_BY_DTYPE_KIND.get(dtype.kind)
+    return searchable_characters is None or set(search_value) <= searchable_characters
+
+
+def get_lowercase_strings(uniques: Any) -> Any:
+    """
+    Returns the lowercase string of each unique value, as str(value).lower() would, 
+    in a pyarrow array if pyarrow is installed, and otherwise in a numpy array.
+    """
+    unique_values = np.asarray(uniques) if isinstance(uniques, (np.ndarray, pd.Index)) and uniques.dtype.kind in 'iuf' else None
+    if is_pyarrow_installed():
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        # Numbers are much faster to stringify all at once. Arrow writes floats differently than 
+        # python (e.g. 1.0 as 1), so we only let it write ints, and use numpy for floats
+        if unique_values is not None and unique_values.dtype.kind in 'iu':
+            return pc.cast(pa.array(unique_values), pa.string())
+        if unique_values is not None:
+            return pa.array(unique_values.astype(str), type=pa.string())
+        return pa.array([str(unique).lower() for unique in uniques], type=pa.large_string())
+
+    if unique_values is not None:
+        return unique_values.astype(str).astype(object)
+    return np.array([str(unique).lower() for unique in uniques], dtype=object)
+
+
+class StringifiedValues():
+    """
+    The lowercase strings of the unique values in some values, how many times each 
+    is in them, and which unique value each of them is (-1 if it is null).
+    """
+
+    def __init__(self, series: pd.Series) -> None:
+        values = series
+        # Values of different types can be equal without having the same string (e.g. 1 and True),
+        # so we stringify the values of columns that are not all strings before finding the unique ones
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) != 'string':
+            values = series.map(str, na_action='ignore')
+
+        self.codes, uniques = pd.factorize(values)
+        self.unique_strings = get_lowercase_strings(uniques)
+        self.unique_counts = np.bincount(self.codes[self.codes >= 0], minlength=len(uniques))
+
+        # Roughly the memory used by the strings, where each python string takes about 50 bytes, as well as its characters
+        unique_strings_bytes = sum(len(unique_string) + 50 for unique_string in self.unique_strings) if isinstance(self.unique_strings, np.ndarray) else self.unique_strings.nbytes
+        self.nbytes: int = unique_strings_bytes + self.codes.nbytes + self.unique_counts.nbytes
+
+    def get_unique_matches(self, search_value: str) -> np.ndarray:
+        """
+        Returns which unique values contain the lowercase search value.
+        """
+        if isinstance(self.unique_strings, np.ndarray):
+            return np.fromiter((search_value in unique_string for unique_string in self.unique_strings), dtype=bool, count=len(self.unique_strings))
+        import pyarrow.compute as pc
+        return pc.match_substring(self.unique_strings, search_value).to_numpy(zero_copy_only=False)
+
+    def get_number_matches(self, search_value: str) -> int:
+        """
+        Returns the number of values that contain the lowercase search value.
+        """
+        return int(self.unique_counts[self.get_unique_matches(search_value)].sum())
+
+    def get_matching_indexes(self, search_value: str) -> np.ndarray:
+        """
+        Returns the indexes of the values that contain the lowercase search value.
+        """
+        # Null values have a code of -1, which is the last item, and so never match
+        return np.flatnonzero(np.append(self.get_unique_matches(search_value), False)[self.codes])
+
+
+class SearchColumn():
+    """
+    The stringified values of the displayed rows of a column, and, once the total number 
+    of matches in the column is needed, the stringified values of all of the column.
+    """
+
+    def __init__(self, series: pd.Series) -> None:
+        self.displayed_values = StringifiedValues(series.iloc[:MAX_ROWS])
+        self.all_values: Optional[StringifiedValues] = self.displayed_values if len(series) <= MAX_ROWS else None
+
+    @property
+    def nbytes(self) -> int:
+        if self.all_values is None or self.all_values is self.displayed_values:
+            return self.displayed_values.nbytes
+        # We don't need the codes of all the values, so they are not kept
+        return self.displayed_values.nbytes + self.all_values.nbytes
+
+    def stringify_all_values(self, series: pd.Series) -> None:
+        if self.all_values is None:
+            self.all_values = StringifiedValues(series)
+            # Only the counts of the unique values are needed to count the matches
+            self.all_values.nbytes -= self.all_values.codes.nbytes
+            self.all_values.codes = np.array([], dtype=np.intp)
+
+    def get_matches(self, search_value: str) -> Tuple[Optional[int], np.ndarray]:
+        """
+        Returns the number of cells that contain the lowercase search value, and the
+        indexes of the displayed rows that do. The number of cells is None if not all 
+        of the values are stringified yet.
+        """
+        number_matches = self.all_values.get_number_matches(search_value) if self.all_values is not None else None
+        return number_matches, self.displayed_values.get_matching_indexes(search_value)
+
+
+def get_column_data_reference(series: pd.Series) -> Optional[Callable[[], Any]]:
+    """
+    Returns a weak reference to the object that owns the data of the series, or None 
+    if there is no object we can weakly reference. While the object is alive, no other 
+    column can have its data in the same memory, so it has the same version.
+    """
+    values = series.array if pd.api.types.is_extension_array_dtype(series.dtype) else series.to_numpy()
+    try:
+        return weakref.ref(get_data_owner(values))
+    except TypeError:
+        return None
+
+
+class SearchColumnCache():
+    """
+    Caches the SearchColumn of each column that has been searched, for each
+    (sheet_index, column_header), along with the version of the column it is for.
+
+    The strings of a large column with many unique values take a lot of memory, so
+    we only keep the most recently searched columns that fit in max_bytes. If there
+    is a step history memory budget, these are counted in it too.
+    """
+
+    def __init__(self, max_bytes: int=DEFAULT_SEARCH_COLUMN_CACHE_MAX_BYTES) -> None:
+        # (sheet_index, column_header) -> (column version, reference to the column data, search column), least recently searched first
+        self.entries: "OrderedDict[Tuple[int, Any], Tuple[Hashable, Callable[[], Any], SearchColumn]]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.num_columns_stringified = 0
+
+    def get_search_column(self, sheet_index: int, column_header: Any, series: pd.Series, stringify_all_values: bool=True) -> SearchColumn:
+        column_version, _ = get_column_version(series)
+        entry_key = (sheet_index, column_header)
+        entry = self.entries.get(entry_key)
+        if entry is not None and entry[0] == column_version and entry[1]() is not None:
+            self.entries.move_to_end(entry_key)
+            search_column = entry[2]
+            if stringify_all_values and search_column.all_values is None:
+                self.num_bytes -= search_column.nbytes
+                search_column.stringify_all_values(series)
+                self.num_bytes += search_column.nbytes
+                self.remove_least_recently_searched_entries(self.max_bytes)
+            return search_column
+
+        search_column = SearchColumn(series)
+        if stringify_all_values:
+            search_column.stringify_all_values(series)
+        self.num_columns_stringified += 1
+        self._remove_entry(entry_key)
+
+        column_data_reference = get_column_data_reference(series)
+        if column_data_reference is not None:
+            self.entries[entry_key] = (column_version, column_data_reference, search_column)
+            self.num_bytes += search_column.nbytes
+            self.remove_least_recently_searched_entries(self.max_bytes)
+
+        return search_column
+
+    def remove_least_recently_searched_entries(self, max_bytes: int) -> None:
+        """
+        Removes the least recently searched columns until the cache uses at most max_bytes, 
+        but always keeps the most recently searched column.
+        """
+        while self.num_bytes > max_bytes and len(self.entries) > 1:
+            self._remove_entry(next(iter(self.entries)))
+
+    def _remove_entry(self, entry_key: Tuple[int, Any]) -> None:
+        entry = self.entries.pop(entry_key, None)
+        if entry is not None:
+            self.num_bytes -= entry[2].nbytes
+
+    def remove_unused_entries(self, sheet_index: int, column_headers: Set[Any]) -> None:
+        """
+        Removes the columns of the sheet that are no longer in it, and the columns
+        whose data no longer exists.
+        """
+        for (entry_sheet_index, entry_column_header), entry in list(self.entries.items()):
+            if (entry_sheet_index == sheet_index and entry_column_header not in column_headers) or entry[1]() is None:
+                self._remove_entry((entry_sheet_index, entry_column_header))
+
+
+def get_column_search_matches(
+        series: pd.Series,
+        search_value: str,
+        sheet_index: int=0,
+        search_column_cache: Optional[SearchColumnCache]=None,
+        count_all_matches: bool=True
+    ) -> Tuple[Optional[int], np.ndarray]:
+    """
+    Returns the number of cells in the column that contain the search value, ignoring case,
+    and the indexes of the displayed rows that do. Null cells never match.
+
+    If count_all_matches is False, only the displayed rows are searched, and the number of 
+    cells is None, unless all of the column was stringified in an earlier search.
+    """
+    search_value = search_value.lower()
+    if not can_column_contain_search_value(series.dtype, search_value):
+        return 0, np.array([], dtype=np.intp)
+
+    if search_column_cache is not None:
+        search_column = search_column_cache.get_search_column(sheet_index, series.name, series, stringify_all_values=count_all_matches)
+    else:
+        search_column = SearchColumn(series)
+        if count_all_matches:
+            search_column.stringify_all_values(series)
+    return search_column.get_matches(search_value)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+After every edit, the frontend needs the new sheet data and analysis data, but
+most edits only change a few columns of a single sheet, add a step, and change
+a few lines of code. So rather than sending the full sheet data and analysis data
+each time, we send each frontend a patch from the last state we sent it.
+
+Each frontend sends its frontend_id with each message, along with the version of
+the sheet data and analysis data that it has. If it has a version, we send a patch
+from the last version we sent it, and the frontend applies the patches in the order
+of their versions. Otherwise (e.g. it was just rendered, or it missed a patch), we
+send the full state, which resyncs the frontend.
+
+A sheet data patch has the sheets that have changed, where the columns with the same
+data leave out their columnData. An analysis data patch has the values that have
+changed, and for lists (like the step summaries and graphs), just the changed items.
+"""
+
+from collections import OrderedDict
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from mitosheet.utils import NpEncoder
+
+# The number of frontends we keep the last sent state for, which is more than
+# one if the same analysis is open in a few places (e.g. a few Streamlit tabs)
+MAX_FRONTENDS_WITH_SENT_STATE = 5
+
+SHEET_DATA = 'sheet_data'
+ANALYSIS_DATA = 'analysis_data'
+
+# The analysis data with each value, or each item of a list value, encoded as json
+EncodedAnalysisData = Dict[str, Union[str, List[str]]]
+
+
+def get_acknowledged_version(event: Dict[str, Any], shared_variable: str) -> Optional[int]:
+    """
+    Returns the version of the shared variable that the frontend that sent the event has.
+    """
+    shared_state_versions = event.get('shared_state_versions')
+    if not isinstance(shared_state_versions, dict):
+        return None
+    return shared_state_versions.get(shared_variable)
+
+
+def get_sheet_data_patch(previous_sheet_data_array: List[Dict[str, Any]], sheet_data_array: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns the changes from the previous sheet data to the sheet data.
+
+    A sheet that is unchanged is the same object in both (see dfs_to_array_for_json),
+    and a column with unchanged data has the same columnData list (see SheetDataColumnCache),
+    so we check these by identity rather than comparing the data itself.
+    """
+    sheets = {}
+    for sheet_index, sheet_data in enumerate(sheet_data_array):
+        previous_sheet_data = previous_sheet_data_array[sheet_index] if sheet_index < len(previous_sheet_data_array) else None
+        if sheet_data is previous_sheet_data:
+            continue
+        if previous_sheet_data is None:
+            sheets[str(sheet_index)] = sheet_data
+            continue
+
+        previous_column_data = {column['columnID']: column['columnData'] for column in previous_sheet_data['data']}
+        sheet_patch = {
+            **sheet_data,
+            'data': [
+                {key: value for key, value in column.items() if key != 'columnData'}
+                if previous_column_data.get(column['columnID']) is column['columnData'] else column
+                for column in sheet_data['data']
+            ]
+        }
+        if sheet_data['index'] == previous_sheet_data['index']:
+            del sheet_patch['index']
+        sheets[str(sheet_index)] = sheet_patch
+
+    return {
+        'numSheets': len(sheet_data_array),
+        'sheets': sheets
+    }
+
+
+def encode_analysis_data(analysis_data: Dict[str, Any]) -> EncodedAnalysisData:
+    return {
+        key: [json.dumps(item, cls=NpEncoder) for item in value] if isinstance(value, list) else json.dumps(value, cls=NpEncoder)
+        for key, value in analysis_data.items()
+    }
+
+
+def get_analysis_data_patch(previous_encoded_analysis_data: EncodedAnalysisData, encoded_analysis_data: EncodedAnalysisData, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the changes from the previous analysis data to the analysis data. Changed
+    lists that were also lists before just have the items that changed, and their length.
+    """
+    values = {}
+    lists = {}
+    for key, encoded_value in encoded_analysis_data.items():
+        previous_encoded_value = previous_encoded_analysis_data.get(key)
+        if encoded_value == previous_encoded_value:
+            continue
+
+        if isinstance(encoded_value, list) and isinstance(previous_encoded_value, list):
+            lists[key] = {
+                'length': len(encoded_value),
+                'items': {
+                    str(index): analysis_data[key][index]
+                    for index, encoded_item in enumerate(encoded_value)
+                    if index >= len(previous_encoded_value) or encoded_item != previous_encoded_value[index]
+                }
+            }
+        else:
+            values[key] = analysis_data[key]
+
+    return {
+        'values': values,
+        'lists': lists
+    }
+
+
+class SharedStatePatcher():
+    """
+    Keeps the last sheet data and analysis data sent to each frontend, and
+    returns the shared state variables to send to a frontend next, which are
+    patches from these if the frontend has a version.
+    """
+
+    def __init__(self) -> None:
+        self.version = 0
+        # frontend_id -> shared variable -> (version, the state sent with this version)
+        self.sent_states: "OrderedDict[str, Dict[str, Tuple[int, Any]]]" = OrderedDict()
+        # frontend_id -> shared variable -> the last version the frontend told us it has
+        self.acknowledged_versions: Dict[str, Dict[str, Optional[int]]] = {}
+
+    def _get_previous_sent_state(self, frontend_id: Optional[str], shared_variable: str, acknowledged_version: Optional[int]) -> Optional[Tuple[int, Any]]:
+        if frontend_id is None:
+            return None
+
+        self.acknowledged_versions.setdefault(frontend_id, {})[shared_variable] = acknowledged_version
+        previous_sent_state = self.sent_states.get(frontend_id, {}).get(shared_variable)
+        # If the frontend does not have a version, or has a version we did not send it, we resync it
+        if acknowledged_version is None or previous_sent_state is None or acknowledged_version > previous_sent_state[0]:
+            return None
+        return previous_sent_state
+
+    def _save_sent_state(self, frontend_id: Optional[str], shared_variable: str, state: Any) -> int:
+        self.version += 1
+        if frontend_id is None:
+            return self.version
+
+        self.sent_states.setdefault(frontend_id, {})[shared_variable] = (self.version, state)
+        self.sent_states.move_to_end(frontend_id)
+        while len(self.sent_states) > MAX_FRONTENDS_WITH_SENT_STATE:
+            removed_frontend_id, _ = self.sent_states.popitem(last=False)
+            self.acknowledged_versions.pop(removed_frontend_id, None)
+        return self.version
+
+    def get_sheet_data_shared_state_variables(self, frontend_id: Optional[str], acknowledged_version: Optional[int], sheet_data_array: List[Dict[str, Any]]) -> Dict[str, Any]:
+        previous_sent_state = self._get_previous_sent_state(frontend_id, SHEET_DATA, acknowledged_version)
+        version = self._save_sent_state(frontend_id, SHEET_DATA, sheet_data_array)
+
+        if previous_sent_state is None:
+            return {
+                'sheet_data_json': json.dumps(sheet_data_array, cls=NpEncoder),
+                'sheet_data_version': version
+            }
+
+        previous_version, previous_sheet_data_array = previous_sent_state
+        return {
+            'sheet_data_patch_json': json.dumps(get_sheet_data_patch(previous_sheet_data_array, sheet_data_array), cls=NpEncoder),
+            'sheet_data_version': version,
+            'sheet_data_base_version': previous_version
+        }
+
+    def get_analysis_data_shared_state_variables(self, frontend_id: Optional[str], acknowledged_version: Optional[int], analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        previous_sent_state = self._get_previous_sent_state(frontend_id, ANALYSIS_DATA, acknowledged_version)
+        # We keep the analysis data encoded, as it is built from objects that later steps may change
+        encoded_analysis_data = encode_analysis_data(analysis_data)
+        version = self._save_sent_state(frontend_id, ANALYSIS_DATA, encoded_analysis_data)
+
+        if previous_sent_state is None:
+            return {
+                'analysis_data_json': json.dumps(analysis_data, cls=NpEncoder),
+                'analysis_data_version': version
+            }
+
+        previous_version, previous_encoded_analysis_data = previous_sent_state
+        return {
+            'analysis_data_patch_json': json.dumps(get_analysis_data_patch(previous_encoded_analysis_data, encoded_analysis_data, analysis_data), cls=NpEncoder),
+            'analysis_data_version': version,
+            'analysis_data_base_version': previous_version
+        }
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Most of the sheet data is usually the data of numeric columns, which is slow to
+write as json, large to send, and slow for the frontend to parse back into numbers.
+
+If arrow sheet data is turned on, we instead send the data of the numeric and
+boolean columns of each sheet in an Arrow IPC buffer, and leave their columnData
+empty in the sheet data json. Each column in the buffer has columnDataInBuffer set,
+and each sheet with a buffer has the index of its buffer in columnDataBufferIndex.
+
+The frontend reads the buffers back into the sheet data so that it is exactly the
+same as the sheet data json would be: non-finite numbers are sent as nulls (which
+become 'NaN'), and floats are rounded the same way as in the sheet data json.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mitosheet.utils import MAX_ROWS, round_floats_like_to_json
+
+
+def is_arrow_sheet_data_dtype(dtype: Any) -> bool:
+    """
+    Returns True if columns with this dtype are sent in the Arrow buffer. We only
+    send numpy numbers and booleans, as every other dtype is turned into strings.
+    """
+    return isinstance(dtype, np.dtype) and dtype.kind in 'iufb'
+
+
+def get_sheet_data_buffer(df: pd.DataFrame, sheet_data: Dict[str, Any]) -> Optional[bytes]:
+    """
+    Returns the Arrow buffer with the data of the columns of the df that have 
+    columnDataInBuffer set in the sheet data, which is made with buffer_column_data 
+    (see dfs_to_array_for_json), so these columns were never serialized as json. 
+    Returns no buffer if no columns are in it.
+    """
+    import pyarrow as pa
+
+    displayed_df = df.iloc[:MAX_ROWS]
+    arrays = []
+    column_ids = []
+    for column_index, column_sheet_data in enumerate(sheet_data['data']):
+        if not column_sheet_data.get('columnDataInBuffer', False):
+            continue
+
+        values = displayed_df.iloc[:, column_index].to_numpy()
+        if values.dtype.kind == 'f':
+            values = round_floats_like_to_json(values)
+            arrays.append(pa.array(values, mask=np.isnan(values)))
+        else:
+            arrays.append(pa.array(values))
+        column_ids.append(str(column_sheet_data['columnID']))
+
+    if len(arrays) == 0:
+        return None
+
+    table = pa.Table.from_arrays(arrays, names=column_ids)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return sink.getvalue().to_pybytes()
+
+
+class SheetDataBufferCache():
+    """
+    Caches the Arrow buffer of each sheet, along with the sheet data it was made
+    from. The sheet data of a sheet is the same object until the sheet is modified
+    (see dfs_to_array_for_json), so we only make new buffers for modified sheets.
+    """
+
+    def __init__(self) -> None:
+        # sheet_index -> (sheet data, buffer)
+        self.entries: Dict[int, Tuple[Dict[str, Any], Optional[bytes]]] = {}
+
+    def get_sheet_data_and_buffers(self, dfs: List[pd.DataFrame], sheet_data_array: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[bytes]]:
+        """
+        Returns the sheet data array, with the index of the buffer of each sheet that 
+        has one, and the buffers of all the sheets that have one.
+        """
+        new_sheet_data_array = []
+        buffers = []
+        for sheet_index, (df, sheet_data) in enumerate(zip(dfs, sheet_data_array)):
+            entry = self.entries.get(sheet_index)
+            if entry is None or entry[0] is not sheet_data:
+                entry = (sheet_data, get_sheet_data_buffer(df, sheet_data))
+                self.entries[sheet_index] = entry
+
+            _, buffer = entry
+            if buffer is not None:
+                sheet_data = {**sheet_data, 'columnDataBufferIndex': len(buffers)}
+                buffers.append(buffer)
+            new_sheet_data_array.append(sheet_data)
+
+        for sheet_index in list(self.entries.keys()):
+            if sheet_index >= len(sheet_data_array):
+                del self.entries[sheet_index]
+
+        return new_sheet_data_array, buffers
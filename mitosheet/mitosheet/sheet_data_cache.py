@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Serializing the sheet data is one of the slowest parts of rendering a wide sheet,
+and most steps only change a few columns of a single sheet. So, we cache the
+serialized data of each column, and only serialize the columns that have changed.
+
+We know a column has not changed if it has the same data as the column we cached,
+which is the case if it is the same array in memory, as steps never write to the
+data of a column in place without copying it first (see State.copy). So the version
+of a column is just where its data is in memory, and we keep a reference to this
+data in the cache so that nothing else can use this memory while the column is cached.
+
+Every test edit checks that the previous step's dataframes did not change, which is
+what catches a step that breaks this by writing to a column it shares with them.
+"""
+
+from typing import Any, Collection, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mitosheet.types import ColumnID
+from mitosheet.utils import get_parsed_json_column, get_parsed_json_index
+
+
+def get_column_version(series: pd.Series) -> Tuple[Hashable, Any]:
+    """
+    Returns the version of the data of the series, and the data itself.
+    """
+    values = series.array if pd.api.types.is_extension_array_dtype(series.dtype) else series.to_numpy()
+    if isinstance(values, np.ndarray):
+        return (str(series.dtype), values.__array_interface__['data'][0], values.strides, len(values)), values
+    return (str(series.dtype), id(values), len(values)), values
+
+
+def get_data_owner(values: Any) -> Any:
+    """
+    Returns the object that owns the memory of the values, which is the values
+    themselves unless they are a view of another array (e.g. a column that is a
+    view of the data of the block it is in). While the owner is alive, no other 
+    data can be in its memory.
+    """
+    while isinstance(values, np.ndarray) and isinstance(values.base, np.ndarray):
+        values = values.base
+    return values
+
+
+class SheetDataColumnCache():
+    """
+    Caches the serialized data of each column in the sheet data, for each
+    (sheet_index, column_id), along with the version of the column it is for.
+
+    We only keep the columns that are in the sheet data we last serialized
+    for each sheet, as these are the only columns we might serialize again.
+    """
+
+    def __init__(self) -> None:
+        # (sheet_index, column_id) -> (column version, column data, serialized column data)
+        self.entries: Dict[Tuple[int, ColumnID], Tuple[Hashable, Any, List[Any]]] = {}
+        self.num_columns_serialized = 0
+
+    def get_columns_data(
+            self, 
+            sheet_index: int, 
+            df: pd.DataFrame, 
+            column_ids: List[ColumnID], 
+            max_rows: Optional[int],
+            column_indexes_in_buffer: Collection[int]=()
+        ) -> Tuple[List[List[Any]], List[Any]]:
+        """
+        Returns the serialized data of the first len(column_ids) columns of the dataframe, 
+        which have the column_ids, and the serialized index. Only the columns that are not
+        cached are serialized. The serialized data is the same as convert_df_to_parsed_json.
+
+        The columns in column_indexes_in_buffer are sent in an Arrow buffer, so they
+        are not serialized or cached, and their data is left empty.
+
+        NOTE: we take each column from the dataframe itself, as selecting many columns 
+        at once (e.g. with df.iloc[:, :max_columns]) can copy their data.
+        """
+        column_versions = []
+        uncached_column_indexes = []
+        for column_index, column_id in enumerate(column_ids):
+            if column_index in column_indexes_in_buffer:
+                column_versions.append((None, None))
+                continue
+            column_version, column_values = get_column_version(df.iloc[:, column_index])
+            column_versions.append((column_version, column_values))
+            entry = self.entries.get((sheet_index, column_id))
+            if entry is None or entry[0] != column_version:
+                uncached_column_indexes.append(column_index)
+
+        displayed_df = df if max_rows is None else df.iloc[:max_rows]
+        for column_index in uncached_column_indexes:
+            column_version, column_values = column_versions[column_index]
+            self.entries[(sheet_index, column_ids[column_index])] = (
+                column_version,
+                column_values,
+                get_parsed_json_column(displayed_df.iloc[:, column_index])
+            )
+        self.num_columns_serialized += len(uncached_column_indexes)
+
+        # Remove the columns that are no longer serialized for this sheet
+        serialized_column_ids = set(column_id for column_index, column_id in enumerate(column_ids) if column_index not in column_indexes_in_buffer)
+        for (entry_sheet_index, entry_column_id) in list(self.entries.keys()):
+            if entry_sheet_index == sheet_index and entry_column_id not in serialized_column_ids:
+                del self.entries[(entry_sheet_index, entry_column_id)]
+
+        columns_data = [
+            [] if column_index in column_indexes_in_buffer else self.entries[(sheet_index, column_id)][2] 
+            for column_index, column_id in enumerate(column_ids)
+        ]
+        return columns_data, get_parsed_json_index(displayed_df.index)
+
+    def remove_sheets_after(self, num_sheets: int) -> None:
+        """
+        Removes the columns of the sheets that no longer exist.
+        """
+        for (sheet_index, column_id) in list(self.entries.keys()):
+            if sheet_index >= num_sheets:
+                del self.entries[(sheet_index, column_id)]
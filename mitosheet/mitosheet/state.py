@@ -4,14 +4,26 @@
 # Copyright (c) Saga Inc.
 # Distributed under the terms of the GPL License.
 from collections import OrderedDict
+from contextlib import contextmanager
 from copy import deepcopy
-from typing import Any, Callable, Collection, List, Dict, Optional, Set, Union
+import threading
+from typing import Any, Callable, Collection, Iterator, List, Dict, Optional, Set, Union
+import numpy as np
 import pandas as pd
+try:
+    from pandas.core.arrays._mixins import NDArrayBackedExtensionArray
+    from pandas.core.arrays.masked import BaseMaskedArray
+except ImportError: # pragma: no cover
+    # Older versions of pandas do not have these base classes, and so no 
+    # extension arrays are replaced in dataframe schemas
+    NDArrayBackedExtensionArray = () # type: ignore
+    BaseMaskedArray = () # type: ignore
 
 from mitosheet.column_headers import ColumnIDMap
+from mitosheet.step_profiling import get_current_step_profile, get_dataframe_memory_bytes, record_bytes_copied
 from mitosheet.types import FrontendFormulaAndLocation, OverwriteSheetIndexParams
 from mitosheet.types import ColumnHeader, ColumnID, DataframeFormat
-from mitosheet.utils import  get_first_unused_dataframe_name
+from mitosheet.utils import  get_first_unused_dataframe_name, is_prev_version
 
 # Constants for where the dataframe in the state came from
 DATAFRAME_SOURCE_PASSED = "passed"  # passed in mitosheet.sheet
@@ -45,6 +57,214 @@ def get_default_dataframe_format() -> DataframeFormat:
     }
 
 
+def is_pandas_copy_on_write_enabled() -> bool:
+    """
+    Returns True if pandas Copy-on-Write is turned on, either because the
+    user turned it on in their kernel or because it is the default (pandas 3.0+). 
+    In this case, shallow copies of a dataframe never write into the data of the
+    dataframe they were copied from.
+    """
+    try:
+        if not is_prev_version(pd.__version__, '3.0.0'):
+            return True
+    except:
+        pass
+    
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except:
+        # Older versions of pandas do not have the option at all
+        return False
+
+
+def copy_dataframe_with_deep_columns(df: pd.DataFrame, deep_column_headers: Collection[ColumnHeader]) -> pd.DataFrame:
+    """
+    Returns a copy of the dataframe that shares the data of every column with the
+    original dataframe, except for the columns in deep_column_headers, which are
+    deep copied. As such, it is safe to write to those columns in place (e.g. with
+    df.at or df.loc) without changing the original dataframe.
+
+    Adding, deleting, renaming or reordering columns of the returned dataframe never
+    changes the original dataframe, as these operations do not touch the data itself.
+
+    If pandas Copy-on-Write is enabled, we just return a shallow copy, as pandas
+    will itself copy any column that is written to. If we cannot safely share 
+    columns, we fall back to a full deep copy.
+    """
+    if is_pandas_copy_on_write_enabled():
+        return df.copy(deep=False)
+    
+    # DataFrame.isetitem was added in pandas 1.5, and is the only way to 
+    # replace a column without writing into the existing data of the column 
+    if not hasattr(df, 'isetitem'):
+        return df.copy(deep=True)
+
+    new_df = df.copy(deep=False)
+    for column_header in deep_column_headers:
+        try:
+            column_index = new_df.columns.get_loc(column_header)
+        except:
+            return df.copy(deep=True)
+        
+        # If the column header is duplicated, get_loc returns a mask or slice
+        if not isinstance(column_index, (int, np.integer)):
+            return df.copy(deep=True)
+
+        new_df.isetitem(column_index, new_df.iloc[:, column_index].copy(deep=True))
+
+    return new_df
+
+
+def get_copied_column_bytes(df: pd.DataFrame, deep_column_headers: Collection[ColumnHeader]) -> int:
+    """
+    Returns the number of bytes of column data that copy_dataframe_with_deep_columns
+    copies, which is only the deep columns, unless pandas copies them lazily.
+    """
+    if is_pandas_copy_on_write_enabled():
+        return 0
+    column_memory_usage = df.memory_usage(index=False, deep=False)
+    return int(sum(column_memory_usage[column_header] for column_header in deep_column_headers if column_header in column_memory_usage))
+
+
+# Tracks if we are currently only reading the column headers, dtypes and indexes of 
+# dataframes, in which case evicted states do not need to be rebuilt
+_evicted_state_access = threading.local()
+
+
+@contextmanager
+def use_dataframe_schemas_for_evicted_states() -> Iterator[None]:
+    """
+    Inside this context, the dfs of evicted states are not rebuilt, and instead
+    are dataframes with the same index, column headers, and dtypes as the 
+    real dataframes, but with no real data. 
+    
+    This is used when transpiling, as the code chunks only read this information
+    from the dataframes, so that transpiling does not rebuild every evicted state.
+    """
+    previous_value = getattr(_evicted_state_access, 'use_schemas', False)
+    _evicted_state_access.use_schemas = True
+    try:
+        yield
+    finally:
+        _evicted_state_access.use_schemas = previous_value
+
+
+def get_empty_values(values: Any, length: int) -> Optional[Any]:
+    """
+    Returns values with the same type and dtype as the passed values, with the 
+    given length, that take up no memory. Each is a read-only view of a single
+    value (or missing value, for extension arrays), broadcast to the length.
+
+    Returns None if the values cannot be replaced this way, as is the case for 
+    extension arrays that are not backed by numpy arrays (e.g. pyarrow arrays).
+    """
+    if isinstance(values, np.ndarray):
+        return np.broadcast_to(np.zeros(1, dtype=values.dtype), (length,))
+
+    try:
+        missing_value = type(values)._from_sequence([None], dtype=values.dtype)
+        if isinstance(missing_value, BaseMaskedArray):
+            empty_values = type(missing_value)(
+                np.broadcast_to(missing_value._data, (length,)), 
+                np.broadcast_to(missing_value._mask, (length,))
+            )
+        elif isinstance(missing_value, NDArrayBackedExtensionArray):
+            backing_data = np.broadcast_to(missing_value._ndarray, (length,))
+            try:
+                empty_values = missing_value._from_backing_data(backing_data)
+            except ValueError:
+                # Some arrays (e.g. StringArray) validate their data by writing 
+                # to it, which a read-only view does not allow
+                empty_values = type(missing_value)._simple_new(backing_data, missing_value.dtype)
+        else:
+            return None
+    except Exception:
+        return None
+
+    if empty_values.dtype != values.dtype or len(empty_values) != length:
+        return None
+    return empty_values
+
+
+def get_empty_index(index: pd.Index) -> pd.Index:
+    """
+    Returns an index with the same type, dtype and length as the passed index, 
+    that takes up no memory where possible. A RangeIndex is already small, and
+    so is returned as is, as is any index that cannot be replaced.
+    """
+    if isinstance(index, pd.RangeIndex):
+        return index
+
+    if isinstance(index, pd.MultiIndex):
+        # Every entry points at a missing value in an empty level
+        missing_codes = np.broadcast_to(np.array([-1], dtype=np.int8), (len(index),))
+        return pd.MultiIndex(
+            levels=[level[:0] for level in index.levels],
+            codes=[missing_codes] * index.nlevels,
+            names=index.names,
+            verify_integrity=False
+        )
+
+    empty_values = get_empty_values(index._values, len(index))
+    if empty_values is None:
+        return index
+    try:
+        empty_index = pd.Index(empty_values, dtype=index.dtype, name=index.name, copy=False)
+    except Exception:
+        return index
+    if type(empty_index) != type(index) or empty_index.dtype != index.dtype:
+        return index
+    return empty_index
+
+
+def is_empty_values(values: Any) -> bool:
+    """
+    Returns True if the passed values take up no memory, as the values 
+    returned from get_empty_values do.
+    """
+    if isinstance(values, np.ndarray):
+        backing_arrays = [values]
+    elif isinstance(values, BaseMaskedArray):
+        backing_arrays = [values._data, values._mask]
+    elif isinstance(values, NDArrayBackedExtensionArray):
+        backing_arrays = [values._ndarray]
+    else:
+        return False
+    return all(len(array) <= 1 or array.strides == (0,) for array in backing_arrays)
+
+
+def is_empty_index(index: pd.Index) -> bool:
+    """
+    Returns True if the passed index takes up little or no memory, as the 
+    indexes returned from get_empty_index do.
+    """
+    if isinstance(index, pd.RangeIndex):
+        return True
+    if isinstance(index, pd.MultiIndex):
+        return all(len(level) == 0 for level in index.levels) and all(is_empty_values(np.asarray(codes)) for codes in index.codes)
+    return is_empty_values(index._values)
+
+
+def get_dataframe_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a dataframe with the same index, column headers and dtypes as 
+    the passed dataframe. Each column, and the index, is a read-only view of
+    a single value where possible, and so takes up no memory. Columns and 
+    indexes that cannot be replaced are kept as is, and are counted against
+    the step history memory budget.
+    """
+    columns: Dict[int, Any] = {}
+    for column_index in range(df.shape[1]):
+        # Use the underlying array, as .values drops the timezone of datetimes
+        values = df.iloc[:, column_index]._values
+        empty_values = get_empty_values(values, len(df))
+        columns[column_index] = empty_values if empty_values is not None else values
+
+    schema = pd.DataFrame(columns, index=get_empty_index(df.index), copy=False)
+    schema.columns = df.columns
+    return schema
+
+
 class State:
     """
     State is a container that stores the current state of a Mito analysis,
@@ -72,8 +292,11 @@ class State:
         user_defined_editors: Optional[List[Callable]]=None,
     ):
 
-        # The dataframes that are in the state
-        self.dfs = list(dfs)
+        # The dataframes that are in the state. These can be evicted from memory 
+        # to save space, in which case they are rebuilt when they are next accessed
+        self._dfs: Optional[List[pd.DataFrame]] = list(dfs)
+        self._dfs_schemas: Optional[List[pd.DataFrame]] = None
+        self._rebuild_dfs: Optional[Callable[[], List[pd.DataFrame]]] = None
 
         self.public_interface_version = public_interface_version
 
@@ -144,17 +367,86 @@ class State:
         self.user_defined_importers = user_defined_importers if user_defined_importers is not None else []
         self.user_defined_editors = user_defined_editors if user_defined_editors is not None else []
 
-    def copy(self, deep_sheet_indexes: Optional[Union[List[int], Set[int], None]]=None) -> "State":
+    @property
+    def dfs(self) -> List[pd.DataFrame]:
+        if self._dfs is None:
+            if getattr(_evicted_state_access, 'use_schemas', False):
+                return self._dfs_schemas # type: ignore
+            self._dfs = self._rebuild_dfs() # type: ignore
+        return self._dfs
+
+    @dfs.setter
+    def dfs(self, dfs: List[pd.DataFrame]) -> None:
+        self._dfs = dfs
+
+    @property
+    def dfs_schemas(self) -> Optional[List[pd.DataFrame]]:
+        """
+        The schemas of the dataframes of this state, if they are evicted.
+        """
+        return self._dfs_schemas
+
+    @property
+    def dfs_evicted(self) -> bool:
+        """
+        Returns True if the dataframes of this state are not currently
+        held in memory, and so will be rebuilt when they are next accessed.
+        """
+        return self._dfs is None
+
+    def evict_dfs(self, rebuild_dfs: Callable[[], List[pd.DataFrame]]) -> None:
+        """
+        Drops the dataframes in this state from memory. The next time the 
+        dataframes are accessed, they are rebuilt by calling rebuild_dfs. 
+        
+        All other metadata in the state (names, column ids, formulas, etc) is
+        small, and so is kept as is, along with the schema of each dataframe.
+        """
+        self._dfs_schemas = [get_dataframe_schema(df) for df in self.dfs]
+        self._rebuild_dfs = rebuild_dfs
+        self._dfs = None
+
+    def copy(
+        self, 
+        deep_sheet_indexes: Optional[Union[List[int], Set[int], None]]=None,
+        deep_column_ids: Optional[Dict[int, Collection[ColumnID]]]=None
+    ) -> "State":
         """
         Returns a copy of the state, while only making deep copies of
-        those dataframes in the deep_sheet_indexes. Ideally, we'd copy
-        even less than that deeply.
+        those dataframes in the deep_sheet_indexes. 
+        
+        If deep_column_ids is passed, then for any sheet index in it, only 
+        the columns with those column ids are deep copied, and the rest of the 
+        columns share their data with this state. This is much cheaper for 
+        wide dataframes where a step only writes to a single column.
         """
         if deep_sheet_indexes is None:
             deep_sheet_indexes = []
+        if deep_column_ids is None:
+            deep_column_ids = {}
+
+        # We only count the bytes we copy if a step is being profiled
+        is_profiling = get_current_step_profile() is not None
+
+        dfs = []
+        for sheet_index, df in enumerate(self.dfs):
+            if sheet_index not in deep_sheet_indexes:
+                dfs.append(df.copy(deep=False))
+            elif sheet_index in deep_column_ids:
+                column_ids_map = self.column_ids.get_column_ids_map(sheet_index)
+                deep_column_headers = [
+                    column_ids_map[column_id] for column_id in deep_column_ids[sheet_index] if column_id in column_ids_map
+                ]
+                dfs.append(copy_dataframe_with_deep_columns(df, deep_column_headers))
+                if is_profiling:
+                    record_bytes_copied(get_copied_column_bytes(df, deep_column_headers))
+            else:
+                dfs.append(df.copy(deep=True))
+                if is_profiling:
+                    record_bytes_copied(get_dataframe_memory_bytes(df))
         
         return State(
-            [df.copy(deep=index in deep_sheet_indexes) for index, df in enumerate(self.dfs)],
+            dfs,
             self.public_interface_version,
             df_names=deepcopy(self.df_names),
             df_sources=deepcopy(self.df_sources),
@@ -4,7 +4,7 @@
 # Copyright (c) Saga Inc.
 # Distributed under the terms of the GPL License.
 
-from typing import Any, Dict, List, Optional, Set, Type
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 import json
 from mitosheet.code_chunks.code_chunk import CodeChunk
 from mitosheet.step_performers.step_performer import StepPerformer
@@ -12,7 +12,8 @@ from mitosheet.step_performers.column_steps.set_column_formula import SetColumnF
 from mitosheet.step_performers.filter import FilterStepPerformer
 from mitosheet.state import State
 from mitosheet.step_performers import STEP_TYPE_TO_STEP_PERFORMER
-from mitosheet.types import FORMULA_SPECIFIC_INDEX_LABELS_TYPE, ColumnHeader, ColumnID, FORMULA_ENTIRE_COLUMN_TYPE
+from mitosheet.step_profiling import get_empty_step_profile, get_frame_memory_bytes, record_step_profile, time_step_profile_section
+from mitosheet.types import FORMULA_SPECIFIC_INDEX_LABELS_TYPE, ColumnHeader, ColumnID, FORMULA_ENTIRE_COLUMN_TYPE, StepProfile
 
 
 class Step:
@@ -63,6 +64,15 @@ class Step:
         # is useful for the transpiler - that means the transpiler can do way less
         # work if it has already been done. See simple_import for an example
         self.execution_data = execution_data if execution_data is not None else {}
+        # How long each part of the last execution of this step took, and how much
+        # memory it used. Is None if this step has not been executed
+        self.profile: Optional[StepProfile] = None
+
+        # The code chunks that transpile this step, along with the prev_state, params and 
+        # execution_data they were transpiled from, and the display name and description 
+        # of the step from them. See get_code_chunks
+        self._code_chunks: Optional[Tuple[Tuple[Any, ...], List[CodeChunk]]] = None
+        self._display_name_and_description: Optional[Tuple[List[CodeChunk], str, str]] = None
 
 
     @property
@@ -145,13 +155,17 @@ class Step:
         Returns True if the step returns a new post_state, meaning an
         execution actually occured.
         """        
-        # Saturate the event to get up to date parameters
-        # TODO: this should fill in the execution data - hopefully
-        # we can get all of it without executing. I think we probably can
-        params = self.step_performer.saturate(new_prev_state, self.params, previous_steps)
-
-        # Actually execute the data transformation
-        post_state_and_execution_data = self.step_performer.execute(new_prev_state, params)
+        profile = get_empty_step_profile(self.step_id, self.step_type)
+        with record_step_profile(profile):
+            # Saturate the event to get up to date parameters
+            # TODO: this should fill in the execution data - hopefully
+            # we can get all of it without executing. I think we probably can
+            with time_step_profile_section('saturate_time'):
+                params = self.step_performer.saturate(new_prev_state, self.params, previous_steps)
+
+            # Actually execute the data transformation
+            with time_step_profile_section('execute_time'):
+                post_state_and_execution_data = self.step_performer.execute(new_prev_state, params)
 
         if post_state_and_execution_data is not None:
             # If we don't get anything new back, then we just make this
@@ -170,9 +184,47 @@ class Step:
         self.execution_data = execution_data if execution_data is not None else {}
         self.params = params
 
+        profile['frame_memory_bytes'] = get_frame_memory_bytes(new_post_state.dfs)
+        self.profile = profile
+
         return post_state_and_execution_data is not None
     
 
+    def get_code_chunks(self) -> List[CodeChunk]:
+        """
+        Returns the code chunks that transpile this step, which are not optimized.
+
+        These only change when the step is executed again, so we cache them until
+        its prev_state, params or execution_data change. As such, the code chunks
+        that are returned should not be modified.
+        """
+        transpile_inputs = (self.prev_state, self.params, self.execution_data)
+        if self._code_chunks is None or any(cached_input is not transpile_input for cached_input, transpile_input in zip(self._code_chunks[0], transpile_inputs)):
+            code_chunks = self.step_performer.transpile(
+                self.prev_state, # type: ignore
+                self.params,
+                self.execution_data,
+            )
+            self._code_chunks = (transpile_inputs, code_chunks)
+
+        return self._code_chunks[1]
+
+    def get_display_name_and_description(self) -> Tuple[str, str]:
+        """
+        Returns the display name and description of this step, which are shown in the 
+        step list, from its first code chunk.
+        """
+        code_chunks = self.get_code_chunks()
+        if self._display_name_and_description is None or self._display_name_and_description[0] is not code_chunks:
+            self._display_name_and_description = (
+                code_chunks,
+                code_chunks[0].get_display_name(),
+                code_chunks[0].get_description_comment().strip().replace('\n', '\n# ')
+            )
+
+        _, display_name, description = self._display_name_and_description
+        return display_name, description
+
     def step_indexes_to_skip(self, all_steps_before_this_step: List['Step']) -> Set[int]:
         """
         Given the steps that come before it, any step has the ability
@@ -183,6 +235,9 @@ class Step:
         2. This step has the same id as any step before it (like for pivot tables)
         3. This step is a formula step overwriting the step that came just before it AND they both set the entire column
         4. This step is a formula step overwriting the step that came just before it AND they both set the same indexes
+
+        NOTE: the StepsManager finds skipped steps with a StepSkipIndex, which implements these
+        same rules, so make sure to update get_step_skip_key if you change them.
         """
 
         step_indexes_to_skip = set()
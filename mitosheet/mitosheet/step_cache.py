@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Many edits re-execute steps whose inputs have not changed: e.g. replaying an analysis
+after update_existing_imports when the imported files are the same, or undoing a clear.
+
+To avoid running pandas again in these cases, the StepsManager keeps a bounded LRU cache
+of step executions. Each execution is keyed by the step type and version, the normalized
+params of the step, and a fingerprint of the sheets the step reads. If a step is executed
+with the same key, the sheets it modifies are taken from the cached post state.
+
+Sheet fingerprints are content-addressed: two sheets with the same fingerprint have the
+same data and metadata. When a step modifies a sheet, the fingerprint of the resulting
+sheet is derived from the cache key of the step, so we only need to hash the data of
+sheets that are created by steps we do not cache (e.g. imports).
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+from weakref import WeakKeyDictionary
+
+import numpy as np
+import pandas as pd
+
+from mitosheet.state import State
+from mitosheet.step import Step
+from mitosheet.step_dependencies import get_step_modified_sheet_indexes, reuse_step_execution
+from mitosheet.utils import NpEncoder
+
+
+def get_value_types_hash(values: Any) -> np.ndarray:
+    """
+    Returns a hash of the type of each value. Objects are hashed by their string, so
+    e.g. 1 and '1' have the same hash, and we hash their types to tell them apart.
+    """
+    return pd.util.hash_array(np.array([type(value).__qualname__ for value in values], dtype=object))
+
+
+def get_sheet_content_fingerprint(state: State, sheet_index: int) -> Optional[str]:
+    """
+    Returns a hash of the data and metadata of the sheet, or None if the data
+    of the sheet cannot be hashed (e.g. if it contains lists).
+    """
+    df = state.dfs[sheet_index]
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True).values
+        value_types_hashes = [
+            get_value_types_hash(values) for values in 
+            [df.index] + [df.iloc[:, column_index] for column_index in range(df.shape[1])]
+            if values.dtype == object
+        ]
+        metadata = json.dumps([
+            [str(column_header) for column_header in df.columns],
+            [str(dtype) for dtype in df.dtypes],
+            state.df_sources[sheet_index],
+            state.column_ids.column_id_to_column_header[sheet_index],
+            state.column_formulas[sheet_index],
+            state.column_filters[sheet_index],
+            state.df_formats[sheet_index],
+        ], sort_keys=True, cls=NpEncoder, default=str)
+    except Exception:
+        return None
+
+    sha = hashlib.sha256()
+    sha.update(row_hashes.tobytes())
+    for value_types_hash in value_types_hashes:
+        sha.update(value_types_hash.tobytes())
+    sha.update(metadata.encode())
+    return 'content:' + sha.hexdigest()
+
+
+class StepExecutionCache():
+    """
+    A bounded LRU cache of step executions. Only steps that modify a known set of
+    existing sheets are cached, which excludes imports, exports, AI transformations
+    and user defined edits, as these read from or write to the outside world.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        # From cache key to the executed step
+        self.entries: 'OrderedDict[str, Step]' = OrderedDict()
+        # The fingerprint of each sheet in a state, if we know it
+        self.state_fingerprints: 'WeakKeyDictionary[State, List[Optional[str]]]' = WeakKeyDictionary()
+
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
+    def copy(self) -> "StepExecutionCache":
+        step_execution_cache_copy = StepExecutionCache(self.max_size)
+        step_execution_cache_copy.entries = self.entries.copy()
+        step_execution_cache_copy.state_fingerprints = WeakKeyDictionary(
+            (state, list(fingerprints)) for state, fingerprints in self.state_fingerprints.items()
+        )
+        step_execution_cache_copy.hit_count = self.hit_count
+        step_execution_cache_copy.miss_count = self.miss_count
+        step_execution_cache_copy.eviction_count = self.eviction_count
+        return step_execution_cache_copy
+
+    def get_sheet_fingerprint(self, state: State, sheet_index: int) -> Optional[str]:
+        fingerprints = self.state_fingerprints.get(state)
+        if fingerprints is None or len(fingerprints) != len(state.df_names):
+            fingerprints = [None] * len(state.df_names)
+            self.state_fingerprints[state] = fingerprints
+
+        if fingerprints[sheet_index] is None:
+            fingerprints[sheet_index] = get_sheet_content_fingerprint(state, sheet_index)
+        return fingerprints[sheet_index]
+
+    def get_cache_key(self, step: Step, prev_state: State) -> Optional[str]:
+        """
+        Returns the key of executing the step on the prev_state, or None if
+        the step cannot be cached.
+        """
+        modified_sheet_indexes = get_step_modified_sheet_indexes(step)
+        if modified_sheet_indexes is None or any(sheet_index >= len(prev_state.df_names) for sheet_index in modified_sheet_indexes):
+            return None
+
+        read_sheet_indexes = step.step_performer.get_read_dataframe_indexes(step.params)
+        if read_sheet_indexes is None:
+            read_sheet_indexes = set(range(len(prev_state.df_names)))
+        if any(sheet_index >= len(prev_state.df_names) for sheet_index in read_sheet_indexes):
+            return None
+
+        read_sheets = []
+        for sheet_index in sorted(read_sheet_indexes):
+            fingerprint = self.get_sheet_fingerprint(prev_state, sheet_index)
+            if fingerprint is None:
+                return None
+            read_sheets.append([sheet_index, prev_state.df_names[sheet_index], fingerprint])
+
+        try:
+            key = json.dumps([
+                step.step_type,
+                step.step_performer.step_version(),
+                step.params,
+                len(prev_state.df_names),
+                prev_state.public_interface_version,
+                read_sheets
+            ], sort_keys=True, cls=NpEncoder)
+        except Exception:
+            return None
+
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def execute_step(self, new_step: Step, prev_state: State, previous_steps: List[Step]) -> None:
+        """
+        Executes the new_step on the prev_state, or takes the sheets it modifies
+        from the cached post state if it has been executed with the same key.
+        """
+        # NOTE: we get the key before executing, as saturating the step changes its params
+        cache_key = self.get_cache_key(new_step, prev_state)
+        modified_sheet_indexes: Set[int] = get_step_modified_sheet_indexes(new_step) # type: ignore
+
+        cached_step = self.entries.get(cache_key) if cache_key is not None else None
+        if cached_step is not None:
+            self.hit_count += 1
+            self.entries.move_to_end(cache_key) # type: ignore
+            reuse_step_execution(new_step, cached_step, prev_state, modified_sheet_indexes)
+        else:
+            new_step.set_prev_state_and_execute(prev_state, previous_steps)
+            if cache_key is not None:
+                self.miss_count += 1
+                self._add_entry(cache_key, new_step)
+
+                # Replayed steps (e.g. from a saved analysis) have saturated params, so 
+                # we also cache the execution under the key of the saturated params
+                saturated_cache_key = self.get_cache_key(new_step, prev_state)
+                if saturated_cache_key is not None and saturated_cache_key != cache_key:
+                    self._add_entry(saturated_cache_key, new_step)
+
+        self._set_post_state_fingerprints(new_step, cache_key, modified_sheet_indexes)
+
+    def _add_entry(self, cache_key: str, step: Step) -> None:
+        if self.max_size <= 0:
+            return
+
+        # We only keep the post state, so that the cache does not keep the prev state in memory
+        post_state: State = step.post_state # type: ignore
+        self.entries[cache_key] = Step(
+            step.step_type, 
+            step.step_id, 
+            step.params, 
+            prev_state=post_state if step.post_state is step.prev_state else None,
+            post_state=post_state,
+            execution_data=step.execution_data
+        )
+        while len(self.entries) > self.max_size:
+            self.remove_entry(next(iter(self.entries)))
+
+    def remove_entry(self, cache_key: str) -> None:
+        del self.entries[cache_key]
+        self.eviction_count += 1
+
+    def _set_post_state_fingerprints(self, step: Step, cache_key: Optional[str], modified_sheet_indexes: Optional[Set[int]]) -> None:
+        prev_state = step.prev_state
+        post_state = step.post_state
+        if prev_state is None or post_state is None or post_state is prev_state or post_state in self.state_fingerprints:
+            return
+
+        prev_fingerprints = self.state_fingerprints.get(prev_state, [None] * len(prev_state.df_names))
+        if cache_key is not None and modified_sheet_indexes is not None and len(post_state.df_names) == len(prev_state.df_names):
+            post_fingerprints: List[Optional[str]] = list(prev_fingerprints)
+            for sheet_index in modified_sheet_indexes:
+                post_fingerprints[sheet_index] = f'step:{cache_key}:{sheet_index}'
+            self.state_fingerprints[post_state] = post_fingerprints
+        elif step.step_performer.get_modified_dataframe_indexes(step.params) == {-1} and len(post_state.df_names) > len(prev_state.df_names):
+            # The step only created new sheets, which we hash if they are read
+            self.state_fingerprints[post_state] = list(prev_fingerprints) + [None] * (len(post_state.df_names) - len(prev_state.df_names))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'hit_count': self.hit_count,
+            'miss_count': self.miss_count,
+            'eviction_count': self.eviction_count,
+            'size': len(self.entries),
+            'max_size': self.max_size,
+        }
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Every step in the step history keeps the state it produced, which makes undo and
+checkout instant, but means that a long analysis on a large dataframe can take up
+many times the memory of the dataframe itself.
+
+This file contains the memory accounting for the states in the step history, and
+the policy for which states to keep when the step history is over its memory budget.
+When over budget, we keep the states of checkpoint steps (every Nth step, the current
+step, and any step that reads data from outside of the analysis) and drop the
+dataframes of other states from memory. A dropped state is rebuilt from the nearest
+checkpoint before it by rerunning the steps in between, the next time it is accessed.
+"""
+
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mitosheet.sheet_data_cache import get_data_owner
+from mitosheet.state import State, is_empty_index, is_empty_values
+from mitosheet.step import Step
+from mitosheet.step_spill import StepStateSpiller
+from mitosheet.step_performers.import_steps.dataframe_import import DataframeImportStepPerformer
+from mitosheet.step_performers.import_steps.excel_import import ExcelImportStepPerformer
+from mitosheet.step_performers.import_steps.excel_range_import import ExcelRangeImportStepPerformer
+from mitosheet.step_performers.import_steps.simple_import import SimpleImportStepPerformer
+from mitosheet.step_performers.import_steps.snowflake_import import SnowflakeImportStepPerformer
+from mitosheet.step_performers.user_defined_edit import UserDefinedEditStepPerformer
+from mitosheet.step_performers.user_defined_import import UserDefinedImportStepPerformer
+
+if TYPE_CHECKING:
+    from mitosheet.step_cache import StepExecutionCache
+
+# A key that identifies a piece of memory that might be shared between dataframes
+BufferKey = Tuple[Any, ...]
+# For each buffer, a weak reference to the object that owns its memory, and the number of bytes it uses
+BufferMemoryUsageCache = Dict[BufferKey, Tuple[Callable[[], Any], int]]
+
+# Steps that read data from outside of the analysis, or run code that we cannot
+# be sure gives the same result twice, so we always keep their state in memory
+ALWAYS_CHECKPOINT_STEP_TYPES = {
+    'initialize',
+    SimpleImportStepPerformer.step_type(),
+    ExcelImportStepPerformer.step_type(),
+    DataframeImportStepPerformer.step_type(),
+    SnowflakeImportStepPerformer.step_type(),
+    ExcelRangeImportStepPerformer.step_type(),
+    UserDefinedImportStepPerformer.step_type(),
+    UserDefinedEditStepPerformer.step_type(),
+}
+
+
+def get_dataframe_buffer_keys(df: pd.DataFrame) -> List[Tuple[BufferKey, pd.Series, Any]]:
+    """
+    Returns a key for the data of each column in the dataframe, along with the
+    column itself and the object that owns its data. Columns that share their data 
+    between dataframes (e.g. because one dataframe is a shallow copy of the other) 
+    have the same key.
+    """
+    buffer_keys = []
+    for column_index in range(df.shape[1]):
+        column = df.iloc[:, column_index]
+        buffer_key, owner = get_values_buffer_key(column.values)
+        buffer_keys.append((buffer_key, column, owner))
+    return buffer_keys
+
+
+def get_values_buffer_key(values: Any) -> Tuple[BufferKey, Any]:
+    """
+    Returns the key for the data of the values of a column, and the object
+    that owns this data.
+    """
+    if isinstance(values, np.ndarray):
+        address = values.__array_interface__['data'][0]
+        return ('array', address, values.nbytes, str(values.dtype)), get_data_owner(values)
+    # Extension arrays are shared between shallow copies as the same object
+    return ('extension_array', id(values)), values
+
+
+def get_buffer_memory_usage(column: pd.Series) -> int:
+    return int(column.memory_usage(index=False, deep=True))
+
+
+def get_cached_buffer_memory_usage(
+    buffer_memory_usage_cache: BufferMemoryUsageCache,
+    buffer_key: BufferKey,
+    owner: Any,
+    get_memory_usage: Callable[[], int]
+) -> int:
+    """
+    Returns the memory usage of the buffer from the cache, if it is cached for the
+    same owner. The addresses and ids in the buffer keys can be reused once their
+    owner is freed, so we only keep a weak reference to the owner, and check it.
+    """
+    entry = buffer_memory_usage_cache.get(buffer_key)
+    if entry is None or entry[0]() is not owner:
+        entry = (weakref.ref(owner), get_memory_usage())
+        buffer_memory_usage_cache[buffer_key] = entry
+    return entry[1]
+
+
+def get_state_buffers(state: State, buffer_memory_usage_cache: BufferMemoryUsageCache) -> Dict[BufferKey, int]:
+    """
+    Returns a mapping from each buffer key in the dataframes of the state
+    to the number of bytes that buffer uses.
+
+    The buffer_memory_usage_cache is used to avoid recomputing the memory
+    usage of buffers we have already seen, as calculating the deep memory
+    usage of object columns is slow.
+
+    If the dataframes of the state are evicted, only the parts of their schemas
+    that still hold data (e.g. pyarrow columns, which cannot be replaced with 
+    empty values) are returned, without rebuilding the dataframes.
+    """
+    dfs_evicted = state.dfs_evicted
+    dfs = state.dfs_schemas if dfs_evicted else state.dfs
+
+    buffers: Dict[BufferKey, int] = {}
+    for df in dfs or []:
+        index = df.index
+        if not dfs_evicted or not is_empty_index(index):
+            index_key = ('index', id(index))
+            buffers[index_key] = get_cached_buffer_memory_usage(
+                buffer_memory_usage_cache, index_key, index, lambda: int(index.memory_usage(deep=True))
+            )
+
+        for buffer_key, column, owner in get_dataframe_buffer_keys(df):
+            if dfs_evicted and is_empty_values(column._values):
+                continue
+            buffers[buffer_key] = get_cached_buffer_memory_usage(
+                buffer_memory_usage_cache, buffer_key, owner, lambda: get_buffer_memory_usage(column)
+            )
+    return buffers
+
+
+def get_step_states(steps: List[Step]) -> List[Optional[State]]:
+    """
+    Returns the post state of each step, or None if the post state is the
+    same object as the post state of an earlier step (e.g. because the step
+    did not change anything), so that each state is only counted once.
+    """
+    seen_state_ids: Set[int] = set()
+    states: List[Optional[State]] = []
+    for step in steps:
+        state = step.post_state
+        if state is None or id(state) in seen_state_ids:
+            states.append(None)
+        else:
+            seen_state_ids.add(id(state))
+            states.append(state)
+    return states
+
+
+def get_checkpoint_step_indexes(
+    steps: List[Step],
+    step_indexes_to_skip: Set[int],
+    curr_step_idx: int,
+    checkpoint_interval: int
+) -> Set[int]:
+    """
+    Returns the indexes of the steps whose state we always keep in memory.
+
+    These are every checkpoint_interval-th step, the current and final step,
+    and the steps in ALWAYS_CHECKPOINT_STEP_TYPES. Skipped steps are never
+    rebuilt, so they are also always kept.
+    """
+    checkpoint_step_indexes = {0, curr_step_idx, len(steps) - 1}
+    for step_index, step in enumerate(steps):
+        if step_index % checkpoint_interval == 0 \
+            or step.step_type in ALWAYS_CHECKPOINT_STEP_TYPES \
+            or step_index in step_indexes_to_skip:
+            checkpoint_step_indexes.add(step_index)
+    return checkpoint_step_indexes
+
+
+def get_rebuild_dfs_function(steps: List[Step], step_indexes_to_skip: Set[int], checkpoint_step_index: int, step_index: int):
+    """
+    Returns a function that rebuilds the dataframes of the post state of the
+    step at step_index, by rerunning the steps after the checkpoint step on
+    the post state of the checkpoint step.
+
+    We rerun the steps on new Step objects, so that the steps in the step
+    history are not changed by rebuilding.
+    """
+    checkpoint_state = steps[checkpoint_step_index].final_defined_state
+    steps_to_rerun = [
+        (steps[index], [step for previous_index, step in enumerate(steps[:index]) if previous_index not in step_indexes_to_skip])
+        for index in range(checkpoint_step_index + 1, step_index + 1)
+        if index not in step_indexes_to_skip
+    ]
+
+    def rebuild_dfs() -> List[pd.DataFrame]:
+        state = checkpoint_state
+        for step, previous_steps in steps_to_rerun:
+            new_step = Step(step.step_type, step.step_id, step.params)
+            new_step.set_prev_state_and_execute(state, previous_steps)
+            state = new_step.final_defined_state
+        return state.dfs
+
+    return rebuild_dfs
+
+
+def get_step_memory_report(
+    steps: List[Step],
+    step_indexes_to_skip: Set[int],
+    checkpoint_step_indexes: Set[int],
+    memory_budget: Optional[int],
+    buffer_memory_usage_cache: Optional[BufferMemoryUsageCache]=None,
+) -> Dict[str, Any]:
+    """
+    Returns a report of the memory that each step in the step history is
+    holding onto. The memory_usage of a step is the memory used by the data
+    that was first created in that step, as data that is unchanged from
+    a previous step is shared between the steps. Steps whose dataframes
+    are not in memory only use the memory their schemas still hold.
+    """
+    if buffer_memory_usage_cache is None:
+        buffer_memory_usage_cache = {}
+
+    seen_buffer_keys: Set[BufferKey] = set()
+    step_reports = []
+    total_memory_usage = 0
+    for step_index, (step, state) in enumerate(zip(steps, get_step_states(steps))):
+        in_memory = state is not None and not state.dfs_evicted
+        memory_usage = 0
+        if state is not None:
+            for buffer_key, buffer_memory_usage in get_state_buffers(state, buffer_memory_usage_cache).items():
+                if buffer_key not in seen_buffer_keys:
+                    seen_buffer_keys.add(buffer_key)
+                    memory_usage += buffer_memory_usage
+
+        total_memory_usage += memory_usage
+        step_reports.append({
+            'step_idx': step_index,
+            'step_id': step.step_id,
+            'step_type': step.step_type,
+            'is_checkpoint': step_index in checkpoint_step_indexes,
+            'is_skipped': step_index in step_indexes_to_skip,
+            'in_memory': in_memory,
+            'memory_usage': memory_usage,
+        })
+
+    # Only keep the memory usage of buffers that still exist, so the cache does not grow forever
+    for buffer_key in list(buffer_memory_usage_cache.keys()):
+        if buffer_key not in seen_buffer_keys:
+            del buffer_memory_usage_cache[buffer_key]
+
+    return {
+        'memory_budget': memory_budget,
+        'total_memory_usage': total_memory_usage,
+        'steps': step_reports
+    }
+
+
+def evict_step_states_over_memory_budget(
+    steps: List[Step],
+    step_indexes_to_skip: Set[int],
+    checkpoint_step_indexes: Set[int],
+    memory_budget: int,
+    buffer_memory_usage_cache: Optional[BufferMemoryUsageCache]=None,
+    spiller: Optional[StepStateSpiller]=None,
+    step_cache: Optional["StepExecutionCache"]=None,
+) -> List[int]:
+    """
+    If the states in the step history use more memory than the memory_budget,
+    drops the dataframes of non-checkpoint states from memory, starting from
+    the oldest step, until the states are back within the budget (or there is
+    nothing left to drop).
+
+    If a spiller is passed, the dropped dataframes are written to disk, and
+    read back from disk rather than rebuilt when they are next accessed.
+
+    If a step_cache is passed, the states it keeps are also counted, and if the
+    states are still over the budget once no more states can be dropped, the 
+    least recently used entries of the cache are removed.
+
+    Returns the indexes of the steps whose states were dropped.
+    """
+    if buffer_memory_usage_cache is None:
+        buffer_memory_usage_cache = {}
+
+    states = get_step_states(steps)
+    step_state_ids = set(id(state) for state in states if state is not None)
+    
+    # The states that are only kept by the step cache, along with the cache keys that keep each of them
+    cached_states: Dict[int, State] = {}
+    cached_state_keys: Dict[int, Set[str]] = {}
+    if step_cache is not None:
+        for cache_key, cached_step in step_cache.entries.items():
+            cached_state = cached_step.post_state
+            if cached_state is None or id(cached_state) in step_state_ids or cached_state.dfs_evicted:
+                continue
+            cached_states[id(cached_state)] = cached_state
+            cached_state_keys.setdefault(id(cached_state), set()).add(cache_key)
+
+    # For each buffer, count how many in memory states use it, as dropping a
+    # state only frees the buffers that no other state is using
+    state_buffers: Dict[int, Dict[BufferKey, int]] = {}
+    buffer_reference_counts: Dict[BufferKey, int] = {}
+    buffer_memory_usages: Dict[BufferKey, int] = {}
+
+    def retain_buffers(buffers: Dict[BufferKey, int]) -> int:
+        retained_memory_usage = 0
+        for buffer_key, buffer_memory_usage in buffers.items():
+            if buffer_key not in buffer_reference_counts:
+                buffer_reference_counts[buffer_key] = 0
+                buffer_memory_usages[buffer_key] = buffer_memory_usage
+                retained_memory_usage += buffer_memory_usage
+            buffer_reference_counts[buffer_key] += 1
+        return retained_memory_usage
+
+    total_memory_usage = 0
+    for step_index, state in enumerate(states):
+        if state is None:
+            continue
+        # Evicted states cannot be evicted again, but the data their schemas still hold is counted
+        buffers = get_state_buffers(state, buffer_memory_usage_cache)
+        if not state.dfs_evicted:
+            state_buffers[step_index] = buffers
+        total_memory_usage += retain_buffers(buffers)
+
+    cached_state_buffers: Dict[int, Dict[BufferKey, int]] = {}
+    for cached_state_id, cached_state in cached_states.items():
+        cached_state_buffers[cached_state_id] = get_state_buffers(cached_state, buffer_memory_usage_cache)
+        total_memory_usage += retain_buffers(cached_state_buffers[cached_state_id])
+
+    def release_buffers(buffers: Dict[BufferKey, int]) -> int:
+        freed_memory_usage = 0
+        for buffer_key, buffer_memory_usage in buffers.items():
+            buffer_reference_counts[buffer_key] -= 1
+            if buffer_reference_counts[buffer_key] == 0:
+                del buffer_reference_counts[buffer_key]
+                freed_memory_usage += buffer_memory_usage
+        return freed_memory_usage
+
+    evicted_step_indexes = []
+    for step_index, state in enumerate(states):
+        if total_memory_usage <= memory_budget:
+            break
+
+        if state is None or step_index not in state_buffers or step_index in checkpoint_step_indexes:
+            continue
+
+        checkpoint_step_index = max(index for index in checkpoint_step_indexes if index < step_index and index not in step_indexes_to_skip)
+        rebuild_dfs = get_rebuild_dfs_function(steps, step_indexes_to_skip, checkpoint_step_index, step_index)
+        if spiller is not None:
+            rebuild_dfs = spiller.spill_state(state, rebuild_dfs)
+        state.evict_dfs(rebuild_dfs)
+        evicted_step_indexes.append(step_index)
+        total_memory_usage += retain_buffers(get_state_buffers(state, buffer_memory_usage_cache))
+        total_memory_usage -= release_buffers(state_buffers[step_index])
+
+    if step_cache is not None:
+        for cache_key in list(step_cache.entries.keys()):
+            if total_memory_usage <= memory_budget:
+                break
+
+            # Entries whose state is in the step history do not use any memory of their own
+            cached_state_id = id(step_cache.entries[cache_key].post_state)
+            if cached_state_id not in cached_state_keys:
+                continue
+
+            step_cache.remove_entry(cache_key)
+            cached_state_keys[cached_state_id].discard(cache_key)
+            if len(cached_state_keys[cached_state_id]) == 0:
+                del cached_state_keys[cached_state_id]
+                total_memory_usage -= release_buffers(cached_state_buffers[cached_state_id])
+
+    # Only keep the memory usage of buffers that still exist, so the cache does not grow forever
+    for buffer_key in list(buffer_memory_usage_cache.keys()):
+        if buffer_key not in buffer_reference_counts:
+            del buffer_memory_usage_cache[buffer_key]
+
+    return evicted_step_indexes
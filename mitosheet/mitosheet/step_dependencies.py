@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+When a step in the middle of the step list becomes skipped (or stops being skipped),
+all the steps after it are rerun. However, many of these steps often only read and
+modify sheets that are unrelated to the skipped step.
+
+This file contains the utilities for figuring out which sheets a step reads and
+modifies, so that a step that does not depend on any sheet that changed can reuse
+the result of its previous execution, rather than being executed again.
+"""
+
+from copy import deepcopy
+from typing import Optional, Set
+
+from mitosheet.state import State, use_dataframe_schemas_for_evicted_states
+from mitosheet.step import Step
+from mitosheet.step_performers.column_steps.set_column_formula import SetColumnFormulaStepPerformer
+
+
+def get_step_modified_sheet_indexes(step: Step) -> Optional[Set[int]]:
+    """
+    Returns the indexes of the existing sheets that the step modifies, or None
+    if the step modifies every sheet, or creates new sheets.
+    """
+    modified_sheet_indexes = step.step_performer.get_modified_dataframe_indexes(step.params)
+    if len(modified_sheet_indexes) == 0 or -1 in modified_sheet_indexes:
+        return None
+    return set(modified_sheet_indexes)
+
+
+def get_step_read_sheet_indexes(step: Step) -> Optional[Set[int]]:
+    """
+    Returns the indexes of the sheets that the step read from when it was last
+    executed, from the sheets that its code chunks edit or use as a source. Returns
+    None if any code chunk does not say which sheets it reads.
+    """
+    if step.prev_state is None:
+        return None
+
+    # Cross-sheet references in formulas (e.g. in a VLOOKUP) read another sheet,
+    # which the code chunk does not tell us about
+    if step.step_type == SetColumnFormulaStepPerformer.step_type() and '!' in str(step.params.get('new_formula', '')):
+        return None
+
+    try:
+        with use_dataframe_schemas_for_evicted_states():
+            code_chunks = step.step_performer.transpile(step.prev_state, step.params, step.execution_data)
+    except Exception:
+        return None
+
+    read_sheet_indexes: Set[int] = set()
+    for code_chunk in code_chunks:
+        edited_sheet_indexes = code_chunk.get_edited_sheet_indexes()
+        created_sheet_indexes = code_chunk.get_created_sheet_indexes()
+        source_sheet_indexes = code_chunk.get_source_sheet_indexes()
+        if edited_sheet_indexes is None and created_sheet_indexes is None:
+            return None
+        if source_sheet_indexes is None:
+            return None
+
+        read_sheet_indexes.update(edited_sheet_indexes if edited_sheet_indexes is not None else [])
+        read_sheet_indexes.update(source_sheet_indexes)
+    return read_sheet_indexes
+
+
+def get_reusable_step_modified_sheet_indexes(step: Step, changed_sheet_indexes: Set[int]) -> Optional[Set[int]]:
+    """
+    If the step does not read or modify any of the changed_sheet_indexes, then 
+    executing it again on a state that only differs from its previous prev_state
+    in the changed sheets has the same result on the sheets it modifies. In this 
+    case, returns the sheets it modifies. Otherwise, returns None.
+    """
+    if step.prev_state is None or step.post_state is None:
+        return None
+
+    modified_sheet_indexes = get_step_modified_sheet_indexes(step)
+    if modified_sheet_indexes is None or not modified_sheet_indexes.isdisjoint(changed_sheet_indexes):
+        return None
+
+    if any(sheet_index >= len(step.prev_state.df_names) for sheet_index in modified_sheet_indexes):
+        return None
+
+    read_sheet_indexes = get_step_read_sheet_indexes(step)
+    if read_sheet_indexes is None or not read_sheet_indexes.isdisjoint(changed_sheet_indexes):
+        return None
+
+    return modified_sheet_indexes
+
+
+def reuse_step_execution(new_step: Step, old_step: Step, new_prev_state: State, modified_sheet_indexes: Set[int]) -> None:
+    """
+    Sets the prev_state of the new_step to new_prev_state, and sets its post_state
+    to new_prev_state with the modified sheets taken from the post_state of the
+    old_step, rather than executing the new_step.
+
+    NOTE: only call this with the modified sheet indexes returned from
+    get_reusable_step_modified_sheet_indexes.
+    """
+    old_post_state: State = old_step.post_state # type: ignore
+
+    if old_post_state is old_step.prev_state:
+        # The step did not change anything when it was executed
+        new_post_state = new_prev_state
+    else:
+        new_post_state = new_prev_state.copy()
+        for sheet_index in modified_sheet_indexes:
+            new_post_state.dfs[sheet_index] = old_post_state.dfs[sheet_index].copy(deep=False)
+            new_post_state.df_names[sheet_index] = old_post_state.df_names[sheet_index]
+            new_post_state.df_sources[sheet_index] = old_post_state.df_sources[sheet_index]
+            new_post_state.column_ids.column_id_to_column_header[sheet_index] = deepcopy(old_post_state.column_ids.column_id_to_column_header[sheet_index])
+            new_post_state.column_ids.column_header_to_column_id[sheet_index] = deepcopy(old_post_state.column_ids.column_header_to_column_id[sheet_index])
+            new_post_state.column_formulas[sheet_index] = deepcopy(old_post_state.column_formulas[sheet_index])
+            new_post_state.column_filters[sheet_index] = deepcopy(old_post_state.column_filters[sheet_index])
+            new_post_state.df_formats[sheet_index] = deepcopy(old_post_state.df_formats[sheet_index])
+
+    new_step.prev_state = new_prev_state
+    new_step.post_state = new_post_state
+    new_step.execution_data = old_step.execution_data
+    new_step.params = old_step.params
+    if old_step.profile is not None:
+        new_step.profile = {**old_step.profile, 'step_id': new_step.step_id, 'reused_execution': True}
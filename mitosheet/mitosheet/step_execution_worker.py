@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+An edit can take a long time to execute (e.g. a pivot or merge on a large dataframe),
+and while it does, the kernel cannot handle any other message from the frontend, so
+the user cannot undo, cancel, or even use the API.
+
+If cancellable step execution is turned on, the MitoBackend instead hands edit and
+update events to a StepExecutionWorker, which executes them one at a time on its own
+thread. While an event executes, the worker sends the frontend a heartbeat with the
+progress of the event, and cancels the event if it runs for longer than the timeout,
+or if the frontend sends a cancel update event.
+
+Each event is executed on a copy of the StepsManager, and the StepsManager is only
+replaced by this copy if the event finishes before it is cancelled, so a cancelled
+event leaves the StepsManager exactly as it was.
+
+Undoing while an edit executes cancels the edit, as long as no other event is waiting
+to execute after it, as undoing the edit then just means not applying it.
+
+NOTE: Python cannot stop a running thread, so a cancelled event keeps running in the
+background until it next checks if it was cancelled (before each step it executes),
+and then its result is thrown away. The worker does not wait for it, so the next event
+executes right away, and a step that runs for a long time never blocks undo or cancel.
+We do not execute events in a subprocess, which could be killed, as the dataframes
+the steps execute on would need to be copied to and from it.
+"""
+
+from contextlib import contextmanager
+from queue import Queue
+import threading
+from time import perf_counter
+from typing import Any, Dict, Iterator, NoReturn, Optional
+
+from mitosheet.errors import make_step_execution_cancelled_error
+from mitosheet.types import MitoWidgetType, StepsManagerType
+
+# The update event the frontend sends to cancel the currently executing event
+CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE = 'cancel_step_execution_update'
+
+# The number of seconds between each heartbeat sent to the frontend
+STEP_EXECUTION_HEARTBEAT_INTERVAL = 1
+
+
+class StepExecutionCancelToken():
+    """
+    Tracks if the event that is executing has been cancelled, either by the
+    user or because it ran for longer than the timeout.
+
+    An event can only be cancelled before it finishes, and can only finish
+    if it has not been cancelled, so exactly one of these happens.
+    """
+
+    def __init__(self, timeout: Optional[float]) -> None:
+        self.start_time = perf_counter()
+        self.deadline = self.start_time + timeout if timeout is not None else None
+
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.timed_out = False
+        self.finished = False
+
+        self.num_steps_executed = 0
+        self.num_steps_to_execute = 0
+
+    def cancel(self, timed_out: bool=False) -> bool:
+        """
+        Cancels the event, and returns True, unless it has already finished.
+        """
+        with self.lock:
+            if self.finished:
+                return False
+            if not self.cancelled:
+                self.cancelled = True
+                self.timed_out = timed_out
+            return True
+
+    def finish(self) -> bool:
+        """
+        Marks the event as finished, and returns True, unless it was cancelled.
+        """
+        with self.lock:
+            if self.cancelled:
+                return False
+            self.finished = True
+            return True
+
+    def check_timeout(self) -> None:
+        if self.deadline is not None and perf_counter() > self.deadline:
+            self.cancel(timed_out=True)
+
+    def check_cancelled(self) -> None:
+        """
+        Raises a step_execution_cancelled_error if the event was cancelled, or
+        has run for longer than the timeout.
+        """
+        self.check_timeout()
+        if self.cancelled:
+            raise make_step_execution_cancelled_error(self.timed_out)
+
+
+# The cancel token of the event executing on this thread
+_current_cancel_token = threading.local()
+
+
+def get_current_step_execution_cancel_token() -> Optional[StepExecutionCancelToken]:
+    return getattr(_current_cancel_token, 'token', None)
+
+
+@contextmanager
+def use_step_execution_cancel_token(cancel_token: StepExecutionCancelToken) -> Iterator[StepExecutionCancelToken]:
+    previous_cancel_token = get_current_step_execution_cancel_token()
+    _current_cancel_token.token = cancel_token
+    try:
+        yield cancel_token
+    finally:
+        _current_cancel_token.token = previous_cancel_token
+
+
+def check_step_execution_cancelled() -> None:
+    """
+    Raises a step_execution_cancelled_error if the event executing on this
+    thread was cancelled. Does nothing if the event cannot be cancelled.
+    """
+    cancel_token = get_current_step_execution_cancel_token()
+    if cancel_token is not None:
+        cancel_token.check_cancelled()
+
+
+def report_step_execution_progress(num_steps_executed: int, num_steps_to_execute: int) -> None:
+    cancel_token = get_current_step_execution_cancel_token()
+    if cancel_token is not None:
+        cancel_token.num_steps_executed = num_steps_executed
+        cancel_token.num_steps_to_execute = num_steps_to_execute
+
+
+def finish_step_execution() -> bool:
+    """
+    Marks the event executing on this thread as finished. Returns False if it
+    was already cancelled, in which case the worker has already told the frontend.
+    """
+    cancel_token = get_current_step_execution_cancel_token()
+    if cancel_token is None:
+        return True
+    return cancel_token.finish()
+
+
+@contextmanager
+def execute_on_steps_manager_copy(steps_manager: StepsManagerType) -> Iterator[StepsManagerType]:
+    """
+    If the event executing on this thread can be cancelled, yields a copy of the
+    steps_manager to execute the event on, and then replaces the steps_manager with
+    this copy if the event was not cancelled. Otherwise, just yields the steps_manager.
+    """
+    if get_current_step_execution_cancel_token() is None:
+        yield steps_manager
+        return
+
+    steps_manager_copy = steps_manager.copy_for_execution()
+    yield steps_manager_copy
+
+    if not finish_step_execution():
+        check_step_execution_cancelled()
+    steps_manager.update_from_execution_copy(steps_manager_copy)
+
+
+class StepExecutionWorker():
+    """
+    Executes the edit and update events sent to the MitoBackend one at a time,
+    on a thread that is not the main thread of the kernel.
+    """
+
+    def __init__(self, mito_backend: MitoWidgetType, timeout: Optional[float], heartbeat_interval: float=STEP_EXECUTION_HEARTBEAT_INTERVAL) -> None:
+        self.mito_backend = mito_backend
+        self.timeout = timeout
+        self.heartbeat_interval = heartbeat_interval
+
+        self.current_cancel_token: Optional[StepExecutionCancelToken] = None
+        # The thread executing the last event, which keeps running for a while if it was cancelled
+        self.execution_thread: Optional[threading.Thread] = None
+
+        self.queue: Queue = Queue()
+        self.thread = threading.Thread(target=self.handle_events, daemon=True)
+        self.thread.start()
+
+    def submit(self, event: Dict[str, Any], execute: bool=True) -> None:
+        """
+        Submits an event to be handled after the events before it. If execute is 
+        False, the event is not executed, and the frontend is just sent the 
+        current sheet and analysis data in response to it.
+        """
+        self.queue.put((event, execute))
+
+    def wait_until_idle(self) -> None:
+        """
+        Blocks until all the submitted events have been handled.
+        """
+        self.queue.join()
+
+    def cancel(self) -> bool:
+        """
+        Cancels the event that is currently executing. Returns True if there
+        was an event to cancel.
+        """
+        cancel_token = self.current_cancel_token
+        if cancel_token is None:
+            return False
+        return cancel_token.cancel()
+
+    def cancel_for_undo(self) -> bool:
+        """
+        Cancels the event that is currently executing if no other event is waiting to
+        execute after it, so an undo can just not apply it. Returns True if it did.
+        """
+        with self.queue.mutex:
+            if self.queue.unfinished_tasks != 1:
+                return False
+        return self.cancel()
+
+    def handle_events(self) -> NoReturn:
+        while True:
+            event, execute = self.queue.get()
+            try:
+                if execute:
+                    self.handle_event(event)
+                else:
+                    self.mito_backend.send_shared_state_variables_response(event)
+            finally:
+                self.queue.task_done()
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        # NOTE: if the last event was cancelled, it might still be executing, but it executes on 
+        # its own copy of the StepsManager, and its result is thrown away, so we do not wait for it
+        cancel_token = StepExecutionCancelToken(self.timeout)
+        self.current_cancel_token = cancel_token
+        done = threading.Event()
+
+        def execute_event() -> None:
+            with use_step_execution_cancel_token(cancel_token):
+                try:
+                    self.mito_backend.process_message(event)
+                finally:
+                    done.set()
+
+        self.execution_thread = threading.Thread(target=execute_event, daemon=True)
+        self.execution_thread.start()
+
+        while not done.wait(self.heartbeat_interval):
+            cancel_token.check_timeout()
+            if cancel_token.cancelled:
+                break
+
+            self.mito_backend.mito_send({
+                'event': 'step_execution_heartbeat',
+                'id': f'{event["id"]}_heartbeat',
+                'event_id': event['id'],
+                'data': {
+                    'elapsed_time': perf_counter() - cancel_token.start_time,
+                    'num_steps_executed': cancel_token.num_steps_executed,
+                    'num_steps_to_execute': cancel_token.num_steps_to_execute,
+                }
+            })
+
+        self.current_cancel_token = None
+        if cancel_token.cancelled:
+            # The event will not send a response once it is cancelled, so we tell the frontend
+            error = make_step_execution_cancelled_error(cancel_token.timed_out)
+            self.mito_backend.mito_send({
+                'event': 'error',
+                'id': event['id'],
+                'error': error.to_fix,
+                'errorShort': error.header,
+                'traceback': error.traceback,
+                'showErrorModal': error.error_modal
+            })
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+Accounting for all of the memory that the StepsManager holds onto, so that we can
+tell why a kernel with a Mito sheet in it is using a lot of memory.
+
+The StepsManager holds dataframes in the states of the step history, in the steps
+that can be redone, and in the step execution cache. Many of these dataframes share
+their data with each other, so we count each piece of memory only once, in the first
+place we find it. We also count the metadata of each step (e.g. the column formulas,
+the graphs, and the params), the sheet data that was last sent to the frontend, and
+the caches that make serializing, conditionally formatting and searching the sheets 
+quicker, including any column data they keep that no step still uses.
+"""
+
+import sys
+from typing import Any, Dict, List, Set, Tuple
+
+import pandas as pd
+
+from mitosheet.state import State
+from mitosheet.step import Step
+from mitosheet.step_checkpoints import (BufferKey, BufferMemoryUsageCache, get_buffer_memory_usage, 
+                                        get_cached_buffer_memory_usage, get_state_buffers, get_values_buffer_key)
+from mitosheet.types import StepsManagerType
+
+# The metadata of a state that we count towards its memory
+STATE_METADATA_ATTRIBUTES = [
+    'df_names',
+    'df_sources',
+    'column_ids',
+    'column_formulas',
+    'column_filters',
+    'df_formats',
+    'graph_data_array',
+]
+
+
+def get_object_memory_usage(obj: Any, seen_object_ids: Set[int]) -> int:
+    """
+    Returns the number of bytes used by the object and everything it contains,
+    not counting any objects in seen_object_ids, which it adds to.
+    """
+    if id(obj) in seen_object_ids:
+        return 0
+    seen_object_ids.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(sys.getsizeof(obj))
+
+    memory_usage = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            memory_usage += get_object_memory_usage(key, seen_object_ids)
+            memory_usage += get_object_memory_usage(value, seen_object_ids)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            memory_usage += get_object_memory_usage(item, seen_object_ids)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type) and not callable(obj):
+        memory_usage += get_object_memory_usage(obj.__dict__, seen_object_ids)
+    return memory_usage
+
+
+def get_step_metadata_memory_usage(step: Step, seen_object_ids: Set[int]) -> int:
+    memory_usage = get_object_memory_usage(step.params, seen_object_ids)
+    memory_usage += get_object_memory_usage(step.execution_data, seen_object_ids)
+    for state in [step.prev_state, step.post_state]:
+        if state is not None and id(state) not in seen_object_ids:
+            seen_object_ids.add(id(state))
+            for attribute in STATE_METADATA_ATTRIBUTES:
+                memory_usage += get_object_memory_usage(getattr(state, attribute), seen_object_ids)
+    return memory_usage
+
+
+def get_state_dataframe_memory_usage(
+    state: State,
+    seen_buffer_keys: Set[BufferKey],
+    buffer_memory_usage_cache: BufferMemoryUsageCache
+) -> int:
+    """
+    Returns the memory used by the dataframes in the state that is not used
+    by any dataframe that we have already counted. States whose dataframes
+    are not in memory are not rebuilt, and only use the memory their schemas 
+    still hold.
+    """
+    memory_usage = 0
+    for buffer_key, buffer_memory_usage in get_state_buffers(state, buffer_memory_usage_cache).items():
+        if buffer_key not in seen_buffer_keys:
+            seen_buffer_keys.add(buffer_key)
+            memory_usage += buffer_memory_usage
+    return memory_usage
+
+
+def get_cached_data_memory_usage(
+    data: Any,
+    seen_buffer_keys: Set[BufferKey],
+    buffer_memory_usage_cache: BufferMemoryUsageCache
+) -> int:
+    """
+    Returns the memory used by the data of a column or index that a cache keeps,
+    if it is not used by any dataframe that we have already counted.
+    """
+    if isinstance(data, pd.Index):
+        buffer_key: BufferKey = ('index', id(data))
+        owner = data
+        get_memory_usage = lambda: int(data.memory_usage(deep=True))
+    else:
+        buffer_key, owner = get_values_buffer_key(data)
+        get_memory_usage = lambda: get_buffer_memory_usage(pd.Series(data, copy=False))
+
+    if buffer_key in seen_buffer_keys:
+        return 0
+    seen_buffer_keys.add(buffer_key)
+    return get_cached_buffer_memory_usage(buffer_memory_usage_cache, buffer_key, owner, get_memory_usage)
+
+
+def get_caches_memory_usage(
+    steps_manager: StepsManagerType,
+    seen_buffer_keys: Set[BufferKey],
+    seen_object_ids: Set[int],
+    buffer_memory_usage_cache: BufferMemoryUsageCache
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Returns the memory used by the column data that each cache keeps, and by 
+    the rest of what it keeps, for each of the caches.
+    """
+    sheet_data_cache_data_memory_usage = 0
+    sheet_data_cache_metadata_memory_usage = 0
+    for _, column_values, serialized_column_data in steps_manager.sheet_data_column_cache.entries.values():
+        sheet_data_cache_data_memory_usage += get_cached_data_memory_usage(column_values, seen_buffer_keys, buffer_memory_usage_cache)
+        sheet_data_cache_metadata_memory_usage += get_object_memory_usage(serialized_column_data, seen_object_ids)
+    sheet_data_cache_metadata_memory_usage += get_object_memory_usage(steps_manager.sheet_data_buffer_cache.entries, seen_object_ids)
+
+    conditional_formatting_cache_data_memory_usage = 0
+    conditional_formatting_cache_metadata_memory_usage = 0
+    for _, kept_data, result in steps_manager.conditional_formatting_cache.entries.values():
+        for data in kept_data:
+            conditional_formatting_cache_data_memory_usage += get_cached_data_memory_usage(data, seen_buffer_keys, buffer_memory_usage_cache)
+        conditional_formatting_cache_metadata_memory_usage += get_object_memory_usage(result, seen_object_ids)
+
+    return {
+        'sheet_data_cache_memory_usage': (sheet_data_cache_data_memory_usage, sheet_data_cache_metadata_memory_usage),
+        'conditional_formatting_cache_memory_usage': (conditional_formatting_cache_data_memory_usage, conditional_formatting_cache_metadata_memory_usage),
+        # The search column cache does not keep any column data
+        'search_column_cache_memory_usage': (0, steps_manager.search_column_cache.num_bytes),
+    }
+
+
+def get_steps_memory_usage(
+    steps: List[Step],
+    seen_buffer_keys: Set[BufferKey],
+    seen_object_ids: Set[int],
+    buffer_memory_usage_cache: BufferMemoryUsageCache
+) -> List[Dict[str, Any]]:
+    step_reports = []
+    for step_index, step in enumerate(steps):
+        dataframe_memory_usage = 0
+        for state in [step.prev_state, step.post_state]:
+            if state is not None:
+                dataframe_memory_usage += get_state_dataframe_memory_usage(state, seen_buffer_keys, buffer_memory_usage_cache)
+        metadata_memory_usage = get_step_metadata_memory_usage(step, seen_object_ids)
+
+        step_reports.append({
+            'step_idx': step_index,
+            'step_id': step.step_id,
+            'step_type': step.step_type,
+            'in_memory': step.post_state is not None and not step.post_state.dfs_evicted,
+            'dataframe_memory_usage': dataframe_memory_usage,
+            'metadata_memory_usage': metadata_memory_usage,
+            'memory_usage': dataframe_memory_usage + metadata_memory_usage,
+        })
+    return step_reports
+
+
+def get_steps_manager_memory_usage(steps_manager: StepsManagerType) -> Dict[str, Any]:
+    """
+    Returns the total memory used by the StepsManager, and how much of it is used
+    by each step in the step history, by the steps that can be redone, by the step
+    execution cache, by the sheet data last sent to the frontend, and by the caches
+    of the sheet data, the conditional formatting results, and the searched columns.
+    """
+    buffer_memory_usage_cache: BufferMemoryUsageCache = steps_manager.buffer_memory_usage_cache
+    seen_buffer_keys: Set[BufferKey] = set()
+    seen_object_ids: Set[int] = set()
+
+    step_reports = get_steps_memory_usage(
+        steps_manager.steps_including_skipped, seen_buffer_keys, seen_object_ids, buffer_memory_usage_cache
+    )
+
+    undone_steps: List[Step] = [step for _, step_list in steps_manager.undone_step_list_store for step in step_list]
+    undone_step_reports = get_steps_memory_usage(undone_steps, seen_buffer_keys, seen_object_ids, buffer_memory_usage_cache)
+
+    cached_steps: List[Step] = []
+    if steps_manager.step_execution_cache is not None:
+        cached_steps = list(steps_manager.step_execution_cache.entries.values())
+    cached_step_reports = get_steps_memory_usage(cached_steps, seen_buffer_keys, seen_object_ids, buffer_memory_usage_cache)
+
+    sheet_data_memory_usage = get_object_memory_usage(steps_manager.saved_sheet_data, seen_object_ids)
+
+    caches_memory_usage = get_caches_memory_usage(steps_manager, seen_buffer_keys, seen_object_ids, buffer_memory_usage_cache)
+    caches_data_memory_usage = sum(data_memory_usage for data_memory_usage, _ in caches_memory_usage.values())
+    caches_metadata_memory_usage = sum(metadata_memory_usage for _, metadata_memory_usage in caches_memory_usage.values())
+
+    # Only keep the memory usage of buffers that still exist, so the cache does not grow forever
+    for buffer_key in list(buffer_memory_usage_cache.keys()):
+        if buffer_key not in seen_buffer_keys:
+            del buffer_memory_usage_cache[buffer_key]
+
+    step_history_memory_usage = sum(step_report['memory_usage'] for step_report in step_reports)
+    undone_steps_memory_usage = sum(step_report['memory_usage'] for step_report in undone_step_reports)
+    step_cache_memory_usage = sum(step_report['memory_usage'] for step_report in cached_step_reports)
+    all_step_reports = step_reports + undone_step_reports + cached_step_reports
+
+    return {
+        'total_memory_usage': (
+            step_history_memory_usage + undone_steps_memory_usage + step_cache_memory_usage + sheet_data_memory_usage
+            + caches_data_memory_usage + caches_metadata_memory_usage
+        ),
+        'dataframe_memory_usage': sum(step_report['dataframe_memory_usage'] for step_report in all_step_reports) + caches_data_memory_usage,
+        'metadata_memory_usage': sum(step_report['metadata_memory_usage'] for step_report in all_step_reports) + sheet_data_memory_usage + caches_metadata_memory_usage,
+        'step_history_memory_usage': step_history_memory_usage,
+        'undone_steps_memory_usage': undone_steps_memory_usage,
+        'step_cache_memory_usage': step_cache_memory_usage,
+        'sheet_data_memory_usage': sheet_data_memory_usage,
+        **{
+            cache_name: data_memory_usage + metadata_memory_usage 
+            for cache_name, (data_memory_usage, metadata_memory_usage) in caches_memory_usage.items()
+        },
+        'steps': step_reports,
+    }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+When the step list is rerun (e.g. after a step in the middle of it becomes skipped,
+or when replaying an analysis), steps on different sheets are often independent of
+each other: a formula on df1 does not care about the filters on df2.
+
+This file contains the utilities for executing runs of such steps in parallel. Each
+sheet's chain of steps is executed on its own thread, starting from the same state,
+and then the results are merged back into a single chain of states in the original
+step order, so the result is the same as executing the steps one at a time.
+
+NOTE: we use threads rather than processes, as the states hold dataframes that would
+be expensive to send to another process. Much of the time spent in pandas releases
+the GIL, so threads still give a speedup for large dataframes.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from typing import Dict, List, Optional, Tuple
+
+from mitosheet.state import State
+from mitosheet.step import Step
+from mitosheet.step_dependencies import get_step_modified_sheet_indexes, reuse_step_execution
+
+
+def get_step_parallel_sheet_index(step: Step) -> Optional[int]:
+    """
+    Returns the sheet index that the step reads and modifies, if it only reads
+    and modifies a single sheet, and so can be executed in parallel with steps
+    on other sheets. Otherwise, returns None.
+    """
+    read_sheet_indexes = step.step_performer.get_read_dataframe_indexes(step.params)
+    modified_sheet_indexes = get_step_modified_sheet_indexes(step)
+    if read_sheet_indexes is None or modified_sheet_indexes is None:
+        return None
+    if len(read_sheet_indexes) != 1 or read_sheet_indexes != modified_sheet_indexes:
+        return None
+    return next(iter(read_sheet_indexes))
+
+
+def execute_sheet_step_chain(
+    steps: List[Tuple[int, Step]], prev_state: State, previous_steps: List[Step]
+) -> Tuple[List[Tuple[int, Step]], Optional[Tuple[int, Exception]]]:
+    """
+    Executes the steps one after another, starting from prev_state. Returns the
+    executed steps, and the position and error of the step that failed, if any
+    step failed. The steps after the failed step are not executed.
+    """
+    previous_steps = copy(previous_steps)
+    executed_steps: List[Tuple[int, Step]] = []
+    for position, step in steps:
+        new_step = Step(step.step_type, step.step_id, step.params)
+        try:
+            new_step.set_prev_state_and_execute(prev_state, previous_steps)
+        except Exception as e:
+            return executed_steps, (position, e)
+
+        prev_state = new_step.final_defined_state
+        previous_steps.append(new_step)
+        executed_steps.append((position, new_step))
+    return executed_steps, None
+
+
+def execute_steps_in_parallel(
+    steps: List[Step], prev_state: State, previous_steps: List[Step], max_workers: int
+) -> List[Step]:
+    """
+    Executes the steps starting from prev_state, executing the steps on each sheet
+    in parallel, and returns the new executed steps in the same order as the steps.
+
+    If any step fails, raises the error of the first step that fails, once all the
+    sheets are done executing, so that none of the new steps are used.
+
+    NOTE: only call this with steps that get_step_parallel_sheet_index returns a
+    sheet index for.
+    """
+    # Make sure the dataframes are not rebuilt by each of the threads, if the state was evicted
+    prev_state.dfs
+
+    sheet_indexes: List[int] = []
+    steps_by_sheet_index: Dict[int, List[Tuple[int, Step]]] = {}
+    for position, step in enumerate(steps):
+        sheet_index: int = get_step_parallel_sheet_index(step) # type: ignore
+        sheet_indexes.append(sheet_index)
+        steps_by_sheet_index.setdefault(sheet_index, []).append((position, step))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(steps_by_sheet_index))) as executor:
+        futures = [
+            executor.submit(execute_sheet_step_chain, sheet_steps, prev_state, previous_steps)
+            for sheet_steps in steps_by_sheet_index.values()
+        ]
+        results = [future.result() for future in futures]
+
+    errors = [error for _, error in results if error is not None]
+    if len(errors) > 0:
+        raise min(errors, key=lambda error: error[0])[1]
+
+    executed_steps: Dict[int, Step] = {}
+    for sheet_executed_steps, _ in results:
+        executed_steps.update(sheet_executed_steps)
+
+    # Merge the results of each sheet into a single chain of states, in step order
+    new_steps = []
+    for position, sheet_index in enumerate(sheet_indexes):
+        executed_step = executed_steps[position]
+        new_step = Step(executed_step.step_type, executed_step.step_id, executed_step.params)
+        reuse_step_execution(new_step, executed_step, prev_state, {sheet_index})
+        # The step was really executed, just on another thread
+        new_step.profile = executed_step.profile
+        prev_state = new_step.final_defined_state
+        new_steps.append(new_step)
+
+    return new_steps
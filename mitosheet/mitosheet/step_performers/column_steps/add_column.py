@@ -12,6 +12,7 @@ from mitosheet.column_headers import get_column_header_id
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
+from mitosheet.types import ColumnEffects, ColumnID
 
 
 class AddColumnStepPerformer(StepPerformer):
@@ -71,4 +72,21 @@ class AddColumnStepPerformer(StepPerformer):
 
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
-        return {get_param(params, 'sheet_index')}
\ No newline at end of file
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        # This step does not write to the data of any existing column
+        return set()
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        # This step only adds a column
+        return {
+            'modified_column_ids': set(),
+            'renamed_column_ids': {}
+        }
@@ -14,7 +14,7 @@ from mitosheet.public.v1.sheet_functions.types.utils import \
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
-from mitosheet.types import ColumnID, StepType
+from mitosheet.types import ColumnEffects, ColumnID, StepType
 
 
 class ChangeColumnDtypeStepPerformer(StepPerformer):
@@ -106,4 +106,19 @@ class ChangeColumnDtypeStepPerformer(StepPerformer):
 
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
-        return {get_param(params, 'sheet_index')}
\ No newline at end of file
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        return set(get_param(params, 'column_ids'))
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        return {
+            'modified_column_ids': set(get_param(params, 'column_ids')),
+            'renamed_column_ids': {}
+        }
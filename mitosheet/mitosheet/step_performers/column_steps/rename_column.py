@@ -14,6 +14,7 @@ from mitosheet.errors import make_column_exists_error
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
+from mitosheet.types import ColumnEffects, ColumnID
 
 
 class RenameColumnStepPerformer(StepPerformer):
@@ -78,4 +79,27 @@ class RenameColumnStepPerformer(StepPerformer):
     
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
-        return {get_param(params, 'sheet_index')}
\ No newline at end of file
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        # This step does not write to the data of any existing column
+        return set()
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        # If the new column header is an empty string, it's a noop
+        if params['new_column_header'] == '':
+            return {
+                'modified_column_ids': set(),
+                'renamed_column_ids': {}
+            }
+
+        return {
+            'modified_column_ids': set(),
+            'renamed_column_ids': get_param(execution_data, 'column_ids_to_new_column_headers')
+        }
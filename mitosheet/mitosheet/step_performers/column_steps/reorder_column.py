@@ -13,6 +13,7 @@ from mitosheet.code_chunks.step_performers.column_steps.reorder_column_code_chun
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
+from mitosheet.types import ColumnID
 
 
 def get_valid_index(dfs: List[pd.DataFrame], sheet_index: int, new_column_index: int) -> int:
@@ -58,4 +59,13 @@ class ReorderColumnStepPerformer(StepPerformer):
     
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
-        return {get_param(params, 'sheet_index')}
\ No newline at end of file
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        # This step does not write to the data of any existing column
+        return set()
@@ -19,7 +19,7 @@ from mitosheet.parser import get_frontend_formula, parse_formula
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
-from mitosheet.types import FORMULA_ENTIRE_COLUMN_TYPE, ColumnHeader, ColumnID, FormulaAppliedToType, StepType
+from mitosheet.types import FORMULA_ENTIRE_COLUMN_TYPE, ColumnEffects, ColumnHeader, ColumnID, FormulaAppliedToType, StepType
 
 
 
@@ -180,6 +180,24 @@ class SetColumnFormulaStepPerformer(StepPerformer):
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
         return {get_param(params, 'sheet_index')}
 
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        # Cross-sheet references (e.g. in a VLOOKUP) read other sheets
+        if '!' in str(params.get('new_formula', '')):
+            return None
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        return {get_param(params, 'column_id')}
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        return {
+            'modified_column_ids': {get_param(params, 'column_id')},
+            'renamed_column_ids': {}
+        }
+
 
 def _get_fixed_invalid_formula(
         new_formula: str, 
@@ -12,7 +12,7 @@ from mitosheet.is_type_utils import is_datetime_dtype, is_timedelta_dtype
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
-from mitosheet.types import ColumnHeader, ColumnID
+from mitosheet.types import ColumnEffects, ColumnHeader, ColumnID
 
 
 class SplitTextToColumnsStepPerformer(StepPerformer):
@@ -96,3 +96,15 @@ class SplitTextToColumnsStepPerformer(StepPerformer):
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
         return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        # This step only adds new columns, and does not change the column that is split
+        return {
+            'modified_column_ids': set(),
+            'renamed_column_ids': {}
+        }
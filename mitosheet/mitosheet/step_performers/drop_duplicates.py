@@ -10,6 +10,7 @@ from mitosheet.code_chunks.step_performers.drop_duplicates_code_chunk import Dro
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
+from mitosheet.types import ColumnEffects
 
 
 class DropDuplicatesStepPerformer(StepPerformer):
@@ -59,3 +60,15 @@ class DropDuplicatesStepPerformer(StepPerformer):
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
         return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        # This step only removes rows
+        return {
+            'modified_column_ids': set(),
+            'renamed_column_ids': {}
+        }
@@ -15,7 +15,7 @@ from mitosheet.code_chunks.code_chunk import CodeChunk
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
-from mitosheet.types import ColumnHeader, ColumnID, Filter, FilterGroup, OperatorType, StepType
+from mitosheet.types import ColumnEffects, ColumnHeader, ColumnID, Filter, FilterGroup, OperatorType, StepType
 from mitosheet.types import (
     FC_BOOLEAN_IS_FALSE, FC_BOOLEAN_IS_TRUE, FC_DATETIME_EXACTLY,
     FC_DATETIME_GREATER, FC_DATETIME_GREATER_THAN_OR_EQUAL, FC_DATETIME_LESS,
@@ -116,6 +116,18 @@ class FilterStepPerformer(StepPerformer):
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
         return {get_param(params, 'sheet_index')}
 
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        # This step only removes rows
+        return {
+            'modified_column_ids': set(),
+            'renamed_column_ids': {}
+        }
+
 
 def get_applied_filter(
     df: pd.DataFrame, column_header: ColumnHeader, filter_: Filter
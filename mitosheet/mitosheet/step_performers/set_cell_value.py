@@ -18,7 +18,7 @@ from mitosheet.public.v1.sheet_functions.types import \
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
-from mitosheet.types import ColumnID, StepType
+from mitosheet.types import ColumnEffects, ColumnID, StepType
 
 
 class SetCellValueStepPerformer(StepPerformer):
@@ -107,6 +107,21 @@ class SetCellValueStepPerformer(StepPerformer):
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
         return {get_param(params, 'sheet_index')}
 
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        return {get_param(params, 'column_id')}
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        return {
+            'modified_column_ids': {get_param(params, 'column_id')},
+            'renamed_column_ids': {}
+        }
+
 
 def cast_value_to_type(value: Union[str, None], column_dtype: str) -> Optional[Any]:
     """
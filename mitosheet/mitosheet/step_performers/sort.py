@@ -12,7 +12,7 @@ from mitosheet.errors import make_invalid_sort_error
 from mitosheet.state import State
 from mitosheet.step_performers.step_performer import StepPerformer
 from mitosheet.step_performers.utils.utils import get_param
-from mitosheet.types import ColumnID
+from mitosheet.types import ColumnEffects, ColumnID
 
 # CONSTANTS USED IN THE SORT STEP ITSELF
 SORT_DIRECTION_ASCENDING = 'ascending'
@@ -70,3 +70,15 @@ class SortStepPerformer(StepPerformer):
     @classmethod
     def get_modified_dataframe_indexes(cls, params: Dict[str, Any]) -> Set[int]:
         return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        return {get_param(params, 'sheet_index')}
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        # This step only reorders rows
+        return {
+            'modified_column_ids': set(),
+            'renamed_column_ids': {}
+        }
@@ -9,8 +9,9 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 
 from mitosheet.code_chunks.code_chunk import CodeChunk
 from mitosheet.state import State
-from mitosheet.transpiler.transpile_utils import get_globals_for_exec
-from mitosheet.types import (ColumnHeader, ColumnID,
+from mitosheet.step_profiling import get_current_step_profile, time_step_profile_section
+from mitosheet.transpiler.transpile_utils import get_compiled_code, get_globals_for_exec
+from mitosheet.types import (ColumnEffects, ColumnHeader, ColumnID,
                              ExecuteThroughTranspileNewDataframeParams, StepType)
 
 
@@ -136,31 +137,39 @@ class StepPerformer(ABC, object):
         if modified_dataframe_indexes == {-1}:
             modified_dataframe_indexes = set()
 
-        post_state = prev_state.copy(deep_sheet_indexes=modified_dataframe_indexes)
+        # If the step tells us exactly which columns it writes to, we only deep copy
+        # those columns, and share the rest of the columns with the previous state
+        deep_column_ids = None
+        modified_column_ids = cls.get_modified_column_ids(params)
+        if modified_column_ids is not None and len(modified_dataframe_indexes) == 1:
+            deep_column_ids = {sheet_index: modified_column_ids for sheet_index in modified_dataframe_indexes}
 
-        code_chunks = cls.transpile(post_state, params, execution_data)
-        code = []
-        for chunk in code_chunks:
-            _code, imports = chunk.get_code()
-            code.extend(imports)
-            code.extend(_code)
+        post_state = prev_state.copy(deep_sheet_indexes=modified_dataframe_indexes, deep_column_ids=deep_column_ids)
 
-        final_code = "\n".join(code)
+        with time_step_profile_section('transpile_time'):
+            code_chunks = cls.transpile(post_state, params, execution_data)
+            code = []
+            for chunk in code_chunks:
+                _code, imports = chunk.get_code()
+                code.extend(imports)
+                code.extend(_code)
 
-        # TODO: this is weird. This will not always be updated, accoring to exec documentation, 
-        # but in practice is seems to work...
+            final_code = "\n".join(code)
+
+        # NOTE: we exec the code with a single namespace, just like a notebook cell, so 
+        # the variables the code defines are also available to functions it defines
         exec_globals = get_globals_for_exec(post_state, post_state.public_interface_version)
-        exec_locals = {**exec_globals}
+        exec_locals = exec_globals
         
         pandas_start_time = perf_counter()
-        exec(final_code, exec_globals, exec_locals)
+        exec(get_compiled_code(final_code), exec_globals, exec_locals)
 
         # Go through the optional code lines
         optional_code_that_successfully_executed: Tuple[List[str], List[str]] = ([], [])
         if optional_code is not None:
             for optional_import in optional_code[1]:
                 try:
-                    exec(optional_import, exec_globals, exec_locals)
+                    exec(get_compiled_code(optional_import), exec_globals, exec_locals)
                     optional_code_that_successfully_executed = (
                         optional_code_that_successfully_executed[0],
                         optional_code_that_successfully_executed[1] + [optional_import],
@@ -183,7 +192,7 @@ class StepPerformer(ABC, object):
                 # but it's fine for now -- since partial updates don't seem to 
                 # manifest in practice
                 try:
-                    exec(optional_code_line, exec_globals, exec_locals)
+                    exec(get_compiled_code(optional_code_line), exec_globals, exec_locals)
                     optional_code_that_successfully_executed = (
                         optional_code_that_successfully_executed[0] + non_code_lines_before_optional_line + [optional_code_line],
                         optional_code_that_successfully_executed[1],
@@ -194,18 +203,46 @@ class StepPerformer(ABC, object):
 
 
         pandas_processing_time = perf_counter() - pandas_start_time
+        profile = get_current_step_profile()
+        if profile is not None:
+            profile['exec_time'] += pandas_processing_time
+
+        recon_start_time = perf_counter()
+        # If the step tells us which columns it modifies and renames, then recon can trust
+        # this rather than comparing the data in the old and new dataframes
+        column_effects = cls.get_column_effects(params, execution_data) if len(modified_dataframe_indexes) == 1 else None
 
         for modified_dataframe_index in modified_dataframe_indexes:
             df_name = prev_state.df_names[modified_dataframe_index]
             new_df = exec_locals[df_name]
+
+            modified_column_headers = None
+            renamed_column_headers = None
+            if column_effects is not None:
+                try:
+                    modified_column_headers = prev_state.column_ids.get_column_headers_by_ids(modified_dataframe_index, list(column_effects['modified_column_ids']))
+                    renamed_column_headers = {
+                        prev_state.column_ids.get_column_header_by_id(modified_dataframe_index, column_id): new_column_header
+                        for column_id, new_column_header in column_effects['renamed_column_ids'].items()
+                    }
+                except KeyError:
+                    # If the step declares columns that do not exist, we fall back to comparing the dataframes
+                    modified_column_headers = None
+                    renamed_column_headers = None
+
             post_state, _ = update_state_by_reconing_dataframes(
                 post_state, 
                 modified_dataframe_index, 
                 prev_state.dfs[modified_dataframe_index],
                 new_df, 
-                column_headers_to_column_ids=column_headers_to_column_ids
+                column_headers_to_column_ids=column_headers_to_column_ids,
+                modified_column_headers=modified_column_headers,
+                renamed_column_headers=renamed_column_headers
             )
 
+        if profile is not None:
+            profile['recon_time'] += perf_counter() - recon_start_time
+
         if new_dataframe_params:
             for new_df_name in new_dataframe_params['new_df_names']:
                 df_source = new_dataframe_params['df_source']
@@ -239,4 +276,52 @@ class StepPerformer(ABC, object):
         If it returned -1, then it modified all new dataframes (on
         the left side of the dfs array).
         """
-        pass
\ No newline at end of file
+        pass
+
+    @classmethod
+    def get_modified_column_ids(cls, params: Dict[str, Any]) -> Optional[Set[ColumnID]]:
+        """
+        Returns the set of column ids in the modified dataframe whose data this 
+        step might write to in place. When this is defined, only these columns
+        are deep copied before the step executes, and the rest share their data
+        with the previous state.
+
+        Adding, deleting, renaming and reordering columns do not write to the data 
+        of any existing column, and so do not need to be included.
+
+        Only used for steps that modify a single dataframe. If it returns None, then 
+        the step might write to any column, and the whole dataframe is deep copied.
+
+        NOTE: a step must never write in place to a column it does not return, as this
+        changes the previous steps, and the caches of the sheet data (see get_column_version) 
+        would not see the change. So if the code of a step can touch the whole dataframe, 
+        either return None or make sure every column is returned when it does.
+        """
+        return None
+
+    @classmethod
+    def get_column_effects(cls, params: Dict[str, Any], execution_data: Dict[str, Any]) -> Optional[ColumnEffects]:
+        """
+        Returns the column ids whose values this step changes, and the column ids that 
+        this step renames, in the dataframe it modifies. Removing or reordering rows does 
+        not change the values of a column, and added and deleted columns are found by 
+        comparing the column headers, so none of these need to be included.
+
+        When this is defined, recon trusts it rather than comparing the data in the old 
+        and new dataframe, which is the slowest part of recon for large dataframes.
+
+        Only used for steps that modify a single dataframe. If it returns None, then
+        recon compares every column in the old and new dataframe.
+        """
+        return None
+
+    @classmethod
+    def get_read_dataframe_indexes(cls, params: Dict[str, Any]) -> Optional[Set[int]]:
+        """
+        Returns the set of sheet indexes whose data this step might read. 
+
+        Steps that only read and modify a single sheet can be executed in parallel 
+        with steps on other sheets. If it returns None, then the step might read 
+        any sheet (or other state, like the names of the other dataframes).
+        """
+        return None
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+To find the expensive steps in an analysis without attaching a profiler, each
+executed step records a StepProfile: how long it took to saturate, transpile, exec
+and recon the step, how long it took to serialize the sheet data after the step,
+how many bytes of dataframe data were copied by State.copy, and how much memory
+the resulting dataframes take up.
+
+The step that is currently executing is tracked per thread, so that the functions
+deep inside execution (e.g. State.copy or execute_through_transpile) can record
+into its profile without it being passed through every call.
+"""
+
+from contextlib import contextmanager
+import threading
+from time import perf_counter
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from mitosheet.types import StepProfile
+
+STEP_PROFILE_TIME_KEYS = [
+    'saturate_time',
+    'transpile_time',
+    'exec_time',
+    'recon_time',
+    'execute_time',
+    'serialization_time',
+]
+
+# The profile of the step currently executing on this thread
+_current_step_profile = threading.local()
+
+
+def get_empty_step_profile(step_id: str, step_type: str) -> StepProfile:
+    return {
+        'step_id': step_id,
+        'step_type': step_type,
+        'saturate_time': 0,
+        'transpile_time': 0,
+        'exec_time': 0,
+        'recon_time': 0,
+        'execute_time': 0,
+        'serialization_time': 0,
+        'bytes_copied': 0,
+        'frame_memory_bytes': 0,
+        'reused_execution': False
+    }
+
+
+def get_current_step_profile() -> Optional[StepProfile]:
+    return getattr(_current_step_profile, 'profile', None)
+
+
+@contextmanager
+def record_step_profile(profile: StepProfile) -> Iterator[StepProfile]:
+    """
+    Inside this context, the timings and copies on this thread are recorded
+    into the passed profile.
+    """
+    previous_profile = get_current_step_profile()
+    _current_step_profile.profile = profile
+    try:
+        yield profile
+    finally:
+        _current_step_profile.profile = previous_profile
+
+
+@contextmanager
+def time_step_profile_section(time_key: str, profile: Optional[StepProfile]=None) -> Iterator[None]:
+    """
+    Adds the time spent inside this context to the time_key of the profile,
+    which defaults to the profile of the step currently executing.
+    """
+    if profile is None:
+        profile = get_current_step_profile()
+
+    start_time = perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile[time_key] += perf_counter() - start_time # type: ignore
+
+
+def record_bytes_copied(bytes_copied: int) -> None:
+    profile = get_current_step_profile()
+    if profile is not None:
+        profile['bytes_copied'] += bytes_copied
+
+
+def get_dataframe_memory_bytes(df: pd.DataFrame) -> int:
+    """
+    Returns the memory taken up by the dataframe, not including the memory of
+    the objects in object columns, as finding this requires looking at every value.
+    """
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+def get_frame_memory_bytes(dfs: List[pd.DataFrame]) -> int:
+    return sum(get_dataframe_memory_bytes(df) for df in dfs)
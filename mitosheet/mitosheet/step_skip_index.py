@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+A step can skip the steps before it (see Step.step_indexes_to_skip). Finding all the
+skipped steps by checking every step against every step before it is quadratic in
+the number of steps, which dominates the time it takes to handle an edit in long
+analyses (e.g. thousands of set cell value steps).
+
+Instead, the StepsManager keeps a StepSkipIndex that is updated as steps are added,
+undone or reset. It indexes steps by the keys that decide which steps they skip, so
+adding or removing a step only takes constant time.
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from mitosheet.step import Step
+from mitosheet.step_performers.column_steps.set_column_formula import SetColumnFormulaStepPerformer
+from mitosheet.step_performers.filter import FilterStepPerformer
+from mitosheet.types import FORMULA_ENTIRE_COLUMN_TYPE, FORMULA_SPECIFIC_INDEX_LABELS_TYPE
+
+# The (step_type, step_id, filter key, formula key) of a step, which decide which steps it skips
+StepSkipKey = Tuple[str, str, Optional[Tuple[Any, Any]], Optional[Tuple[Any, ...]]]
+
+
+def get_step_skip_key(step: Step) -> StepSkipKey:
+    """
+    Returns the key of the step that decides which steps it skips. Keep this in
+    sync with Step.step_indexes_to_skip. A step skips:
+    1. Filter steps before it with the same filter key, if it is a filter step
+    2. Steps before it with the same step_id, except for filter steps if it is 
+       a filter step, as these are only skipped if they have the same filter key
+    3. The step just before it, if they have the same (non-None) formula key
+    """
+    filter_key = None
+    if step.step_type == FilterStepPerformer.step_type():
+        filter_key = (step.params['sheet_index'], step.params['column_id'])
+
+    formula_key = None
+    if step.step_type == SetColumnFormulaStepPerformer.step_type():
+        index_labels_formula_is_applied_to = step.params['index_labels_formula_is_applied_to']
+        if index_labels_formula_is_applied_to['type'] == FORMULA_ENTIRE_COLUMN_TYPE:
+            formula_key = (step.params['sheet_index'], step.params['column_id'], FORMULA_ENTIRE_COLUMN_TYPE, None)
+        elif index_labels_formula_is_applied_to['type'] == FORMULA_SPECIFIC_INDEX_LABELS_TYPE:
+            formula_key = (step.params['sheet_index'], step.params['column_id'], FORMULA_SPECIFIC_INDEX_LABELS_TYPE, list(index_labels_formula_is_applied_to['index_labels']))
+
+    return (step.step_type, step.step_id, filter_key, formula_key)
+
+
+class StepSkipIndex():
+    """
+    Keeps track of which steps are skipped in a list of steps, and updates
+    this as the list of steps changes.
+
+    As a step with a given step_id (or filter key) skips all steps before it with
+    the same key, it is mostly enough for each step to skip the last step with the 
+    same key, as that step skips all the others. So we only need to store a stack 
+    of the steps with each key, and a count of how many steps skip each step.
+
+    The exception is that filter steps do not skip filter steps with the same step_id
+    (but a different filter key), so a step that is not a filter step also skips the 
+    filter steps with its step_id after the last step with its step_id that is not.
+    """
+
+    def __init__(self) -> None:
+        self.steps: List[Step] = []
+        self.step_skip_keys: List[StepSkipKey] = []
+        # For each step, the indexes of the steps it skips
+        self.skipped_indexes_by_step: List[List[int]] = []
+        # For each skipped step index, the number of steps that skip it
+        self.skip_counts: Dict[int, int] = {}
+
+        self.non_filter_step_indexes_by_step_id: Dict[str, List[int]] = {}
+        self.filter_step_indexes_by_step_id: Dict[str, List[int]] = {}
+        self.filter_step_indexes_by_filter_key: Dict[Tuple[Any, Any], List[int]] = {}
+
+    def copy(self) -> "StepSkipIndex":
+        step_skip_index_copy = StepSkipIndex()
+        step_skip_index_copy.steps = self.steps.copy()
+        step_skip_index_copy.step_skip_keys = self.step_skip_keys.copy()
+        step_skip_index_copy.skipped_indexes_by_step = [skipped_indexes.copy() for skipped_indexes in self.skipped_indexes_by_step]
+        step_skip_index_copy.skip_counts = self.skip_counts.copy()
+
+        step_skip_index_copy.non_filter_step_indexes_by_step_id = {key: value.copy() for key, value in self.non_filter_step_indexes_by_step_id.items()}
+        step_skip_index_copy.filter_step_indexes_by_step_id = {key: value.copy() for key, value in self.filter_step_indexes_by_step_id.items()}
+        step_skip_index_copy.filter_step_indexes_by_filter_key = {key: value.copy() for key, value in self.filter_step_indexes_by_filter_key.items()}
+        return step_skip_index_copy
+
+    def update(self, steps: List[Step]) -> None:
+        """
+        Updates the index to the given steps. This only reindexes the steps
+        after the last step the given steps have in common with the indexed
+        steps, so appending or undoing a step is cheap.
+        """
+        num_common_steps = 0
+        max_num_common_steps = min(len(self.steps), len(steps))
+        while num_common_steps < max_num_common_steps:
+            step = steps[num_common_steps]
+            if step is not self.steps[num_common_steps]:
+                # Reexecuted steps are new objects with the same params, so we compare keys
+                if get_step_skip_key(step) != self.step_skip_keys[num_common_steps]:
+                    break
+                self.steps[num_common_steps] = step
+            num_common_steps += 1
+
+        while len(self.steps) > num_common_steps:
+            self._pop_step()
+
+        for step in steps[num_common_steps:]:
+            self._append_step(step)
+
+    def get_step_indexes_to_skip(self, num_steps: Optional[int]=None) -> Set[int]:
+        """
+        Returns the indexes of the skipped steps. If num_steps is passed, only
+        returns the steps skipped by the first num_steps steps.
+        """
+        if num_steps is None or num_steps >= len(self.steps):
+            return set(self.skip_counts.keys())
+
+        step_indexes_to_skip: Set[int] = set()
+        for skipped_indexes in self.skipped_indexes_by_step[:num_steps]:
+            step_indexes_to_skip.update(skipped_indexes)
+        return step_indexes_to_skip
+
+    def _append_step(self, step: Step) -> None:
+        step_index = len(self.steps)
+        step_skip_key = get_step_skip_key(step)
+        (_, step_id, filter_key, formula_key) = step_skip_key
+
+        skipped_indexes = []
+
+        non_filter_step_indexes_with_step_id = self.non_filter_step_indexes_by_step_id.setdefault(step_id, [])
+        last_non_filter_step_index_with_step_id = non_filter_step_indexes_with_step_id[-1] if len(non_filter_step_indexes_with_step_id) > 0 else -1
+        if last_non_filter_step_index_with_step_id >= 0:
+            skipped_indexes.append(last_non_filter_step_index_with_step_id)
+
+        if filter_key is None:
+            filter_step_indexes_with_step_id = self.filter_step_indexes_by_step_id.get(step_id, [])
+            for filter_step_index in reversed(filter_step_indexes_with_step_id):
+                if filter_step_index < last_non_filter_step_index_with_step_id:
+                    break
+                skipped_indexes.append(filter_step_index)
+            non_filter_step_indexes_with_step_id.append(step_index)
+        else:
+            self.filter_step_indexes_by_step_id.setdefault(step_id, []).append(step_index)
+            step_indexes_with_filter_key = self.filter_step_indexes_by_filter_key.setdefault(filter_key, [])
+            if len(step_indexes_with_filter_key) > 0:
+                skipped_indexes.append(step_indexes_with_filter_key[-1])
+            step_indexes_with_filter_key.append(step_index)
+
+        if formula_key is not None and step_index > 0 and self.step_skip_keys[step_index - 1][3] == formula_key:
+            skipped_indexes.append(step_index - 1)
+
+        for skipped_index in skipped_indexes:
+            self.skip_counts[skipped_index] = self.skip_counts.get(skipped_index, 0) + 1
+
+        self.steps.append(step)
+        self.step_skip_keys.append(step_skip_key)
+        self.skipped_indexes_by_step.append(skipped_indexes)
+
+    def _pop_step(self) -> None:
+        self.steps.pop()
+        (_, step_id, filter_key, _) = self.step_skip_keys.pop()
+
+        if filter_key is None:
+            self.non_filter_step_indexes_by_step_id[step_id].pop()
+        else:
+            self.filter_step_indexes_by_step_id[step_id].pop()
+            if len(self.filter_step_indexes_by_step_id[step_id]) == 0:
+                del self.filter_step_indexes_by_step_id[step_id]
+
+        if len(self.non_filter_step_indexes_by_step_id[step_id]) == 0:
+            del self.non_filter_step_indexes_by_step_id[step_id]
+
+        if filter_key is not None:
+            self.filter_step_indexes_by_filter_key[filter_key].pop()
+            if len(self.filter_step_indexes_by_filter_key[filter_key]) == 0:
+                del self.filter_step_indexes_by_filter_key[filter_key]
+
+        for skipped_index in self.skipped_indexes_by_step.pop():
+            self.skip_counts[skipped_index] -= 1
+            if self.skip_counts[skipped_index] == 0:
+                del self.skip_counts[skipped_index]
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+
+"""
+When the step history is over its memory budget, the dataframes of non-checkpoint
+states are dropped from memory (see step_checkpoints.py). By default, a dropped
+state is rebuilt by rerunning the steps since the nearest checkpoint, which can be
+slow for expensive steps.
+
+If a spill directory is configured, we instead write the dataframes of a dropped
+state to Arrow IPC files in that directory, and memory-map them back when the state
+is next accessed (e.g. on undo, redo, or checking out an old step). Most columns are
+not copied out of the file when they are read back (see read_dataframe_from_spill_file). 
+This keeps undo instant for long analyses, without holding every state in memory.
+
+Only dataframes that round trip through Arrow exactly are spilled. Any state that
+cannot be spilled, or does not fit in the disk quota, is rebuilt from the nearest
+checkpoint instead.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from mitosheet.state import State
+
+SPILL_FILE_EXTENSION = '.arrow'
+SPILL_DIRECTORY_PREFIX = 'mito-step-history-'
+
+
+def is_dataframe_spillable(df: pd.DataFrame) -> bool:
+    """
+    Returns True if the dataframe is read back from an Arrow IPC file exactly
+    as it was written, with the same headers, index, dtypes and values.
+
+    We are conservative here, as a state that is read back differently would
+    silently change the result of undo. For example, object columns that contain
+    NaN values are read back with None values, so we do not spill them.
+    """
+    if df.columns.name is not None or not df.columns.is_unique or len(df.attrs) > 0:
+        return False
+
+    for column_header in df.columns:
+        if not isinstance(column_header, str) or column_header.startswith('__index_level_'):
+            return False
+
+    index = df.index
+    if not isinstance(index, pd.RangeIndex) and not (type(index) == pd.Index and index.dtype == 'int64'):
+        return False
+    if index.name is not None:
+        return False
+
+    for column_index in range(df.shape[1]):
+        dtype = df.dtypes.iloc[column_index]
+        if dtype == object:
+            inferred_dtype = pd.api.types.infer_dtype(df.iloc[:, column_index], skipna=False)
+            if inferred_dtype != 'string':
+                return False
+        elif str(dtype) not in ('datetime64[ns]', 'timedelta64[ns]') and dtype.kind not in 'biuf':
+            return False
+        elif dtype.kind == 'f' and dtype.itemsize < 4:
+            return False
+
+    return True
+
+
+def write_dataframe_to_spill_file(df: pd.DataFrame, path: str) -> int:
+    """
+    Writes the dataframe to an uncompressed Arrow IPC file, so that it can be
+    memory-mapped back without decompressing. Returns the size of the file.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=None)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return os.path.getsize(path)
+
+
+def read_dataframe_from_spill_file(path: str) -> pd.DataFrame:
+    """
+    Memory-maps the dataframe back from the spill file. Numeric and datetime columns
+    without missing values are not copied, but are read-only views of the mapped file, 
+    so they are only read from disk as they are used. Other columns are copied into memory.
+
+    NOTE: we do not close the memory map, as the columns of the dataframe are views
+    of it. It is unmapped once the dataframe, and so the state it is in, is garbage 
+    collected. This is safe, as steps never write to the data of a column in place 
+    without copying it first (see State.copy).
+    """
+    import pyarrow as pa
+
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    # Each column gets its own block, as combining them into one block copies them
+    return table.to_pandas(split_blocks=True)
+
+
+def _delete_spill_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class StepStateSpiller():
+    """
+    Writes the dataframes of states in the step history to Arrow IPC files in a
+    directory that is unique to a single StepsManager, and reads them back when
+    they are needed.
+
+    The files of a state are kept until the state is garbage collected, so a state
+    that is read back and then dropped again does not need to be rewritten. The
+    whole directory is deleted when the StepsManager is garbage collected.
+    """
+
+    def __init__(self, owner: Any, spill_directory: str, disk_quota: Optional[int]=None):
+        os.makedirs(spill_directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=SPILL_DIRECTORY_PREFIX, dir=spill_directory)
+        self.disk_quota = disk_quota
+
+        # For each spilled state, by id, the files it is written to and their total size
+        self.spilled_states: Dict[int, Tuple[List[str], int]] = {}
+        self.disk_usage = 0
+
+        self.spill_count = 0
+        self.spill_bytes = 0
+        self.spill_seconds = 0.0
+        self.restore_count = 0
+        self.restore_bytes = 0
+        self.restore_seconds = 0.0
+        self.not_spilled_count = 0
+
+        # Delete the spill directory when the owner (the StepsManager) is garbage collected,
+        # or when the process exits, whichever comes first
+        self._cleanup = weakref.finalize(owner, shutil.rmtree, self.directory, ignore_errors=True)
+
+    def cleanup(self) -> None:
+        """
+        Deletes all spill files. States that were spilled are rebuilt from the
+        nearest checkpoint if they are accessed afterwards.
+        """
+        self._cleanup()
+        self.spilled_states = {}
+        self.disk_usage = 0
+
+    def spill_state(self, state: State, rebuild_dfs: Callable[[], List[pd.DataFrame]]) -> Callable[[], List[pd.DataFrame]]:
+        """
+        Writes the dataframes of the state to disk, if they can be spilled and fit in
+        the disk quota. Returns a function that reads the dataframes back from disk,
+        which falls back to rebuild_dfs if the files are missing (e.g. because they
+        were cleaned up). If the state is not spilled, returns rebuild_dfs.
+        """
+        state_id = id(state)
+        if state_id not in self.spilled_states:
+            paths = self._write_state(state)
+            if paths is None:
+                self.not_spilled_count += 1
+                return rebuild_dfs
+
+        paths, num_bytes = self.spilled_states[state_id]
+
+        def restore_dfs() -> List[pd.DataFrame]:
+            start_time = time.perf_counter()
+            try:
+                dfs = [read_dataframe_from_spill_file(path) for path in paths]
+            except (OSError, ValueError):
+                return rebuild_dfs()
+            self.restore_count += 1
+            self.restore_bytes += num_bytes
+            self.restore_seconds += time.perf_counter() - start_time
+            return dfs
+
+        return restore_dfs
+
+    def _write_state(self, state: State) -> Optional[List[str]]:
+        if not self._cleanup.alive:
+            return None
+
+        dfs = state.dfs
+        if not all(is_dataframe_spillable(df) for df in dfs):
+            return None
+
+        start_time = time.perf_counter()
+        paths: List[str] = []
+        num_bytes = 0
+        try:
+            for df in dfs:
+                path = os.path.join(self.directory, uuid.uuid4().hex + SPILL_FILE_EXTENSION)
+                paths.append(path)
+                num_bytes += write_dataframe_to_spill_file(df, path)
+                if self.disk_quota is not None and self.disk_usage + num_bytes > self.disk_quota:
+                    _delete_spill_files(paths)
+                    return None
+        except Exception:
+            # Arrow raises many different errors for data it cannot write, and
+            # in any of these cases we can just rebuild the state instead
+            _delete_spill_files(paths)
+            return None
+
+        self.spilled_states[id(state)] = (paths, num_bytes)
+        self.disk_usage += num_bytes
+        self.spill_count += 1
+        self.spill_bytes += num_bytes
+        self.spill_seconds += time.perf_counter() - start_time
+
+        weakref.finalize(state, self._forget_state, id(state), paths, num_bytes)
+        return paths
+
+    def _forget_state(self, state_id: int, paths: List[str], num_bytes: int) -> None:
+        _delete_spill_files(paths)
+        if self.spilled_states.get(state_id, (None, 0))[0] is paths:
+            del self.spilled_states[state_id]
+            self.disk_usage -= num_bytes
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'spill_directory': self.directory,
+            'disk_quota': self.disk_quota,
+            'disk_usage': self.disk_usage,
+            'spilled_state_count': len(self.spilled_states),
+            'spill_count': self.spill_count,
+            'spill_bytes': self.spill_bytes,
+            'spill_seconds': self.spill_seconds,
+            'restore_count': self.restore_count,
+            'restore_bytes': self.restore_bytes,
+            'restore_seconds': self.restore_seconds,
+            'not_spilled_count': self.not_spilled_count,
+        }
@@ -7,12 +7,14 @@
 import json
 import random
 import string
+import threading
 from copy import copy, deepcopy
 from typing import Any, Callable, Collection, Dict, List, Optional, Set, Tuple, Union
 
 import pandas as pd
 from mitosheet.api.get_parameterizable_params import get_parameterizable_params_metadata
 from mitosheet.api.get_path_contents import get_path_parts
+from mitosheet.code_chunks.code_chunk_utils import OptimizedCodeChunksCache
 
 from mitosheet.enterprise.mito_config import MitoConfig
 from mitosheet.enterprise.telemetry.mito_log_uploader import MitoLogUploader
@@ -23,10 +25,26 @@ from mitosheet.step_performers.import_steps.excel_range_import import ExcelRange
 from mitosheet.step_performers.user_defined_import import UserDefinedImportStepPerformer
 from mitosheet.telemetry.telemetry_utils import log
 from mitosheet.preprocessing import PREPROCESS_STEP_PERFORMERS
+from mitosheet.pro.conditional_formatting_utils import ConditionalFormattingResultCache
 from mitosheet.saved_analyses.save_utils import get_analysis_exists
-from mitosheet.state import State
+from mitosheet.sheet_data_arrow import SheetDataBufferCache
+from mitosheet.search_column_cache import SearchColumnCache
+from mitosheet.sheet_data_cache import SheetDataColumnCache
+from mitosheet.state import State, use_dataframe_schemas_for_evicted_states
 from mitosheet.step import Step
+from mitosheet.step_cache import StepExecutionCache
+from mitosheet.step_checkpoints import (BufferMemoryUsageCache, evict_step_states_over_memory_budget,
+                                        get_checkpoint_step_indexes, get_step_memory_report)
+from mitosheet.step_memory import get_steps_manager_memory_usage
 from mitosheet.step_performers import EVENT_TYPE_TO_STEP_PERFORMER
+from mitosheet.step_dependencies import (get_reusable_step_modified_sheet_indexes,
+                                         get_step_modified_sheet_indexes,
+                                         reuse_step_execution)
+from mitosheet.step_execution_worker import check_step_execution_cancelled, report_step_execution_progress
+from mitosheet.step_parallel_execution import execute_steps_in_parallel, get_step_parallel_sheet_index
+from mitosheet.step_profiling import time_step_profile_section
+from mitosheet.step_skip_index import StepSkipIndex
+from mitosheet.step_spill import StepStateSpiller
 from mitosheet.step_performers.import_steps.excel_import import \
     ExcelImportStepPerformer
 from mitosheet.step_performers.import_steps.simple_import import \
@@ -35,30 +53,54 @@ from mitosheet.step_performers.import_steps.snowflake_import import \
     SnowflakeImportStepPerformer
 from mitosheet.transpiler.transpile import transpile
 from mitosheet.transpiler.transpile_utils import get_default_code_options
-from mitosheet.types import CodeOptions, MitoTheme, ParamMetadata
+from mitosheet.types import CodeOptions, MitoTheme, ParamMetadata, StepProfile
 from mitosheet.updates import UPDATES
 from mitosheet.user.utils import is_enterprise, is_running_test
-from mitosheet.utils import NpEncoder, dfs_to_array_for_json, get_new_id, is_default_df_names
+from mitosheet.utils import NpEncoder, dfs_to_array_for_json, get_new_id, is_default_df_names, is_pyarrow_installed
 from mitosheet.step_performers.utils.user_defined_function_utils import get_user_defined_importers_for_frontend, get_user_defined_editors_for_frontend
 from mitosheet.step_performers.utils.user_defined_function_utils import validate_and_wrap_sheet_functions, validate_user_defined_editors
 
+# The type of an edit event that contains a list of edit_events, which are applied together
+BATCH_EDIT_EVENT_TYPE = 'batch_edit'
+
 def get_step_indexes_to_skip(step_list: List[Step]) -> Set[int]:
     """
     Given a list of steps, will collect all of the steps
     from this list that should be skipped.
+
+    NOTE: the StepsManager keeps a StepSkipIndex up to date as its steps change,
+    so use StepsManager.get_step_indexes_to_skip instead when possible.
     """
-    step_indexes_to_skip: Set[int] = set()
+    step_skip_index = StepSkipIndex()
+    step_skip_index.update(step_list)
+    return step_skip_index.get_step_indexes_to_skip()
 
-    for step_index, step in enumerate(step_list):
-        step_indexes_to_skip = step_indexes_to_skip.union(
-            step.step_indexes_to_skip(step_list[:step_index])
-        )
 
-    return step_indexes_to_skip
+def get_last_valid_index_of_restored_steps(step_list: List[Step], step_indexes_to_skip: Set[int]) -> int:
+    """
+    Given a list of steps that already hold their states (e.g. steps that are 
+    restored by a redo), returns the index of the last step such that every step
+    that is not skipped up to and including it was executed on the final state of
+    the step that is not skipped before it. 
+    
+    These steps hold valid states, and so do not need to be executed again.
+    """
+    last_valid_index = 0
+    for step_index in range(1, len(step_list)):
+        if step_index in step_indexes_to_skip:
+            continue
+
+        step = step_list[step_index]
+        if step.post_state is None or step.prev_state is not step_list[last_valid_index].final_defined_state:
+            break
+        last_valid_index = step_index
+
+    return last_valid_index
 
 
 def execute_step_list_from_index(
-    step_list: List[Step], start_index: Optional[int]=None
+    step_list: List[Step], start_index: Optional[int]=None, step_indexes_to_skip: Optional[Set[int]]=None, max_workers: int=1,
+    step_cache: Optional[StepExecutionCache]=None
 ) -> List[Step]:
     """
     Given a list of steps, and a specific index to start from, will assume that
@@ -69,7 +111,25 @@ def execute_step_list_from_index(
     means that the returned step list will only have valid prev_state/post_states
     for the steps that are not skipped.
 
-    If start_index is not given, will start from the initialize step.
+    If start_index is not given, will start from the initialize step. If 
+    step_indexes_to_skip is not given, will find the steps to skip in the list.
+
+    Steps that were previously executed, and do not depend on any sheet that has
+    changed since they were executed, reuse the result of their previous execution
+    for the sheets they modify rather than being executed again. To do so, we follow 
+    the chain of states the steps were previously executed on, and keep track of
+    which sheets differ between this chain and the states we are creating.
+
+    If max_workers is more than 1, runs of steps that each only read and modify a
+    single sheet, and that cannot reuse their previous result, are executed on a
+    thread per sheet. If any of these steps fail, the error of the first step that
+    fails is raised, just like when executing them one at a time.
+
+    If a step_cache is passed, steps that are executed with the same inputs as a
+    cached execution take the sheets they modify from the cached result.
+
+    If the execution is cancelled, a step_execution_cancelled_error is raised 
+    before the next step is executed.
     """
 
     # Make sure start index is not None
@@ -77,31 +137,127 @@ def execute_step_list_from_index(
         start_index = 0
 
     # Get the steps to skip, so that we can skip them
-    step_indexes_to_skip = get_step_indexes_to_skip(step_list)
+    if step_indexes_to_skip is None:
+        step_indexes_to_skip = get_step_indexes_to_skip(step_list)
 
     # Get the steps that are valid, and the last valid step, so we can execute from there
     new_step_list = step_list[: start_index + 1]
     last_valid_step = step_list[start_index]
 
+    # The steps that are actually executed, which we keep up to date as we go
+    # NOTE: steps only read these previous steps, so we can pass the same list to each step
+    non_skipped_steps = [step for index, step in enumerate(new_step_list) if index not in step_indexes_to_skip]
+
+    # For each state that steps were previously executed on, the sheets that differ between
+    # it and the state of the last valid step. We only keep the states that a step we have 
+    # not yet executed was previously executed on
+    previous_states_to_changed_sheet_indexes: Dict[int, Tuple[State, Set[int]]] = {}
+    remaining_prev_state_counts: Dict[int, int] = {}
+    for step in step_list[start_index + 1 :]:
+        if step.prev_state is not None:
+            remaining_prev_state_counts[id(step.prev_state)] = remaining_prev_state_counts.get(id(step.prev_state), 0) + 1
+
+    def add_previous_state(previous_state: State, changed_sheet_indexes: Set[int]) -> None:
+        if remaining_prev_state_counts.get(id(previous_state), 0) > 0:
+            previous_states_to_changed_sheet_indexes[id(previous_state)] = (previous_state, changed_sheet_indexes)
+
+    add_previous_state(last_valid_step.final_defined_state, set())
+
+    # The new steps from executing a run of steps in parallel, and the index of the
+    # last step that we have already checked if it could be executed in parallel
+    parallel_executed_steps: Dict[int, Step] = {}
+    last_parallel_checked_index = start_index
+
+    def get_parallel_step_indexes(first_step_index: int) -> List[int]:
+        # NOTE: none of the steps in the run can reuse their previous result, so we
+        # do not lose anything by executing them rather than reusing their result
+        parallel_step_indexes = [first_step_index]
+        for next_step_index in range(first_step_index + 1, len(step_list)):
+            next_step = step_list[next_step_index]
+            if next_step_index in step_indexes_to_skip or get_step_parallel_sheet_index(next_step) is None: # type: ignore
+                break
+            if next_step.prev_state is not None and next_step.post_state is not None and id(next_step.prev_state) in previous_states_to_changed_sheet_indexes:
+                break
+            parallel_step_indexes.append(next_step_index)
+        return parallel_step_indexes
+
     for partial_index, step in enumerate(step_list[start_index + 1 :]):
         step_index = partial_index + start_index + 1
+
+        check_step_execution_cancelled()
+        report_step_execution_progress(partial_index, len(step_list) - start_index - 1)
+
+        # Find the sheets that have changed since this step was previously executed, if we know them
+        changed_sheet_indexes: Optional[Set[int]] = None
+        if step.prev_state is not None and step.post_state is not None and id(step.prev_state) in previous_states_to_changed_sheet_indexes:
+            changed_sheet_indexes = previous_states_to_changed_sheet_indexes[id(step.prev_state)][1]
+        if step.prev_state is not None:
+            remaining_prev_state_counts[id(step.prev_state)] -= 1
+            if remaining_prev_state_counts[id(step.prev_state)] == 0:
+                previous_states_to_changed_sheet_indexes.pop(id(step.prev_state), None)
+
         # If we're skipping a step, add it to the new step list (since we don't
         # want to lose it), but don't reexecute it
         if step_index in step_indexes_to_skip:
             new_step_list.append(step)
+
+            # Steps after this step might have been executed on its previous result, which differs
+            # from the state of the last valid step in the sheets it modified
+            step_modified_sheet_indexes = get_step_modified_sheet_indexes(step)
+            if changed_sheet_indexes is not None and step_modified_sheet_indexes is not None:
+                add_previous_state(step.final_defined_state, changed_sheet_indexes.union(step_modified_sheet_indexes))
             continue
             
         # Create a new step with the same params
         new_step = Step(step.step_type, step.step_id, step.params)
 
-        # Set the previous state of the new step, and then update
-        # what the last valid step is. Note that we find the actually
-        # executed steps before passing them
-        non_skipped_steps = [step for index, step in enumerate(new_step_list) if index not in step_indexes_to_skip]
-        new_step.set_prev_state_and_execute(last_valid_step.final_defined_state, non_skipped_steps)
+        reusable_modified_sheet_indexes = get_reusable_step_modified_sheet_indexes(step, changed_sheet_indexes) \
+            if changed_sheet_indexes is not None else None
+
+        if reusable_modified_sheet_indexes is not None:
+            # The new result only differs from the previous result in the sheets that had already changed
+            reuse_step_execution(new_step, step, last_valid_step.final_defined_state, reusable_modified_sheet_indexes)
+            step_modified_sheet_indexes = reusable_modified_sheet_indexes
+            previous_result_changed_sheet_indexes = changed_sheet_indexes
+        else:
+            if max_workers > 1 and step_index > last_parallel_checked_index and changed_sheet_indexes is None and get_step_parallel_sheet_index(step) is not None:
+                parallel_step_indexes = get_parallel_step_indexes(step_index)
+                last_parallel_checked_index = parallel_step_indexes[-1]
+                if len({get_step_parallel_sheet_index(step_list[index]) for index in parallel_step_indexes}) > 1:
+                    parallel_new_steps = execute_steps_in_parallel(
+                        [step_list[index] for index in parallel_step_indexes], last_valid_step.final_defined_state, non_skipped_steps, max_workers
+                    )
+                    parallel_executed_steps = dict(zip(parallel_step_indexes, parallel_new_steps))
+
+            if step_index in parallel_executed_steps:
+                new_step = parallel_executed_steps.pop(step_index)
+            else:
+                # Set the previous state of the new step, and then update
+                # what the last valid step is. Note that we only pass the actually
+                # executed steps
+                if step_cache is not None:
+                    step_cache.execute_step(new_step, last_valid_step.final_defined_state, non_skipped_steps)
+                else:
+                    new_step.set_prev_state_and_execute(last_valid_step.final_defined_state, non_skipped_steps)
+            step_modified_sheet_indexes = get_step_modified_sheet_indexes(new_step)
+            previous_step_modified_sheet_indexes = get_step_modified_sheet_indexes(step)
+            previous_result_changed_sheet_indexes = changed_sheet_indexes.union(step_modified_sheet_indexes, previous_step_modified_sheet_indexes) \
+                if changed_sheet_indexes is not None and step_modified_sheet_indexes is not None and previous_step_modified_sheet_indexes is not None else None
+
+        # This step changed the sheets it modified, compared to all the previous states
+        for previous_state_id, (previous_state, previous_state_changed_sheet_indexes) in list(previous_states_to_changed_sheet_indexes.items()):
+            if step_modified_sheet_indexes is None:
+                del previous_states_to_changed_sheet_indexes[previous_state_id]
+            else:
+                previous_states_to_changed_sheet_indexes[previous_state_id] = (previous_state, previous_state_changed_sheet_indexes.union(step_modified_sheet_indexes))
+
+        if previous_result_changed_sheet_indexes is not None:
+            add_previous_state(step.final_defined_state, previous_result_changed_sheet_indexes)
+
         last_valid_step = new_step
 
         new_step_list.append(new_step)
+        non_skipped_steps.append(new_step)
 
     return new_step_list
 
@@ -271,6 +427,11 @@ class StepsManager:
             )
         ]
 
+        # We keep an index of which steps are skipped, that we update as the steps change,
+        # so that we do not have to check every step against every step before it
+        self.step_skip_index = StepSkipIndex()
+        self.step_skip_index.update(self.steps_including_skipped)
+
         """
         To help with redo, we store a list of a list of the steps that 
         existed in the step manager before the user clicked undo or reset,
@@ -296,7 +457,11 @@ class StepsManager:
         # We also cache some of the sheet data in a form suitable to turn
         # into json, so that we can package it and send it to the front-end
         # faster and with less work. Make sure to cache the starting values
-        # for the saved sheet data
+        # for the saved sheet data. We also cache the serialized data of each column, and the
+        # conditional formatting results for each column, so that we only serialize the columns 
+        # that a step changes
+        self.sheet_data_column_cache = SheetDataColumnCache()
+        self.conditional_formatting_cache = ConditionalFormattingResultCache()
         self.saved_sheet_data: List[Dict] = dfs_to_array_for_json(
             self.curr_step.final_defined_state,
             set(range(len(args))),
@@ -308,8 +473,18 @@ class StepsManager:
             self.curr_step.column_filters,
             self.curr_step.column_ids,
             self.curr_step.df_formats,
+            column_cache=self.sheet_data_column_cache,
+            conditional_formatting_cache=self.conditional_formatting_cache
         )
         self.last_step_index_we_wrote_sheet_json_on = 0
+        # If the saved sheet data leaves out the data of the columns that are sent in Arrow buffers
+        self.saved_sheet_data_has_buffer_columns = False
+        # If the sheet data is sent with Arrow buffers, we cache the buffer of each sheet
+        self.sheet_data_buffer_cache = SheetDataBufferCache()
+        # We cache the optimized code chunks, so we only optimize the code of new steps
+        self.optimized_code_chunks_cache = OptimizedCodeChunksCache()
+        # We cache the stringified values of each searched column, so searching as you type is quick
+        self.search_column_cache = SearchColumnCache()
 
         # We store the number of update events that have been processed successfully,
         # which allows us to have some awareness about undos and redos in the front-end
@@ -329,6 +504,29 @@ class StepsManager:
         # We store the mito_config variables here so that we can use them in the api
         self.mito_config = mito_config
 
+        # If the states in the step history use more memory than this budget, we only keep
+        # the checkpoint states in memory, and rebuild other states when they are needed
+        self.step_history_memory_budget: Optional[int] = mito_config.step_history_memory_budget
+        self.step_history_checkpoint_interval: int = mito_config.step_history_checkpoint_interval
+        self.buffer_memory_usage_cache: BufferMemoryUsageCache = {}
+
+        # If there is a spill directory, states that are dropped from memory are written there, 
+        # and read back rather than rebuilt. The spiller is created lazily, when we first enforce the budget
+        self.step_history_spill_directory: Optional[str] = mito_config.step_history_spill_directory
+        self.step_history_spill_quota: Optional[int] = mito_config.step_history_spill_quota
+        self.step_state_spiller: Optional[StepStateSpiller] = None
+
+        # The number of threads used to execute steps on different sheets in parallel
+        self.step_execution_max_workers: int = mito_config.step_execution_max_workers
+
+        # Steps that are executed with the same inputs as a recent execution reuse its result
+        step_cache_size = mito_config.step_cache_size
+        self.step_execution_cache: Optional[StepExecutionCache] = StepExecutionCache(step_cache_size) if step_cache_size > 0 else None
+
+        # Held while this StepsManager is replaced by a copy that an event executed on, so 
+        # that other threads (e.g. the API) never read it while it is half replaced
+        self.execution_lock = threading.RLock()
+
         # Store the mito_log_uploader
         self.mito_log_uploader = mito_log_uploader
 
@@ -354,70 +552,109 @@ class StepsManager:
     def dfs(self) -> List[pd.DataFrame]:
         return self.steps_including_skipped[self.curr_step_idx].dfs
 
-    @property
-    def sheet_data_json(self) -> str:
+    def get_sheet_data(self, buffer_column_data: bool=False) -> List[Dict[str, Any]]:
         """
-        sheet_json contains a serialized representation of the data
+        Returns the sheet data, which is a representation of the data
         frames that is then fed into the Endo in the front-end.
 
+        If buffer_column_data is True, the data of the numeric and boolean
+        columns is left out, as it is sent in Arrow buffers.
+
         NOTE: we only display the _first_ 1,500 rows of the dataframe
         for speed reasons. This results in way less data getting
         passed around
         """
-        modified_sheet_indexes = get_modified_sheet_indexes(
-            self.steps_including_skipped, self.last_step_index_we_wrote_sheet_json_on, self.curr_step_idx
-        )
+        if buffer_column_data != self.saved_sheet_data_has_buffer_columns:
+            # None of the saved sheet data can be reused, but the column cache still can
+            modified_sheet_indexes = set(range(len(self.curr_step.dfs)))
+        else:
+            # We only need the number of dataframes in each step, so don't rebuild any evicted states
+            with use_dataframe_schemas_for_evicted_states():
+                modified_sheet_indexes = get_modified_sheet_indexes(
+                    self.steps_including_skipped, self.last_step_index_we_wrote_sheet_json_on, self.curr_step_idx
+                )
 
-        array = dfs_to_array_for_json(
-            self.curr_step.final_defined_state,
-            modified_sheet_indexes,
-            self.saved_sheet_data,
-            self.curr_step.dfs,
-            self.curr_step.df_names,
-            self.curr_step.df_sources,
-            self.curr_step.column_formulas,
-            self.curr_step.column_filters,
-            self.curr_step.column_ids,
-            self.curr_step.df_formats,
-        )
+        # The time to serialize the sheet data is counted in the profile of the step it shows
+        with time_step_profile_section('serialization_time', profile=self.curr_step.profile):
+            array = dfs_to_array_for_json(
+                self.curr_step.final_defined_state,
+                modified_sheet_indexes,
+                self.saved_sheet_data,
+                self.curr_step.dfs,
+                self.curr_step.df_names,
+                self.curr_step.df_sources,
+                self.curr_step.column_formulas,
+                self.curr_step.column_filters,
+                self.curr_step.column_ids,
+                self.curr_step.df_formats,
+                column_cache=self.sheet_data_column_cache,
+                conditional_formatting_cache=self.conditional_formatting_cache,
+                buffer_column_data=buffer_column_data
+            )
 
-        self.saved_sheet_data = array
-        self.last_step_index_we_wrote_sheet_json_on = self.curr_step_idx
+            self.saved_sheet_data = array
+            self.saved_sheet_data_has_buffer_columns = buffer_column_data
+            self.last_step_index_we_wrote_sheet_json_on = self.curr_step_idx
 
-        return json.dumps(array, cls=NpEncoder)
+            return array
+
+    @property
+    def sheet_data_json(self) -> str:
+        """
+        sheet_json contains a serialized representation of the data
+        frames that is then fed into the Endo in the front-end.
+        """
+        array = self.get_sheet_data()
+        with time_step_profile_section('serialization_time', profile=self.curr_step.profile):
+            return json.dumps(array, cls=NpEncoder)
+
+    def get_sheet_data_json_and_buffers(self) -> Tuple[str, List[bytes]]:
+        """
+        Returns the sheet data json, without the data of the numeric and boolean
+        columns, and the Arrow IPC buffers that contain the data of these columns.
+        See sheet_data_arrow.py for more information.
+        """
+        array = self.get_sheet_data(buffer_column_data=True)
+        with time_step_profile_section('serialization_time', profile=self.curr_step.profile):
+            array, buffers = self.sheet_data_buffer_cache.get_sheet_data_and_buffers(self.curr_step.dfs, array)
+            return json.dumps(array, cls=NpEncoder), buffers
+
+    def get_analysis_data(self) -> Dict[str, Any]:
+        """
+        Returns the analysis data, which is everything about the analysis other than 
+        the sheet data that the frontend needs (e.g. the code and the graphs).
+        """
+        return {
+            "analysisName": self.analysis_name,
+            "publicInterfaceVersion": self.public_interface_version,
+            "analysisToReplay": {
+                'analysisName': self.analysis_to_replay,
+                'existsOnDisk': self.analysis_to_replay_exists,
+            } if self.analysis_to_replay is not None else None,
+            "code": self.code(),
+            "stepSummaryList": self.step_summary_list,
+            "currStepIdx": self.curr_step_idx,
+            "graphDataArray": self.curr_step.graph_data_array,
+            'updateEventCount': self.update_event_count,
+            'undoCount': self.undo_count,
+            'redoCount': self.redo_count,
+            'renderCount': self.render_count,
+            'lastResult': self.curr_step.execution_data['result'] if 'result' in self.curr_step.execution_data else None,
+            'experiment': self.experiment,
+            'codeOptions': self.code_options,
+            'userDefinedFunctions': get_user_defined_sheet_function_objects(self.curr_step.post_state),
+            'userDefinedImporters': get_user_defined_importers_for_frontend(self.curr_step.post_state),
+            'userDefinedEdits': get_user_defined_editors_for_frontend(self.curr_step.post_state),
+            "importFolderData": {
+                'path': self.import_folder,
+                'pathParts': get_path_parts(self.import_folder)
+            } if self.import_folder is not None else None,
+            "theme": self.theme
+        }
 
     @property
     def analysis_data_json(self):
-        return json.dumps(
-            {
-                "analysisName": self.analysis_name,
-                "publicInterfaceVersion": self.public_interface_version,
-                "analysisToReplay": {
-                    'analysisName': self.analysis_to_replay,
-                    'existsOnDisk': self.analysis_to_replay_exists,
-                } if self.analysis_to_replay is not None else None,
-                "code": self.code(),
-                "stepSummaryList": self.step_summary_list,
-                "currStepIdx": self.curr_step_idx,
-                "graphDataArray": self.curr_step.graph_data_array,
-                'updateEventCount': self.update_event_count,
-                'undoCount': self.undo_count,
-                'redoCount': self.redo_count,
-                'renderCount': self.render_count,
-                'lastResult': self.curr_step.execution_data['result'] if 'result' in self.curr_step.execution_data else None,
-                'experiment': self.experiment,
-                'codeOptions': self.code_options,
-                'userDefinedFunctions': get_user_defined_sheet_function_objects(self.curr_step.post_state),
-                'userDefinedImporters': get_user_defined_importers_for_frontend(self.curr_step.post_state),
-                'userDefinedEdits': get_user_defined_editors_for_frontend(self.curr_step.post_state),
-                "importFolderData": {
-                    'path': self.import_folder,
-                    'pathParts': get_path_parts(self.import_folder)
-                } if self.import_folder is not None else None,
-                "theme": self.theme
-            },
-            cls=NpEncoder
-        )
+        return json.dumps(self.get_analysis_data(), cls=NpEncoder)
 
     @property
     def step_summary_list(self) -> List:
@@ -426,7 +663,7 @@ class StepsManager:
         the skipped steps
         """
         step_summary_list = []
-        step_indexes_to_skip = get_step_indexes_to_skip(self.steps_including_skipped)
+        step_indexes_to_skip = self.get_step_indexes_to_skip()
         for index, step in enumerate(self.steps_including_skipped):
             if step.step_type == "initialize":
                 step_summary_list.append(
@@ -447,19 +684,16 @@ class StepsManager:
             
             # NOTE: we cannot and should not optimize the code chunks here, as
             # rely on getting data out of them is to label the steps correctly
-            code_chunks = step.step_performer.transpile(
-                step.prev_state, # type: ignore
-                step.params,
-                step.execution_data,
-            )
+            with use_dataframe_schemas_for_evicted_states():
+                step_display_name, step_description = step.get_display_name_and_description()
 
             step_summary_list.append(
                 {
                     "step_id": step.step_id,
                     "step_idx": index,
                     "step_type": step.step_type,
-                    "step_display_name": code_chunks[0].get_display_name(),
-                    "step_description": code_chunks[0].get_description_comment().strip().replace('\n', '\n# '),
+                    "step_display_name": step_display_name,
+                    "step_description": step_description,
                     "params": step.params,
                     "result": step.execution_data.get('result', None) if step.execution_data else None
                 }
@@ -497,7 +731,9 @@ class StepsManager:
     def handle_edit_event(self, edit_event: Dict[str, Any]) -> None:
         """
         Updates the widget state with a new step that was created
-        by the edit_event. Each edit event creates one new step.
+        by the edit_event. Each edit event creates one new step, except
+        for batch edit events, which create a step for each edit event
+        in them.
 
         If there is an error in the creation of the new step, this
         function will not create the new invalid step.
@@ -515,17 +751,14 @@ class StepsManager:
         if edit_event.get('refresh_use_live_updating_hooks'):
             self.update_event_count += 1
 
-        step_performer = EVENT_TYPE_TO_STEP_PERFORMER[edit_event["type"]]
-
-        # First, we add the public interface to the params, as we might need it for any step
-        edit_event["params"]['public_interface_version'] = self.public_interface_version
-
-        # Then, we make a new step
-        new_step = Step(
-            step_performer.step_type(), edit_event["step_id"], edit_event["params"]
-        )
-
-        new_steps = self.steps_including_skipped + [new_step]
+        # A batch edit event creates a new step for each of the edit events in it, which are
+        # executed together, so that if any of them fails, none of the new steps are created
+        if edit_event["type"] == BATCH_EDIT_EVENT_TYPE:
+            new_steps = self.steps_including_skipped + [
+                self.get_step_from_edit_event(batched_edit_event) for batched_edit_event in edit_event["params"]["edit_events"]
+            ]
+        else:
+            new_steps = self.steps_including_skipped + [self.get_step_from_edit_event(edit_event)]
 
         self.execute_and_update_steps(new_steps)
 
@@ -543,6 +776,38 @@ class StepsManager:
         if len(self.steps_including_skipped) == 2 and is_default_df_names(self.curr_step.df_names): # NOTE: two means we have done at least one edit.
             log('args_update_remains_failed')
 
+    def handle_batch_edit_event(self, edit_events: List[Dict[str, Any]]) -> None:
+        """
+        Creates a new step for each of the edit_events, and executes them all at
+        once. If any of the new steps fail, none of them are created.
+
+        Each edit event should have a type and params, and optionally a step_id, just 
+        like the edit events that are sent from the frontend. This is useful for applying
+        many edits at once (e.g. pasting a range of cells) from Python.
+        """
+        self.handle_edit_event({
+            'type': BATCH_EDIT_EVENT_TYPE,
+            'params': {
+                'edit_events': [
+                    {'step_id': get_new_id(), **edit_event} for edit_event in edit_events
+                ]
+            }
+        })
+
+    def get_step_from_edit_event(self, edit_event: Dict[str, Any]) -> Step:
+        """
+        Returns a new step with the params of the edit_event. 
+        """
+        step_performer = EVENT_TYPE_TO_STEP_PERFORMER[edit_event["type"]]
+
+        # First, we add the public interface to the params, as we might need it for any step
+        edit_event["params"]['public_interface_version'] = self.public_interface_version
+
+        # Then, we make a new step
+        return Step(
+            step_performer.step_type(), edit_event["step_id"], edit_event["params"]
+        )
+
     def handle_update_event(self, update_event: Dict[str, Any]) -> None:
         """
         Handles any event that isn't caused by an edit, but instead
@@ -570,17 +835,16 @@ class StepsManager:
         then start from).
         """
 
+        previously_skipped_indexes = self.get_step_indexes_to_skip()
+        self.step_skip_index.update(new_steps)
+        all_skipped_indexes = self.step_skip_index.get_step_indexes_to_skip()
+
         # Currently, we only remove steps in an undo
         if len(new_steps) < len(self.steps_including_skipped):
             # If we are removing steps, then we figure out what skipped steps
             # we are losing, and run from right before where we are no longer
             # skipped steps
-            no_longer_skipped_indexes: Set[int] = set()
-            for step_index, removed_step in enumerate(self.steps_including_skipped[len(new_steps) :]):
-                previous_steps = self.steps_including_skipped[: len(new_steps) + step_index]
-                no_longer_skipped_indexes = no_longer_skipped_indexes.union(
-                    removed_step.step_indexes_to_skip(previous_steps)
-                )
+            no_longer_skipped_indexes = previously_skipped_indexes.difference(all_skipped_indexes)
 
             last_valid_index = (
                 min(no_longer_skipped_indexes.union({len(new_steps)})) - 1
@@ -590,19 +854,13 @@ class StepsManager:
             # we're adding, and run from right before the oldest new skipped step
 
             # Collect anything that is newly skipped
-            newly_skipped_indexes: Set[int] = set()
-            for step_index, new_step in enumerate(new_steps[len(self.steps_including_skipped) :]):
-                previous_steps = new_steps[: len(self.steps_including_skipped) + step_index]
-                newly_skipped_indexes = newly_skipped_indexes.union(
-                    new_step.step_indexes_to_skip(previous_steps)
-                )
+            newly_skipped_indexes = all_skipped_indexes.difference(previously_skipped_indexes)
 
             # The last valid index is the minimum of the newly skipped things - 1
             # or the last valid step (if nothing is skipped)
             last_valid_index = min(newly_skipped_indexes.union({len(self.steps_including_skipped)})) - 1
 
         # Make sure that this step isn't itself skipped, and decrement until it is not
-        all_skipped_indexes = get_step_indexes_to_skip(new_steps)
         while last_valid_index in all_skipped_indexes:
             last_valid_index -= 1
 
@@ -612,6 +870,15 @@ class StepsManager:
 
         return last_valid_index
 
+    def find_last_valid_index_of_restored_steps(self, new_steps: List[Step]) -> int:
+        """
+        Given the new_steps, which are steps that were previously in the step list
+        (e.g. steps restored by a redo), returns the index of the last step that 
+        holds a valid state. See get_last_valid_index_of_restored_steps.
+        """
+        self.step_skip_index.update(new_steps)
+        return get_last_valid_index_of_restored_steps(new_steps, self.step_skip_index.get_step_indexes_to_skip())
+
     def execute_undo(self) -> None:
         """
         This function attempts to undo the most recent step, and if there
@@ -668,12 +935,13 @@ class StepsManager:
         elif undo_or_clear == "reset":
             new_steps = step_list
             # Note: since we're breaking the invariant that the steps don't
-            # move order, we have to execute from the very start
-            self.execute_and_update_steps(new_steps, last_valid_index=0)
+            # move order, we cannot use find_last_valid_index. Instead, we 
+            # only execute the restored steps that do not hold valid states
+            self.execute_and_update_steps(new_steps, last_valid_index=self.find_last_valid_index_of_restored_steps(new_steps))
 
         elif undo_or_clear == "undo_to_step_index":
             new_steps = step_list
-            self.execute_and_update_steps(new_steps)
+            self.execute_and_update_steps(new_steps, last_valid_index=self.find_last_valid_index_of_restored_steps(new_steps))
 
         # Remove the item we just redid from the undone_step_list_store, so
         # that we don't redo it again
@@ -722,9 +990,9 @@ class StepsManager:
 
         new_steps = self.steps_including_skipped[:step_idx + 1]
 
-        # We need to set the last_valid_index to 0 as we are changing
-        # the step order
-        self.execute_and_update_steps(new_steps, last_valid_index=0)
+        # The steps we keep already hold valid states, unless they were skipped
+        # by the steps we removed, so we only execute from the first of these
+        self.execute_and_update_steps(new_steps, last_valid_index=self.find_last_valid_index_of_restored_steps(new_steps))
 
         self.undone_step_list_store.append(("undo_to_step_index", old_steps))
 
@@ -749,12 +1017,162 @@ class StepsManager:
         if last_valid_index is None:
             last_valid_index = self.find_last_valid_index(new_steps)
 
+        self.step_skip_index.update(new_steps)
         final_steps = execute_step_list_from_index(
-            new_steps, start_index=last_valid_index
+            new_steps, 
+            start_index=last_valid_index, 
+            step_indexes_to_skip=self.step_skip_index.get_step_indexes_to_skip(),
+            max_workers=self.step_execution_max_workers,
+            step_cache=self.step_execution_cache
         )
         self.steps_including_skipped = final_steps
         self.curr_step_idx = len(self.steps_including_skipped) - 1
 
+        # The states are shared with the StepsManager this might be a copy of, so a cancelled
+        # event stops before dropping any of them from memory
+        check_step_execution_cancelled()
+        self.enforce_step_history_memory_budget()
+
+    def get_step_indexes_to_skip(self, num_steps: Optional[int]=None) -> Set[int]:
+        """
+        Returns the indexes of the skipped steps. If num_steps is passed, only returns
+        the steps skipped by the first num_steps steps, which are the steps that are
+        skipped when just those steps are run (e.g. when an older step is checked out).
+        """
+        self.step_skip_index.update(self.steps_including_skipped)
+        return self.step_skip_index.get_step_indexes_to_skip(num_steps)
+
+    def get_checkpoint_step_indexes(self) -> Set[int]:
+        return get_checkpoint_step_indexes(
+            self.steps_including_skipped,
+            self.get_step_indexes_to_skip(),
+            self.curr_step_idx,
+            self.step_history_checkpoint_interval
+        )
+
+    def enforce_step_history_memory_budget(self) -> List[int]:
+        """
+        If there is a step history memory budget, and the states in the step
+        history are over it, drops the dataframes of non-checkpoint states 
+        from memory. They are rebuilt from the nearest checkpoint if they
+        are accessed again. The states kept by the step execution cache are
+        counted too, and removed from it if needed, as are the strings of the
+        searched columns.
+
+        Returns the indexes of the steps whose states were dropped.
+        """
+        if self.step_history_memory_budget is None:
+            return []
+
+        # The searched columns are quick to stringify again, so we don't let them take more than half of the budget
+        self.search_column_cache.remove_least_recently_searched_entries(self.step_history_memory_budget // 2)
+
+        return evict_step_states_over_memory_budget(
+            self.steps_including_skipped,
+            self.get_step_indexes_to_skip(),
+            self.get_checkpoint_step_indexes(),
+            max(self.step_history_memory_budget - self.search_column_cache.num_bytes, 0),
+            buffer_memory_usage_cache=self.buffer_memory_usage_cache,
+            spiller=self.get_step_state_spiller(),
+            step_cache=self.step_execution_cache
+        )
+
+    def get_step_state_spiller(self) -> Optional[StepStateSpiller]:
+        """
+        Returns the spiller that writes dropped states to the spill directory, or
+        None if there is no spill directory or pyarrow is not installed, in which
+        case dropped states are rebuilt from the nearest checkpoint.
+        """
+        if self.step_history_spill_directory is None or not is_pyarrow_installed():
+            return None
+
+        if self.step_state_spiller is None:
+            self.step_state_spiller = StepStateSpiller(
+                self, 
+                self.step_history_spill_directory, 
+                disk_quota=self.step_history_spill_quota
+            )
+        return self.step_state_spiller
+
+    def get_step_spill_metrics(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns how many states have been spilled to and restored from disk, 
+        and how long it took, or None if no state has been spilled.
+        """
+        if self.step_state_spiller is None:
+            return None
+        return self.step_state_spiller.get_metrics()
+
+    def get_step_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the number of hits, misses and evictions of the step execution
+        cache, or None if the cache is turned off.
+        """
+        if self.step_execution_cache is None:
+            return None
+        return self.step_execution_cache.get_stats()
+
+    def get_step_profiles(self) -> List[StepProfile]:
+        """
+        Returns the profile of each executed step in the step history, in order, 
+        which records how long each part of executing the step took, and how much 
+        memory it copied and used.
+        """
+        return [step.profile for step in self.steps_including_skipped if step.profile is not None]
+
+    def get_step_memory_report(self) -> Dict[str, Any]:
+        """
+        Returns a report of how much memory each step in the step history
+        is holding onto, and which steps are checkpoints that are always
+        kept in memory.
+        """
+        return get_step_memory_report(
+            self.steps_including_skipped,
+            self.get_step_indexes_to_skip(),
+            self.get_checkpoint_step_indexes(),
+            self.step_history_memory_budget,
+            buffer_memory_usage_cache=self.buffer_memory_usage_cache
+        )
+
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """
+        Returns the total memory used by this StepsManager, and how it is split between 
+        the steps in the step history, the steps that can be redone, the step execution 
+        cache, and the sheet data. Dataframes shared between steps are only counted once.
+        """
+        return get_steps_manager_memory_usage(self)
+
+    def copy_for_execution(self) -> "StepsManager":
+        """
+        Returns a copy of the StepsManager that an event can be executed on without
+        changing this StepsManager. The steps and states are shared, as executing an 
+        event creates new steps rather than changing the existing ones. 
+        
+        The caches of the sheet data and search are also shared, as they are only used
+        once the event is done, by this StepsManager. The caches that executing an event
+        writes to are copied, as a cancelled event keeps executing in the background.
+        """
+        # The spill directory is deleted when the StepsManager that creates the spiller is
+        # garbage collected, so we make sure this is never a copy
+        self.get_step_state_spiller()
+
+        steps_manager_copy = copy(self)
+        for attribute, value in self.__dict__.items():
+            if isinstance(value, (list, dict)):
+                setattr(steps_manager_copy, attribute, copy(value))
+        steps_manager_copy.step_skip_index = self.step_skip_index.copy()
+        steps_manager_copy.optimized_code_chunks_cache = self.optimized_code_chunks_cache.copy()
+        steps_manager_copy.step_execution_cache = self.step_execution_cache.copy() if self.step_execution_cache is not None else None
+        return steps_manager_copy
+
+    def update_from_execution_copy(self, steps_manager_copy: "StepsManager") -> None:
+        """
+        Makes this StepsManager the same as a copy from copy_for_execution that an 
+        event was executed on, so that everything holding it sees the result.
+        """
+        with self.execution_lock:
+            self.__dict__.update(steps_manager_copy.__dict__)
+
     def execute_steps_data(self, new_steps_data: Optional[List[Dict[str, Any]]] = None) -> None:
         """
         Given steps data (e.g. from a saved analysis), will turn
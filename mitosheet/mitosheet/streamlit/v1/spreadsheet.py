@@ -288,6 +288,8 @@ try:
             responses.append(response)
         
         mito_backend.mito_send = send
+        # The frontend renders the shared state variables it is passed, so they cannot follow the responses
+        mito_backend.async_edit_pipeline = False
 
         if df_names is not None and len(df_names) > 0:
             mito_backend.receive_message(
@@ -377,7 +379,9 @@ try:
         if key is None:
             key = mito_backend.analysis_name
 
-        sheet_data_json = mito_backend.steps_manager.sheet_data_json,
+        sheet_data_shared_state_variables, _ = mito_backend.get_sheet_data_shared_state_variables()
+        sheet_data_json = sheet_data_shared_state_variables['sheet_data_json']
+        sheet_data_buffers = sheet_data_shared_state_variables.get('sheet_data_buffers')
         analysis_data_json = mito_backend.steps_manager.analysis_data_json,
         user_profile_json = mito_backend.get_user_profile_json()
 
@@ -403,7 +407,7 @@ try:
         # waste a component value update setting the value
         selection = _mito_component_func(
             key=key, 
-            sheet_data_json=sheet_data_json, analysis_data_json=analysis_data_json, user_profile_json=user_profile_json, 
+            sheet_data_json=sheet_data_json, sheet_data_buffers=sheet_data_buffers, analysis_data_json=analysis_data_json, user_profile_json=user_profile_json, 
             responses_json=responses_json, id=id(mito_backend),
             return_type=return_type
         )
@@ -591,6 +591,61 @@ def test_get_column_recon(old_df, new_df, recon):
     assert recon == _recon
 
 
+def test_get_column_recon_trusts_declared_column_effects(monkeypatch):
+    old_df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6], 'C': [7, 8, 9]})
+    new_df = old_df.rename(columns={'A': 'D'})
+    new_df['B'] = new_df['B'] + 1
+    new_df['E'] = 0
+
+    # Declared effects are trusted, so no columns are compared
+    monkeypatch.setattr(pd.Series, 'equals', lambda self, other: pytest.fail('Compared columns'))
+    _recon = get_modified_dataframe_recon_data(old_df, new_df, modified_column_headers=['B'], renamed_column_headers={'A': 'D'})
+    assert _recon == {
+        'column_recon': {
+            'created_columns': ['E'],
+            'deleted_columns': [],
+            'modified_columns': ['B'],
+            'renamed_columns': {'A': 'D'}
+        }, 
+        'num_added_or_removed_rows': 0
+    }
+
+
+def test_get_column_recon_skips_comparing_shared_column_data(monkeypatch):
+    old_df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6], 'C': ['a', 'b', 'c']})
+    new_df = old_df.copy(deep=False)
+    new_df['B'] = new_df['B'].astype(float)
+    new_df['C'] = ['a', 'b', 'd']
+
+    compared_values = []
+    equals = pd.Series.equals
+    def recording_equals(self, other):
+        compared_values.append(self.tolist())
+        return equals(self, other)
+    monkeypatch.setattr(pd.Series, 'equals', recording_equals)
+
+    _recon = get_modified_dataframe_recon_data(old_df, new_df)
+    assert _recon['column_recon']['modified_columns'] == ['B', 'C']
+    # A shares its data and B has a new dtype, so only C is compared
+    assert compared_values == [['a', 'b', 'c']]
+
+
+def test_declared_column_effects_match_recon():
+    from mitosheet.tests.test_utils import create_mito_wrapper
+    from mitosheet.types import FC_NUMBER_GREATER
+
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6]}))
+    mito.add_column(0, 'C')
+    mito.set_formula('=A + B', 0, 'C')
+    mito.rename_column(0, 'A', 'D')
+    mito.sort(0, 'B', 'descending')
+    mito.filter(0, 'B', 'And', FC_NUMBER_GREATER, 4)
+    mito.change_column_dtype(0, ['D'], 'float')
+
+    assert mito.dfs[0].equals(pd.DataFrame({'D': [3.0, 2.0], 'B': [6, 5], 'C': [9, 7]}, index=[2, 1]))
+    assert mito.mito_backend.steps_manager.curr_step.column_ids.column_header_to_column_id[0] == {'D': 'A', 'B': 'B', 'C': 'C'}
+
+
 EXEC_AND_GET_NEW_STATE_TESTS: List[Tuple[Dict[str, pd.DataFrame], str, Dict[str, pd.DataFrame]]] = [
     (
         {},
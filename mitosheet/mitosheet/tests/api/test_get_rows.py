@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for the get_rows api call.
+"""
+
+import json
+
+import pandas as pd
+
+from mitosheet.api.get_rows import COLUMN_PREFETCH_WINDOW, ROW_PREFETCH_WINDOW, get_rows
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+from mitosheet.utils import MAX_ROWS
+
+
+def test_get_rows_beyond_sheet_data():
+    df = pd.DataFrame({'A': list(range(10000)), 'B': [str(i) for i in range(10000)]})
+    mito = create_mito_wrapper(df)
+
+    rows = get_rows({'sheet_index': 0, 'start': 5000, 'end': 5050}, mito.mito_backend.steps_manager)
+
+    assert rows['numRows'] == 10000
+    assert rows['startingRowIndex'] == 5000 - ROW_PREFETCH_WINDOW
+    assert rows['endingRowIndex'] == 5050 + ROW_PREFETCH_WINDOW
+    assert rows['index'] == list(range(5000 - ROW_PREFETCH_WINDOW, 5050 + ROW_PREFETCH_WINDOW))
+    assert rows['columnData']['A'] == list(range(5000 - ROW_PREFETCH_WINDOW, 5050 + ROW_PREFETCH_WINDOW))
+    assert rows['columnData']['B'] == [str(i) for i in range(5000 - ROW_PREFETCH_WINDOW, 5050 + ROW_PREFETCH_WINDOW)]
+    json.dumps(rows)
+
+
+def test_get_rows_clamps_to_dataframe_and_max_rows():
+    mito = create_mito_wrapper(pd.DataFrame({'A': list(range(5000))}))
+    steps_manager = mito.mito_backend.steps_manager
+
+    rows = get_rows({'sheet_index': 0, 'start': -10, 'end': 10}, steps_manager)
+    assert rows['startingRowIndex'] == 0
+    assert rows['endingRowIndex'] == 10 + ROW_PREFETCH_WINDOW
+
+    rows = get_rows({'sheet_index': 0, 'start': 4990, 'end': 6000}, steps_manager)
+    assert rows['endingRowIndex'] == 5000
+    assert rows['columnData']['A'][-1] == 4999
+
+    rows = get_rows({'sheet_index': 0, 'start': 1000, 'end': 5000}, steps_manager)
+    assert rows['endingRowIndex'] == 1000 + MAX_ROWS + ROW_PREFETCH_WINDOW
+
+
+def test_get_rows_only_returns_requested_columns_in_sheet_data_format():
+    df = pd.DataFrame({
+        'A': [1.5, None, 3.0], 
+        'B': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03']),
+        'C': ['a', 'b', 'c']
+    })
+    mito = create_mito_wrapper(df)
+    mito.set_formula('=A * 2', 0, 'D', add_column=True)
+
+    rows = get_rows({'sheet_index': 0, 'start': 0, 'end': 3, 'column_ids': ['B', 'D']}, mito.mito_backend.steps_manager)
+    assert list(rows['columnData'].keys()) == ['B', 'D']
+    assert rows['columnData']['B'] == ['2020-01-01 00:00:00', '2020-01-02 00:00:00', '2020-01-03 00:00:00']
+    assert rows['columnData']['D'] == [3.0, 'NaN', 6.0]
+
+    # The rows are the same as those in the sheet data
+    sheet_data = json.loads(mito.mito_backend.steps_manager.sheet_data_json)[0]
+    assert sheet_data['data'][3]['columnData'] == rows['columnData']['D']
+
+
+def test_get_rows_returns_conditional_formatting_for_rows():
+    from mitosheet.types import FC_NUMBER_GREATER
+    df = pd.DataFrame({'A': list(range(10000))})
+    mito = create_mito_wrapper(df)
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.curr_step.df_formats[0]['conditional_formats'] = [{
+        'format_uuid': '1234',
+        'columnIDs': ['A'],
+        'filters': [{'condition': FC_NUMBER_GREATER, 'value': 5020}],
+        'color': 'red',
+        'backgroundColor': None,
+    }]
+
+    rows = get_rows({'sheet_index': 0, 'start': 5000, 'end': 5050}, steps_manager)
+    assert list(rows['conditionalFormattingResults']['A'].keys()) == [str(i) for i in range(5021, 5050 + ROW_PREFETCH_WINDOW)]
+    assert rows['conditionalFormattingResults']['A']['5021'] == {'color': 'red', 'backgroundColor': None}
+
+
+def test_get_rows_only_returns_requested_column_range():
+    df = pd.DataFrame({f'C{i}': list(range(3000)) for i in range(100)})
+    mito = create_mito_wrapper(df)
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.curr_step.df_formats[0]['conditional_formats'] = [{
+        'format_uuid': '1234',
+        'columnIDs': ['C0', 'C50'],
+        'filters': [{'condition': FC_NUMBER_GREATER, 'value': 2000}],
+        'color': 'red',
+        'backgroundColor': None,
+    }]
+
+    rows = get_rows({'sheet_index': 0, 'start': 2000, 'end': 2050, 'start_column': 40, 'end_column': 60}, steps_manager)
+    assert list(rows['columnData'].keys()) == [f'C{i}' for i in range(40 - COLUMN_PREFETCH_WINDOW, 60 + COLUMN_PREFETCH_WINDOW)]
+    assert list(rows['conditionalFormattingResults'].keys()) == ['C50']
+
+    rows = get_rows({'sheet_index': 0, 'start': 2000, 'end': 2050, 'start_column': 95, 'end_column': 200}, steps_manager)
+    assert list(rows['columnData'].keys()) == [f'C{i}' for i in range(95 - COLUMN_PREFETCH_WINDOW, 100)]
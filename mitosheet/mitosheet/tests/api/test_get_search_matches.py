@@ -7,11 +7,16 @@
 Contains tests for the add_formatting_to_excel_sheet function.
 """
 
+import weakref
+
+import numpy as np
 import pandas as pd
 import pytest
 
 from mitosheet.tests.test_utils import create_mito_wrapper, create_mito_wrapper_with_data
 from mitosheet.api.get_search_matches import get_search_matches
+import mitosheet.search_column_cache
+from mitosheet.search_column_cache import SearchColumnCache, get_column_search_matches
 from mitosheet.tests.decorators import pandas_post_1_only
 
 NUMBER_MATCHES_TESTS = [
@@ -214,4 +219,122 @@ def test_get_number_matches_multiple_dataframes(dfs,sheet_index,search_value,exp
 
     for i, match in enumerate(matches['matches']):
         assert match['rowIndex'] == expected_matches[i][0]
-        assert match['colIndex'] == expected_matches[i][1]
\ No newline at end of file
+        assert match['colIndex'] == expected_matches[i][1]
+
+
+def test_get_search_matches_counts_all_rows_but_only_matches_displayed_rows():
+    test_wrapper = create_mito_wrapper(pd.DataFrame({'A': ['abc', 'def', None] * 1000, 'B': [1, 'abc', True] * 1000}))
+
+    matches = get_search_matches({'sheet_index': 0, 'search_value': 'ABC'}, test_wrapper.mito_backend.steps_manager)
+
+    # Null cells never match, and values of different types are searched as their own strings
+    assert matches['total_number_matches'] == 2000
+    assert len(matches['matches']) == 1000
+    assert matches['matches'][:3] == [{'rowIndex': 0, 'colIndex': 0}, {'rowIndex': 1, 'colIndex': 1}, {'rowIndex': 3, 'colIndex': 0}]
+    assert get_search_matches({'sheet_index': 0, 'search_value': '1'}, test_wrapper.mito_backend.steps_manager)['total_number_matches'] == 1000
+    assert get_search_matches({'sheet_index': 0, 'search_value': 'none'}, test_wrapper.mito_backend.steps_manager)['total_number_matches'] == 0
+
+
+def test_get_search_matches_only_stringifies_changed_columns():
+    test_wrapper = create_mito_wrapper(pd.DataFrame({'A': ['abc', 'def', 'ghi'], 'B': ['a', 'b', 'c'], 'C': [1.5, 2.5, 3.5]}))
+    steps_manager = test_wrapper.mito_backend.steps_manager
+    search_column_cache = steps_manager.search_column_cache
+
+    # Columns of numbers cannot contain letters, so they are not searched. The header of column A also matches
+    assert get_search_matches({'sheet_index': 0, 'search_value': 'a'}, steps_manager)['total_number_matches'] == 3
+    assert search_column_cache.num_columns_stringified == 2
+    assert get_search_matches({'sheet_index': 0, 'search_value': 'ab'}, steps_manager)['total_number_matches'] == 1
+    assert search_column_cache.num_columns_stringified == 2
+
+    assert get_search_matches({'sheet_index': 0, 'search_value': '.5'}, steps_manager)['total_number_matches'] == 3
+    assert search_column_cache.num_columns_stringified == 3
+
+    test_wrapper.set_formula('=CONCAT(B, "x")', 0, 'B', add_column=False)
+    assert get_search_matches({'sheet_index': 0, 'search_value': 'ax'}, steps_manager)['total_number_matches'] == 1
+    assert search_column_cache.num_columns_stringified == 4
+
+    test_wrapper.delete_columns(0, ['A'])
+    get_search_matches({'sheet_index': 0, 'search_value': 'a'}, steps_manager)
+    assert set(search_column_cache.entries.keys()) == {(0, 'B'), (0, 'C')}
+
+
+def test_search_column_cache_keeps_most_recently_searched_columns_under_max_bytes():
+    search_column_cache = SearchColumnCache(max_bytes=1)
+    df = pd.DataFrame({'A': np.arange(100), 'B': np.arange(100)})
+
+    search_column_cache.get_search_column(0, 'A', df['A'])
+    search_column_cache.get_search_column(0, 'B', df['B'])
+    assert list(search_column_cache.entries.keys()) == [(0, 'B')]
+    assert search_column_cache.num_bytes == search_column_cache.entries[(0, 'B')][2].nbytes
+
+
+@pytest.mark.parametrize('pyarrow_installed', [True, False])
+def test_get_column_search_matches_with_and_without_pyarrow(monkeypatch, pyarrow_installed):
+    monkeypatch.setattr(mitosheet.search_column_cache, 'is_pyarrow_installed', lambda: pyarrow_installed)
+
+    number_matches, row_indexes = get_column_search_matches(pd.Series([1.5, 12.0, np.nan, 2.0] * 500), '2')
+    assert number_matches == 1000
+    assert row_indexes.tolist() == [i for i in range(1500) if i % 4 in (1, 3)]
+
+    number_matches, row_indexes = get_column_search_matches(pd.Series([12, 3, -1]), '-1')
+    assert number_matches == 1
+    assert row_indexes.tolist() == [2]
+
+    number_matches, row_indexes = get_column_search_matches(pd.Series(['Mito', 'MITO', 'sheet']), 'mItO')
+    assert number_matches == 2
+    assert row_indexes.tolist() == [0, 1]
+
+
+def test_get_column_search_matches_in_negative_timedeltas():
+    number_matches, row_indexes = get_column_search_matches(pd.Series(pd.to_timedelta(['-1 hours', '1 days'])), '+23:00')
+    assert number_matches == 1
+    assert row_indexes.tolist() == [0]
+
+
+def test_get_search_matches_only_searches_displayed_rows_until_all_matches_are_counted():
+    test_wrapper = create_mito_wrapper(pd.DataFrame({'A': ['abc', 'def', 'ghi'] * 1000}))
+    steps_manager = test_wrapper.mito_backend.steps_manager
+
+    matches = get_search_matches({'sheet_index': 0, 'search_value': 'abc', 'count_all_matches': False}, steps_manager)
+    assert matches['total_number_matches'] is None
+    assert len(matches['matches']) == 500
+    search_column = steps_manager.search_column_cache.entries[(0, 'A')][2]
+    assert search_column.all_values is None
+    num_bytes = steps_manager.search_column_cache.num_bytes
+
+    matches = get_search_matches({'sheet_index': 0, 'search_value': 'abc'}, steps_manager)
+    assert matches['total_number_matches'] == 1000
+    assert len(matches['matches']) == 500
+    assert steps_manager.search_column_cache.entries[(0, 'A')][2] is search_column
+    assert steps_manager.search_column_cache.num_bytes == search_column.nbytes > num_bytes
+    assert steps_manager.search_column_cache.num_columns_stringified == 1
+
+    # Once all of the column is stringified, all the matches are counted anyways
+    assert get_search_matches({'sheet_index': 0, 'search_value': 'def', 'count_all_matches': False}, steps_manager)['total_number_matches'] == 1000
+
+
+def test_search_column_cache_does_not_keep_column_data_alive():
+    search_column_cache = SearchColumnCache()
+    df = pd.DataFrame({'A': ['abc', 'def'], 'B': ['ghi', 'jkl']})
+    column_data_reference = weakref.ref(df['A'].to_numpy().base)
+
+    search_column_cache.get_search_column(0, 'A', df['A'])
+    del df
+    assert column_data_reference() is None
+
+    search_column_cache.remove_unused_entries(0, {'A', 'B'})
+    assert len(search_column_cache.entries) == 0
+    assert search_column_cache.num_bytes == 0
+
+
+def test_searched_columns_are_counted_in_step_history_memory_budget():
+    test_wrapper = create_mito_wrapper(pd.DataFrame({'A': [str(i) for i in range(10_000)], 'B': [str(i) for i in range(10_000)]}))
+    steps_manager = test_wrapper.mito_backend.steps_manager
+    get_search_matches({'sheet_index': 0, 'search_value': '1'}, steps_manager)
+    assert len(steps_manager.search_column_cache.entries) == 2
+
+    steps_manager.step_history_memory_budget = steps_manager.search_column_cache.num_bytes
+    assert test_wrapper.add_column(0, 'C')
+
+    # Only the most recently searched column fits in half of the budget
+    assert list(steps_manager.search_column_cache.entries.keys()) == [(0, 'B')]
@@ -14,7 +14,7 @@ import pandas as pd
 import sys
 from mitosheet.ai.ai_utils import is_open_ai_credentials_available
 
-from mitosheet.utils import is_prev_version, is_snowflake_connector_python_installed, is_snowflake_credentials_available, is_streamlit_installed, is_dash_installed
+from mitosheet.utils import is_prev_version, is_snowflake_connector_python_installed, is_snowflake_credentials_available, is_streamlit_installed, is_dash_installed, is_pyarrow_installed
 
 pandas_pre_1_only = pytest.mark.skipif(
     not pd.__version__.startswith('0.'), 
@@ -75,6 +75,11 @@ requires_dash = pytest.mark.skipif(
     reason='requires dash to be installed'
 )
 
+requires_pyarrow = pytest.mark.skipif(
+    not is_pyarrow_installed(),
+    reason='requires pyarrow to be installed'
+)
+
 requires_open_ai_credentials = pytest.mark.skipif(
     not is_open_ai_credentials_available(),
     reason='Requires a set OPENAI_API_KEY'
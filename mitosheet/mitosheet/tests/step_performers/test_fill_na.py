@@ -378,4 +378,35 @@ def test_fill_nan_then_delete_optimizes():
     )
     mito.delete_dataframe(0)
 
-    assert mito.transpiled_code == []
\ No newline at end of file
+    assert mito.transpiled_code == []
+
+def test_fill_nan_with_as_many_rows_as_filled_columns_only_fills_those_columns():
+    df = pd.DataFrame({'A': [1.0, None], 'B': [None, 2.0], 'C': [None, 3.0]})
+    mito = create_mito_wrapper(df.copy())
+
+    mito.fill_na(
+        0, 
+        ['A', 'B'],
+        {'type': 'value', 'value': 0}
+    )
+
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [1.0, 0.0], 'B': [0.0, 2.0], 'C': [None, 3.0]}))
+    assert mito.mito_backend.steps_manager.steps_including_skipped[0].dfs[0].equals(df)
+
+    mito.undo()
+    assert mito.dfs[0].equals(df)
+
+
+def test_fill_nan_in_full_dataframe_leaves_previous_step_unchanged():
+    df = pd.DataFrame({'A': [1.0, None], 'B': [None, 2.0], 'C': [None, 3.0]})
+    mito = create_mito_wrapper(df.copy())
+
+    mito.fill_na(
+        0, 
+        ['A', 'B', 'C'],
+        {'type': 'value', 'value': 0}
+    )
+
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [1.0, 0.0], 'B': [0.0, 2.0], 'C': [0.0, 3.0]}))
+    assert "df1.fillna(0, inplace=True)" in mito.transpiled_code
+    assert mito.mito_backend.steps_manager.steps_including_skipped[0].dfs[0].equals(df)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for applying many edit events at once with a batch edit event
+"""
+import pandas as pd
+
+import mitosheet.mito_backend
+from mitosheet.steps_manager import StepsManager
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.utils import get_new_id
+
+
+def get_set_cell_value_edit_events(mito, sheet_index, column_header, new_values):
+    column_id = mito.mito_backend.steps_manager.curr_step.column_ids.get_column_id_by_header(sheet_index, column_header)
+    return [
+        {
+            'type': 'set_cell_value_edit',
+            'step_id': get_new_id(),
+            'params': {
+                'sheet_index': sheet_index,
+                'column_id': column_id,
+                'row_index': row_index,
+                'new_value': str(new_value)
+            }
+        }
+        for row_index, new_value in enumerate(new_values)
+    ]
+
+
+def count_calls(monkeypatch, obj, name):
+    calls = []
+    function = getattr(obj, name)
+    def counting_function(*args, **kwargs):
+        calls.append(1)
+        return function(*args, **kwargs)
+    monkeypatch.setattr(obj, name, counting_function)
+    return calls
+
+
+def test_batch_edit_event_executes_writes_and_renders_once(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}))
+    edit_events = get_set_cell_value_edit_events(mito, 0, 'A', [10, 20, 30, 40])
+
+    executions = count_calls(monkeypatch, StepsManager, 'execute_and_update_steps')
+    writes = count_calls(monkeypatch, mitosheet.mito_backend, 'write_analysis')
+    sent_messages = []
+    monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message: sent_messages.append(message))
+
+    assert mito.mito_backend.receive_message({
+        'event': 'edit_event',
+        'id': get_new_id(),
+        'type': 'batch_edit',
+        'step_id': get_new_id(),
+        'params': {
+            'edit_events': edit_events
+        }
+    })
+
+    assert len(executions) == 1
+    assert len(writes) == 1
+    assert len(sent_messages) == 1
+    assert mito.dfs[0]['A'].tolist() == [10, 20, 30, 40]
+    assert len(mito.mito_backend.steps_manager.steps_including_skipped) == 5
+
+    mito.undo()
+    assert mito.dfs[0]['A'].tolist() == [10, 20, 30, 4]
+
+
+def test_batch_edit_event_with_invalid_edit_applies_no_edits():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}))
+    edit_events = get_set_cell_value_edit_events(mito, 0, 'A', [10, 20])
+    edit_events.append({
+        'type': 'delete_column_edit',
+        'step_id': get_new_id(),
+        'params': {'sheet_index': 0, 'column_ids': ['NOT_A_COLUMN']}
+    })
+
+    assert not mito.mito_backend.receive_message({
+        'event': 'edit_event',
+        'id': get_new_id(),
+        'type': 'batch_edit',
+        'step_id': get_new_id(),
+        'params': {
+            'edit_events': edit_events
+        }
+    })
+
+    assert mito.dfs[0]['A'].tolist() == [1, 2, 3, 4]
+    assert len(mito.mito_backend.steps_manager.steps_including_skipped) == 1
+
+
+def test_handle_batch_edit_event_from_python():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}))
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.handle_batch_edit_event([
+        {'type': 'add_column_edit', 'params': {'sheet_index': 0, 'column_header': 'B', 'column_header_index': -1}},
+        {'type': 'add_column_edit', 'params': {'sheet_index': 0, 'column_header': 'C', 'column_header_index': -1}},
+    ])
+
+    assert mito.dfs[0].columns.tolist() == ['A', 'B', 'C']
+    assert len(steps_manager.steps_including_skipped) == 3
+    assert mito.transpiled_code[2:5] == ["df1['B'] = 0", '', "df1['C'] = 0"]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for encoding large messages sent over the comm
+"""
+import json
+import zlib
+
+from mitosheet.comm_messages import CHUNK_SIZE_BYTES, CHUNKS_ENCODING, ZLIB_ENCODING, get_encoded_comm_send, get_frontend_message_encodings
+
+
+def receive_messages(sent_messages):
+    """
+    Joins and decodes the encoded messages, in the order they are sent, like the frontend does
+    """
+    received_messages = []
+    chunks = {}
+    for message, buffers in sent_messages:
+        if message.get('event') != 'encoded_message':
+            received_messages.append((message, buffers))
+            continue
+
+        chunks.setdefault(message['encoded_message_id'], {})[message['chunk_index']] = buffers
+        message_chunks = chunks[message['encoded_message_id']]
+        if len(message_chunks) == message['num_chunks']:
+            message_bytes = b''.join(message_chunks[chunk_index][0] for chunk_index in range(message['num_chunks']))
+            if message['encoding'] == ZLIB_ENCODING:
+                message_bytes = zlib.decompress(message_bytes)
+            received_messages.append((json.loads(message_bytes), message_chunks[message['num_chunks'] - 1][1:] or None))
+    return received_messages
+
+
+def get_comm_send(message_encodings):
+    sent_messages = []
+    comm_send = lambda message, buffers=None: sent_messages.append((message, buffers))
+    return get_encoded_comm_send(comm_send, message_encodings), sent_messages
+
+
+def test_frontend_message_encodings():
+    assert get_frontend_message_encodings({'message_encodings': ['chunks', 'zlib']}) == [CHUNKS_ENCODING, ZLIB_ENCODING]
+    assert get_frontend_message_encodings({'message_encodings': ['chunks', 'lz4']}) == [CHUNKS_ENCODING]
+    assert get_frontend_message_encodings({}) == []
+    assert get_frontend_message_encodings(None) == []
+
+
+def test_small_messages_are_not_encoded():
+    mito_send, sent_messages = get_comm_send([CHUNKS_ENCODING, ZLIB_ENCODING])
+    mito_send({'event': 'response', 'id': '1', 'data': 'small'})
+    mito_send({'event': 'response', 'id': '2'}, buffers=[b'abc'])
+    assert sent_messages == [
+        ({'event': 'response', 'id': '1', 'data': 'small'}, None),
+        ({'event': 'response', 'id': '2'}, [b'abc']),
+    ]
+
+
+def test_large_messages_are_compressed_and_chunked():
+    mito_send, sent_messages = get_comm_send([CHUNKS_ENCODING, ZLIB_ENCODING])
+    # Random-ish data, so that it is still larger than a chunk once it is compressed
+    large_data = ''.join(str(hash((i, 'mito'))) for i in range(300_000))
+    message = {'event': 'response', 'id': '1', 'data': large_data}
+    mito_send(message, buffers=[b'arrow buffer'])
+
+    assert len(sent_messages) > 1
+    assert all(sent_message['event'] == 'encoded_message' and sent_message['encoding'] == ZLIB_ENCODING for sent_message, _ in sent_messages)
+    assert all(len(buffers[0]) <= CHUNK_SIZE_BYTES for _, buffers in sent_messages)
+    assert sum(len(buffers[0]) for _, buffers in sent_messages) < len(large_data)
+    assert receive_messages(sent_messages) == [(message, [b'arrow buffer'])]
+
+
+def test_large_messages_are_chunked_without_compression():
+    mito_send, sent_messages = get_comm_send([CHUNKS_ENCODING])
+    message = {'event': 'response', 'id': '1', 'data': 'a' * (CHUNK_SIZE_BYTES * 2)}
+    mito_send(message)
+
+    assert len(sent_messages) == 3
+    assert all(sent_message['encoding'] is None for sent_message, _ in sent_messages)
+    assert receive_messages(sent_messages) == [(message, None)]
+
+
+def test_messages_are_received_in_the_order_they_are_sent():
+    mito_send, sent_messages = get_comm_send([CHUNKS_ENCODING, ZLIB_ENCODING])
+    large_data = ''.join(str(hash((i, 'mito'))) for i in range(300_000))
+    large_message = {'event': 'response', 'id': '1', 'data': large_data}
+    small_message = {'event': 'response', 'id': '2', 'data': 'small'}
+    mito_send(large_message)
+    mito_send(small_message)
+
+    # Every chunk of the large message is sent before the small message, and as the 
+    # frontend decodes messages in the order they arrive, it reads them in this order
+    assert sent_messages[-1] == (small_message, None)
+    assert all(sent_message['event'] == 'encoded_message' for sent_message, _ in sent_messages[:-1])
+    assert receive_messages(sent_messages) == [(large_message, None), (small_message, None)]
+
+
+def test_frontends_without_message_encodings_get_messages_as_is():
+    mito_send, sent_messages = get_comm_send([])
+    message = {'event': 'response', 'id': '1', 'data': 'a' * (CHUNK_SIZE_BYTES * 2)}
+    mito_send(message)
+    assert sent_messages == [(message, None)]
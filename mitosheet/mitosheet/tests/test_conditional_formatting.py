@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for evaluating conditional formats for the sheet data
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mitosheet.pro.conditional_formatting_utils import ConditionalFormattingResultCache, get_conditonal_formatting_result, get_json_index_labels
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_BOOLEAN_IS_TRUE, FC_NUMBER_GREATER, FC_NUMBER_HIGHEST
+from mitosheet.utils import MAX_ROWS, NpEncoder
+
+
+def get_conditional_format(format_uuid, column_ids, filters, background_color='blue'):
+    return {'format_uuid': format_uuid, 'columnIDs': column_ids, 'filters': filters, 'color': None, 'backgroundColor': background_color}
+
+
+JSON_INDEX_LABELS_TESTS = [
+    pd.RangeIndex(5),
+    pd.Index([3, -1, 2 ** 40], dtype='int64'),
+    pd.Index([1, 2], dtype='uint64'),
+    pd.Index([True, False], dtype='bool'),
+    pd.Index([1.5, np.nan, 1e20, 0.1 + 0.2]),
+    pd.Index(['a', 'b"c', None]),
+    pd.to_datetime(['2020-01-01 10:11:12', '1999-12-31 00:00:00']),
+    pd.to_timedelta(['1 days', '1s']),
+    pd.MultiIndex.from_tuples([(1, 'a'), (2, 'b')]),
+]
+
+
+@pytest.mark.parametrize("index", JSON_INDEX_LABELS_TESTS)
+def test_get_json_index_labels_matches_json_dumps(index):
+    assert get_json_index_labels(index) == [json.dumps(label, cls=NpEncoder) for label in index]
+
+
+def get_result(mito, conditional_formats, conditional_formatting_cache=None, **kwargs):
+    steps_manager = mito.mito_backend.steps_manager
+    return get_conditonal_formatting_result(
+        steps_manager.curr_step.final_defined_state, 0, steps_manager.dfs[0], conditional_formats, conditional_formatting_cache=conditional_formatting_cache, **kwargs
+    )
+
+
+def test_conditional_formatting_only_evaluates_displayed_rows():
+    df = pd.DataFrame({'A': list(range(MAX_ROWS * 2))})
+    mito = create_mito_wrapper(df)
+    result = get_result(mito, [
+        get_conditional_format('greater', ['A'], [{'condition': FC_NUMBER_GREATER, 'value': 10}]),
+        # Conditions that need the whole column still only return the displayed rows
+        get_conditional_format('highest', ['A'], [{'condition': FC_NUMBER_HIGHEST, 'value': 5}], background_color='red'),
+    ])
+
+    assert result['invalid_conditional_formats'] == {}
+    assert list(result['results']['A'].keys()) == [str(i) for i in range(11, MAX_ROWS)]
+
+    result = get_result(mito, [
+        get_conditional_format('highest', ['A'], [{'condition': FC_NUMBER_HIGHEST, 'value': 5}], background_color='red'),
+    ], start_row=MAX_ROWS * 2 - 10, max_rows=10)
+    assert list(result['results']['A'].keys()) == [str(i) for i in range(MAX_ROWS * 2 - 5, MAX_ROWS * 2)]
+
+
+def test_conditional_formatting_result_is_cached_per_column():
+    df = pd.DataFrame({'A': [1, 5, 10], 'B': [10, 5, 1]})
+    mito = create_mito_wrapper(df)
+    cache = ConditionalFormattingResultCache()
+    conditional_formats = [get_conditional_format('1', ['A', 'B'], [{'condition': FC_NUMBER_GREATER, 'value': 4}])]
+
+    assert get_result(mito, conditional_formats, cache)['results'] == {
+        'A': {'1': {'backgroundColor': 'blue', 'color': None}, '2': {'backgroundColor': 'blue', 'color': None}},
+        'B': {'0': {'backgroundColor': 'blue', 'color': None}, '1': {'backgroundColor': 'blue', 'color': None}},
+    }
+    assert cache.num_results_evaluated == 2
+
+    # Changing another column does not evaluate the conditional format again
+    mito.set_formula('=A + 1', 0, 'C', add_column=True)
+    get_result(mito, conditional_formats, cache)
+    assert cache.num_results_evaluated == 2
+
+    # But changing a formatted column evaluates it for just this column
+    mito.set_cell_value(0, 'B', 0, '0')
+    assert get_result(mito, conditional_formats, cache)['results']['B'] == {'1': {'backgroundColor': 'blue', 'color': None}}
+    assert cache.num_results_evaluated == 3
+
+    # As does changing the conditional format
+    conditional_formats[0]['backgroundColor'] = 'red'
+    assert get_result(mito, conditional_formats, cache)['results']['A']['1'] == {'backgroundColor': 'red', 'color': None}
+    assert cache.num_results_evaluated == 5
+
+
+def test_conditional_formatting_marks_each_invalid_column():
+    df = pd.DataFrame({'A': [1, 5, 10], 'B': ['a', 'b', 'c'], 'C': [10, 5, 1]})
+    mito = create_mito_wrapper(df)
+    result = get_result(mito, [
+        get_conditional_format('1', ['B', 'C', 'D'], [{'condition': FC_NUMBER_GREATER, 'value': 4}]),
+    ], ConditionalFormattingResultCache())
+
+    assert result['invalid_conditional_formats'] == {'1': ['B', 'D']}
+    assert list(result['results']['C'].keys()) == ['0', '1']
+
+
+def test_conditional_formatting_nullable_column_with_missing_values():
+    df = pd.DataFrame({'A': pd.array([1, None, 10, 5], dtype='Int64'), 'B': pd.array([True, None, False, True], dtype='boolean')})
+    mito = create_mito_wrapper(df)
+    result = get_result(mito, [
+        get_conditional_format('1', ['A'], [{'condition': FC_NUMBER_GREATER, 'value': 4}]),
+        get_conditional_format('2', ['B'], [{'condition': FC_BOOLEAN_IS_TRUE, 'value': ''}]),
+    ], ConditionalFormattingResultCache())
+
+    assert result['invalid_conditional_formats'] == {}
+    assert list(result['results']['A'].keys()) == ['2', '3']
+    assert list(result['results']['B'].keys()) == ['0', '3']
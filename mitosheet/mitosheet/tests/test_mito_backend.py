@@ -11,6 +11,7 @@ from mitosheet.transpiler.transpile_utils import get_default_code_options
 import pytest
 import numpy as np
 
+import mitosheet.mito_backend
 from mitosheet.mito_backend import MitoBackend, get_mito_backend
 from mitosheet.tests.test_utils import create_mito_wrapper_with_data, create_mito_wrapper
 from mitosheet.transpiler.transpile import transpile
@@ -188,4 +189,46 @@ def test_create_backend_with_code_options_works():
     code_options = get_default_code_options('tmp')
     code_options['call_function'] = False
     mito_backend = MitoBackend(code_options=code_options)
-    assert mito_backend.steps_manager.code_options == code_options
\ No newline at end of file
+    assert mito_backend.steps_manager.code_options == code_options
+
+def test_async_edit_pipeline_sends_response_before_shared_variables(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    mito.mito_backend.async_edit_pipeline = True
+
+    sent_messages = []
+    def write_analysis(steps_manager):
+        sent_messages.append('write_analysis')
+    monkeypatch.setattr(mitosheet.mito_backend, 'write_analysis', write_analysis)
+    monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message: sent_messages.append(message))
+
+    assert mito.add_column(0, 'B')
+
+    response, sheet_data_response, analysis_data_response, write = sent_messages
+    assert 'shared_variables' not in response
+    assert response['deferred_shared_variables'] == [sheet_data_response['id'], analysis_data_response['id']]
+    assert write == 'write_analysis'
+
+    shared_variables = mito.mito_backend.get_shared_state_variables()
+    assert sheet_data_response['shared_variables'] == {
+        'sheet_data_json': shared_variables['sheet_data_json'],
+        'sheet_data_version': sheet_data_response['shared_variables']['sheet_data_version']
+    }
+    assert analysis_data_response['shared_variables'] == {
+        'analysis_data_json': shared_variables['analysis_data_json'],
+        'analysis_data_version': analysis_data_response['shared_variables']['analysis_data_version'],
+        'user_profile_json': shared_variables['user_profile_json'],
+    }
+    assert json.loads(sheet_data_response['shared_variables']['sheet_data_json'])[0]['numColumns'] == 2
+
+
+def test_shared_variables_are_sent_with_response_by_default(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    assert not mito.mito_backend.async_edit_pipeline
+
+    sent_messages = []
+    monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message: sent_messages.append(message))
+    assert mito.add_column(0, 'B')
+
+    assert len(sent_messages) == 1
+    assert 'deferred_shared_variables' not in sent_messages[0]
+    assert set(sent_messages[0]['shared_variables'].keys()) == {'sheet_data_json', 'sheet_data_version', 'analysis_data_json', 'analysis_data_version', 'user_profile_json'}
@@ -1,9 +1,15 @@
+import base64
+import json
 import subprocess
 import os
+import re
+import zlib
 
 import pandas as pd
 import pytest
 
+import mitosheet.mito_backend
+
 from mitosheet.mito_backend import get_mito_frontend_code
 from mitosheet.steps_manager import StepsManager
 from mitosheet.tests.test_utils import create_mito_wrapper
@@ -48,4 +54,40 @@ def test_mito_frontend_is_valid_code(tmp_path, string):
     # we want to make sure that there are no failures in parsing, that it runs up to the 
     # ReferenceError: document is not defined 
     assert 'SyntaxError' not in err.decode('utf-8') 
-    assert 'ReferenceError' in err.decode('utf-8') 
\ No newline at end of file
+    assert 'ReferenceError' in err.decode('utf-8') 
+
+
+# The lines of jupyterRender.tsx that get_mito_frontend_code replaces, as they are in the built code
+BOOTSTRAP_CODE_TEMPLATE = """
+const bootstrapEncoding = "REPLACE_THIS_WITH_BOOTSTRAP_ENCODING";
+const sheetDataBase64 = "REPLACE_THIS_WITH_SHEET_DATA_BASE64";
+const analysisDataBase64 = "REPLACE_THIS_WITH_ANALYSIS_DATA_BASE64";
+const userProfileBase64 = "REPLACE_THIS_WITH_USER_PROFILE_BASE64";
+"""
+
+
+def read_bootstrap_payloads(code):
+    values = dict(re.findall(r'const (\w+) = "([^"]*)";', code))
+    def read_payload(payload_base64):
+        payload = base64.b64decode(payload_base64)
+        if values['bootstrapEncoding'] == 'zlib':
+            payload = zlib.decompress(payload)
+        return json.loads(payload.decode('utf8'))
+    return values['bootstrapEncoding'], read_payload(values['sheetDataBase64']), read_payload(values['analysisDataBase64']), read_payload(values['userProfileBase64'])
+
+
+@pytest.mark.parametrize('string_length, bootstrap_encoding', [(1, 'utf8'), (100, 'zlib')])
+def test_mito_frontend_code_has_base64_payloads(monkeypatch, string_length, bootstrap_encoding):
+    monkeypatch.setattr(mitosheet.mito_backend, 'js_code_from_file', BOOTSTRAP_CODE_TEMPLATE)
+    mito = create_mito_wrapper(pd.DataFrame({'A': [string * string_length for string in STRINGS_TO_TEST] * 100}))
+    code = get_mito_frontend_code('a', 'a', 'a', mito.mito_backend)
+
+    encoding, sheet_data_array, analysis_data, user_profile = read_bootstrap_payloads(code)
+    assert encoding == bootstrap_encoding
+    assert sheet_data_array == json.loads(mito.mito_backend.steps_manager.sheet_data_json)
+    assert analysis_data == json.loads(mito.mito_backend.steps_manager.analysis_data_json)
+    assert user_profile == json.loads(mito.mito_backend.get_user_profile_json())
+
+    # The payloads are at most a third larger than the json, rather than a list of every byte in it
+    payloads_length = len(mito.mito_backend.steps_manager.sheet_data_json.encode('utf8')) + len(mito.mito_backend.steps_manager.analysis_data_json.encode('utf8')) + len(mito.mito_backend.get_user_profile_json().encode('utf8'))
+    assert len(code) < len(BOOTSTRAP_CODE_TEMPLATE) + payloads_length * 4 / 3 + 10
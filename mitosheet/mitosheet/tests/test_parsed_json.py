@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for converting dataframes to the json that is sent to the frontend
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mitosheet.utils import convert_df_to_parsed_json, round_floats_like_to_json
+
+
+def convert_df_to_parsed_json_with_to_json(original_df, max_rows=None):
+    """
+    Converts the dataframe by writing it with to_json and reading it back, which
+    is the format that convert_df_to_parsed_json should have
+    """
+    df = original_df.head(max_rows) if max_rows is not None else original_df
+    df = df.copy(deep=True)
+    for column_index in range(len(df.columns)):
+        dtype = str(df.dtypes.iloc[column_index])
+        if 'datetime' in dtype:
+            df.isetitem(column_index, df.iloc[:, column_index].dt.strftime('%Y-%m-%d %X'))
+        elif 'timedelta' in dtype:
+            df.isetitem(column_index, df.iloc[:, column_index].apply(lambda x: str(x)))
+    if isinstance(df.index, pd.DatetimeIndex):
+        df.index = df.index.strftime('%Y-%m-%d %X')
+    elif isinstance(df.index, pd.TimedeltaIndex):
+        df.index = df.index.to_series().apply(lambda x: str(x))
+
+    json_obj = json.loads(df.to_json(orient="split"))
+    json_obj['data'] = [['NaN' if e is None else e for e in row] for row in json_obj['data']]
+    return json_obj
+
+
+PARSED_JSON_TESTS = [
+    pd.DataFrame({
+        'ints': [1, 2, 3, -4, 5],
+        'uints': np.array([1, 2, 3, 2 ** 64 - 1, 0], dtype=np.uint64),
+        'bools': [True, False, True, True, False],
+        'floats': [1.5, np.nan, np.inf, -np.inf, 0.1 + 0.2],
+        'float32s': np.array([0.1, 1 / 3, np.nan, np.inf, 5], dtype=np.float32),
+    }),
+    pd.DataFrame({
+        'strings': ['a', None, np.nan, 'd', 'e'],
+        'mixed': [1, 'a', None, 2.5, [1, 2]],
+        'categories': pd.Categorical(['a', 'b', None, 'a', 'b']),
+        'nullable ints': pd.array([1, None, 3, 4, 5], dtype='Int64'),
+        'nullable strings': pd.array(['a', None, 'c', 'd', 'e'], dtype='string'),
+    }),
+    pd.DataFrame({
+        'dates': pd.to_datetime(['2020-01-01 10:11:12.9', '1900-02-03 00:00:00', None, '2262-01-01 00:00:00', '1969-12-31 23:59:59.5'], format='ISO8601'),
+        'timezone dates': pd.date_range('2020-03-08', periods=5, freq='7h', tz='US/Eastern'),
+        'null dates': pd.to_datetime([None] * 5),
+        'second dates': np.array(['0500-01-01', '2020-01-01', 'NaT', '1999-12-31T23:59:59', '2000-01-01'], dtype='datetime64[s]'),
+        'timedeltas': pd.to_timedelta(['1 days', '1.5s', None, '-3h', '0s']),
+        'day timedeltas': pd.to_timedelta(['1 days', '2 days', '3 days', '4 days', '5 days']),
+    }, index=pd.date_range('2020-01-01', periods=5)),
+    pd.DataFrame({'A': [1, 2]}, index=pd.to_timedelta(['1 days', '2 days'])),
+    pd.DataFrame({'A': [1, 2, 3, 4, 5]}, index=pd.MultiIndex.from_tuples([(1, 'a'), (1, 'b'), (2, 'a'), (2, 'b'), (3, 'c')])),
+    pd.DataFrame([[1, 2, 3]], columns=['A', 'A', pd.Timestamp('2020-01-01')], index=[1.5]),
+    pd.DataFrame(index=[1, 2]),
+    pd.DataFrame({'A': []}),
+]
+
+
+@pytest.mark.parametrize("df", PARSED_JSON_TESTS)
+def test_convert_df_to_parsed_json_matches_to_json(df):
+    assert convert_df_to_parsed_json(df) == convert_df_to_parsed_json_with_to_json(df)
+    assert convert_df_to_parsed_json(df, max_rows=2) == convert_df_to_parsed_json_with_to_json(df, max_rows=2)
+
+
+def test_round_floats_like_to_json():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        rng.standard_normal(10000) * 10.0 ** rng.integers(-20, 25, 10000),
+        # Decimals that are exactly halfway between two roundings
+        rng.integers(-10 ** 9, 10 ** 9, 10000) / 10 ** 11,
+        rng.integers(-10 ** 16, 10 ** 16, 10000) / 10 ** rng.integers(0, 8, 10000),
+        [0.0, -0.0, 1e16 - 1, 1e16, 1e-15, 9.99e-16, 0.999999999995, 900719.99999999999],
+    ])
+    expected = [value for value, in json.loads(pd.DataFrame({'A': values}).to_json(orient="split"))['data']]
+    assert round_floats_like_to_json(values).tolist() == expected
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for restoring steps that hold valid states without executing them again
+"""
+import pandas as pd
+
+from mitosheet.tests.test_step_dependencies import count_step_executions
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+
+
+def get_mito_with_many_steps(num_steps=20):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}))
+    for i in range(num_steps):
+        mito.add_column(0, f'B{i}')
+        mito.set_formula(f'=A + {i}', 0, f'B{i}')
+    return mito
+
+
+def test_undo_clear_restores_steps_without_executing(monkeypatch):
+    mito = get_mito_with_many_steps()
+    steps = mito.mito_backend.steps_manager.steps_including_skipped
+    mito.clear()
+    assert mito.dfs[0].columns.tolist() == ['A']
+
+    executed_step_types = count_step_executions(monkeypatch)
+    mito.undo()
+
+    assert executed_step_types == []
+    assert all(step is restored_step for step, restored_step in zip(steps, mito.mito_backend.steps_manager.steps_including_skipped))
+    assert mito.mito_backend.steps_manager.curr_step_idx == 40
+    assert mito.dfs[0]['B19'].tolist() == [20, 21, 22, 23]
+
+
+def test_undo_to_step_index_and_redo_without_executing(monkeypatch):
+    mito = get_mito_with_many_steps()
+    executed_step_types = count_step_executions(monkeypatch)
+
+    mito.undo_to_step_index(10)
+    assert mito.dfs[0].columns.tolist() == ['A', 'B0', 'B1', 'B2', 'B3', 'B4']
+    assert mito.mito_backend.steps_manager.curr_step_idx == 10
+
+    mito.redo()
+    assert mito.dfs[0]['B19'].tolist() == [20, 21, 22, 23]
+    assert executed_step_types == []
+
+
+def test_undo_to_step_index_reexecutes_steps_that_are_no_longer_skipped(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}))
+    mito.mito_backend.steps_manager.step_execution_cache = None
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 1)
+    mito.add_column(0, 'B')
+    mito.set_formula('=A * 2', 0, 'B')
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 2)
+    mito.add_column(0, 'C')
+    assert mito.dfs[0]['B'].tolist() == [6, 8]
+
+    executed_step_types = count_step_executions(monkeypatch)
+    mito.undo_to_step_index(3)
+
+    # The first filter is no longer skipped, so the steps after it are executed again
+    assert executed_step_types == ['add_column', 'set_column_formula']
+    assert mito.dfs[0]['B'].tolist() == [4, 6, 8]
+    assert mito.dfs[0].columns.tolist() == ['A', 'B']
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for sending patches of the shared state to the frontend
+"""
+import json
+
+import pandas as pd
+
+from mitosheet.tests.test_utils import create_mito_wrapper
+
+
+def apply_sheet_data_patch(sheet_data_array, sheet_data_patch):
+    """
+    Applies the patch to the sheet data, like the frontend does
+    """
+    new_sheet_data_array = []
+    for sheet_index in range(sheet_data_patch['numSheets']):
+        sheet_patch = sheet_data_patch['sheets'].get(str(sheet_index))
+        if sheet_patch is None:
+            new_sheet_data_array.append(sheet_data_array[sheet_index])
+            continue
+        previous_sheet_data = sheet_data_array[sheet_index] if sheet_index < len(sheet_data_array) else {'data': [], 'index': []}
+        previous_column_data = {column['columnID']: column['columnData'] for column in previous_sheet_data['data']}
+        new_sheet_data_array.append({
+            **sheet_patch,
+            'data': [{**column, 'columnData': column.get('columnData', previous_column_data.get(column['columnID']))} for column in sheet_patch['data']],
+            'index': sheet_patch.get('index', previous_sheet_data['index'])
+        })
+    return new_sheet_data_array
+
+
+def apply_analysis_data_patch(analysis_data, analysis_data_patch):
+    """
+    Applies the patch to the analysis data, like the frontend does
+    """
+    new_analysis_data = {**analysis_data, **analysis_data_patch['values']}
+    for key, list_patch in analysis_data_patch['lists'].items():
+        new_list = analysis_data[key][:list_patch['length']]
+        new_list += [None] * (list_patch['length'] - len(new_list))
+        for index, item in list_patch['items'].items():
+            new_list[int(index)] = item
+        new_analysis_data[key] = new_list
+    return new_analysis_data
+
+
+class PatchedFrontend():
+    """
+    Sends shared state variable requests to the backend like the frontend does, and
+    keeps the sheet data and analysis data up to date from the responses.
+    """
+
+    def __init__(self, mito, monkeypatch, frontend_id='frontend_id'):
+        self.mito = mito
+        self.frontend_id = frontend_id
+        self.versions = {'sheet_data': None, 'analysis_data': None}
+        self.sheet_data_array = None
+        self.analysis_data = None
+        self.sent_messages = []
+        monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message: self.sent_messages.append(message))
+
+    def update(self):
+        self.mito.mito_backend.send_shared_state_variables_response({
+            'id': 'test_id',
+            'frontend_id': self.frontend_id,
+            'shared_state_versions': dict(self.versions)
+        })
+        shared_variables = self.sent_messages[-1]['shared_variables']
+
+        if 'sheet_data_json' in shared_variables:
+            self.sheet_data_array = json.loads(shared_variables['sheet_data_json'])
+        else:
+            assert shared_variables['sheet_data_base_version'] == self.versions['sheet_data']
+            self.sheet_data_array = apply_sheet_data_patch(self.sheet_data_array, json.loads(shared_variables['sheet_data_patch_json']))
+        self.versions['sheet_data'] = shared_variables['sheet_data_version']
+
+        if 'analysis_data_json' in shared_variables:
+            self.analysis_data = json.loads(shared_variables['analysis_data_json'])
+        else:
+            assert shared_variables['analysis_data_base_version'] == self.versions['analysis_data']
+            self.analysis_data = apply_analysis_data_patch(self.analysis_data, json.loads(shared_variables['analysis_data_patch_json']))
+        self.versions['analysis_data'] = shared_variables['analysis_data_version']
+
+        return shared_variables
+
+    def assert_up_to_date(self):
+        assert self.sheet_data_array == json.loads(self.mito.mito_backend.steps_manager.sheet_data_json)
+        assert self.analysis_data == json.loads(self.mito.mito_backend.steps_manager.analysis_data_json)
+
+
+def test_patches_keep_the_frontend_up_to_date(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3], 'B': ['a', 'b', 'c']}), pd.DataFrame({'C': [1.5]}))
+    frontend = PatchedFrontend(mito, monkeypatch)
+
+    shared_variables = frontend.update()
+    assert 'sheet_data_json' in shared_variables and 'analysis_data_json' in shared_variables
+    frontend.assert_up_to_date()
+
+    edits = [
+        lambda: mito.add_column(0, 'D'),
+        lambda: mito.set_formula('=A + 1', 0, 'D', add_column=False),
+        lambda: mito.sort(0, 'B', 'descending'),
+        lambda: mito.add_column(1, 'E'),
+        lambda: mito.delete_columns(0, ['B']),
+        lambda: mito.delete_dataframe(1),
+        lambda: mito.undo(),
+        lambda: mito.clear(),
+    ]
+    for edit in edits:
+        assert edit()
+        shared_variables = frontend.update()
+        assert 'sheet_data_patch_json' in shared_variables and 'analysis_data_patch_json' in shared_variables
+        frontend.assert_up_to_date()
+
+
+def test_sheet_data_patch_only_has_changed_columns(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3], 'B': ['a', 'b', 'c']}), pd.DataFrame({'C': [1.5]}))
+    frontend = PatchedFrontend(mito, monkeypatch)
+    frontend.update()
+
+    mito.add_column(0, 'D')
+    shared_variables = frontend.update()
+
+    # Sheets may be in the patch even if they are not modified, but only the columns with new data have their data
+    sheet_data_patch = json.loads(shared_variables['sheet_data_patch_json'])
+    columns_with_data = [column['columnID'] for sheet_patch in sheet_data_patch['sheets'].values() for column in sheet_patch['data'] if 'columnData' in column]
+    assert columns_with_data == ['D']
+    assert all('index' not in sheet_patch for sheet_patch in sheet_data_patch['sheets'].values())
+
+    analysis_data_patch = json.loads(shared_variables['analysis_data_patch_json'])
+    assert list(analysis_data_patch['lists']['stepSummaryList']['items'].keys()) == [str(len(frontend.analysis_data['stepSummaryList']) - 1)]
+    frontend.assert_up_to_date()
+
+
+def test_resyncs_frontend_without_a_version(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    frontend = PatchedFrontend(mito, monkeypatch)
+    frontend.update()
+    mito.add_column(0, 'B')
+    assert 'sheet_data_patch_json' in frontend.update()
+
+    # A frontend without a version, or that says it has a version we did not send it, gets the full state
+    frontend.versions = {'sheet_data': None, 'analysis_data': 10 ** 6}
+    shared_variables = frontend.update()
+    assert 'sheet_data_json' in shared_variables and 'analysis_data_json' in shared_variables
+    frontend.assert_up_to_date()
+
+    # As does a different frontend, and a message without a frontend id
+    other_frontend = PatchedFrontend(mito, monkeypatch, frontend_id='other_frontend_id')
+    other_frontend.versions = dict(frontend.versions)
+    assert 'sheet_data_json' in other_frontend.update()
+    mito.mito_backend.send_shared_state_variables_response({'id': 'test_id'})
+    assert 'sheet_data_json' in other_frontend.sent_messages[-1]['shared_variables']
+
+
+def test_get_shared_state_variables_has_full_state():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    mito.add_column(0, 'B')
+    shared_state_variables = mito.mito_backend.get_shared_state_variables()
+    assert shared_state_variables['sheet_data_json'] == mito.mito_backend.steps_manager.sheet_data_json
+    assert shared_state_variables['analysis_data_json'] == mito.mito_backend.steps_manager.analysis_data_json
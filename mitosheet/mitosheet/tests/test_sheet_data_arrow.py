@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for sending the sheet data with Arrow buffers
+"""
+import base64
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.utils import get_parsed_json_column, is_pyarrow_installed
+
+pytestmark = pytest.mark.skipif(not is_pyarrow_installed(), reason='requires pyarrow')
+
+
+def read_sheet_data_buffers(sheet_data_json, buffers):
+    """
+    Reads the columns in the buffers back into the sheet data, like the frontend does
+    """
+    import pyarrow as pa
+
+    sheet_data_array = json.loads(sheet_data_json)
+    for sheet_data in sheet_data_array:
+        if 'columnDataBufferIndex' not in sheet_data:
+            continue
+        table = pa.ipc.open_stream(buffers[sheet_data.pop('columnDataBufferIndex')]).read_all()
+        for column in sheet_data['data']:
+            if column.pop('columnDataInBuffer', False):
+                column['columnData'] = ['NaN' if value is None else value for value in table.column(column['columnID']).to_pylist()]
+    return sheet_data_array
+
+
+def test_sheet_data_buffers_read_back_to_sheet_data_json():
+    df = pd.DataFrame({
+        'ints': [1, 2, 3, -4],
+        'floats': [1.5, np.nan, np.inf, 0.1 + 0.2],
+        'float32s': np.array([0.1, 2, 3, 4], dtype=np.float32),
+        'bools': [True, False, True, False],
+        'strings': ['a', 'b', 'c', 'd'],
+        'dates': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-04']),
+    })
+    mito = create_mito_wrapper(df, pd.DataFrame({'strings': ['a']}))
+    steps_manager = mito.mito_backend.steps_manager
+
+    sheet_data_json_with_buffers, buffers = steps_manager.get_sheet_data_json_and_buffers()
+    assert len(buffers) == 1
+
+    sheet_data_array = json.loads(sheet_data_json_with_buffers)
+    assert sheet_data_array[0]['data'][0]['columnData'] == []
+    assert sheet_data_array[0]['data'][4]['columnData'] == ['a', 'b', 'c', 'd']
+    assert 'columnDataBufferIndex' not in sheet_data_array[1]
+
+    assert read_sheet_data_buffers(sheet_data_json_with_buffers, buffers) == json.loads(steps_manager.sheet_data_json)
+
+
+def test_arrow_sheet_data_sends_base64_buffers_in_shared_variables(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    assert mito.add_column(0, 'B')
+    mito.mito_backend.arrow_sheet_data = True
+
+    sent_messages = []
+    monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message: sent_messages.append(message))
+    mito.mito_backend.send_shared_state_variables_response({'id': 'test_id'})
+
+    shared_variables = sent_messages[-1]['shared_variables']
+    buffers = [base64.b64decode(buffer) for buffer in shared_variables['sheet_data_buffers']]
+    sheet_data_array = read_sheet_data_buffers(shared_variables['sheet_data_json'], buffers)
+    assert sheet_data_array == json.loads(mito.mito_backend.steps_manager.sheet_data_json)
+    assert sheet_data_array[0]['data'][0]['columnData'] == [1, 2, 3]
+
+
+def test_arrow_sheet_data_sends_binary_buffers_over_the_comm(monkeypatch):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    assert mito.add_column(0, 'B')
+    mito.mito_backend.arrow_sheet_data = True
+    mito.mito_backend.mito_send_supports_buffers = True
+
+    sent_messages = []
+    monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message, buffers=None: sent_messages.append((message, buffers)))
+    mito.mito_backend.send_shared_state_variables_response({'id': 'test_id'})
+
+    message, buffers = sent_messages[-1]
+    assert 'sheet_data_buffers' not in message['shared_variables']
+    assert len(buffers) == 1
+    sheet_data_array = read_sheet_data_buffers(message['shared_variables']['sheet_data_json'], buffers)
+    assert sheet_data_array == json.loads(mito.mito_backend.steps_manager.sheet_data_json)
+
+
+def test_columns_in_sheet_data_buffers_are_not_serialized_as_json():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3], 'B': ['a', 'b', 'c']}))
+    assert mito.set_formula('=A * 2', 0, 'A')
+    steps_manager = mito.mito_backend.steps_manager
+
+    with patch('mitosheet.sheet_data_cache.get_parsed_json_column', wraps=get_parsed_json_column) as mock_get_parsed_json_column:
+        sheet_data_json_with_buffers, buffers = steps_manager.get_sheet_data_json_and_buffers()
+        # Undoing changes column A, which is still not serialized as json
+        steps_manager.execute_undo()
+        sheet_data_json_with_buffers_after_undo, buffers_after_undo = steps_manager.get_sheet_data_json_and_buffers()
+
+    assert mock_get_parsed_json_column.call_count == 0
+    assert (0, 'A') not in steps_manager.sheet_data_column_cache.entries
+
+    sheet_data_array = json.loads(sheet_data_json_with_buffers)
+    assert sheet_data_array[0]['data'][0]['columnDataInBuffer']
+    assert 'columnDataInBuffer' not in sheet_data_array[0]['data'][1]
+    assert read_sheet_data_buffers(sheet_data_json_with_buffers, buffers)[0]['data'][0]['columnData'] == [2, 4, 6]
+    assert read_sheet_data_buffers(sheet_data_json_with_buffers_after_undo, buffers_after_undo)[0]['data'][0]['columnData'] == [1, 2, 3]
+    assert read_sheet_data_buffers(sheet_data_json_with_buffers_after_undo, buffers_after_undo) == json.loads(steps_manager.sheet_data_json)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for caching the serialized data of each column in the sheet data
+"""
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mitosheet.api.get_search_matches import get_search_matches
+from mitosheet.pro.conditional_formatting_utils import ConditionalFormattingResultCache, get_conditonal_formatting_result
+from mitosheet.search_column_cache import SearchColumnCache
+from mitosheet.step_performers import STEP_PERFORMERS
+from mitosheet.step_performers.step_performer import StepPerformer
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+from mitosheet.utils import NpEncoder, dfs_to_array_for_json
+
+
+def get_uncached_sheet_data_json(steps_manager):
+    curr_step = steps_manager.curr_step
+    return json.dumps(dfs_to_array_for_json(
+        curr_step.final_defined_state,
+        set(range(len(curr_step.dfs))),
+        [],
+        curr_step.dfs,
+        curr_step.df_names,
+        curr_step.df_sources,
+        curr_step.column_formulas,
+        curr_step.column_filters,
+        curr_step.column_ids,
+        curr_step.df_formats,
+    ), cls=NpEncoder)
+
+
+def test_only_modified_columns_are_serialized():
+    df = pd.DataFrame({f'C{i}': np.arange(2000) * i for i in range(400)})
+    mito = create_mito_wrapper(df)
+    steps_manager = mito.mito_backend.steps_manager
+    column_cache = steps_manager.sheet_data_column_cache
+    assert column_cache.num_columns_serialized == 400
+
+    mito.set_formula('=C1 + 1', 0, 'C2')
+    steps_manager.sheet_data_json
+    assert column_cache.num_columns_serialized == 401
+
+    mito.add_column(0, 'new')
+    steps_manager.sheet_data_json
+    assert column_cache.num_columns_serialized == 402
+
+    # Undo is more than one step, so the sheet is serialized, but only the changed column is
+    mito.undo()
+    mito.undo()
+    steps_manager.sheet_data_json
+    assert column_cache.num_columns_serialized == 403
+
+    assert steps_manager.sheet_data_json == get_uncached_sheet_data_json(steps_manager)
+
+
+def test_cached_sheet_data_matches_uncached_sheet_data():
+    df = pd.DataFrame({
+        'A': [1.5, np.nan, 3.0, np.inf],
+        'B': pd.to_datetime(['2020-01-01', '2020-01-02', None, '2020-01-04']),
+        'C': pd.to_timedelta([1, 2, 3, 4], unit='d'),
+        'D': ['a', None, 'c', 'd'],
+        'E': pd.array([1, None, 3, 4], dtype='Int64'),
+        'F': [True, False, True, False],
+    }, index=pd.date_range('2021-01-01', periods=4))
+    mito = create_mito_wrapper(df, pd.DataFrame({'A': [1, 2, 3]}))
+    steps_manager = mito.mito_backend.steps_manager
+    assert steps_manager.sheet_data_json == get_uncached_sheet_data_json(steps_manager)
+
+    mito.set_formula('=A * 2', 0, 'G', add_column=True)
+    mito.rename_column(0, 'D', 'DD')
+    mito.delete_columns(0, ['E'])
+    mito.set_formula('=A + 1', 1, 'A')
+    assert steps_manager.sheet_data_json == get_uncached_sheet_data_json(steps_manager)
+
+    mito.delete_dataframe(1)
+    assert steps_manager.sheet_data_json == get_uncached_sheet_data_json(steps_manager)
+    assert {sheet_index for (sheet_index, _) in steps_manager.sheet_data_column_cache.entries} == {0}
+
+
+# An edit for each step that only deep copies the columns it modifies (see get_modified_column_ids)
+MODIFIED_COLUMN_EDITS = {
+    'set_cell_value': lambda mito: mito.set_cell_value(0, 'A', 1, 10),
+    'fill_na': lambda mito: mito.fill_na(0, ['A', 'B'], {'type': 'value', 'value': 0}),
+    'set_column_formula': lambda mito: mito.set_formula('=C + 1', 0, 'A'),
+    'rename_column': lambda mito: mito.rename_column(0, 'A', 'AA'),
+    'reorder_column': lambda mito: mito.reorder_column(0, 'A', 2),
+    'delete_column': lambda mito: mito.delete_columns(0, ['A']),
+    'change_column_dtype': lambda mito: mito.change_column_dtype(0, ['A'], 'int'),
+    'add_column': lambda mito: mito.add_column(0, 'D'),
+}
+
+def test_every_step_with_modified_columns_has_an_edit():
+    assert MODIFIED_COLUMN_EDITS.keys() == {
+        step_performer.step_type() for step_performer in STEP_PERFORMERS
+        if step_performer.get_modified_column_ids.__func__ is not StepPerformer.get_modified_column_ids.__func__
+    }
+
+def get_cached_and_uncached_results(steps_manager, conditional_formatting_cache):
+    conditional_formats = [{'format_uuid': '1', 'columnIDs': ['A', 'B', 'C'], 'filters': [{'condition': FC_NUMBER_GREATER, 'value': 2}], 'color': None, 'backgroundColor': 'blue'}]
+    state = steps_manager.curr_step.final_defined_state
+    uncached_steps_manager = SimpleNamespace(dfs=steps_manager.dfs, search_column_cache=SearchColumnCache())
+    return (
+        (
+            steps_manager.sheet_data_json,
+            get_search_matches({'sheet_index': 0, 'search_value': '3'}, steps_manager),
+            get_conditonal_formatting_result(state, 0, state.dfs[0], conditional_formats, conditional_formatting_cache=conditional_formatting_cache),
+        ),
+        (
+            get_uncached_sheet_data_json(steps_manager),
+            get_search_matches({'sheet_index': 0, 'search_value': '3'}, uncached_steps_manager),
+            get_conditonal_formatting_result(state, 0, state.dfs[0], conditional_formats),
+        )
+    )
+
+@pytest.mark.parametrize("step_type", MODIFIED_COLUMN_EDITS.keys())
+def test_steps_with_modified_columns_do_not_write_to_shared_columns(step_type):
+    # NOTE: as many rows as the columns some edits modify, so that mixing up rows and columns changes the other columns
+    df = pd.DataFrame({'A': [1.0, None], 'B': [None, 2.0], 'C': [None, 3.0]})
+    mito = create_mito_wrapper(df.copy())
+    steps_manager = mito.mito_backend.steps_manager
+    conditional_formatting_cache = ConditionalFormattingResultCache()
+    get_cached_and_uncached_results(steps_manager, conditional_formatting_cache)
+
+    MODIFIED_COLUMN_EDITS[step_type](mito)
+
+    assert steps_manager.curr_step.step_type == step_type
+    assert steps_manager.steps_including_skipped[0].dfs[0].equals(df)
+    cached_results, uncached_results = get_cached_and_uncached_results(steps_manager, conditional_formatting_cache)
+    assert cached_results == uncached_results
+
+    mito.undo()
+    assert mito.dfs[0].equals(df)
+    cached_results, uncached_results = get_cached_and_uncached_results(steps_manager, conditional_formatting_cache)
+    assert cached_results == uncached_results
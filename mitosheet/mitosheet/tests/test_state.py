@@ -6,7 +6,9 @@
 """
 Contains tests for the state class
 """
-from mitosheet.state import DATAFRAME_SOURCE_IMPORTED, DATAFRAME_SOURCE_PASSED, State
+from mitosheet.state import DATAFRAME_SOURCE_IMPORTED, DATAFRAME_SOURCE_PASSED, State, is_pandas_copy_on_write_enabled
+from mitosheet.tests.test_utils import create_mito_wrapper
+import numpy as np
 import pandas as pd
 
 def test_state_can_add_df_to_end():
@@ -29,3 +31,50 @@ def test_state_can_add_df_to_middle():
     
     assert state.df_sources == [DATAFRAME_SOURCE_IMPORTED]
 
+def test_state_copy_only_deep_copies_passed_column_ids():
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6], 'C': ['a', 'b', 'c']})
+    state = State([df], 3)
+    new_state = state.copy(deep_sheet_indexes=[0], deep_column_ids={0: ['A']})
+
+    new_state.dfs[0].at[0, 'A'] = 100
+    new_state.dfs[0].loc[new_state.dfs[0]['B'] > 4, 'A'] = 200
+    assert state.dfs[0].equals(pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6], 'C': ['a', 'b', 'c']}))
+    assert new_state.dfs[0]['A'].tolist() == [100, 200, 200]
+
+    if not is_pandas_copy_on_write_enabled() and hasattr(df, 'isetitem'):
+        assert np.shares_memory(state.dfs[0]['B'].values, new_state.dfs[0]['B'].values)
+        assert not np.shares_memory(state.dfs[0]['A'].values, new_state.dfs[0]['A'].values)
+
+def test_state_copy_with_deep_column_ids_can_change_columns():
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6], 'C': ['a', 'b', 'c']})
+    state = State([df], 3)
+    new_state = state.copy(deep_sheet_indexes=[0], deep_column_ids={0: []})
+
+    new_state.dfs[0].drop(['B'], axis=1, inplace=True)
+    new_state.dfs[0].rename(columns={'C': 'D'}, inplace=True)
+    new_state.dfs[0].insert(0, 'E', 0)
+    assert state.dfs[0].columns.tolist() == ['A', 'B', 'C']
+    assert new_state.dfs[0].columns.tolist() == ['E', 'A', 'D']
+
+def test_state_copy_with_duplicated_column_headers_deep_copies():
+    df = pd.DataFrame([[1, 2, 3]], columns=['A', 'A', 'B'])
+    state = State([df], 3)
+    new_state = state.copy(deep_sheet_indexes=[0], deep_column_ids={0: list(state.column_ids.get_column_ids(0))})
+    new_state.dfs[0].iloc[0, 0] = 100
+    assert state.dfs[0].iloc[0, 0] == 1
+
+def test_column_steps_do_not_change_previous_states():
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6], 'C': [7.0, None, 9.0]})
+    mito = create_mito_wrapper(df)
+    mito.set_formula('=B + 1', 0, 'A')
+    mito.set_cell_value(0, 'B', 0, 10)
+    mito.fill_na(0, ['C'], {'type': 'value', 'value': 0})
+    mito.change_column_dtype(0, ['A'], 'float')
+
+    assert mito.mito_backend.steps_manager.steps_including_skipped[0].dfs[0].equals(df)
+    assert mito.mito_backend.steps_manager.steps_including_skipped[1].dfs[0]['A'].tolist() == [5, 6, 7]
+    assert mito.mito_backend.steps_manager.steps_including_skipped[1].dfs[0]['B'].tolist() == [4, 5, 6]
+    assert mito.mito_backend.steps_manager.steps_including_skipped[2].dfs[0]['B'].tolist() == [10, 5, 6]
+    assert mito.mito_backend.steps_manager.steps_including_skipped[3].dfs[0]['C'].tolist() == [7.0, 0, 9.0]
+    assert mito.mito_backend.steps_manager.steps_including_skipped[3].dfs[0]['A'].dtype == 'int64'
+    assert mito.dfs[0]['A'].dtype == 'float64'
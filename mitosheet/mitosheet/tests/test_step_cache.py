@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for the step execution cache
+"""
+import pandas as pd
+
+from mitosheet.state import State
+from mitosheet.step_cache import StepExecutionCache, get_sheet_content_fingerprint
+from mitosheet.tests.test_step_dependencies import count_step_executions
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+
+
+def get_mito_with_formula_steps(num_steps=3):
+    df1 = pd.DataFrame({'A': [1, 2, 3, 4]})
+    df2 = pd.DataFrame({'A': [5, 6, 7, 8]})
+    mito = create_mito_wrapper(df1, df2)
+    for i in range(num_steps):
+        mito.add_column(0, f'B{i}')
+        mito.set_formula(f'=A + {i}', 0, f'B{i}')
+    mito.filter(1, 'A', 'And', FC_NUMBER_GREATER, 5)
+    return mito
+
+
+def get_steps_data(mito):
+    return [
+        {'step_type': step.step_type, 'params': step.params}
+        for step in mito.mito_backend.steps_manager.steps_including_skipped[1:]
+    ]
+
+
+def test_replaying_steps_hits_cache(monkeypatch):
+    mito = get_mito_with_formula_steps()
+    steps_manager = mito.mito_backend.steps_manager
+    steps_data = get_steps_data(mito)
+    dfs = [df.copy() for df in mito.dfs]
+
+    mito.clear()
+    assert mito.dfs[0].columns.tolist() == ['A']
+
+    executed_step_types = count_step_executions(monkeypatch)
+    steps_manager.execute_steps_data(new_steps_data=steps_data)
+
+    assert executed_step_types == []
+    assert steps_manager.get_step_cache_stats()['hit_count'] == 7
+    for df, replayed_df in zip(dfs, mito.dfs):
+        assert df.equals(replayed_df)
+    assert 'df1[\'B2\'] = df1[\'A\'] + 2' in mito.transpiled_code
+
+
+def test_changed_input_sheet_misses_cache(monkeypatch):
+    mito = get_mito_with_formula_steps()
+    steps_manager = mito.mito_backend.steps_manager
+    steps_data = get_steps_data(mito)
+
+    mito.clear()
+    mito.set_cell_value(0, 'A', 0, 10)
+
+    executed_step_types = count_step_executions(monkeypatch)
+    steps_manager.execute_steps_data(new_steps_data=steps_data)
+
+    # Only the filter on the second sheet reads a sheet that did not change
+    assert executed_step_types == ['add_column', 'set_column_formula'] * 3
+    assert mito.dfs[0]['B2'].tolist() == [12, 4, 5, 6]
+    assert mito.dfs[1]['A'].tolist() == [6, 7, 8]
+
+
+def test_cache_evicts_least_recently_used():
+    mito = get_mito_with_formula_steps()
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.step_execution_cache = StepExecutionCache(2)
+
+    for i in range(3):
+        mito.add_column(0, f'C{i}')
+
+    stats = steps_manager.get_step_cache_stats()
+    assert stats['size'] == 2
+    assert stats['max_size'] == 2
+    assert stats['eviction_count'] > 0
+    assert stats['miss_count'] == 3
+
+
+def test_cache_turned_off():
+    mito = get_mito_with_formula_steps()
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.step_execution_cache = None
+
+    mito.add_column(0, 'C')
+    assert steps_manager.get_step_cache_stats() is None
+    assert mito.dfs[0].columns.tolist()[-1] == 'C'
+
+
+def test_fingerprint_tells_apart_object_values_with_same_string():
+    fingerprints = [
+        get_sheet_content_fingerprint(State([df], 3), 0) for df in [
+            pd.DataFrame({'A': pd.Series([1, 2], dtype=object)}),
+            pd.DataFrame({'A': ['1', '2']}),
+            pd.DataFrame({'A': [1, 2]}, index=pd.Index([1, 2], dtype=object)),
+            pd.DataFrame({'A': [1, 2]}, index=pd.Index(['1', '2'], dtype=object)),
+        ]
+    ]
+    assert None not in fingerprints
+    assert len(set(fingerprints)) == 4
+
+
+def test_cached_states_are_removed_when_over_memory_budget():
+    mito = get_mito_with_formula_steps()
+    steps_manager = mito.mito_backend.steps_manager
+    mito.clear()
+    num_cached_steps = steps_manager.get_step_cache_stats()['size']
+    assert num_cached_steps > 0
+
+    # The cached states are within the budget, so they are kept
+    steps_manager.step_history_memory_budget = 1_000_000_000
+    steps_manager.enforce_step_history_memory_budget()
+    assert steps_manager.get_step_cache_stats()['size'] == num_cached_steps
+
+    # But once over the budget, the cached states that are not in the step history are removed
+    steps_manager.step_history_memory_budget = 0
+    steps_manager.enforce_step_history_memory_budget()
+    assert all(
+        cached_step.post_state is steps_manager.curr_step.post_state 
+        for cached_step in steps_manager.step_execution_cache.entries.values()
+    )
+    assert steps_manager.get_step_cache_stats()['size'] < num_cached_steps
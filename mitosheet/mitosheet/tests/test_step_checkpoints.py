@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for keeping the step history within a memory budget
+"""
+import pandas as pd
+
+from mitosheet.tests.test_utils import create_mito_wrapper
+
+
+def get_mito_with_formula_steps(memory_budget, num_steps=12, checkpoint_interval=5):
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6]})
+    mito = create_mito_wrapper(df)
+    mito.mito_backend.steps_manager.step_history_memory_budget = memory_budget
+    mito.mito_backend.steps_manager.step_history_checkpoint_interval = checkpoint_interval
+    for i in range(num_steps):
+        mito.add_column(0, f'C{i}')
+        mito.set_formula(f'=A + {i}', 0, f'C{i}')
+    return mito
+
+
+def test_no_memory_budget_keeps_every_state():
+    mito = get_mito_with_formula_steps(None)
+    report = mito.mito_backend.steps_manager.get_step_memory_report()
+    assert report['memory_budget'] is None
+    assert all(step_report['in_memory'] for step_report in report['steps'])
+    assert report['total_memory_usage'] > 0
+
+
+def test_memory_budget_only_keeps_checkpoints():
+    mito = get_mito_with_formula_steps(0)
+    steps_manager = mito.mito_backend.steps_manager
+    checkpoint_step_indexes = steps_manager.get_checkpoint_step_indexes()
+
+    assert checkpoint_step_indexes == {0, 5, 10, 15, 20, 24}
+    for step_index, step in enumerate(steps_manager.steps_including_skipped):
+        assert step.post_state.dfs_evicted == (step_index not in checkpoint_step_indexes)
+
+    report = steps_manager.get_step_memory_report()
+    assert [step_report['step_idx'] for step_report in report['steps'] if step_report['in_memory']] == [0, 5, 10, 15, 20, 24]
+    assert all(step_report['memory_usage'] == 0 for step_report in report['steps'] if not step_report['in_memory'])
+
+
+def test_dropped_states_are_rebuilt_when_accessed():
+    mito = get_mito_with_formula_steps(0)
+    mito_no_budget = get_mito_with_formula_steps(None)
+
+    for step, step_no_budget in zip(mito.mito_backend.steps_manager.steps_including_skipped, mito_no_budget.mito_backend.steps_manager.steps_including_skipped):
+        assert step.dfs[0].equals(step_no_budget.dfs[0])
+        assert step.column_formulas == step_no_budget.column_formulas
+
+    assert mito.transpiled_code == mito_no_budget.transpiled_code
+
+
+def test_checkout_and_undo_with_memory_budget():
+    mito = get_mito_with_formula_steps(0)
+    steps_manager = mito.mito_backend.steps_manager
+
+    mito.checkout_step_by_idx(3)
+    assert mito.dfs[0].columns.tolist() == ['A', 'B', 'C0', 'C1']
+    assert mito.dfs[0]['C1'].tolist() == [0, 0, 0]
+
+    mito.checkout_step_by_idx(-1)
+    assert steps_manager.steps_including_skipped[3].post_state.dfs_evicted
+
+    for _ in range(4):
+        mito.undo()
+
+    assert len(steps_manager.steps_including_skipped) == 21
+    assert mito.dfs[0].columns.tolist() == ['A', 'B'] + [f'C{i}' for i in range(10)]
+    assert mito.dfs[0]['C9'].tolist() == [10, 11, 12]
+
+    mito.set_formula('=B', 0, 'C9')
+    assert mito.dfs[0]['C9'].tolist() == [4, 5, 6]
+
+
+def test_dataframe_schemas_keep_dtypes_and_hold_no_data():
+    from mitosheet.state import get_dataframe_schema, is_empty_index, is_empty_values
+    
+    df = pd.DataFrame({
+        'int': [1, 2, 3],
+        'Int64': pd.array([1, None, 3], dtype='Int64'),
+        'category': pd.Categorical(['a', 'b', 'a']),
+        'string': pd.array(['a', 'b', 'c'], dtype='string'),
+        'datetime': pd.date_range('2020-01-01', periods=3, tz='UTC'),
+    })
+    for index in [pd.RangeIndex(3), pd.Index([10, 20, 30], name='index'), pd.date_range('2020-01-01', periods=3), pd.MultiIndex.from_tuples([(1, 'a'), (2, 'b'), (3, 'c')])]:
+        df.index = index
+        schema = get_dataframe_schema(df)
+
+        assert schema.columns.equals(df.columns)
+        assert schema.dtypes.equals(df.dtypes)
+        assert len(schema) == len(df)
+        assert type(schema.index) == type(df.index)
+        assert schema.index.dtype == df.index.dtype
+        assert is_empty_index(schema.index)
+        assert all(is_empty_values(schema.iloc[:, column_index]._values) for column_index in range(schema.shape[1]))
+
+
+def test_data_evicted_schemas_still_hold_is_counted():
+    from mitosheet.step_checkpoints import get_state_buffers
+    from mitosheet.state import State
+
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': pd.array([1, 2, 3], dtype='int64[pyarrow]')})
+    state = State([df], 0)
+    buffers = get_state_buffers(state, {})
+    assert len(buffers) == 3
+
+    state.evict_dfs(lambda: [df])
+    evicted_buffers = get_state_buffers(state, {})
+    assert state.dfs_evicted
+    # Only the pyarrow column cannot be replaced with empty values
+    assert len(evicted_buffers) == 1
+    assert list(evicted_buffers.values())[0] == buffers[('extension_array', id(df['B'].array))]
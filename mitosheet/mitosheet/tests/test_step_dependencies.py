@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for only rerunning the steps that depend on a changed sheet
+"""
+import pandas as pd
+
+from mitosheet.step import Step
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+
+
+def count_step_executions(monkeypatch):
+    executed_step_types = []
+    set_prev_state_and_execute = Step.set_prev_state_and_execute
+
+    def counting_set_prev_state_and_execute(self, new_prev_state, previous_steps):
+        executed_step_types.append(self.step_type)
+        return set_prev_state_and_execute(self, new_prev_state, previous_steps)
+
+    monkeypatch.setattr(Step, 'set_prev_state_and_execute', counting_set_prev_state_and_execute)
+    return executed_step_types
+
+
+def get_mito_with_two_sheets():
+    df1 = pd.DataFrame({'A': [1, 2, 3, 4]})
+    df2 = pd.DataFrame({'A': [1, 2, 3, 4], 'B': [5, 6, 7, 8]})
+    mito = create_mito_wrapper(df1, df2)
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 1)
+    mito.add_column(0, 'B')
+    mito.set_formula('=A * 2', 0, 'B')
+    for i in range(5):
+        mito.add_column(1, f'C{i}')
+        mito.set_formula(f'=A + B + {i}', 1, f'C{i}')
+    return mito
+
+
+def test_skipping_step_only_reruns_steps_on_changed_sheet(monkeypatch):
+    mito = get_mito_with_two_sheets()
+    executed_step_types = count_step_executions(monkeypatch)
+
+    # This filter skips the first filter, so the steps after it are rerun
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 2)
+
+    assert executed_step_types == ['add_column', 'set_column_formula', 'filter_column']
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [3, 4], 'B': [6, 8]}, index=[2, 3]))
+    assert mito.dfs[1]['C4'].tolist() == [10, 12, 14, 16]
+
+
+def test_reused_steps_match_full_execution():
+    mito = get_mito_with_two_sheets()
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 2)
+
+    mito_replayed = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}), pd.DataFrame({'A': [1, 2, 3, 4], 'B': [5, 6, 7, 8]}))
+    mito_replayed.mito_backend.steps_manager.execute_steps_data(new_steps_data=[
+        {'step_type': step.step_type, 'params': step.params, 'step_version': step.step_performer.step_version()}
+        for step in mito.mito_backend.steps_manager.steps_including_skipped[1:]
+        if step.step_id != mito.mito_backend.steps_manager.steps_including_skipped[1].step_id
+    ])
+
+    for step, replayed_step in zip(
+        [step for index, step in enumerate(mito.mito_backend.steps_manager.steps_including_skipped) if index != 1],
+        mito_replayed.mito_backend.steps_manager.steps_including_skipped
+    ):
+        for df, replayed_df in zip(step.dfs, replayed_step.dfs):
+            assert df.equals(replayed_df)
+        assert step.column_formulas == replayed_step.column_formulas
+        assert step.df_names == replayed_step.df_names
+
+    assert mito.transpiled_code == mito_replayed.transpiled_code
+
+
+def test_undo_skipping_step_only_reruns_steps_on_changed_sheet(monkeypatch):
+    mito = get_mito_with_two_sheets()
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 2)
+    executed_step_types = count_step_executions(monkeypatch)
+
+    mito.undo()
+
+    # The first filter is no longer skipped, and reuses its result from before it was skipped
+    assert executed_step_types == ['add_column', 'set_column_formula']
+    assert mito.dfs[0]['B'].tolist() == [4, 6, 8]
+    assert mito.dfs[1]['C4'].tolist() == [10, 12, 14, 16]
+
+
+def test_cross_sheet_formula_reruns_when_other_sheet_changes(monkeypatch):
+    df1 = pd.DataFrame({'A': [1, 2, 3, 4], 'B': [5, 6, 7, 8]})
+    df2 = pd.DataFrame({'A': [1, 2, 3, 4]})
+    mito = create_mito_wrapper(df1, df2)
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 1)
+    mito.add_column(1, 'C')
+    mito.set_formula('=VLOOKUP(A0, df1!A:B, 2)', 1, 'C')
+    assert pd.isna(mito.get_column(1, 'C', as_list=True)[0])
+    assert mito.get_column(1, 'C', as_list=True)[1:] == [6, 7, 8]
+
+    # The formula now runs before any filter on df1, so it finds every value
+    executed_step_types = count_step_executions(monkeypatch)
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 2)
+
+    assert executed_step_types == ['set_column_formula', 'filter_column']
+    assert mito.get_column(1, 'C', as_list=True) == [5, 6, 7, 8]
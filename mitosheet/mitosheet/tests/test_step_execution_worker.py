@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for executing edits on the cancellable step execution worker
+"""
+import gc
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from mitosheet.step_execution_worker import CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE, StepExecutionWorker
+from mitosheet.tests.decorators import requires_pyarrow
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.utils import get_new_id
+
+
+def get_mito_with_step_execution_worker(monkeypatch, timeout=None):
+    started = threading.Event()
+    release = threading.Event()
+
+    def SLOW(col):
+        started.set()
+        release.wait(5)
+        return col + 1
+
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}), sheet_functions=[SLOW])
+    mito.add_column(0, 'B')
+
+    sent_messages = []
+    monkeypatch.setattr(mito.mito_backend, 'mito_send', lambda message: sent_messages.append(message))
+    mito.mito_backend.step_execution_worker = StepExecutionWorker(mito.mito_backend, timeout, heartbeat_interval=0.01)
+    return mito, sent_messages, started, release
+
+
+def get_last_non_heartbeat_message(sent_messages):
+    # Heartbeats are sent from the worker thread, so they can be sent after other messages
+    return [message for message in sent_messages if message['event'] != 'step_execution_heartbeat'][-1]
+
+
+def test_no_step_execution_worker_by_default():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    assert mito.mito_backend.step_execution_worker is None
+
+
+def test_edits_execute_on_step_execution_worker(monkeypatch):
+    mito, sent_messages, _, release = get_mito_with_step_execution_worker(monkeypatch)
+    release.set()
+
+    assert mito.set_formula('=SLOW(A)', 0, 'B')
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [1, 2, 3], 'B': [2, 3, 4]}))
+    assert get_last_non_heartbeat_message(sent_messages)['event'] == 'response'
+    assert 'shared_variables' in get_last_non_heartbeat_message(sent_messages)
+
+
+def test_cancelled_edit_leaves_steps_unchanged(monkeypatch):
+    mito, sent_messages, started, release = get_mito_with_step_execution_worker(monkeypatch)
+    steps_manager = mito.mito_backend.steps_manager
+    steps_before = list(steps_manager.steps_including_skipped)
+    df_before = mito.dfs[0].copy()
+
+    mito.set_formula('=SLOW(A)', 0, 'B')
+    assert started.wait(5)
+    time.sleep(0.05)
+
+    mito.mito_backend.receive_message({
+        'event': 'update_event',
+        'id': get_new_id(),
+        'type': CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE,
+        'params': {}
+    })
+    assert get_last_non_heartbeat_message(sent_messages)['data'] == True
+
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    release.set()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+
+    assert mito.mito_backend.steps_manager is steps_manager
+    assert steps_manager.steps_including_skipped == steps_before
+    assert steps_manager.curr_step_idx == len(steps_before) - 1
+    assert mito.dfs[0].equals(df_before)
+
+    # The frontend is told about the cancel once, and was sent heartbeats while the edit ran
+    error_messages = [message for message in sent_messages if message['event'] == 'error']
+    assert len(error_messages) == 1
+    assert error_messages[0]['errorShort'] == 'Edit Cancelled'
+    assert any(message['event'] == 'step_execution_heartbeat' for message in sent_messages)
+
+    # And we can keep editing after the cancel
+    mito.set_formula('=A * 2', 0, 'B')
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [1, 2, 3], 'B': [2, 4, 6]}))
+
+
+def test_edit_that_runs_over_timeout_is_cancelled(monkeypatch):
+    mito, sent_messages, _, release = get_mito_with_step_execution_worker(monkeypatch, timeout=0.1)
+    steps_before = list(mito.mito_backend.steps_manager.steps_including_skipped)
+
+    mito.set_formula('=SLOW(A)', 0, 'B')
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    release.set()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+
+    assert mito.mito_backend.steps_manager.steps_including_skipped == steps_before
+    error_messages = [message for message in sent_messages if message['event'] == 'error']
+    assert len(error_messages) == 1
+    assert error_messages[0]['errorShort'] == 'Edit Timed Out'
+
+
+def test_cancel_with_no_edit_executing(monkeypatch):
+    mito, sent_messages, _, _ = get_mito_with_step_execution_worker(monkeypatch)
+    mito.mito_backend.receive_message({
+        'event': 'update_event',
+        'id': get_new_id(),
+        'type': CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE,
+        'params': {}
+    })
+    assert sent_messages[-1]['data'] == False
+
+
+def cancel_step_execution(mito):
+    mito.mito_backend.receive_message({
+        'event': 'update_event',
+        'id': get_new_id(),
+        'type': CANCEL_STEP_EXECUTION_UPDATE_EVENT_TYPE,
+        'params': {}
+    })
+
+
+def test_next_edit_does_not_wait_for_cancelled_edit(monkeypatch):
+    mito, sent_messages, started, release = get_mito_with_step_execution_worker(monkeypatch)
+    steps_manager = mito.mito_backend.steps_manager
+
+    mito.set_formula('=SLOW(A)', 0, 'B')
+    assert started.wait(5)
+    cancelled_execution_thread = mito.mito_backend.step_execution_worker.execution_thread
+    cancel_step_execution(mito)
+
+    # The next edit executes while the cancelled edit is still running
+    mito.set_formula('=A * 2', 0, 'B')
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+    assert cancelled_execution_thread.is_alive()
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [1, 2, 3], 'B': [2, 4, 6]}))
+    steps_after_edit = list(steps_manager.steps_including_skipped)
+
+    # And the result of the cancelled edit is thrown away once it finishes
+    release.set()
+    cancelled_execution_thread.join()
+    assert steps_manager.steps_including_skipped == steps_after_edit
+    assert mito.dfs[0].equals(pd.DataFrame({'A': [1, 2, 3], 'B': [2, 4, 6]}))
+
+
+def test_undo_while_edit_executes_cancels_edit(monkeypatch):
+    mito, sent_messages, started, release = get_mito_with_step_execution_worker(monkeypatch)
+    steps_manager = mito.mito_backend.steps_manager
+    steps_before = list(steps_manager.steps_including_skipped)
+
+    mito.set_formula('=SLOW(A)', 0, 'B')
+    assert started.wait(5)
+    undo_event_id = get_new_id()
+    mito.mito_backend.receive_message({'event': 'update_event', 'id': undo_event_id, 'type': 'undo', 'params': {}})
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+
+    # The undo does not wait for the edit, and only undoes the edit, not the step before it
+    assert mito.mito_backend.step_execution_worker.execution_thread.is_alive()
+    assert steps_manager.steps_including_skipped == steps_before
+    assert any(message['event'] == 'response' and message['id'] == undo_event_id for message in sent_messages)
+    assert [message['errorShort'] for message in sent_messages if message['event'] == 'error'] == ['Edit Cancelled']
+
+    release.set()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+    assert steps_manager.steps_including_skipped == steps_before
+
+
+def test_undo_after_edit_finishes_undoes_it(monkeypatch):
+    mito, _, _, release = get_mito_with_step_execution_worker(monkeypatch)
+    release.set()
+    steps_before = list(mito.mito_backend.steps_manager.steps_including_skipped)
+
+    mito.set_formula('=SLOW(A)', 0, 'B')
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+    mito.undo()
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+
+    assert mito.mito_backend.steps_manager.steps_including_skipped == steps_before
+
+
+def test_copy_for_execution_shares_sheet_data_caches():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager_copy = steps_manager.copy_for_execution()
+
+    # The caches that are only used once an event is done are shared
+    for cache_attribute in ['sheet_data_column_cache', 'conditional_formatting_cache', 'sheet_data_buffer_cache', 'search_column_cache']:
+        assert getattr(steps_manager_copy, cache_attribute) is getattr(steps_manager, cache_attribute)
+    for cache_attribute in ['optimized_code_chunks_cache', 'buffer_memory_usage_cache', 'saved_sheet_data']:
+        assert getattr(steps_manager_copy, cache_attribute) is not getattr(steps_manager, cache_attribute)
+    assert steps_manager_copy.execution_lock is steps_manager.execution_lock
+
+    # Executing on the copy does not change the steps manager
+    steps_manager_copy.handle_edit_event({
+        'event': 'edit_event', 'id': get_new_id(), 'type': 'add_column_edit', 'step_id': get_new_id(),
+        'params': {'sheet_index': 0, 'column_header': 'B', 'column_header_index': 1}
+    })
+    assert 'B' in json.loads(steps_manager_copy.sheet_data_json)[0]['columnIDsMap']
+    assert 'B' not in json.loads(steps_manager.sheet_data_json)[0]['columnIDsMap']
+
+
+@requires_pyarrow
+def test_spilling_after_edits_on_step_execution_worker(monkeypatch, tmp_path):
+    mito, _, _, release = get_mito_with_step_execution_worker(monkeypatch)
+    release.set()
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.step_history_memory_budget = 0
+    steps_manager.step_history_checkpoint_interval = 5
+    steps_manager.step_history_spill_directory = str(tmp_path)
+
+    mito.set_formula('=A + 1', 0, 'B')
+    mito.mito_backend.step_execution_worker.wait_until_idle()
+    mito.mito_backend.step_execution_worker.execution_thread.join()
+    gc.collect()
+
+    # The spill directory is not deleted when the copy the edit executed on is garbage collected
+    spill_directory = steps_manager.get_step_spill_metrics()['spill_directory']
+    assert os.path.exists(spill_directory)
+    for i in range(3):
+        mito.add_column(0, f'C{i}')
+        mito.mito_backend.step_execution_worker.wait_until_idle()
+        mito.mito_backend.step_execution_worker.execution_thread.join()
+    gc.collect()
+
+    assert steps_manager.get_step_spill_metrics()['spill_count'] > 0
+    assert len(os.listdir(spill_directory)) > 0
+    assert steps_manager.steps_including_skipped[2].dfs[0].columns.tolist() == ['A', 'B']
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for accounting for the memory used by the StepsManager
+"""
+import numpy as np
+import pandas as pd
+
+from mitosheet.api.get_memory_usage import get_memory_usage
+from mitosheet.api.get_search_matches import get_search_matches
+from mitosheet.step_checkpoints import get_cached_buffer_memory_usage, get_values_buffer_key
+from mitosheet.step_memory import get_object_memory_usage
+from mitosheet.tests.test_utils import create_mito_wrapper
+
+
+def test_memory_usage_counts_shared_dataframes_once():
+    df = pd.DataFrame({'A': list(range(10000)), 'B': [str(i) for i in range(10000)]})
+    mito = create_mito_wrapper(df)
+    for i in range(5):
+        mito.add_column(0, f'C{i}')
+
+    memory_usage = mito.mito_backend.steps_manager.get_memory_usage()
+    final_df_memory_usage = int(mito.dfs[0].memory_usage(index=True, deep=True).sum())
+
+    # Every step shares the data of A and B, so they are only counted in the first step
+    assert memory_usage['dataframe_memory_usage'] >= final_df_memory_usage
+    assert memory_usage['dataframe_memory_usage'] < 1.5 * final_df_memory_usage
+    assert memory_usage['steps'][0]['dataframe_memory_usage'] > memory_usage['steps'][1]['dataframe_memory_usage']
+    assert all(step_report['metadata_memory_usage'] > 0 for step_report in memory_usage['steps'])
+
+    assert memory_usage['total_memory_usage'] == memory_usage['dataframe_memory_usage'] + memory_usage['metadata_memory_usage']
+    assert memory_usage['total_memory_usage'] == (
+        memory_usage['step_history_memory_usage']
+        + memory_usage['undone_steps_memory_usage']
+        + memory_usage['step_cache_memory_usage']
+        + memory_usage['sheet_data_memory_usage']
+        + memory_usage['sheet_data_cache_memory_usage']
+        + memory_usage['conditional_formatting_cache_memory_usage']
+        + memory_usage['search_column_cache_memory_usage']
+    )
+
+
+def test_memory_usage_counts_undone_steps():
+    mito = create_mito_wrapper(pd.DataFrame({'A': list(range(1000))}))
+    mito.add_column(0, 'B')
+    mito.set_formula('=A * 2', 0, 'B')
+
+    assert mito.mito_backend.steps_manager.get_memory_usage()['undone_steps_memory_usage'] == 0
+
+    mito.undo()
+    memory_usage = mito.mito_backend.steps_manager.get_memory_usage()
+    # The data of the undone formula is only held by the undone step and the cache
+    assert memory_usage['undone_steps_memory_usage'] + memory_usage['step_cache_memory_usage'] >= 8000
+    assert get_memory_usage({}, mito.mito_backend.steps_manager) == memory_usage
+
+
+def test_object_memory_usage_counts_shared_objects_once():
+    shared_list = ['a' * 1000]
+    seen_object_ids = set()
+    first_memory_usage = get_object_memory_usage({'x': shared_list}, seen_object_ids)
+    assert first_memory_usage > 1000
+    assert get_object_memory_usage({'y': shared_list}, seen_object_ids) < 1000
+
+
+def test_memory_usage_counts_caches():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [str(i) for i in range(10000)]}))
+    mito.set_formula('=A', 0, 'B', add_column=True)
+    steps_manager = mito.mito_backend.steps_manager
+    memory_usage = steps_manager.get_memory_usage()
+    assert memory_usage['search_column_cache_memory_usage'] == 0
+
+    get_search_matches({'sheet_index': 0, 'search_value': '1'}, steps_manager)
+    new_memory_usage = steps_manager.get_memory_usage()
+    assert new_memory_usage['search_column_cache_memory_usage'] == steps_manager.search_column_cache.num_bytes > 0
+    assert new_memory_usage['total_memory_usage'] == memory_usage['total_memory_usage'] + steps_manager.search_column_cache.num_bytes
+    # The serialized data of the columns is the same as in the sheet data, so it is only counted there
+    assert new_memory_usage['sheet_data_cache_memory_usage'] < new_memory_usage['sheet_data_memory_usage']
+
+    # Once the column the cache serialized is no longer in any step, the cache is the only thing keeping its data
+    steps_manager.sheet_data_column_cache.entries[(0, 'B')] = (None, np.array([str(i) for i in range(10000)], dtype=object), [])
+    assert steps_manager.get_memory_usage()['sheet_data_cache_memory_usage'] > new_memory_usage['sheet_data_cache_memory_usage'] + 10000 * 50
+
+
+def test_buffer_memory_usage_is_not_reused_for_new_data_at_same_address():
+    buffer_memory_usage_cache = {}
+    values = np.array(['a' * 100] * 10, dtype=object)
+    buffer_key, owner = get_values_buffer_key(values)
+
+    assert get_cached_buffer_memory_usage(buffer_memory_usage_cache, buffer_key, owner, lambda: 1) == 1
+    assert get_cached_buffer_memory_usage(buffer_memory_usage_cache, buffer_key, owner, lambda: 2) == 1
+
+    # If the data is freed, its memory could be reused by other data with the same buffer key
+    del values, owner
+    new_owner = np.array(['b'] * 10, dtype=object)
+    assert get_cached_buffer_memory_usage(buffer_memory_usage_cache, buffer_key, new_owner, lambda: 2) == 2
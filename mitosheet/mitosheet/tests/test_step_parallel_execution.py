@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for executing steps on different sheets in parallel
+"""
+import threading
+
+import pandas as pd
+import pytest
+
+from mitosheet.step import Step
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+
+
+def get_mito_with_steps_on_two_sheets():
+    df1 = pd.DataFrame({'A': [1, 2, 3, 4]})
+    df2 = pd.DataFrame({'A': [1, 2, 3, 4], 'B': [5, 6, 7, 8]})
+    mito = create_mito_wrapper(df1, df2)
+    for i in range(3):
+        mito.add_column(0, f'B{i}')
+        mito.set_formula(f'=A * {i}', 0, f'B{i}')
+        mito.add_column(1, f'C{i}')
+        mito.set_formula(f'=A + B + {i}', 1, f'C{i}')
+    mito.filter(1, 'A', 'And', FC_NUMBER_GREATER, 1)
+    mito.set_formula('=VLOOKUP(A, df2!A:B, 2)', 0, 'B0')
+    return mito
+
+
+def get_steps_data(mito):
+    return [
+        {'step_type': step.step_type, 'params': step.params}
+        for step in mito.mito_backend.steps_manager.steps_including_skipped[1:]
+    ]
+
+
+def get_replayed_mito(steps_data, max_workers):
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}), pd.DataFrame({'A': [1, 2, 3, 4], 'B': [5, 6, 7, 8]}))
+    mito.mito_backend.steps_manager.step_execution_max_workers = max_workers
+    mito.mito_backend.steps_manager.execute_steps_data(new_steps_data=steps_data)
+    return mito
+
+
+def test_parallel_execution_matches_sequential_execution(monkeypatch):
+    steps_data = get_steps_data(get_mito_with_steps_on_two_sheets())
+
+    executing_threads = set()
+    set_prev_state_and_execute = Step.set_prev_state_and_execute
+    def recording_set_prev_state_and_execute(self, new_prev_state, previous_steps):
+        executing_threads.add(threading.get_ident())
+        return set_prev_state_and_execute(self, new_prev_state, previous_steps)
+    monkeypatch.setattr(Step, 'set_prev_state_and_execute', recording_set_prev_state_and_execute)
+
+    mito_sequential = get_replayed_mito(steps_data, 1)
+    assert executing_threads == {threading.get_ident()}
+
+    mito_parallel = get_replayed_mito(steps_data, 4)
+    assert len(executing_threads) > 1
+
+    steps_sequential = mito_sequential.mito_backend.steps_manager.steps_including_skipped
+    steps_parallel = mito_parallel.mito_backend.steps_manager.steps_including_skipped
+    assert len(steps_sequential) == len(steps_parallel)
+    for step_sequential, step_parallel in zip(steps_sequential, steps_parallel):
+        assert step_sequential.step_type == step_parallel.step_type
+        assert step_sequential.params == step_parallel.params
+        for df_sequential, df_parallel in zip(step_sequential.dfs, step_parallel.dfs):
+            assert df_sequential.equals(df_parallel)
+        assert step_sequential.column_formulas == step_parallel.column_formulas
+        assert step_sequential.column_ids.column_header_to_column_id == step_parallel.column_ids.column_header_to_column_id
+
+    assert mito_sequential.transpiled_code == mito_parallel.transpiled_code
+    assert pd.isna(mito_parallel.get_column(0, 'B0', as_list=True)[0])
+    assert mito_parallel.get_column(0, 'B0', as_list=True)[1:] == [6, 7, 8]
+
+
+def test_parallel_execution_error_applies_no_steps():
+    steps_data = get_steps_data(get_mito_with_steps_on_two_sheets())[:6]
+    steps_data.insert(3, {'step_type': 'delete_column', 'params': {'sheet_index': 1, 'column_ids': ['NOT_A_COLUMN']}})
+
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3, 4]}), pd.DataFrame({'A': [1, 2, 3, 4], 'B': [5, 6, 7, 8]}))
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.step_execution_max_workers = 4
+    with pytest.raises(Exception):
+        steps_manager.execute_steps_data(new_steps_data=steps_data)
+
+    assert len(steps_manager.steps_including_skipped) == 1
+    assert mito.dfs[0].columns.tolist() == ['A']
+    assert mito.dfs[1].columns.tolist() == ['A', 'B']
+
+
+def test_parallel_execution_after_undo():
+    mito = get_mito_with_steps_on_two_sheets()
+    mito.mito_backend.steps_manager.step_execution_max_workers = 4
+    mito.filter(1, 'A', 'And', FC_NUMBER_GREATER, 2)
+    assert mito.dfs[1]['C2'].tolist() == [12, 14]
+
+    mito.undo()
+    assert mito.dfs[1]['C2'].tolist() == [10, 12, 14]
+    assert mito.dfs[0]['B2'].tolist() == [2, 4, 6, 8]
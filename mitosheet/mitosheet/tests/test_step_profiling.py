@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for profiling each executed step
+"""
+import pandas as pd
+
+from mitosheet.api.get_step_profiles import get_step_profiles
+from mitosheet.step_profiling import STEP_PROFILE_TIME_KEYS
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FC_NUMBER_GREATER
+
+
+def test_step_profiles_record_each_executed_step():
+    df = pd.DataFrame({'A': list(range(100)), 'B': [1.0] * 100, 'C': ['a'] * 100})
+    mito = create_mito_wrapper(df)
+    mito.set_formula('=A + 1', 0, 'B')
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 10)
+
+    steps_manager = mito.mito_backend.steps_manager
+    profiles = steps_manager.get_step_profiles()
+    assert [profile['step_type'] for profile in profiles] == ['set_column_formula', 'filter_column']
+    assert [profile['step_id'] for profile in profiles] == [step.step_id for step in steps_manager.steps_including_skipped[1:]]
+
+    set_formula_profile, filter_profile = profiles
+    for profile in profiles:
+        assert all(profile[time_key] >= 0 for time_key in STEP_PROFILE_TIME_KEYS)
+        assert profile['execute_time'] >= profile['exec_time']
+        assert not profile['reused_execution']
+
+    # Setting a formula only copies the column it writes to
+    assert set_formula_profile['bytes_copied'] == 800
+    assert set_formula_profile['frame_memory_bytes'] == int(mito.mito_backend.steps_manager.steps_including_skipped[1].dfs[0].memory_usage().sum())
+    assert filter_profile['frame_memory_bytes'] == int(mito.dfs[0].memory_usage().sum())
+
+    # The sheet data is serialized for the current step
+    assert filter_profile['serialization_time'] > 0
+
+    assert get_step_profiles({}, steps_manager) == profiles
+
+
+def test_step_profiles_mark_reused_executions():
+    mito = create_mito_wrapper(pd.DataFrame({'A': [1, 2, 3]}))
+    mito.add_column(0, 'B')
+    mito.set_formula('=A + 1', 0, 'B')
+    executed_profile = mito.mito_backend.steps_manager.get_step_profiles()[-1]
+
+    mito.undo()
+    mito.redo()
+
+    profiles = mito.mito_backend.steps_manager.get_step_profiles()
+    assert len(profiles) == 2
+    assert profiles[-1]['step_id'] == mito.mito_backend.steps_manager.steps_including_skipped[-1].step_id
+    assert profiles[-1]['exec_time'] == executed_profile['exec_time']
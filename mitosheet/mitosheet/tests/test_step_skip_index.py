@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for the index of skipped steps
+"""
+import random
+
+import pandas as pd
+
+from mitosheet.step import Step
+from mitosheet.step_skip_index import StepSkipIndex
+from mitosheet.tests.test_utils import create_mito_wrapper
+from mitosheet.types import FORMULA_ENTIRE_COLUMN_TYPE, FORMULA_SPECIFIC_INDEX_LABELS_TYPE
+
+
+def get_step_indexes_to_skip_by_checking_every_step(steps):
+    step_indexes_to_skip = set()
+    for step_index, step in enumerate(steps):
+        step_indexes_to_skip.update(step.step_indexes_to_skip(steps[:step_index]))
+    return step_indexes_to_skip
+
+
+def get_random_step(random_generator):
+    step_id = random_generator.choice(['id0', 'id1', 'id2', 'id3'])
+    sheet_index = random_generator.choice([0, 1])
+    column_id = random_generator.choice(['A', 'B'])
+    step_type = random_generator.choice(['filter_column', 'set_column_formula', 'add_column'])
+    if step_type == 'filter_column':
+        return Step(step_type, step_id, {'sheet_index': sheet_index, 'column_id': column_id})
+    if step_type == 'set_column_formula':
+        if random_generator.random() < 0.5:
+            index_labels_formula_is_applied_to = {'type': FORMULA_ENTIRE_COLUMN_TYPE}
+        else:
+            index_labels_formula_is_applied_to = {'type': FORMULA_SPECIFIC_INDEX_LABELS_TYPE, 'index_labels': random_generator.choice([[0], [1], [0, 1]])}
+        return Step(step_type, step_id, {'sheet_index': sheet_index, 'column_id': column_id, 'index_labels_formula_is_applied_to': index_labels_formula_is_applied_to})
+    return Step(step_type, step_id, {'sheet_index': sheet_index})
+
+
+def test_step_skip_index_matches_checking_every_step():
+    random_generator = random.Random(0)
+    step_skip_index = StepSkipIndex()
+    steps = [Step('initialize', 'initialize', {})]
+
+    for _ in range(2000):
+        operation = random_generator.random()
+        if operation < 0.6:
+            steps = steps + [get_random_step(random_generator)]
+        elif operation < 0.9:
+            steps = steps[:max(1, len(steps) - random_generator.randint(1, 3))]
+        else:
+            # Replace some of the steps at the end, like a redo after an undo
+            steps = steps[:max(1, len(steps) - 2)] + [get_random_step(random_generator) for _ in range(3)]
+
+        step_skip_index.update(steps)
+        assert step_skip_index.get_step_indexes_to_skip() == get_step_indexes_to_skip_by_checking_every_step(steps)
+
+        num_steps = random_generator.randint(1, len(steps))
+        assert step_skip_index.get_step_indexes_to_skip(num_steps) == get_step_indexes_to_skip_by_checking_every_step(steps[:num_steps])
+
+
+def test_step_skip_index_reuses_reexecuted_steps():
+    step_skip_index = StepSkipIndex()
+    steps = [Step('initialize', 'initialize', {})] + [Step('filter_column', f'id{i}', {'sheet_index': 0, 'column_id': 'A'}) for i in range(3)]
+    step_skip_index.update(steps)
+    assert step_skip_index.get_step_indexes_to_skip() == {1, 2}
+
+    reexecuted_steps = [Step(step.step_type, step.step_id, step.params) for step in steps]
+    step_skip_index.update(reexecuted_steps)
+    assert step_skip_index.get_step_indexes_to_skip() == {1, 2}
+    assert all(indexed_step is step for indexed_step, step in zip(step_skip_index.steps, reexecuted_steps))
+
+
+def test_steps_manager_skip_index_stays_up_to_date():
+    df = pd.DataFrame({'A': [1, 2, 3]})
+    mito = create_mito_wrapper(df)
+    mito.add_column(0, 'B')
+    for i in range(5):
+        mito.set_formula(f'=A + {i}', 0, 'B')
+
+    steps_manager = mito.mito_backend.steps_manager
+    assert steps_manager.get_step_indexes_to_skip() == {2, 3, 4, 5}
+    assert mito.dfs[0]['B'].tolist() == [5, 6, 7]
+
+    mito.undo()
+    assert steps_manager.get_step_indexes_to_skip() == {2, 3, 4}
+    assert mito.dfs[0]['B'].tolist() == [4, 5, 6]
+
+    mito.redo()
+    assert steps_manager.get_step_indexes_to_skip() == {2, 3, 4, 5}
+    assert mito.dfs[0]['B'].tolist() == [5, 6, 7]
+
+    mito.checkout_step_by_idx(3)
+    assert steps_manager.get_step_indexes_to_skip(4) == {2}
+    assert 'df1[\'B\'] = df1[\'A\'] + 1' in mito.transpiled_code
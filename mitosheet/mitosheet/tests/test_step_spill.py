@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Saga Inc.
+# Distributed under the terms of the GPL License.
+"""
+Contains tests for spilling dropped step states to disk
+"""
+import gc
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mitosheet.step_spill import is_dataframe_spillable, read_dataframe_from_spill_file, write_dataframe_to_spill_file
+from mitosheet.tests.decorators import requires_pyarrow
+from mitosheet.tests.test_step_checkpoints import get_mito_with_formula_steps
+from mitosheet.tests.test_utils import create_mito_wrapper
+
+
+def get_mito_with_spilled_steps(spill_directory, num_steps=12, spill_quota=None):
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6]})
+    mito = create_mito_wrapper(df)
+    steps_manager = mito.mito_backend.steps_manager
+    steps_manager.step_history_memory_budget = 0
+    steps_manager.step_history_checkpoint_interval = 5
+    steps_manager.step_history_spill_directory = str(spill_directory)
+    steps_manager.step_history_spill_quota = spill_quota
+    for i in range(num_steps):
+        mito.add_column(0, f'C{i}')
+        mito.set_formula(f'=A + {i}', 0, f'C{i}')
+    return mito
+
+
+SPILLABLE_TESTS = [
+    (pd.DataFrame({'A': [1, 2, 3], 'B': [1.0, np.nan, 3.0], 'C': ['a', 'b', 'c'], 'D': [True, False, True]}), True),
+    (pd.DataFrame({'A': pd.to_datetime(['2020-01-01', None]), 'B': pd.to_timedelta([1, 2], unit='s')}), True),
+    (pd.DataFrame({'A': [1, 2, 3]}, index=[2, 0, 1]), True),
+    (pd.DataFrame({'A': ['a', np.nan, 'c']}), False),
+    (pd.DataFrame({'A': [1, 'a', 2.0]}), False),
+    (pd.DataFrame({1: [1, 2, 3]}), False),
+    (pd.DataFrame({'A': [1, 2, 3]}, index=['a', 'b', 'c']), False),
+    (pd.DataFrame({'A': pd.Categorical(['a', 'b', 'a'])}), False),
+]
+@pytest.mark.parametrize("df, spillable", SPILLABLE_TESTS)
+def test_is_dataframe_spillable(df, spillable):
+    assert is_dataframe_spillable(df) == spillable
+
+
+@requires_pyarrow
+def test_dropped_states_are_spilled_and_restored(tmp_path):
+    mito = get_mito_with_spilled_steps(tmp_path)
+    mito_no_budget = get_mito_with_formula_steps(None)
+    steps_manager = mito.mito_backend.steps_manager
+
+    metrics = steps_manager.get_step_spill_metrics()
+    assert metrics['spill_count'] == 19
+    assert metrics['disk_usage'] > 0
+    assert len(os.listdir(metrics['spill_directory'])) == 19
+
+    for step, step_no_budget in zip(steps_manager.steps_including_skipped, mito_no_budget.mito_backend.steps_manager.steps_including_skipped):
+        assert step.dfs[0].equals(step_no_budget.dfs[0])
+
+    metrics = steps_manager.get_step_spill_metrics()
+    assert metrics['restore_count'] == 19
+    assert metrics['restore_seconds'] >= 0
+
+
+@requires_pyarrow
+def test_checkout_and_undo_with_spilled_states(tmp_path):
+    mito = get_mito_with_spilled_steps(tmp_path)
+    steps_manager = mito.mito_backend.steps_manager
+
+    mito.checkout_step_by_idx(3)
+    assert mito.dfs[0].columns.tolist() == ['A', 'B', 'C0', 'C1']
+    assert mito.dfs[0]['C1'].tolist() == [0, 0, 0]
+    assert steps_manager.get_step_spill_metrics()['restore_count'] == 1
+
+    # Dropping the state again does not rewrite it to disk
+    mito.checkout_step_by_idx(-1)
+    assert steps_manager.steps_including_skipped[3].post_state.dfs_evicted
+    assert steps_manager.get_step_spill_metrics()['spill_count'] == 19
+
+    for _ in range(4):
+        mito.undo()
+    assert mito.dfs[0]['C9'].tolist() == [10, 11, 12]
+
+    mito.redo()
+    assert mito.dfs[0]['C10'].tolist() == [0, 0, 0]
+
+
+@requires_pyarrow
+def test_spill_files_are_read_back_without_copying(tmp_path):
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [1.0, np.nan, 3.0], 'C': ['a', 'b', 'c'], 'D': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03'])})
+    path = str(tmp_path / 'df.arrow')
+    write_dataframe_to_spill_file(df, path)
+
+    spilled_df = read_dataframe_from_spill_file(path)
+    assert spilled_df.equals(df)
+    # Columns without missing values are read-only views of the memory-mapped file
+    assert not spilled_df['A'].to_numpy().flags.writeable
+    assert not spilled_df['D'].to_numpy().flags.writeable
+    assert spilled_df['B'].to_numpy().flags.writeable
+
+
+@requires_pyarrow
+def test_edits_after_undoing_to_spilled_state(tmp_path):
+    mito = get_mito_with_spilled_steps(tmp_path)
+    steps_manager = mito.mito_backend.steps_manager
+
+    for _ in range(3):
+        mito.undo()
+    # The state we undo to is read back from its spill file, so it is read-only
+    assert not mito.dfs[0]['A'].to_numpy().flags.writeable
+    restored_df = mito.dfs[0].copy()
+
+    mito.set_cell_value(0, 'A', 0, 10)
+    mito.set_formula('=A * 2', 0, 'C0')
+    mito.fill_na(0, ['A', 'B'], {'type': 'value', 'value': 0})
+    mito.change_column_dtype(0, ['B'], 'float')
+    mito.sort(0, 'A', 'descending')
+    assert mito.dfs[0][['A', 'B', 'C0', 'C9']].to_dict('list') == {'A': [10, 3, 2], 'B': [4.0, 6.0, 5.0], 'C0': [20, 6, 4], 'C9': [10, 12, 11]}
+
+    assert steps_manager.steps_including_skipped[-6].dfs[0].equals(restored_df)
+    assert steps_manager.get_step_spill_metrics()['restore_count'] > 0
+
+
+@requires_pyarrow
+def test_spill_quota_falls_back_to_rebuilding(tmp_path):
+    mito = get_mito_with_spilled_steps(tmp_path, spill_quota=0)
+    mito_no_budget = get_mito_with_formula_steps(None)
+    steps_manager = mito.mito_backend.steps_manager
+
+    metrics = steps_manager.get_step_spill_metrics()
+    assert metrics['spill_count'] == 0
+    assert metrics['not_spilled_count'] == 19
+    assert os.listdir(metrics['spill_directory']) == []
+
+    for step, step_no_budget in zip(steps_manager.steps_including_skipped, mito_no_budget.mito_backend.steps_manager.steps_including_skipped):
+        assert step.dfs[0].equals(step_no_budget.dfs[0])
+
+
+@requires_pyarrow
+def test_spilled_states_are_rebuilt_after_cleanup(tmp_path):
+    mito = get_mito_with_spilled_steps(tmp_path)
+    steps_manager = mito.mito_backend.steps_manager
+
+    steps_manager.step_state_spiller.cleanup()
+    assert os.listdir(tmp_path) == []
+
+    mito.checkout_step_by_idx(3)
+    assert mito.dfs[0]['C1'].tolist() == [0, 0, 0]
+
+
+@requires_pyarrow
+def test_spill_directory_deleted_when_steps_manager_garbage_collected(tmp_path):
+    mito = get_mito_with_spilled_steps(tmp_path, num_steps=3)
+    spill_directory = mito.mito_backend.steps_manager.get_step_spill_metrics()['spill_directory']
+    assert os.path.exists(spill_directory)
+
+    del mito
+    gc.collect()
+
+    assert not os.path.exists(spill_directory)
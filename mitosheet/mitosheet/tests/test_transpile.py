@@ -1318,4 +1318,104 @@ def test_does_not_reorder_around_empty_code_chunk():
     mito.delete_columns(0, ['A', 'B'])
     result = mito.generate_graph('test', BAR, 0, False, ['C'], [], '400', '400')
     assert result
-    assert mito.dfs[0].equals(pd.DataFrame({'C': [3], 'D': [0]}))
\ No newline at end of file
+    assert mito.dfs[0].equals(pd.DataFrame({'C': [3], 'D': [0]}))
+
+def test_replaying_steps_reuses_compiled_code():
+    from mitosheet.transpiler.transpile_utils import get_compiled_code
+    df = pd.DataFrame({'A': [1, 2, 3]})
+    mito = create_mito_wrapper(df)
+    mito.mito_backend.steps_manager.step_execution_cache = None
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 0)
+    mito.set_formula('=A + 100', 0, 'B', add_column=True)
+
+    hits = get_compiled_code.cache_info().hits
+
+    # Filtering the same column again skips the first filter, so the formula is executed again
+    mito.filter(0, 'A', 'And', FC_NUMBER_GREATER, 1)
+
+    assert get_compiled_code.cache_info().hits > hits
+    assert mito.dfs[0]['B'].tolist() == [102, 103]
+
+
+def test_exec_globals_do_not_change_public_interface():
+    import mitosheet.public.v3 as v3
+    from mitosheet.transpiler.transpile_utils import get_public_interface_globals
+    assert get_public_interface_globals(3) is get_public_interface_globals(3)
+
+    df = pd.DataFrame({'A': [1, 2, 3]})
+    mito = create_mito_wrapper(df)
+    mito.set_formula('=A + 1', 0, 'B', add_column=True)
+
+    assert 'df1' not in get_public_interface_globals(3)
+    assert 'df1' not in v3.__dict__
+
+
+def test_exec_globals_only_contain_names_that_change_with_each_exec():
+    from mitosheet.transpiler.transpile_utils import get_globals_for_exec, get_public_interface_builtins
+    df = pd.DataFrame({'A': [1, 2, 3]})
+    mito = create_mito_wrapper(df)
+    state = mito.mito_backend.steps_manager.curr_step.final_defined_state
+
+    exec_globals = get_globals_for_exec(state, 3)
+    assert set(exec_globals.keys()) == {'__builtins__', 'df1'}
+    assert exec_globals['__builtins__'] is get_public_interface_builtins(3)
+    assert get_globals_for_exec(state, 3)['__builtins__'] is exec_globals['__builtins__']
+
+    # Both the public interface and the builtins can be used by the code, and by the functions it defines
+    exec('def get_sum(df):\n    return SUM(df["A"]).sum() + len(df)\nresult = get_sum(df1)', exec_globals)
+    assert exec_globals['result'] == 9
+
+
+def test_transpiling_reuses_code_chunks_until_step_executes_again(monkeypatch):
+    from mitosheet.step_performers.column_steps.add_column import AddColumnStepPerformer
+    df = pd.DataFrame({'A': [1, 2, 3]})
+    mito = create_mito_wrapper(df)
+    mito.add_column(0, 'B')
+    mito.add_column(0, 'C')
+    steps_manager = mito.mito_backend.steps_manager
+
+    num_transpiles = []
+    transpile_add_column = AddColumnStepPerformer.transpile
+    monkeypatch.setattr(AddColumnStepPerformer, 'transpile', lambda *args: num_transpiles.append(1) or transpile_add_column(*args))
+
+    step_summary_list = steps_manager.step_summary_list
+    steps_manager.code()
+    assert len(num_transpiles) == 0
+
+    # Adding a step only transpiles the new step, once to execute it and once for its code
+    mito.add_column(0, 'D')
+    assert steps_manager.step_summary_list[:-1] == step_summary_list
+    assert steps_manager.code() == transpile(steps_manager, optimize=False)
+    assert len(num_transpiles) == 2
+
+    # Executing a step again transpiles it again
+    step = steps_manager.steps_including_skipped[1]
+    code_chunks = step.get_code_chunks()
+    step.set_prev_state_and_execute(step.prev_state, steps_manager.steps_including_skipped[:1])
+    assert step.get_code_chunks() is not code_chunks
+    assert len(num_transpiles) == 4
+
+
+def test_incremental_code_chunk_optimization_matches_optimizing_all_code_chunks():
+    from mitosheet.code_chunks.code_chunk_utils import get_code_chunks
+    df = pd.DataFrame({'A': [1, 2, 3]})
+    mito = create_mito_wrapper(df)
+    steps_manager = mito.mito_backend.steps_manager
+
+    edits = [
+        lambda: mito.add_column(0, 'B'),
+        lambda: mito.rename_column(0, 'B', 'C'),
+        lambda: mito.set_formula('=A + 1', 0, 'C'),
+        lambda: mito.add_column(0, 'D'),
+        lambda: mito.delete_columns(0, ['C']),
+        lambda: mito.sort(0, 'A', 'descending'),
+        lambda: mito.delete_columns(0, ['D']),
+        lambda: mito.undo(),
+        lambda: mito.redo(),
+    ]
+    for edit in edits:
+        edit()
+        steps = steps_manager.steps_including_skipped[:steps_manager.curr_step_idx + 1]
+        cached_code_chunks = get_code_chunks(steps, optimized_code_chunks_cache=steps_manager.optimized_code_chunks_cache)
+        code_chunks = get_code_chunks(steps)
+        assert [code_chunk.get_code() for code_chunk in cached_code_chunks] == [code_chunk.get_code() for code_chunk in code_chunks]
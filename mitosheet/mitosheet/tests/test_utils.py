@@ -37,12 +37,34 @@ from mitosheet.utils import NpEncoder, dfs_to_array_for_json, get_new_id
 def check_transpiled_code_after_call(func):
     @wraps(func)
     def wrapper(*args, **kw):
+        steps_manager = args[0].mito_backend.steps_manager
+        with steps_manager.execution_lock:
+            # NOTE: we keep the dataframes themselves, as the step can drop them once it is not the current step
+            prev_dfs = list(steps_manager.curr_step.dfs)
+            prev_df_copies = [df.copy(deep=True) for df in prev_dfs]
         result = func(*args, **kw)
-        check_dataframes_equal(args[0])
+        # If edits execute on the step execution worker, the steps manager can be replaced while we check it
+        with steps_manager.execution_lock:
+            check_dataframes_unchanged(prev_dfs, prev_df_copies)
+            check_dataframes_equal(args[0])
         return result
     return wrapper
 
 
+def check_dataframes_unchanged(dfs: List[pd.DataFrame], df_copies: List[pd.DataFrame]) -> None:
+    """
+    Tests that the dataframes of a step still equal the copies of them that were
+    made before the next step executed. 
+    
+    Steps share the data of the columns they do not modify with the previous step 
+    (see State.copy), and the sheet data and search caches assume that a step never
+    writes to this data in place (see get_column_version), so this catches any step
+    that does.
+    """
+    for df, df_copy in zip(dfs, df_copies):
+        assert df.equals(df_copy)
+
+
 def check_dataframes_equal(test_wrapper: "MitoWidgetTestWrapper") -> None:
     """
     Tests that the dataframes in the widget state container equal
@@ -15,6 +15,7 @@ from mitosheet.code_chunks.code_chunk_utils import get_code_chunks
 from mitosheet.code_chunks.postprocessing import POSTPROCESSING_CODE_CHUNKS
 
 from mitosheet.preprocessing import PREPROCESS_STEP_PERFORMERS
+from mitosheet.state import use_dataframe_schemas_for_evicted_states
 from mitosheet.transpiler.transpile_utils import get_script_as_function, get_imports_for_custom_python_code
 from mitosheet.types import StepsManagerType, CodeOptions
 
@@ -61,31 +62,39 @@ def transpile(
 
         imports_code.extend(preprocess_imports)
 
-    # We only transpile up to the currently checked out step
-    all_code_chunks: List[CodeChunk] = get_code_chunks(steps_manager.steps_including_skipped[:steps_manager.curr_step_idx + 1], optimize=optimize)
+    # Transpiling only reads the column headers, dtypes and indexes of the dataframes
+    # in each state, so we don't need to rebuild any states evicted from memory
+    with use_dataframe_schemas_for_evicted_states():
+        # We only transpile up to the currently checked out step
+        all_code_chunks: List[CodeChunk] = get_code_chunks(
+            steps_manager.steps_including_skipped[:steps_manager.curr_step_idx + 1], 
+            optimize=optimize,
+            step_indexes_to_skip=steps_manager.get_step_indexes_to_skip(steps_manager.curr_step_idx + 1),
+            optimized_code_chunks_cache=steps_manager.optimized_code_chunks_cache
+        )
 
-    # We also make sure to include all the post_processing code chunks, which are those
-    # code chunks that are always at the end of the dataframe
-    for postprocessing_code_chunk in POSTPROCESSING_CODE_CHUNKS:
-        all_code_chunks.append(postprocessing_code_chunk(steps_manager.curr_step.initial_defined_state, steps_manager.curr_step.final_defined_state))
+        # We also make sure to include all the post_processing code chunks, which are those
+        # code chunks that are always at the end of the dataframe
+        for postprocessing_code_chunk in POSTPROCESSING_CODE_CHUNKS:
+            all_code_chunks.append(postprocessing_code_chunk(steps_manager.curr_step.initial_defined_state, steps_manager.curr_step.final_defined_state))
 
-    for code_chunk in all_code_chunks:
-        comment = '# ' + code_chunk.get_description_comment().strip().replace('\n', '\n# ')
-        (gotten_code, code_chunk_imports) = code_chunk.get_code()
-        (optional_code, optional_code_imports) = code_chunk.get_optional_code_that_successfully_executed()
+        for code_chunk in all_code_chunks:
+            comment = '# ' + code_chunk.get_description_comment().strip().replace('\n', '\n# ')
+            (gotten_code, code_chunk_imports) = code_chunk.get_code()
+            (optional_code, optional_code_imports) = code_chunk.get_optional_code_that_successfully_executed()
 
-        # Make sure to not generate comments or code for steps with no code 
-        if len(gotten_code) > 0:
-            if add_comments:
-                gotten_code.insert(0, comment)
-            code.extend(gotten_code)
-            code.extend(optional_code)
+            # Make sure to not generate comments or code for steps with no code 
+            if len(gotten_code) > 0:
+                if add_comments:
+                    gotten_code.insert(0, comment)
+                code.extend(gotten_code)
+                code.extend(optional_code)
 
-            # Then add a line of whitespace
-            code.append('')
+                # Then add a line of whitespace
+                code.append('')
 
-        imports_code.extend(code_chunk_imports)
-        imports_code.extend(optional_code_imports)
+            imports_code.extend(code_chunk_imports)
+            imports_code.extend(optional_code_imports)
 
     # If we have a historical step checked out, then we add a comment letting
     # the user know this is the case
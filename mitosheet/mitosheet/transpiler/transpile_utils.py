@@ -4,9 +4,12 @@
 # Copyright (c) Saga Inc.
 # Distributed under the terms of the GPL License.
 
+import builtins
 from copy import copy
+from functools import lru_cache
 import inspect
 import re
+from types import CodeType
 from typing import Any, Dict, List, Optional, Set, Tuple, Union
 from collections import OrderedDict
 
@@ -368,6 +371,64 @@ def get_default_code_options(analysis_name: str) -> CodeOptions:
     }
 
 
+# The variables exported by each public interface version, so that we only collect them once
+_PUBLIC_INTERFACE_GLOBALS: Dict[int, Dict[str, Any]] = {}
+
+
+def get_public_interface_globals(public_interface: int) -> Dict[str, Any]:
+    """
+    Returns the variables exported by Mito for this public interface version. This
+    is built once for each version and then reused, so do not modify it.
+    """
+    if public_interface not in _PUBLIC_INTERFACE_GLOBALS:
+        if public_interface == 1:
+            import mitosheet.public.v1 as v1
+            public_interface_vars = v1.__dict__
+        elif public_interface == 2:
+            import mitosheet.public.v2 as v2
+            public_interface_vars = v2.__dict__
+        elif public_interface == 3:
+            import mitosheet.public.v3 as v3
+            public_interface_vars = v3.__dict__
+        else:
+            import mitosheet as original
+            public_interface_vars = original.__dict__
+
+        _PUBLIC_INTERFACE_GLOBALS[public_interface] = dict(public_interface_vars)
+
+    return _PUBLIC_INTERFACE_GLOBALS[public_interface]
+
+
+# The builtins along with the variables exported by each public interface version, so that we only build them once
+_PUBLIC_INTERFACE_BUILTINS: Dict[int, Dict[str, Any]] = {}
+
+
+def get_public_interface_builtins(public_interface: int) -> Dict[str, Any]:
+    """
+    Returns the builtins, with the variables exported by Mito for this public interface
+    version layered over them. We exec code with these as its __builtins__, so that any
+    name the code does not define itself is looked up here, and so the globals we exec 
+    with only need the names that change with each exec. This is built once for each
+    version and then reused, so do not modify it.
+    """
+    if public_interface not in _PUBLIC_INTERFACE_BUILTINS:
+        _PUBLIC_INTERFACE_BUILTINS[public_interface] = {
+            **builtins.__dict__,
+            **get_public_interface_globals(public_interface)
+        }
+
+    return _PUBLIC_INTERFACE_BUILTINS[public_interface]
+
+
+@lru_cache(maxsize=1024)
+def get_compiled_code(code: str) -> CodeType:
+    """
+    Returns the compiled code object for the code, so that exec'ing the same
+    code again (e.g. when replaying an analysis) does not compile it again.
+    """
+    return compile(code, '<string>', 'exec')
+
+
 def get_globals_for_exec(state: State, public_interface: int) -> Dict[str, Any]:
     """
     Anytime you are exec'ing transpiled code, you need to pass some global variables including:
@@ -376,6 +437,8 @@ def get_globals_for_exec(state: State, public_interface: int) -> Dict[str, Any]:
     3. The dataframe names
 
     This function collects these all in one location, so they then can be exec'ed.
+    The public interface is in the __builtins__ of the globals, so that we don't
+    copy it for each exec (see get_public_interface_builtins).
     """
 
     df_names_to_df = {
@@ -385,26 +448,13 @@ def get_globals_for_exec(state: State, public_interface: int) -> Dict[str, Any]:
             state.df_names
         )
     }
-    
-    if public_interface == 1:
-        import mitosheet.public.v1 as v1
-        local_vars = v1.__dict__
-    elif public_interface == 2:
-        import mitosheet.public.v2 as v2
-        local_vars = v2.__dict__
-    elif public_interface == 3:
-        import mitosheet.public.v3 as v3
-        local_vars = v3.__dict__
-    else:
-        import mitosheet as original
-        local_vars = original.__dict__
 
     user_defined_functions = state.user_defined_functions
     user_defined_importers = state.user_defined_importers
     user_defined_editors = state.user_defined_editors
 
     local_vars = {
-        **local_vars,
+        '__builtins__': get_public_interface_builtins(public_interface),
         **df_names_to_df,
         **{f.__name__: f for f in user_defined_functions},
         **{f.__name__: f for f in user_defined_importers},
@@ -14,7 +14,7 @@ continous integration
 
 import pandas as pd
 import numpy as np
-from typing import TYPE_CHECKING, Dict, List, Optional, Union, Tuple, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Union, Tuple, Any
 from collections import OrderedDict
 
 GraphID = str
@@ -324,6 +324,23 @@ if sys.version_info[:3] > (3, 8, 0):
         column_recon: ColumnReconData
         num_added_or_removed_rows: int
 
+    class ColumnEffects(TypedDict):
+        modified_column_ids: Set[ColumnID]
+        renamed_column_ids: Dict[ColumnID, ColumnHeader]
+
+    class StepProfile(TypedDict):
+        step_id: str
+        step_type: str
+        saturate_time: float
+        transpile_time: float
+        exec_time: float
+        recon_time: float
+        execute_time: float
+        serialization_time: float
+        bytes_copied: int
+        frame_memory_bytes: int
+        reused_execution: bool
+
     class AITransformFrontendResult(TypedDict):
         last_line_value: Optional[Union[str, bool, int, float, np.number]]
         created_dataframe_names: List[str]
@@ -430,6 +447,8 @@ else:
     DataframeReconData = Any # type: ignore
     ColumnReconData = Any # type: ignore
     ModifiedDataframeReconData = Any # type: ignore
+    ColumnEffects = Any # type: ignore
+    StepProfile = Any # type: ignore
     AITransformFrontendResult = Any # type: ignore
     CodeOptions = Any # type: ignore
     UserDefinedImporterParamType = Any # type: ignore
@@ -28,6 +28,9 @@ def execute_checkout_step_by_idx_update(
 
     steps_manager.curr_step_idx = step_idx
 
+    # The state we were on before is no longer a checkpoint, so may need to be dropped
+    steps_manager.enforce_step_history_memory_budget()
+
 CHECKOUT_STEP_BY_IDX_UPDATE = {
     'event_type': CHECKOUT_STEP_BY_IDX_UPDATE_EVENT,
     'params': CHECKOUT_STEP_BY_IDX_UPDATE_PARAMS,
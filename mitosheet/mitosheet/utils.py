@@ -11,7 +11,7 @@ import pprint
 from random import randint
 import re
 import uuid
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import TYPE_CHECKING, Any, Collection, Dict, List, Optional, Set, Tuple
 import os
 import keyword
 
@@ -19,12 +19,16 @@ import numpy as np
 import pandas as pd
 
 from mitosheet.column_headers import ColumnIDMap, get_column_header_display
-from mitosheet.is_type_utils import get_float_dt_td_columns, is_int_dtype
+from mitosheet.is_type_utils import is_int_dtype
 from mitosheet.types import (ColumnHeader, ColumnID, DataframeFormat, FrontendFormulaAndLocation, StateType)
 from mitosheet.excel_utils import get_df_name_as_valid_sheet_name
 
 from mitosheet.public.v3.formatting import add_formatting_to_excel_sheet
 
+if TYPE_CHECKING:
+    from mitosheet.pro.conditional_formatting_utils import ConditionalFormattingResultCache
+    from mitosheet.sheet_data_cache import SheetDataColumnCache
+
 
 # We only send the first 1500 rows of a dataframe; note that this
 # must match this variable defined on the front-end
@@ -131,8 +135,28 @@ def dfs_to_array_for_json(
         column_formulas_array: List[Dict[ColumnID, List[FrontendFormulaAndLocation]]],
         column_filters_array: List[Dict[ColumnID, Any]],
         column_ids: ColumnIDMap,
-        df_formats: List[DataframeFormat]
+        df_formats: List[DataframeFormat],
+        column_cache: Optional["SheetDataColumnCache"]=None,
+        conditional_formatting_cache: Optional["ConditionalFormattingResultCache"]=None,
+        buffer_column_data: bool=False
     ) -> List:
+    """
+    Returns the sheet data for each of the dfs, only serializing the sheets
+    in modified_sheet_indexes, and taking the rest from the previous_array.
+
+    If a column_cache is passed, then only the columns that have changed since
+    they were last serialized are serialized again. Similarly, if a 
+    conditional_formatting_cache is passed, only the conditional formats of the
+    columns that have changed are evaluated again.
+
+    If buffer_column_data is True, the data of the numeric and boolean columns
+    is not serialized, as it is sent in Arrow buffers. See sheet_data_arrow.py.
+    """
+
+    if column_cache is not None:
+        column_cache.remove_sheets_after(len(dfs))
+    if conditional_formatting_cache is not None:
+        conditional_formatting_cache.remove_sheets_after(len(dfs))
 
     new_array = []
     for sheet_index, df in enumerate(dfs):
@@ -150,7 +174,10 @@ def dfs_to_array_for_json(
                     df_formats[sheet_index],
                     # We only send the first 1500 rows and 1500 columns
                     max_rows=MAX_ROWS,
-                    max_columns=MAX_COLUMNS
+                    max_columns=MAX_COLUMNS,
+                    column_cache=column_cache,
+                    conditional_formatting_cache=conditional_formatting_cache,
+                    buffer_column_data=buffer_column_data
                 ) 
             )
         else:
@@ -304,7 +331,10 @@ def df_to_json_dumpsable(
         column_headers_to_column_ids: Dict[ColumnHeader, ColumnID],
         df_format: DataframeFormat,
         max_rows: Optional[int]=MAX_ROWS, # How many items you want to display. None when using this function to get unique value counts
-        max_columns: int=MAX_COLUMNS # How many columns you want to display. Unlike max_rows, this is always defined
+        max_columns: int=MAX_COLUMNS, # How many columns you want to display. Unlike max_rows, this is always defined
+        column_cache: Optional["SheetDataColumnCache"]=None, # If passed, only the columns that have changed are serialized
+        conditional_formatting_cache: Optional["ConditionalFormattingResultCache"]=None, # If passed, only the conditional formats of changed columns are evaluated
+        buffer_column_data: bool=False # If True, the data of numeric and boolean columns is left out, as it is sent in an Arrow buffer
     ) -> Dict[str, Any]:
     """
     Returns a dataframe and other metadata represented in a way that can be turned into a 
@@ -321,6 +351,7 @@ def df_to_json_dumpsable(
             columnHeader: (string | number);
             columnDtype: string;
             columnData: (string | number)[];
+            columnDataInBuffer?: boolean;
         }[];
         columnIDsMap: ColumnIDsMap;
         columnSpreadsheetCodeMap: Record<string, string>;
@@ -334,24 +365,42 @@ def df_to_json_dumpsable(
 
     (num_rows, num_columns) = original_df.shape 
 
-    json_obj = convert_df_to_parsed_json(original_df, max_rows=max_rows, max_columns=max_columns)
+    column_ids = [_get_column_id_from_header_safe(column_header, column_headers_to_column_ids) for column_header in original_df.columns]
+
+    column_indexes_in_buffer: Set[int] = set()
+    if buffer_column_data:
+        # Import just before we use it to avoid circular imports
+        from mitosheet.sheet_data_arrow import is_arrow_sheet_data_dtype
+        column_indexes_in_buffer = {
+            column_index for column_index, dtype in enumerate(original_df.dtypes.iloc[:max_columns]) 
+            if is_arrow_sheet_data_dtype(dtype)
+        }
+
+    displayed_columns_data: List[List[Any]]
+    if column_cache is not None:
+        displayed_columns_data, index = column_cache.get_columns_data(
+            sheet_index, original_df, column_ids[:max_columns], max_rows, column_indexes_in_buffer=column_indexes_in_buffer
+        )
+    else:
+        displayed_columns_data, index = convert_df_to_parsed_json_columns(
+            original_df, max_rows=max_rows, max_columns=max_columns, column_indexes_in_buffer=column_indexes_in_buffer
+        )
 
     final_data = []
     column_dtype_map = {}
     for column_index, column_header in enumerate(original_df.columns):
-        column_id = _get_column_id_from_header_safe(column_header, column_headers_to_column_ids)
+        column_id = column_ids[column_index]
 
         column_final_data: Dict[str, Any] = {
             'columnID': column_id,
             'columnHeader': get_column_header_display(column_header),
             'columnDtype': str(original_df[column_header].dtype),
-            'columnData': [],
+            # If we're beyond the max columns, we don't have data, so we leave the column data empty
+            'columnData': displayed_columns_data[column_index] if column_index < max_columns else [None] * len(index),
         }
+        if column_index in column_indexes_in_buffer:
+            column_final_data['columnDataInBuffer'] = True
         column_dtype_map[column_id] = str(original_df[column_header].dtype)
-        for row in json_obj['data']:
-            # If we're beyond the max columns, we might not have data, and we leave column data empty
-            # in this case and don't append anything
-            column_final_data['columnData'].append(row[column_index] if column_index < MAX_COLUMNS else None)
         
         final_data.append(column_final_data) 
 
@@ -373,7 +422,7 @@ def df_to_json_dumpsable(
         'columnFormulasMap': column_formulas,
         'columnFiltersMap': column_filters,
         'columnDtypeMap': column_dtype_map,
-        'index': json_obj['index'],
+        'index': index,
         'dfFormat': df_format,
         'conditionalFormattingResult': get_conditonal_formatting_result(
             state,
@@ -381,6 +430,7 @@ def df_to_json_dumpsable(
             original_df,
             df_format['conditional_formats'],
             max_rows=max_rows,
+            conditional_formatting_cache=conditional_formatting_cache
         )
 
     }
@@ -393,49 +443,152 @@ def get_row_data_array(df: pd.DataFrame) -> List[Any]:
     json_obj = convert_df_to_parsed_json(df)
     return json_obj['data']
 
+# The number of decimals that df.to_json rounds floats to
+JSON_DOUBLE_PRECISION = 10
+# df.to_json writes floats outside of these bounds in exponential notation, with JSON_DOUBLE_PRECISION significant digits
+JSON_EXPONENTIAL_MAX = 1e16 - 1
+JSON_EXPONENTIAL_MIN = 1e-15
+# The largest whole part of a float for which whole * 10**JSON_DOUBLE_PRECISION + frac is exact as a float
+JSON_EXACT_WHOLE_MAX = (2 ** 53) // 10 ** JSON_DOUBLE_PRECISION - 1
+
+
+def round_floats_like_to_json(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the floats as they are after being written by df.to_json and read back
+    with json.loads. Non-finite values are returned as NaN, which to_json writes as null.
+
+    NOTE: to_json does not round to the nearest decimal (like round does), but rounds 
+    the fractional part of each float in binary, so we do exactly the same here.
+    """
+    values = values.astype(np.float64)
+    finite = np.isfinite(values)
+    abs_values = np.abs(np.where(finite, values, 0))
+    exponential = (abs_values > JSON_EXPONENTIAL_MAX) | ((abs_values < JSON_EXPONENTIAL_MIN) & (abs_values != 0))
+    fixed_abs_values = np.where(exponential, 0, abs_values)
+
+    pow10 = 10.0 ** JSON_DOUBLE_PRECISION
+    whole = np.floor(fixed_abs_values)
+    tmp = (fixed_abs_values - whole) * pow10
+    frac = np.floor(tmp)
+    diff = tmp - frac
+    frac += (diff > 0.5) | ((diff == 0.5) & ((frac == 0) | (frac % 2 == 1)))
+    rollover = frac >= pow10
+    frac[rollover] = 0
+    whole += rollover
+
+    # Reading whole.frac back is the same as dividing the digits by pow10, as long as the digits are exact
+    large_whole = whole > JSON_EXACT_WHOLE_MAX
+    rounded = np.where(large_whole, whole, (whole * pow10 + frac) / pow10)
+    for i in np.flatnonzero(large_whole & (frac != 0)):
+        rounded[i] = float(f'{int(whole[i])}.{int(frac[i]):0{JSON_DOUBLE_PRECISION}d}')
+    for i in np.flatnonzero(exponential):
+        rounded[i] = float(f'{abs_values[i]:.{JSON_DOUBLE_PRECISION - 1}e}')
+
+    rounded = np.where(values < 0, -rounded, rounded)
+    rounded[~finite] = np.nan
+    return rounded
+
+
+def _get_parsed_json_datetimes(values: np.ndarray) -> List[Any]:
+    """
+    Formats the datetimes like .dt.strftime('%Y-%m-%d %X'), with NaT as 'NaN'.
+    """
+    nat = np.isnat(values)
+    years = values[~nat].astype('datetime64[Y]').astype(np.int64) + 1970
+    # If the years are not all 4 digits, we fall back to formatting each value
+    if len(years) > 0 and (years.min() < 1000 or years.max() > 9999):
+        formatted = pd.Series(values).dt.strftime('%Y-%m-%d %X')
+        return formatted.where(formatted.notnull(), 'NaN').tolist()
+
+    # Each date is formatted as YYYY-MM-DDTHH:MM:SS, and we replace the T with a space
+    strings = np.datetime_as_string(values, unit='s').astype('<U19')
+    characters = strings.view('<U1').reshape(-1, 19)
+    characters[:, 10] = ' '
+    parsed = characters.view('<U19').reshape(-1).astype(object)
+    parsed[nat] = 'NaN'
+    return parsed.tolist()
+
+
+def get_parsed_json_column(series: pd.Series) -> List[Any]:
+    """
+    Returns the data of the series in the same format as it is in the data of
+    convert_df_to_parsed_json. Dates are formatted as strings, timedeltas are turned 
+    into strings, and null values (and infinities) are 'NaN'.
+
+    We encode numbers, dates, timedeltas and strings directly from the underlying 
+    arrays, and only fall back to to_json for columns with other values in them.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype):
+        if dtype.kind in 'iub':
+            return series.to_numpy().tolist()
+        elif dtype.kind == 'f':
+            values = round_floats_like_to_json(series.to_numpy())
+            parsed = values.astype(object)
+            parsed[np.isnan(values)] = 'NaN'
+            return parsed.tolist()
+        elif dtype.kind == 'M':
+            return _get_parsed_json_datetimes(series.to_numpy())
+        elif dtype.kind == 'm':
+            # NOTE: we don't use astype(str), as it leaves out the time if all of the timedeltas are whole days
+            return [str(value) for value in series]
+        elif dtype.kind == 'O' and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            parsed = series.to_numpy(copy=True)
+            parsed[pd.isna(parsed)] = 'NaN'
+            return parsed.tolist()
+    elif isinstance(dtype, pd.DatetimeTZDtype):
+        # We display the time in the timezone of the column
+        return _get_parsed_json_datetimes(series.dt.tz_localize(None).to_numpy())
+
+    return ['NaN' if value is None else value for value in json.loads(series.to_json(orient='values'))]
+
+
+def get_parsed_json_index(index: pd.Index) -> List[Any]:
+    """
+    Returns the index in the same format as it is in convert_df_to_parsed_json.
+    """
+    if isinstance(index, pd.RangeIndex):
+        return list(index)
+    elif isinstance(index, pd.DatetimeIndex):
+        index = pd.Index(index.strftime('%Y-%m-%d %X'))
+    elif isinstance(index, pd.TimedeltaIndex):
+        index = pd.Index([str(value) for value in index])
+    return json.loads(pd.DataFrame(index=index).to_json(orient='split'))['index']
+
+
+def convert_df_to_parsed_json_columns(
+        original_df: pd.DataFrame, 
+        max_rows: Optional[int]=MAX_ROWS, 
+        max_columns: int=MAX_COLUMNS,
+        column_indexes_in_buffer: Collection[int]=()
+    ) -> Tuple[List[List[Any]], List[Any]]:
+    """
+    Returns the data of each of the first max_columns columns of the dataframe,
+    and the index, for the first max_rows rows. See get_parsed_json_column.
+
+    The columns in column_indexes_in_buffer are sent in an Arrow buffer, so
+    their data is left empty.
+    """
+    df = original_df if max_rows is None else original_df.iloc[:max_rows]
+    columns_data = [
+        [] if column_index in column_indexes_in_buffer else get_parsed_json_column(df.iloc[:, column_index]) 
+        for column_index in range(min(len(df.columns), max_columns))
+    ]
+    return columns_data, get_parsed_json_index(df.index)
+
+
 def convert_df_to_parsed_json(original_df: pd.DataFrame, max_rows: Optional[int]=MAX_ROWS, max_columns: int=MAX_COLUMNS) -> Dict[str, Any]:
     """
-    Returns a dataframe as a json object with the correct formatting
+    Returns a dataframe as a json object with the correct formatting, which is the
+    format of df.to_json(orient="split"), with dates and timedeltas as strings, and 
+    null values (and infinities) as 'NaN'.
     """
-    if max_rows is None:
-        df = original_df.copy(deep=True) 
-    else:
-        # we only show the first max_rows rows!
-        df = original_df.head(n=max_rows).copy(deep=True)
-
-    # we only show the first max_columns columns!
-    df = df.iloc[: , :max_columns]
-
-    float_columns, date_columns, timedelta_columns = get_float_dt_td_columns(df)
-    # We figure out which of the columns contain dates, and we
-    # convert them to string columns (for formatting reasons).
-    # NOTE: we don't use date_format='iso' in df.to_json call as it appends seconds to the object, 
-    # see here: https://stackoverflow.com/questions/52730953/pandas-to-json-output-date-format-in-specific-form
-    for column_header in date_columns:
-        df[column_header] = df[column_header].dt.strftime('%Y-%m-%d %X')
-
-    # Third, we figure out which of the columns contain timedeltas, and 
-    # we format the timedeltas as strings to make them readable
-    for column_header in timedelta_columns:
-        df[column_header] = df[column_header].apply(lambda x: str(x))
-
-    # Then, we check the index. If it is a datetime or a timedelta, we have to do
-    # the same conversions that we did above
-    # Then, if we have a datetime index, we update the index to be jsonified better
-    if isinstance(df.index, pd.DatetimeIndex):
-        df.index = df.index.strftime('%Y-%m-%d %X')
-    elif isinstance(df.index, pd.TimedeltaIndex):
-        df.index = df.index.to_series().apply(lambda x: str(x))
-
-    json_obj = json.loads(df.to_json(orient="split"))
-    # Then, we go through and find all the null values (which are infinities),
-    # and set them to 'NaN' for display in the frontend.
-    for d in json_obj['data']:
-        for idx, e in enumerate(d):
-            if e is None:
-                d[idx] = 'NaN'
-
-    return json_obj
+    columns_data, index = convert_df_to_parsed_json_columns(original_df, max_rows=max_rows, max_columns=max_columns)
+    return {
+        'columns': json.loads(original_df.iloc[:0, :max_columns].to_json(orient="split"))['columns'],
+        'index': index,
+        'data': [list(row) for row in zip(*columns_data)] if len(columns_data) > 0 else [[] for _ in index]
+    }
 
 
 def get_random_id() -> str:
@@ -536,6 +689,13 @@ def is_dash_installed() -> bool:
     except ImportError:
         return False
 
+def is_pyarrow_installed() -> bool:
+    try:
+        import pyarrow
+        return True
+    except ImportError:
+        return False
+
 
 def is_snowflake_credentials_available() -> bool:
     SNOWFLAKE_USERNAME = os.getenv('SNOWFLAKE_USERNAME')
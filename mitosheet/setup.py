@@ -145,7 +145,9 @@ setup_args = dict(
             # snowflake-connect-python requires at least Python 3.7
             'snowflake-connector-python[pandas]; python_version>="3.7"',
             'streamlit>=1.24',
-            'dash>=2.9'
+            'dash>=2.9',
+            # pyarrow is used to spill old step states to disk
+            'pyarrow'
         ]
     },
     zip_safe                = False,
@@ -1,7 +1,7 @@
 import Mito from '../mito/Mito';
 import React, { Component } from "react"
 import { MitoResponse, SendFunctionReturnType } from "../mito";
-import { getAnalysisDataFromString, getSheetDataArrayFromString, getUserProfileFromString } from "../jupyter/jupyterUtils";
+import { getAnalysisDataFromString, getSharedStateVariablesFromResponse, getSheetDataArrayFromString, getUserProfileFromString } from "../jupyter/jupyterUtils";
 import { getRandomId } from '../mito/api/api';
 
 export const DELAY_BETWEEN_SET_DASH_PROPS = 25;
@@ -22,6 +22,7 @@ interface State {
 type AllJson = {
     key: string,
     sheet_data_json: string,
+    sheet_data_buffers?: string[],
     analysis_data_json: string,
     user_profile_json: string
     responses_json: string,
@@ -96,12 +97,8 @@ export default class MitoDashWrapper extends Component<Props, State> {
                         });
                     }
 
-                    const sharedVariables = response.shared_variables;
-                    
                     return resolve({
-                        sheetDataArray: sharedVariables ? getSheetDataArrayFromString(sharedVariables.sheet_data_json) : undefined,
-                        analysisData: sharedVariables ? getAnalysisDataFromString(sharedVariables.analysis_data_json) : undefined,
-                        userProfile: sharedVariables ? getUserProfileFromString(sharedVariables.user_profile_json) : undefined,
+                        ...getSharedStateVariablesFromResponse(response.shared_variables),
                         result: response['data'] as ResultType
                     });
                 }
@@ -209,9 +206,9 @@ export default class MitoDashWrapper extends Component<Props, State> {
     render = () => {
 
         const {all_json} = this.props;
-        const {sheet_data_json, analysis_data_json, user_profile_json, key, track_selection} = JSON.parse(all_json) as AllJson;
+        const {sheet_data_json, sheet_data_buffers, analysis_data_json, user_profile_json, key, track_selection} = JSON.parse(all_json) as AllJson;
 
-        const sheetDataArray = getSheetDataArrayFromString(sheet_data_json);
+        const sheetDataArray = getSheetDataArrayFromString(sheet_data_json, sheet_data_buffers);
         const analysisData = getAnalysisDataFromString(analysis_data_json);
         const userProfile = getUserProfileFromString(user_profile_json);
 
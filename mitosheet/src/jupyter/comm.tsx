@@ -37,12 +37,13 @@
  */
 
 import { 
-    MitoResponse,
+    MitoResponse, StepExecutionHeartbeat,
     MAX_WAIT_FOR_SEND_CREATION, SendFunction, SendFunctionError, SendFunctionReturnType,
     waitUntilConditionReturnsTrueOrTimeout,
     isInJupyterLab, isInJupyterNotebook
 } from "../mito";
-import { getAnalysisDataFromString, getSheetDataArrayFromString, getUserProfileFromString } from "./jupyterUtils";
+import { DecodedMessage, EncodedMessageReceiver, getCommOpenData } from "./encodedMessages";
+import { getSharedStateVariablesFromResponse } from "./jupyterUtils";
 
 /**
  * Note the difference between the Lab and Notebook comm interfaces. 
@@ -58,12 +59,12 @@ import { getAnalysisDataFromString, getSheetDataArrayFromString, getUserProfileF
  */
 export interface LabComm {
     send: (msg: Record<string, unknown>) => void,
-    onMsg: (msg: {content: {data: Record<string, unknown>}}) => void,
-    open: () => void;
+    onMsg: (msg: {content: {data: Record<string, unknown>}, buffers?: (ArrayBuffer | ArrayBufferView)[]}) => void,
+    open: (data?: Record<string, unknown>) => void;
 }
 interface NotebookComm {
     send: (msg: Record<string, unknown>) => void,
-    on_msg: (handler: (msg: {content: {data: Record<string, unknown>}}) => void) => void,
+    on_msg: (handler: (msg: {content: {data: Record<string, unknown>}, buffers?: (ArrayBuffer | ArrayBufferView)[]}) => void) => void,
 }
 
 export type CommContainer = {
@@ -110,9 +111,10 @@ export const getNotebookCommConnectedToBackend = async (comm: NotebookComm): Pro
 
 export const getNotebookComm = async (commTargetID: string): Promise<CommContainer | SendFunctionError> => {
 
-    let potentialComm: NotebookComm | undefined = (window as any).Jupyter?.notebook?.kernel?.comm_manager?.new_comm(commTargetID);
+    // We open the comm with the message encodings we can read, so the backend knows how it can send large messages
+    let potentialComm: NotebookComm | undefined = (window as any).Jupyter?.notebook?.kernel?.comm_manager?.new_comm(commTargetID, getCommOpenData());
     await waitUntilConditionReturnsTrueOrTimeout(async () => {
-        potentialComm = (window as any).Jupyter?.notebook?.kernel?.comm_manager?.new_comm(commTargetID);
+        potentialComm = (window as any).Jupyter?.notebook?.kernel?.comm_manager?.new_comm(commTargetID, getCommOpenData());
         return potentialComm !== undefined;
     }, MAX_WAIT_FOR_SEND_CREATION)
 
@@ -184,9 +186,10 @@ export const getLabComm = async (kernelID: string, commTargetID: string): Promis
     } else {
         /**
          * If we have successfully made a comm, we need to manually open this comm before we 
-         * use it. This is required on lab, but not on notebook.
+         * use it. This is required on lab, but not on notebook. We open it with the message
+         * encodings we can read, so the backend knows how it can send large messages.
          */
-        (potentialComm as LabComm).open() // TODO: why do I have to do this cast? Seems like a complier issue
+        (potentialComm as LabComm).open(getCommOpenData()) // TODO: why do I have to do this cast? Seems like a complier issue
         
         if (!(await getLabCommConnectedToBackend(potentialComm))) {
             return 'no_backend_comm_registered_error'
@@ -239,8 +242,29 @@ export async function getCommSend(kernelID: string, commTargetID: string): Promi
     // We save the unconsumed responses on the getCommSend function
     const unconsumedResponses = getCommSend.unconsumedResponses || (getCommSend.unconsumedResponses = []);
 
+    // The ids of the messages that the backend is still executing, and has sent a heartbeat for
+    const heartbeatIds = new Set<string>();
+
+    // Large messages arrive in chunks, which we join back together before reading them
+    const encodedMessageReceiver = new EncodedMessageReceiver();
+
     function receiveResponse(rawResponse: Record<string, unknown>): void {
-        unconsumedResponses.push((rawResponse as any).content.data as MitoResponse);
+        // Responses are handled in the order they arrive, including those that need to be decoded
+        encodedMessageReceiver.receiveMessage((rawResponse as any).content.data, (rawResponse as any).buffers, handleResponse);
+    }
+
+    function handleResponse(message: DecodedMessage): void {
+        const response = message.data as unknown as MitoResponse | StepExecutionHeartbeat;
+        if (response.event === 'step_execution_heartbeat') {
+            heartbeatIds.add(response.event_id);
+            return;
+        }
+        // The Arrow buffers with the sheet data are sent as the binary buffers of the message
+        const buffers = message.buffers;
+        if (response.event === 'response' && response.shared_variables !== undefined && buffers.length > 0) {
+            response.shared_variables.sheet_data_buffers = buffers;
+        }
+        unconsumedResponses.push(response);
     }
 
     function getResponseData<ResultType> (id: string, maxRetries = MAX_RETRIES): Promise<SendFunctionReturnType<ResultType>> {
@@ -249,8 +273,12 @@ export async function getCommSend(kernelID: string, commTargetID: string): Promi
             let tries = 0;
 
             const interval = setInterval(() => {
-                // Only try at most MAX_RETRIES times
+                // Only try at most MAX_RETRIES times, counting from the last heartbeat, as 
+                // long running edits keep sending heartbeats while they execute
                 tries++;
+                if (heartbeatIds.delete(id)) {
+                    tries = 0;
+                }
 
                 if (tries > maxRetries) {
                     console.error(`No response on message: {id: ${id}}`);
@@ -282,13 +310,10 @@ export async function getCommSend(kernelID: string, commTargetID: string): Promi
                         });
                     }
 
-                    const sharedVariables = response.shared_variables;
-                    
                     return resolve({
-                        sheetDataArray: sharedVariables ? getSheetDataArrayFromString(sharedVariables.sheet_data_json) : undefined,
-                        analysisData: sharedVariables ? getAnalysisDataFromString(sharedVariables.analysis_data_json) : undefined,
-                        userProfile: sharedVariables ? getUserProfileFromString(sharedVariables.user_profile_json) : undefined,
-                        result: response['data'] as ResultType
+                        ...getSharedStateVariablesFromResponse(response.shared_variables),
+                        result: response['data'] as ResultType,
+                        deferredResponses: response.deferred_shared_variables?.map((deferredId) => getResponseData<unknown>(deferredId, maxRetries))
                     });
                 }
             }, RETRY_DELAY);
@@ -0,0 +1,136 @@
+// Copyright (c) Mito
+
+/**
+ * The backend sends large messages (like the sheet data, graph html, or an Excel export)
+ * as encoded messages, so that they don't block the kernel while they are sent. The
+ * message json is compressed with zlib, and then split into chunks, each of which is
+ * sent as its own message, with the chunk as its first buffer. The last chunk also has
+ * the buffers of the original message.
+ *
+ * We tell the backend which encodings we can read when we open the comm, and so older
+ * backends, or frontends that can't decompress, just get the message as is. See comm_messages.py.
+ */
+
+type CommBuffer = ArrayBuffer | ArrayBufferView;
+
+export type EncodedMessage = {
+    event: 'encoded_message',
+    encoded_message_id: string,
+    encoding: 'zlib' | null,
+    chunk_index: number,
+    num_chunks: number,
+}
+
+export type DecodedMessage = {
+    data: Record<string, unknown>,
+    buffers: CommBuffer[]
+}
+
+/**
+ * Returns the data to open the comm with, which tells the backend the
+ * message encodings we can read.
+ */
+export const getCommOpenData = (): Record<string, unknown> => {
+    const messageEncodings = ['chunks'];
+    // We can only decompress messages if the browser can decompress them for us
+    if (typeof DecompressionStream !== 'undefined') {
+        messageEncodings.push('zlib');
+    }
+    return {'message_encodings': messageEncodings};
+}
+
+const toUint8Array = (buffer: CommBuffer): Uint8Array => {
+    if (buffer instanceof ArrayBuffer) {
+        return new Uint8Array(buffer);
+    }
+    return new Uint8Array(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+}
+
+/**
+ * Returns the json string in the message bytes, decompressing them if they are compressed.
+ */
+export const decodeMessageBytes = async (messageBytes: Uint8Array, encoding: EncodedMessage['encoding']): Promise<string> => {
+    if (encoding === 'zlib') {
+        // NOTE: the deflate format is the zlib format, which is what the backend compresses with
+        const stream = new Blob([messageBytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+        return await new Response(stream).text();
+    }
+    return new TextDecoder().decode(messageBytes);
+}
+
+
+/**
+ * Keeps the chunks of each encoded message until all of them arrive, and
+ * then decodes the message.
+ */
+export class EncodedMessageReceiver {
+    // encoded message id -> the chunks of it that have arrived, by chunk index
+    chunks: Map<string, Map<number, Uint8Array>> = new Map();
+    // encoded message id -> the buffers of the original message, sent with the last chunk
+    messageBuffers: Map<string, CommBuffer[]> = new Map();
+    // Resolves once every message received so far has been handled
+    handledMessages: Promise<void> = Promise.resolve();
+
+    /**
+     * Call with each message, in the order they arrive. Calls handleMessage with each 
+     * message, once any encoded message is decoded, in the order the messages arrived. 
+     * 
+     * Decoding a compressed message is async, so without this, a large compressed 
+     * message could be handled after a smaller message that the backend sent after it.
+     */
+    receiveMessage(data: Record<string, unknown>, buffers: CommBuffer[] | undefined, handleMessage: (message: DecodedMessage) => void): void {
+        this.handledMessages = this.handledMessages.then(async () => {
+            if (data.event !== 'encoded_message') {
+                handleMessage({data: data, buffers: buffers ?? []});
+                return;
+            }
+            const decodedMessage = await this.receiveChunk(data as EncodedMessage, buffers);
+            if (decodedMessage !== undefined) {
+                handleMessage(decodedMessage);
+            }
+        }).catch((e) => console.error('Could not decode an encoded message', e));
+    }
+
+    /**
+     * Call with each chunk of an encoded message. Returns the decoded message
+     * once all of its chunks have arrived, and otherwise undefined.
+     */
+    async receiveChunk(encodedMessage: EncodedMessage, buffers: CommBuffer[] | undefined): Promise<DecodedMessage | undefined> {
+        if (buffers === undefined || buffers.length === 0) {
+            console.error(`Encoded message ${encodedMessage.encoded_message_id} has a chunk without any data`);
+            return undefined;
+        }
+
+        const messageId = encodedMessage.encoded_message_id;
+        const messageChunks = this.chunks.get(messageId) ?? new Map<number, Uint8Array>();
+        this.chunks.set(messageId, messageChunks);
+        messageChunks.set(encodedMessage.chunk_index, toUint8Array(buffers[0]));
+        if (encodedMessage.chunk_index === encodedMessage.num_chunks - 1) {
+            this.messageBuffers.set(messageId, buffers.slice(1));
+        }
+
+        if (messageChunks.size < encodedMessage.num_chunks) {
+            return undefined;
+        }
+
+        const messageBuffers = this.messageBuffers.get(messageId) ?? [];
+        this.chunks.delete(messageId);
+        this.messageBuffers.delete(messageId);
+
+        let numBytes = 0;
+        messageChunks.forEach(chunk => {numBytes += chunk.byteLength});
+        const messageBytes = new Uint8Array(numBytes);
+        let offset = 0;
+        for (let chunkIndex = 0; chunkIndex < encodedMessage.num_chunks; chunkIndex++) {
+            const chunk = messageChunks.get(chunkIndex) as Uint8Array;
+            messageBytes.set(chunk, offset);
+            offset += chunk.byteLength;
+        }
+
+        const messageJSON = await decodeMessageBytes(messageBytes, encodedMessage.encoding);
+        return {
+            data: JSON.parse(messageJSON) as Record<string, unknown>,
+            buffers: messageBuffers
+        };
+    }
+}
@@ -16,12 +16,16 @@
  */
 
 
+import { tableFromIPC } from "apache-arrow";
 import {
     AnalysisData,
     MitoAPI,
-    PublicInterfaceVersion, SheetData, UserProfile,
+    MitoSharedVariables,
+    PublicInterfaceVersion, SheetData, SheetDataBuffer, UserProfile,
     isInJupyterLab, isInJupyterNotebook
 } from "../mito";
+import { SendFunctionSuccessReturnType } from "../mito/api/send";
+import { decodeMessageBytes } from "./encodedMessages";
 import { notebookGetArgs, notebookOverwriteAnalysisToReplayToMitosheetCall, notebookWriteAnalysisToReplayToMitosheetCall, notebookWriteCodeSnippetCell, notebookWriteGeneratedCodeToCell } from "./notebook/extensionUtils";
 
 
@@ -101,11 +105,66 @@ export const getArgs = (analysisToReplayName: string | undefined): Promise<strin
 
 
 
-export const getSheetDataArrayFromString = (sheet_data_json: string): SheetData[] => {
+const getBytesFromBase64 = (base64: string): Uint8Array => {
+    const binaryString = atob(base64);
+    const bytes = new Uint8Array(binaryString.length);
+    for (let i = 0; i < binaryString.length; i++) {
+        bytes[i] = binaryString.charCodeAt(i);
+    }
+    return bytes;
+}
+
+const getSheetDataBufferBytes = (buffer: SheetDataBuffer): Uint8Array => {
+    if (typeof buffer === 'string') {
+        return getBytesFromBase64(buffer);
+    }
+    if (buffer instanceof ArrayBuffer) {
+        return new Uint8Array(buffer);
+    }
+    return new Uint8Array(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+}
+
+/**
+ * Reads the data of the columns that are in the Arrow buffer of this sheet into
+ * their columnData, so the sheet data is the same as if it was all sent as json. 
+ * See sheet_data_arrow.py.
+ */
+const readSheetDataBuffer = (sheetData: SheetData, buffer: SheetDataBuffer): void => {
+    const table = tableFromIPC(getSheetDataBufferBytes(buffer));
+    sheetData.data.forEach(column => {
+        if (!column.columnDataInBuffer) {
+            return;
+        }
+        const vector = table.getChild(column.columnID);
+        if (vector === null) {
+            return;
+        }
+
+        const columnData: (string | number | boolean)[] = new Array(vector.length);
+        for (let i = 0; i < vector.length; i++) {
+            const value = vector.get(i);
+            // Non-finite numbers are sent as nulls, and 64 bit ints are read as bigints
+            columnData[i] = value === null ? 'NaN' : (typeof value === 'bigint' ? Number(value) : value);
+        }
+        column.columnData = columnData;
+        delete column.columnDataInBuffer;
+    })
+    delete sheetData.columnDataBufferIndex;
+}
+
+export const getSheetDataArrayFromString = (sheet_data_json: string, sheet_data_buffers?: SheetDataBuffer[]): SheetData[] => {
     if (sheet_data_json.length === 0) {
         return []
     }
-    return JSON.parse(sheet_data_json);
+    const sheetDataArray: SheetData[] = JSON.parse(sheet_data_json);
+    if (sheet_data_buffers !== undefined) {
+        sheetDataArray.forEach(sheetData => {
+            if (sheetData.columnDataBufferIndex !== undefined) {
+                readSheetDataBuffer(sheetData, sheet_data_buffers[sheetData.columnDataBufferIndex]);
+            }
+        })
+    }
+    return sheetDataArray;
 }
 
 export const getUserProfileFromString = (user_profile_json: string): UserProfile => {
@@ -118,3 +177,35 @@ export const getUserProfileFromString = (user_profile_json: string): UserProfile
 export const getAnalysisDataFromString = (analysis_data_json: string): AnalysisData =>  {
     return JSON.parse(analysis_data_json)
 }
+
+/**
+ * Returns the json string in a payload that get_mito_frontend_code embeds in the
+ * rendered code, which is base64 encoded, and compressed with zlib if it is large.
+ */
+export const getStringFromBootstrapPayload = async (payloadBase64: string, encoding: string): Promise<string> => {
+    return decodeMessageBytes(getBytesFromBase64(payloadBase64), encoding === 'zlib' ? 'zlib' : null);
+}
+
+/**
+ * Reads the shared variables sent with a response, which have either the full sheet data and
+ * analysis data, or patches from earlier versions of them.
+ * 
+ * NOTE: deferred responses only contain some of the shared variables.
+ */
+export const getSharedStateVariablesFromResponse = (
+    sharedVariables: MitoSharedVariables | undefined
+): Omit<SendFunctionSuccessReturnType<unknown>, 'result' | 'deferredResponses'> => {
+    return {
+        sheetDataArray: sharedVariables?.sheet_data_json !== undefined ? getSheetDataArrayFromString(sharedVariables.sheet_data_json, sharedVariables.sheet_data_buffers) : undefined,
+        sheetDataVersion: sharedVariables?.sheet_data_version,
+        sheetDataPatch: sharedVariables?.sheet_data_patch_json !== undefined && sharedVariables.sheet_data_base_version !== undefined
+            ? {baseVersion: sharedVariables.sheet_data_base_version, patch: JSON.parse(sharedVariables.sheet_data_patch_json)} 
+            : undefined,
+        analysisData: sharedVariables?.analysis_data_json !== undefined ? getAnalysisDataFromString(sharedVariables.analysis_data_json) : undefined,
+        analysisDataVersion: sharedVariables?.analysis_data_version,
+        analysisDataPatch: sharedVariables?.analysis_data_patch_json !== undefined && sharedVariables.analysis_data_base_version !== undefined
+            ? {baseVersion: sharedVariables.analysis_data_base_version, patch: JSON.parse(sharedVariables.analysis_data_patch_json)} 
+            : undefined,
+        userProfile: sharedVariables?.user_profile_json !== undefined ? getUserProfileFromString(sharedVariables.user_profile_json) : undefined,
+    }
+}
@@ -1,21 +1,19 @@
 import * as React from 'react'
 import ReactDOM from 'react-dom';
 import { Mito } from './mito';
-import { getAnalysisDataFromString, getArgs, getSheetDataArrayFromString, getUserProfileFromString, overwriteAnalysisToReplayToMitosheetCall, writeAnalysisToReplayToMitosheetCall, writeCodeSnippetCell, writeGeneratedCodeToCell } from './jupyter/jupyterUtils';
+import { getAnalysisDataFromString, getArgs, getSheetDataArrayFromString, getStringFromBootstrapPayload, getUserProfileFromString, overwriteAnalysisToReplayToMitosheetCall, writeAnalysisToReplayToMitosheetCall, writeCodeSnippetCell, writeGeneratedCodeToCell } from './jupyter/jupyterUtils';
 import { getCommSend } from './jupyter/comm';
 
-// We replace the following byte arrays with the real byte arrays of the utf8 encoded
-// JSON for the sheet data array, etc. We pass this encoded because the JSON parsing
-// when we don't gets really complicated trying to replace \t, etc.
+// We replace the following strings with the real base64 encoded utf8 bytes of the JSON
+// for the sheet data array, etc, which are compressed with zlib if they are large. We 
+// pass this encoded because the JSON parsing when we don't gets really complicated 
+// trying to replace \t, etc. 
 // Do not edit the following lines without updating the get_mito_frontend_code which searches 
 // for this code exactly to replace it.
-const sheetDataBytes = new Uint8Array(['REPLACE_THIS_WITH_SHEET_DATA_BYTES' as unknown as number]);
-const analysisDataBytes = new Uint8Array(['REPLACE_THIS_WITH_ANALYSIS_DATA_BYTES' as unknown as number]);
-const userProfileBytes = new Uint8Array(['REPLACE_THIS_WITH_USER_PROFILE_BYTES' as unknown as number]);
-
-const sheetDataArray = getSheetDataArrayFromString(new TextDecoder().decode(sheetDataBytes));
-const analysisData = getAnalysisDataFromString(new TextDecoder().decode(analysisDataBytes));
-const userProfile = getUserProfileFromString(new TextDecoder().decode(userProfileBytes));
+const bootstrapEncoding = 'REPLACE_THIS_WITH_BOOTSTRAP_ENCODING';
+const sheetDataBase64 = 'REPLACE_THIS_WITH_SHEET_DATA_BASE64';
+const analysisDataBase64 = 'REPLACE_THIS_WITH_ANALYSIS_DATA_BASE64';
+const userProfileBase64 = 'REPLACE_THIS_WITH_USER_PROFILE_BASE64';
 
 // We create a distinct comm channel for each Mito instance, so that they can 
 // each communicate with the backend seperately. We replace these values when
@@ -45,19 +43,28 @@ async function getSendFunction() {
     return sendFromComm;
 
 }
-ReactDOM.render(
-    <Mito
-        getSendFunction={getSendFunction}
-        sheetDataArray={sheetDataArray}
-        analysisData={analysisData}
-        userProfile={userProfile}
-        jupyterUtils={{
-            getArgs: getArgs,
-            writeAnalysisToReplayToMitosheetCall: writeAnalysisToReplayToMitosheetCall,
-            writeGeneratedCodeToCell: writeGeneratedCodeToCell,
-            writeCodeSnippetCell: writeCodeSnippetCell,
-            overwriteAnalysisToReplayToMitosheetCall: overwriteAnalysisToReplayToMitosheetCall,
-        }}
-    />,
-    div
-)
+
+async function renderMitosheet() {
+    const sheetDataArray = getSheetDataArrayFromString(await getStringFromBootstrapPayload(sheetDataBase64, bootstrapEncoding));
+    const analysisData = getAnalysisDataFromString(await getStringFromBootstrapPayload(analysisDataBase64, bootstrapEncoding));
+    const userProfile = getUserProfileFromString(await getStringFromBootstrapPayload(userProfileBase64, bootstrapEncoding));
+
+    ReactDOM.render(
+        <Mito
+            getSendFunction={getSendFunction}
+            sheetDataArray={sheetDataArray}
+            analysisData={analysisData}
+            userProfile={userProfile}
+            jupyterUtils={{
+                getArgs: getArgs,
+                writeAnalysisToReplayToMitosheetCall: writeAnalysisToReplayToMitosheetCall,
+                writeGeneratedCodeToCell: writeGeneratedCodeToCell,
+                writeCodeSnippetCell: writeCodeSnippetCell,
+                overwriteAnalysisToReplayToMitosheetCall: overwriteAnalysisToReplayToMitosheetCall,
+            }}
+        />,
+        div
+    )
+}
+
+void renderMitosheet();
@@ -16,8 +16,9 @@ import { convertFrontendtoBackendGraphParams } from "../components/taskpanes/Gra
 import { AvailableSnowflakeOptionsAndDefaults, SnowflakeCredentials, SnowflakeTableLocationAndWarehouse } from "../components/taskpanes/SnowflakeImport/SnowflakeImportTaskpane";
 import { SplitTextToColumnsParams } from "../components/taskpanes/SplitTextToColumns/SplitTextToColumnsTaskpane";
 import { StepImportData } from "../components/taskpanes/UpdateImports/UpdateImportsTaskpane";
-import { AnalysisData, MergeParams, BackendPivotParams, CodeOptions, CodeSnippetAPIResult, ColumnID, DataframeFormat, FeedbackID, FilterGroupType, FilterType, FormulaLocation, GraphID, ParameterizableParams, SheetData, UIState, UserProfile, GraphParamsBackend, GraphParamsFrontend, StepType } from "../types";
+import { AnalysisData, ConditionalFormattingResult, MergeParams, BackendPivotParams, CodeOptions, CodeSnippetAPIResult, ColumnID, DataframeFormat, IndexLabel, FeedbackID, FilterGroupType, FilterType, FormulaLocation, GraphID, ParameterizableParams, SheetData, SheetDataBuffer, UIState, UserProfile, GraphParamsBackend, GraphParamsFrontend, StepType } from "../types";
 import { SendFunction, SendFunctionErrorReturnType, SendFunctionSuccessReturnType } from "./send";
+import { AnalysisDataPatch, SharedStatePatchQueue, SheetDataPatch, applyAnalysisDataPatch, applySheetDataPatch } from "./sharedStatePatches";
 
 export type MitoAPIResult<ResultType> = {result: ResultType} | SendFunctionErrorReturnType 
 
@@ -45,6 +46,59 @@ interface SearchResults {
 // "stepIndex" -> fileNames list
 export type ImportSummaries = Record<string, string[]>;
 
+export interface StepProfile {
+    step_id: string;
+    step_type: string;
+    saturate_time: number;
+    transpile_time: number;
+    exec_time: number;
+    recon_time: number;
+    execute_time: number;
+    serialization_time: number;
+    bytes_copied: number;
+    frame_memory_bytes: number;
+    reused_execution: boolean;
+}
+
+export interface StepMemoryUsage {
+    step_idx: number;
+    step_id: string;
+    step_type: string;
+    in_memory: boolean;
+    dataframe_memory_usage: number;
+    metadata_memory_usage: number;
+    memory_usage: number;
+}
+
+export interface MemoryUsage {
+    total_memory_usage: number;
+    dataframe_memory_usage: number;
+    metadata_memory_usage: number;
+    step_history_memory_usage: number;
+    undone_steps_memory_usage: number;
+    step_cache_memory_usage: number;
+    sheet_data_memory_usage: number;
+    sheet_data_cache_memory_usage: number;
+    conditional_formatting_cache_memory_usage: number;
+    search_column_cache_memory_usage: number;
+    steps: StepMemoryUsage[];
+}
+
+/*
+    The rows of a sheet from startingRowIndex up to (but not including) endingRowIndex, 
+    in the same format as the column data and index of the sheet data.
+*/
+export interface RowSlice {
+    sheetIndex: number;
+    startingRowIndex: number;
+    endingRowIndex: number;
+    numRows: number;
+    index: IndexLabel[];
+    columnData: Record<ColumnID, (string | number | boolean)[]>;
+    // The cells in these rows that the conditional formats apply to
+    conditionalFormattingResults: ConditionalFormattingResult['results'];
+}
+
 export enum UserJsonFields {
     UJ_USER_JSON_VERSION = 'user_json_version',
     UJ_STATIC_USER_ID = 'static_user_id',
@@ -65,14 +119,30 @@ export enum UserJsonFields {
     UJ_AI_MITO_API_NUM_USAGES = 'ai_mito_api_num_usages',
 }
 
+/*
+    The shared state variables sent with a response. The sheet data and analysis data are 
+    either sent in full, or as a patch from the version with the base version.
+*/
+export interface MitoSharedVariables {
+    'sheet_data_json'?: string,
+    // The Arrow buffers with the data of some columns, either base64 encoded or binary
+    'sheet_data_buffers'?: SheetDataBuffer[],
+    'sheet_data_patch_json'?: string,
+    'sheet_data_version'?: number,
+    'sheet_data_base_version'?: number,
+    'analysis_data_json'?: string,
+    'analysis_data_patch_json'?: string,
+    'analysis_data_version'?: number,
+    'analysis_data_base_version'?: number,
+    'user_profile_json'?: string
+}
+
 interface MitoSuccessOrInplaceErrorResponse {
     'event': 'response',
     'id': string,
-    'shared_variables'?: {
-        'sheet_data_json': string,
-        'analysis_data_json': string,
-        'user_profile_json': string
-    }
+    'shared_variables'?: MitoSharedVariables
+    // The ids of the responses that the shared variables are sent in, if they are sent after this response
+    'deferred_shared_variables'?: string[]
     'data': unknown
 }
 interface MitoErrorModalResponse {
@@ -86,6 +156,21 @@ interface MitoErrorModalResponse {
 
 export type MitoResponse = MitoSuccessOrInplaceErrorResponse | MitoErrorModalResponse
 
+/*
+    While an edit executes on the step execution worker, the backend sends 
+    a heartbeat with its progress, so we know it is still running.
+*/
+export interface StepExecutionHeartbeat {
+    event: 'step_execution_heartbeat',
+    id: string,
+    event_id: string,
+    data: {
+        elapsed_time: number,
+        num_steps_executed: number,
+        num_steps_to_execute: number
+    }
+}
+
 
 declare global {
     interface Window { commands: any }
@@ -104,6 +189,11 @@ export class MitoAPI {
     setAnalysisData: React.Dispatch<React.SetStateAction<AnalysisData>>
     setUserProfile: React.Dispatch<React.SetStateAction<UserProfile>>
     setUIState: React.Dispatch<React.SetStateAction<UIState>>
+
+    // Identifies this frontend to the backend, which sends it patches from the last state it sent it
+    frontendID: string
+    sheetDataPatchQueue: SharedStatePatchQueue<SheetDataPatch>
+    analysisDataPatchQueue: SharedStatePatchQueue<AnalysisDataPatch>
     
     constructor(
         getSendFunction: () => Promise<SendFunction | undefined>,
@@ -117,15 +207,29 @@ export class MitoAPI {
         this.setAnalysisData = setAnalysisData; 
         this.setUserProfile = setUserProfile;
         this.setUIState = setUIState;
+
+        this.frontendID = getRandomId();
+        this.sheetDataPatchQueue = new SharedStatePatchQueue((sheetDataPatch) => {
+            this.setSheetDataArray((prevSheetDataArray) => applySheetDataPatch(prevSheetDataArray, sheetDataPatch));
+        });
+        this.analysisDataPatchQueue = new SharedStatePatchQueue((analysisDataPatch) => {
+            this.setAnalysisData((prevAnalysisData) => applyAnalysisDataPatch(prevAnalysisData, analysisDataPatch));
+        });
     }
 
     _updateSharedStateVariables<ResultType>(response: SendFunctionSuccessReturnType<ResultType>) {
-        if (response.sheetDataArray) {
+        if (response.sheetDataArray && this.sheetDataPatchQueue.receiveFullState(response.sheetDataVersion)) {
             this.setSheetDataArray(response.sheetDataArray);
         } 
-        if (response.analysisData) {
+        if (response.sheetDataPatch && response.sheetDataVersion !== undefined) {
+            this.sheetDataPatchQueue.receivePatch(response.sheetDataVersion, response.sheetDataPatch);
+        }
+        if (response.analysisData && this.analysisDataPatchQueue.receiveFullState(response.analysisDataVersion)) {
             this.setAnalysisData(response.analysisData);
         }
+        if (response.analysisDataPatch && response.analysisDataVersion !== undefined) {
+            this.analysisDataPatchQueue.receivePatch(response.analysisDataVersion, response.analysisDataPatch);
+        }
         if (response.userProfile) {
             this.setUserProfile(response.userProfile);
         }
@@ -186,6 +290,13 @@ export class MitoAPI {
         const id = getRandomId();
         msg['id'] = id;
 
+        // Tell the backend the versions of the shared state we have, so it can send patches from them
+        msg['frontend_id'] = this.frontendID;
+        msg['shared_state_versions'] = {
+            'sheet_data': this.sheetDataPatchQueue.getAcknowledgedVersion(),
+            'analysis_data': this.analysisDataPatchQueue.getAcknowledgedVersion()
+        };
+
         if (this._send === undefined) {
             const _send = await this.getSendFunction();
             this._send = this._send || _send;
@@ -206,6 +317,15 @@ export class MitoAPI {
         } else {
             // Otherwise, we simple update the state variables, and return the response
             this._updateSharedStateVariables(response);
+
+            // If the state variables are sent after the response, we update them when they arrive
+            response.deferredResponses?.forEach((deferredResponse) => {
+                void deferredResponse.then((sharedVariablesResponse) => {
+                    if (!('error' in sharedVariablesResponse)) {
+                        this._updateSharedStateVariables(sharedVariablesResponse);
+                    }
+                })
+            })
             return {result: response.result}
         }
 
@@ -259,13 +379,14 @@ export class MitoAPI {
     /*
         Returns a string encoding of the CSV file to download
     */
-    async getSearchMatches(sheetIndex: number, searchValue: string): Promise<MitoAPIResult<SearchResults>> {
+    async getSearchMatches(sheetIndex: number, searchValue: string, countAllMatches = true): Promise<MitoAPIResult<SearchResults>> {
         return await this.send<SearchResults>({
             'event': 'api_call',
             'type': 'get_search_matches',
             'params': {
                 'sheet_index': sheetIndex,
-                'search_value': searchValue
+                'search_value': searchValue,
+                'count_all_matches': countAllMatches
             },
         })
     }
@@ -577,6 +698,43 @@ export class MitoAPI {
     }
     
 
+    async getStepProfiles(): Promise<MitoAPIResult<StepProfile[]>> {
+        return await this.send<StepProfile[]>({
+            'event': 'api_call',
+            'type': 'get_step_profiles',
+            'params': {}
+        })
+    }
+
+
+    async getMemoryUsage(): Promise<MitoAPIResult<MemoryUsage>> {
+        return await this.send<MemoryUsage>({
+            'event': 'api_call',
+            'type': 'get_memory_usage',
+            'params': {}
+        })
+    }
+
+    /*
+        Gets the rows from startingRowIndex to endingRowIndex of the sheet, as well as a 
+        few rows on either side of them, for the columns from startingColumnIndex to 
+        endingColumnIndex, as well as a few columns on either side of them.
+    */
+    async getRows(sheetIndex: number, startingRowIndex: number, endingRowIndex: number, startingColumnIndex: number, endingColumnIndex: number): Promise<MitoAPIResult<RowSlice>> {
+        return await this.send<RowSlice>({
+            'event': 'api_call',
+            'type': 'get_rows',
+            'params': {
+                'sheet_index': sheetIndex,
+                'start': startingRowIndex,
+                'end': endingRowIndex,
+                'start_column': startingColumnIndex,
+                'end_column': endingColumnIndex
+            }
+        })
+    }
+
+
     // AUTOGENERATED LINE: API GET (DO NOT DELETE)
 
 
@@ -602,6 +760,31 @@ export class MitoAPI {
         });
     }
 
+    /**
+     * Sends a batch of edit events, which the backend applies together in
+     * a single execution. If any of the edits fail, none of them are applied.
+     *
+     * @param editEvents the type, params and step id of each edit event
+     */
+    async editBatch(
+        editEvents: {type: string, params: Record<string, unknown>, stepID: string}[]
+    ): Promise<MitoAPIResult<never>> {
+        return await this.send({
+            'event': 'edit_event',
+            'type': 'batch_edit',
+            'step_id': getRandomId(),
+            'params': {
+                'edit_events': editEvents.map(editEvent => {
+                    return {
+                        'type': editEvent.type,
+                        'step_id': editEvent.stepID,
+                        'params': editEvent.params
+                    }
+                })
+            }
+        });
+    }
+
     async editGraph(
         graphID: GraphID,
         graphParams: GraphParamsFrontend,
@@ -1098,6 +1281,18 @@ export class MitoAPI {
         })
     }
 
+    /*
+        Cancels the edit that is currently executing, if edits can be cancelled. 
+        Returns true if there was an edit to cancel.
+    */
+    async updateCancelStepExecution(): Promise<MitoAPIResult<boolean>> {
+        return await this.send<boolean>({
+            'event': 'update_event',
+            'type': 'cancel_step_execution_update',
+            'params': {}
+        })
+    }
+
     async updateRenderCount(): Promise<void> {
         await this.send({
             'event': 'update_event',
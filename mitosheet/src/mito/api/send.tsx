@@ -12,12 +12,21 @@ export type SendFunctionError = 'non_working_extension_error' | 'no_backend_comm
 export type SendFunctionStatus = 'loading' | 'finished' | SendFunctionError;
 
 import { AnalysisData, SheetData, UserProfile } from "../types";
+import { AnalysisDataPatch, SharedStatePatch, SheetDataPatch } from "./sharedStatePatches";
 
 export type SendFunctionSuccessReturnType<ResultType> = {
     sheetDataArray: SheetData[] | undefined,
     analysisData: AnalysisData | undefined,
     userProfile: UserProfile | undefined,
-    result: ResultType
+    // The versions of the sheet data and analysis data, and the patches that make them, if 
+    // the backend sent patches rather than the full state. See sharedStatePatches.tsx
+    sheetDataVersion?: number,
+    sheetDataPatch?: SharedStatePatch<SheetDataPatch>,
+    analysisDataVersion?: number,
+    analysisDataPatch?: SharedStatePatch<AnalysisDataPatch>,
+    result: ResultType,
+    // If the backend sends the shared state variables after the response, the responses they come in
+    deferredResponses?: Promise<SendFunctionReturnType<unknown>>[]
 };
 
 export type SendFunctionErrorReturnType = {
@@ -0,0 +1,140 @@
+/**
+ * Rather than sending the full sheet data and analysis data after every edit, the
+ * backend sends each frontend a patch from the last version it sent it. Each patch
+ * has the version it was made from (its base version), and the version it makes.
+ *
+ * We apply the patches in the order of their versions, and hold onto patches that
+ * arrive before the patch they were made from. If a patch is missing, we tell the
+ * backend we have no version, and it sends the full state again. See shared_state_patches.py.
+ */
+
+import { AnalysisData, SheetData } from "../types";
+
+type SheetDataColumn = SheetData['data'][number];
+
+export type SheetDataPatch = {
+    numSheets: number,
+    // The sheets that changed, by sheet index. Columns with unchanged data leave out their
+    // columnData, and the index is left out if it is unchanged
+    sheets: Record<string, Omit<SheetData, 'data' | 'index'> & {
+        data: (Omit<SheetDataColumn, 'columnData'> & {columnData?: SheetDataColumn['columnData']})[],
+        index?: SheetData['index']
+    }>
+}
+
+export type AnalysisDataPatch = {
+    // The values that changed
+    values: Partial<AnalysisData>,
+    // The lists that changed, with their new length and just the items that changed, by index
+    lists: Record<string, {length: number, items: Record<string, unknown>}>
+}
+
+export type SharedStatePatch<PatchType> = {
+    baseVersion: number,
+    patch: PatchType
+}
+
+export const applySheetDataPatch = (sheetDataArray: SheetData[], sheetDataPatch: SheetDataPatch): SheetData[] => {
+    const newSheetDataArray: SheetData[] = [];
+    for (let sheetIndex = 0; sheetIndex < sheetDataPatch.numSheets; sheetIndex++) {
+        const sheetPatch = sheetDataPatch.sheets[sheetIndex.toString()];
+        const previousSheetData = sheetDataArray[sheetIndex];
+        if (sheetPatch === undefined) {
+            newSheetDataArray.push(previousSheetData);
+            continue;
+        }
+
+        const previousColumnData: Record<string, SheetDataColumn['columnData']> = {};
+        previousSheetData?.data.forEach(column => {
+            previousColumnData[column.columnID] = column.columnData;
+        });
+
+        newSheetDataArray.push({
+            ...sheetPatch,
+            data: sheetPatch.data.map(column => {
+                return {...column, columnData: column.columnData ?? previousColumnData[column.columnID] ?? []};
+            }),
+            index: sheetPatch.index ?? previousSheetData?.index ?? []
+        });
+    }
+    return newSheetDataArray;
+}
+
+export const applyAnalysisDataPatch = (analysisData: AnalysisData, analysisDataPatch: AnalysisDataPatch): AnalysisData => {
+    const newAnalysisData: Record<string, unknown> = {...analysisData, ...analysisDataPatch.values};
+    Object.entries(analysisDataPatch.lists).forEach(([key, listPatch]) => {
+        const previousList = (analysisData as unknown as Record<string, unknown[]>)[key] ?? [];
+        const newList = previousList.slice(0, listPatch.length);
+        Object.entries(listPatch.items).forEach(([index, item]) => {
+            newList[parseInt(index)] = item;
+        });
+        newAnalysisData[key] = newList;
+    });
+    return newAnalysisData as unknown as AnalysisData;
+}
+
+
+/**
+ * Keeps the version of a shared state variable that the frontend has, and applies
+ * the patches to it in the order of their versions.
+ */
+export class SharedStatePatchQueue<PatchType> {
+    version: number | undefined = undefined;
+    // base version -> the patch made from it, for patches that arrived before their base version
+    queuedPatches: Map<number, {version: number, patch: PatchType}> = new Map();
+    applyPatch: (patch: PatchType) => void;
+
+    constructor(applyPatch: (patch: PatchType) => void) {
+        this.applyPatch = applyPatch;
+    }
+
+    /**
+     * The version to tell the backend we have. If we are waiting on a patch, we have
+     * missed it, so we ask for the full state instead.
+     */
+    getAcknowledgedVersion(): number | undefined {
+        return this.queuedPatches.size > 0 ? undefined : this.version;
+    }
+
+    /**
+     * Call when the full state arrives. Returns false if it is older than the
+     * version we have, and so should not be set.
+     */
+    receiveFullState(version: number | undefined): boolean {
+        if (version === undefined) {
+            this.version = undefined;
+            this.queuedPatches.clear();
+            return true;
+        }
+        if (this.version !== undefined && version <= this.version) {
+            return false;
+        }
+
+        this.version = version;
+        this.queuedPatches.forEach((_, baseVersion) => {
+            if (baseVersion < version) {
+                this.queuedPatches.delete(baseVersion);
+            }
+        });
+        this._applyQueuedPatches();
+        return true;
+    }
+
+    receivePatch(version: number, sharedStatePatch: SharedStatePatch<PatchType>): void {
+        // Patches from a version older than ours have already been applied, or replaced by the full state
+        if (this.version !== undefined && sharedStatePatch.baseVersion < this.version) {
+            return;
+        }
+        this.queuedPatches.set(sharedStatePatch.baseVersion, {version: version, patch: sharedStatePatch.patch});
+        this._applyQueuedPatches();
+    }
+
+    _applyQueuedPatches(): void {
+        while (this.version !== undefined && this.queuedPatches.has(this.version)) {
+            const queuedPatch = this.queuedPatches.get(this.version) as {version: number, patch: PatchType};
+            this.queuedPatches.delete(this.version);
+            this.applyPatch(queuedPatch.patch);
+            this.version = queuedPatch.version;
+        }
+    }
+}
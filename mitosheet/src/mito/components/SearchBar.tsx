@@ -46,6 +46,9 @@ export const SearchBar: React.FC<SearchBarProps> = (props) => {
     const [ totalMatches, setTotalMatches ] = React.useState<number | undefined>(undefined);
     const [ showCautionMessage, setShowCautionMessage ] = React.useState<boolean>(false);
     const [ replaceValue, setReplaceValue ] = React.useState<string>('');
+    // The search value the latest search is for, so we don't show the total matches of an earlier search
+    const latestSearchValue = React.useRef<string | undefined>(searchValue);
+    latestSearchValue.current = searchValue;
 
     const scrollMatchIntoViewAndUpdateSelection = (match?: { rowIndex: number; colIndex: number }) => {
         // Columns have row index -1, so we check for that first.
@@ -92,15 +95,25 @@ export const SearchBar: React.FC<SearchBarProps> = (props) => {
             return;
         }
 
-        // Call the API to get the total number of matches and the displayed matches. 
-        void mitoAPI.getSearchMatches(uiState.selectedSheetIndex, searchValue ?? '').then((response) => {
+        // Call the API to get the displayed matches first, which only searches the displayed rows,
+        // and then to get the total number of matches, which searches all of the rows. 
+        void mitoAPI.getSearchMatches(uiState.selectedSheetIndex, searchValue ?? '', false).then((response) => {
             if ('error' in response) {
                 return;
             }
             const new_total_number_matches = response.result.total_number_matches;
             const new_matches = response.result.matches;
-            // Update the total matches. 
-            setTotalMatches(new_total_number_matches ?? 0);
+            // Update the total matches. If it is not known yet, we keep showing that it is loading
+            if (new_total_number_matches === null) {
+                void mitoAPI.getSearchMatches(uiState.selectedSheetIndex, searchValue ?? '').then((totalResponse) => {
+                    if ('error' in totalResponse || latestSearchValue.current !== searchValue) {
+                        return;
+                    }
+                    setTotalMatches(totalResponse.result.total_number_matches ?? 0);
+                });
+            } else {
+                setTotalMatches(new_total_number_matches);
+            }
 
             // Update the matches in UIState. This will trigger a re-render of the grid with
             // the matches highlighted.
@@ -13,7 +13,7 @@ import GridData from "./GridData";
 import IndexHeaders from "./IndexHeaders";
 import { equalSelections, getColumnIndexesInSelections, getIndexesFromMouseEvent, getIsCellSelected, getIsHeader, getNewSelectionAfterKeyPress, getNewSelectionAfterMouseUp, getSelectedRowLabelsWithEntireSelectedRow, isNavigationKeyPressed, isSelectionsOnlyColumnHeaders, isSelectionsOnlyIndexHeaders, reconciliateSelections, removeColumnFromSelections } from "./selectionUtils";
 import { calculateCurrentSheetView, calculateNewScrollPosition, calculateTranslate} from "./sheetViewUtils";
-import { firstNonNullOrUndefined, getColumnIDsArrayFromSheetDataArray } from "./utils";
+import { firstNonNullOrUndefined, getColumnIDsArrayFromSheetDataArray, getIsRowRangeLoaded, mergeRowSliceIntoSheetData } from "./utils";
 import { ensureCellVisible } from "./visibilityUtils";
 import { reconciliateWidthDataArray } from "./widthUtils";
 import FloatingCellEditor from "./celleditor/FloatingCellEditor";
@@ -27,7 +27,8 @@ export const DEFAULT_WIDTH = 123;
 export const DEFAULT_HEIGHT = 25;
 export const MIN_WIDTH = 50;
 
-// The maximum number of rows sent in the sheet data by the backend
+// The maximum number of rows sent in the sheet data by the backend. The rest 
+// of the rows are fetched from the backend when they are scrolled to
 export const MAX_ROWS = 1500;
 
 
@@ -120,13 +121,55 @@ function EndoGrid(props: {
 
     const totalSize: Dimension = {
         width: gridState.widthDataArray[gridState.sheetIndex]?.totalWidth || 0,
-        height: DEFAULT_HEIGHT * Math.min(sheetData?.numRows || 0, MAX_ROWS)
+        height: DEFAULT_HEIGHT * (sheetData?.numRows || 0)
     }
     
     const currentSheetView: SheetView = useMemo(() => {
         return calculateCurrentSheetView(gridState)
     }, [gridState])
 
+    // If we are currently getting rows from the backend, so we only get them once
+    const rowRequestInFlightRef = useRef(false);
+
+    /* 
+        An effect that gets the cells in the viewport from the backend if they 
+        are not in the sheet data, which only has the first MAX_ROWS rows.
+    */
+    useEffect(() => {
+        if (sheetData === undefined || rowRequestInFlightRef.current) {
+            return;
+        }
+
+        const startingRowIndex = Math.max(currentSheetView.startingRowIndex, 0);
+        const endingRowIndex = Math.min(startingRowIndex + currentSheetView.numRowsRendered, sheetData.numRows);
+        const startingColumnIndex = Math.max(currentSheetView.startingColumnIndex, 0);
+        const endingColumnIndex = Math.min(startingColumnIndex + currentSheetView.numColumnsRendered, sheetData.numColumns);
+        if (getIsRowRangeLoaded(sheetData, startingRowIndex, endingRowIndex, startingColumnIndex, endingColumnIndex)) {
+            return;
+        }
+
+        rowRequestInFlightRef.current = true;
+        void mitoAPI.getRows(sheetIndex, startingRowIndex, endingRowIndex, startingColumnIndex, endingColumnIndex).then((response) => {
+            rowRequestInFlightRef.current = false;
+            if ('error' in response) {
+                return;
+            }
+            mitoAPI.setSheetDataArray((prevSheetDataArray) => {
+                const prevSheetData = prevSheetDataArray[sheetIndex];
+                if (prevSheetData === undefined) {
+                    return prevSheetDataArray;
+                }
+                const newSheetData = mergeRowSliceIntoSheetData(prevSheetData, sheetData, response.result);
+                if (newSheetData === prevSheetData) {
+                    return prevSheetDataArray;
+                }
+                const newSheetDataArray = [...prevSheetDataArray];
+                newSheetDataArray[sheetIndex] = newSheetData;
+                return newSheetDataArray;
+            })
+        })
+    }, [sheetData, sheetIndex, currentSheetView.startingRowIndex, currentSheetView.numRowsRendered, currentSheetView.startingColumnIndex, currentSheetView.numColumnsRendered])
+
     const translate: RendererTranslate = useMemo(() => {
         return calculateTranslate(gridState);
     }, [gridState])
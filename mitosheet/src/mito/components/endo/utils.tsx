@@ -1,3 +1,4 @@
+import { RowSlice } from "../../api/api";
 import { Action, ActionEnum, ColumnFilters, ColumnFormatType, ColumnHeader, ColumnID, GridState, IndexLabel, SheetData, UIState } from "../../types";
 import { isBoolDtype, isDatetimeDtype, isFloatDtype, isIntDtype, isTimedeltaDtype } from "../../utils/dtypes";
 import { getKeyboardShortcutString } from "../../utils/keyboardShortcuts";
@@ -11,6 +12,76 @@ export const isNumberInRangeInclusive = (num: number, start: number, end: number
     return start <= num && num <= end;
 }
 
+// For sheet data with rows from the backend merged into it, the sheet data the backend sent
+const sheetDataWithoutMergedRows = new WeakMap<SheetData, SheetData>();
+
+/*
+    Returns true if the sheet data has the rows from startingRowIndex up to 
+    endingRowIndex, in the columns from startingColumnIndex up to endingColumnIndex, 
+    as the rows after the first MAX_ROWS are only in the sheet data once they have 
+    been merged in with mergeRowSliceIntoSheetData.
+*/
+export const getIsRowRangeLoaded = (sheetData: SheetData, startingRowIndex: number, endingRowIndex: number, startingColumnIndex: number, endingColumnIndex: number): boolean => {
+    const columnsData = sheetData.data.slice(startingColumnIndex, endingColumnIndex);
+    for (let rowIndex = startingRowIndex; rowIndex < endingRowIndex; rowIndex++) {
+        if (sheetData.index[rowIndex] === undefined) {
+            return false;
+        }
+        if (columnsData.some(columnData => columnData.columnData[rowIndex] === undefined)) {
+            return false;
+        }
+    }
+    return true;
+}
+
+/*
+    Returns a copy of the sheet data with the rows in the row slice, which 
+    were requested for requestedSheetData. If the sheet data has changed since 
+    then (e.g. the user made an edit), returns the sheet data unchanged, as the
+    rows might be out of date.
+
+    NOTE: the column data and index are sparse arrays, so only the rows that
+    have been loaded take up memory.
+*/
+export const mergeRowSliceIntoSheetData = (sheetData: SheetData, requestedSheetData: SheetData, rowSlice: RowSlice): SheetData => {
+    const backendSheetData = sheetDataWithoutMergedRows.get(sheetData) ?? sheetData;
+    const requestedBackendSheetData = sheetDataWithoutMergedRows.get(requestedSheetData) ?? requestedSheetData;
+    if (backendSheetData !== requestedBackendSheetData || sheetData.numRows !== rowSlice.numRows) {
+        return sheetData;
+    }
+
+    const newIndex = sheetData.index.slice();
+    rowSlice.index.forEach((indexLabel, i) => {
+        newIndex[rowSlice.startingRowIndex + i] = indexLabel;
+    });
+
+    const newData = sheetData.data.map((columnData) => {
+        const rowSliceColumnData = rowSlice.columnData[columnData.columnID];
+        if (rowSliceColumnData === undefined) {
+            return columnData;
+        }
+        const newColumnData = columnData.columnData.slice();
+        rowSliceColumnData.forEach((value, i) => {
+            newColumnData[rowSlice.startingRowIndex + i] = value;
+        });
+        return {...columnData, columnData: newColumnData};
+    });
+
+    const newConditionalFormattingResults = {...sheetData.conditionalFormattingResult.results};
+    Object.entries(rowSlice.conditionalFormattingResults).forEach(([columnID, rowSliceResults]) => {
+        newConditionalFormattingResults[columnID] = {...newConditionalFormattingResults[columnID], ...rowSliceResults};
+    });
+
+    const newSheetData = {
+        ...sheetData, 
+        index: newIndex, 
+        data: newData,
+        conditionalFormattingResult: {...sheetData.conditionalFormattingResult, results: newConditionalFormattingResults}
+    };
+    sheetDataWithoutMergedRows.set(newSheetData, backendSheetData);
+    return newSheetData;
+}
+
 /* 
     A helper function for getting the first non-null or undefined
     value from a list of arguments.
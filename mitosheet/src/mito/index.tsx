@@ -1,10 +1,10 @@
 export { Mito } from './Mito';
 export { 
-    AnalysisData, GraphData, GraphDataArray as graphDataArray, GraphParamsBackend, PublicInterfaceVersion, SheetData, UserProfile,
+    AnalysisData, GraphData, GraphDataArray as graphDataArray, GraphParamsBackend, PublicInterfaceVersion, SheetData, SheetDataBuffer, UserProfile,
     MitoTheme
 } from "./types"
 
-export { MitoAPI, MitoResponse } from './api/api';
+export { MitoAPI, MitoResponse, MitoSharedVariables, StepExecutionHeartbeat } from './api/api';
 export { MAX_WAIT_FOR_SEND_CREATION, SendFunction, SendFunctionError, SendFunctionReturnType } from "../mito/api/send";
 
 export { waitUntilConditionReturnsTrueOrTimeout } from "../mito/utils/time";
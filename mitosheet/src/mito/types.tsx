@@ -305,6 +305,7 @@ export type FrontendFormulaAndLocation = {
  * @param columnFiltersMap - for this dataframe, a map from column id -> filter objects
  * @param columnDtypeMap - for this dataframe, a map from column id -> column dtype
  * @param index - the indexes in this dataframe
+ * @param columnDataBufferIndex - if the data of some columns is sent in an Arrow buffer, the index of this buffer. These columns have columnDataInBuffer set
  */
 export type SheetData = {
     dfName: string;
@@ -316,7 +317,9 @@ export type SheetData = {
         columnHeader: ColumnHeader;
         columnDtype: string;
         columnData: (string | number | boolean)[];
+        columnDataInBuffer?: boolean;
     }[];
+    columnDataBufferIndex?: number;
     columnIDsMap: ColumnIDsMap;
     columnFormulasMap: Record<ColumnID, FrontendFormulaAndLocation[]>;
     columnFiltersMap: ColumnFilterMap;
@@ -326,6 +329,12 @@ export type SheetData = {
     conditionalFormattingResult: ConditionalFormattingResult;
 };
 
+/**
+ * An Arrow IPC buffer with the data of some columns of a sheet. Over the comm, these 
+ * are sent as binary buffers, and otherwise they are base64 encoded strings.
+ */
+export type SheetDataBuffer = string | ArrayBuffer | ArrayBufferView;
+
 
 export type GraphPreprocessingParams = {
     safety_filter_turned_on_by_user: boolean
@@ -7,7 +7,7 @@ import {
 import Mito from '../mito/Mito';
 import React, { ReactNode } from "react"
 import { MitoResponse, MitoTheme, SendFunctionReturnType } from "../mito";
-import { getAnalysisDataFromString, getSheetDataArrayFromString, getUserProfileFromString } from "../jupyter/jupyterUtils";
+import { getAnalysisDataFromString, getSharedStateVariablesFromResponse, getSheetDataArrayFromString, getUserProfileFromString } from "../jupyter/jupyterUtils";
 
 
 interface State {
@@ -126,12 +126,8 @@ class MitoStreamlitWrapper extends StreamlitComponentBase<State> {
                         });
                     }
 
-                    const sharedVariables = response.shared_variables;
-                    
                     return resolve({
-                        sheetDataArray: sharedVariables ? getSheetDataArrayFromString(sharedVariables.sheet_data_json) : undefined,
-                        analysisData: sharedVariables ? getAnalysisDataFromString(sharedVariables.analysis_data_json) : undefined,
-                        userProfile: sharedVariables ? getUserProfileFromString(sharedVariables.user_profile_json) : undefined,
+                        ...getSharedStateVariablesFromResponse(response.shared_variables),
                         result: response['data'] as ResultType
                     });
                 }
@@ -168,7 +164,7 @@ class MitoStreamlitWrapper extends StreamlitComponentBase<State> {
     public render = (): ReactNode => {
 
         const returnType = this.props.args['return_type'] as string;
-        const sheetDataArray = getSheetDataArrayFromString(this.props.args['sheet_data_json']);
+        const sheetDataArray = getSheetDataArrayFromString(this.props.args['sheet_data_json'], this.props.args['sheet_data_buffers'] ?? undefined);
         const analysisData = getAnalysisDataFromString(this.props.args['analysis_data_json']);
         const userProfile = getUserProfileFromString(this.props.args['user_profile_json']);
         const responses = JSON.parse(this.props.args['responses_json']);